@@ -0,0 +1,469 @@
+"""API HTTP/JSON para pedidos e estoque, sem passar pela interface do Streamlit
+
+Uso: python api.py [--host 0.0.0.0] [--porta 8502]
+
+Autenticação HTTP Basic com os mesmos usuários do sistema. As rotas de leitura
+valem para qualquer usuário; as que gravam (POST/PUT), só para os tipos que
+lançam pedidos e mexem no estoque na interface (TIPOS_QUE_GRAVAM). Rotas:
+
+    GET  /saude                              (sem autenticação)
+    GET  /escolas
+    GET  /produtos?escola_id=1&categoria=Camisetas&tamanho=M
+    GET  /pedidos?escola_id=1
+    GET  /pedidos/itens?ids=1,2,3            (itens de vários pedidos em uma consulta)
+    GET  /clientes/<id>/historico?pagina=1&por_pagina=50  (totais, última compra, tamanhos e uma página de pedidos)
+    POST /pedidos                            {cliente_id, escola_id, itens: [{produto_id, quantidade}], ...}
+    POST /pedidos/lote                       {pedidos: [...]}
+    PUT  /pedidos/<id>/status                {status}
+    POST /pedidos/status/lote                {atualizacoes: [{pedido_id, status}]}
+    PUT  /produtos/<id>/estoque              {estoque}
+    POST /estoque/lote                       {ajustes: [{produto_id, estoque}]}
+    POST /sincronizacao                      {operacoes: [{uuid, tipo, dados, criada_em}]}  (caixa offline)
+    GET  /eventos?depois=CURSOR&limite=100   (mudanças em ordem; guarde o 'cursor' da resposta)
+    GET  /relatorios/vendas?escola_id=&inicio=AAAA-MM-DD&fim=AAAA-MM-DD&granularidade=dia|semana|mes
+    GET  /relatorios/produtos?escola_id=
+
+As rotas de lote respondem item a item, na ordem enviada: {resultados: [{sucesso, mensagem, ...}]};
+um item inválido não impede a gravação dos outros.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from database.auditoria import definir_usuario
+from database.lojas import definir_loja, loja_do_usuario
+from database.offline import receber_operacoes
+from database.banco import (
+    aquecer, verificar_login, particao_existe,
+    STATUS_PEDIDO, FORMAS_PAGAMENTO, PEDIDO_NAO_ENCONTRADO, PRODUTO_NAO_ENCONTRADO,
+    listar_escolas, listar_produtos_por_escola, buscar_produtos, listar_pedidos_por_escola, listar_itens_pedidos,
+    adicionar_pedido, adicionar_pedidos_lote, atualizar_status_pedido, atualizar_status_pedidos_lote,
+    atualizar_estoque, atualizar_estoques_lote, ler_eventos, historico_cliente, listar_pedidos_cliente, cliente_existe,
+    gerar_relatorio_vendas_por_escola, gerar_relatorio_produtos_por_escola, EXPRESSOES_GRANULARIDADE
+)
+
+logger = logging.getLogger(__name__)
+
+LIMITE_LOTE = 500             # Itens por requisição de lote
+VALIDADE_CREDENCIAIS = 60     # Segundos até conferir a senha no banco de novo
+TIPOS_QUE_GRAVAM = ('admin', 'vendedor')  # Tipos de usuário que gravam pedidos e estoque na interface
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+# =========================================
+# 🔐 AUTENTICAÇÃO
+# =========================================
+
+_credenciais_validas = {}
+_credenciais_lock = threading.Lock()
+
+def autenticar(cabecalho):
+    """Confere o cabeçalho Authorization: Basic; guarda o acerto por alguns segundos.
+    Retorna o usuário, o tipo e a loja dele"""
+    if not cabecalho or not cabecalho.startswith('Basic '):
+        raise ErroRequisicao(401, "Autenticação necessária")
+
+    chave = hashlib.sha256(cabecalho.encode()).hexdigest()
+    agora = time.monotonic()
+    with _credenciais_lock:
+        validade, username, tipo, loja = _credenciais_validas.get(chave, (None, None, None, None))
+    if validade and validade > agora:
+        return username, tipo, loja
+
+    try:
+        username, _, password = base64.b64decode(cabecalho[6:]).decode().partition(':')
+    except Exception:
+        raise ErroRequisicao(401, "Cabeçalho de autenticação inválido")
+    sucesso, mensagem, tipo = verificar_login(username, password)
+    if not sucesso:
+        raise ErroRequisicao(401, mensagem)
+    loja = loja_do_usuario(username)
+    with _credenciais_lock:
+        _credenciais_validas[chave] = (agora + VALIDADE_CREDENCIAIS, username, tipo, loja)
+    return username, tipo, loja
+
+# =========================================
+# 🔄 CONVERSÕES
+# =========================================
+
+def linhas_para_json(linhas):
+    return [dict(linha) for linha in linhas]
+
+def relatorio_para_json(df):
+    if df.empty:
+        return []
+    df = df.copy()
+    if 'Data' in df:
+        df['Data'] = df['Data'].dt.strftime('%Y-%m-%d')
+    return df.astype({coluna: str for coluna in df.select_dtypes('category')}).to_dict('records')
+
+def parametro_inteiro(valor, nome):
+    if valor is None or valor == '':
+        return None
+    # 2.7 ou true no JSON não viram 2 ou 1 sem aviso
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ErroRequisicao(400, f"'{nome}' deve ser um número inteiro")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(400, f"'{nome}' deve ser um número inteiro")
+
+def parametro_nao_negativo(valor, nome):
+    numero = parametro_inteiro(valor, nome)
+    if numero is None or numero < 0:
+        raise ErroRequisicao(400, f"'{nome}' deve ser um número inteiro maior ou igual a zero")
+    return numero
+
+def parametro_data(valor, nome):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErroRequisicao(400, f"'{nome}' deve estar no formato AAAA-MM-DD")
+
+def campo(dados, nome, obrigatorio=True):
+    if not isinstance(dados, dict):
+        raise ErroRequisicao(400, "Esperado um objeto JSON")
+    if obrigatorio and dados.get(nome) is None:
+        raise ErroRequisicao(400, f"Campo obrigatório ausente: '{nome}'")
+    return dados.get(nome)
+
+def lista_lote(dados, nome):
+    itens = campo(dados, nome)
+    if not isinstance(itens, list) or not itens:
+        raise ErroRequisicao(400, f"'{nome}' deve ser uma lista não vazia")
+    if len(itens) > LIMITE_LOTE:
+        raise ErroRequisicao(413, f"No máximo {LIMITE_LOTE} itens por lote")
+    return itens
+
+def validar_status(status):
+    if status not in STATUS_PEDIDO:
+        raise ErroRequisicao(400, f"Status inválido: {status}. Use um de: {', '.join(STATUS_PEDIDO)}")
+    return status
+
+def exigir_particao(registro_id, nome):
+    """Com partições, um id fora da faixa de toda escola não chega ao banco: 404"""
+    if not particao_existe(registro_id):
+        raise ErroRequisicao(404, f"{nome} {registro_id} não encontrado")
+    return registro_id
+
+def montar_pedido(dados):
+    """Valida o pedido e completa preço/subtotal com o catálogo em cache da escola (o preço enviado é ignorado)"""
+    cliente_id = parametro_inteiro(campo(dados, 'cliente_id'), 'cliente_id')
+    escola_id = parametro_inteiro(campo(dados, 'escola_id'), 'escola_id')
+    if not cliente_existe(cliente_id):
+        raise ErroRequisicao(400, f"Cliente {cliente_id} não encontrado")
+    itens = campo(dados, 'itens')
+    if not isinstance(itens, list) or not itens:
+        raise ErroRequisicao(400, "'itens' deve ser uma lista não vazia")
+
+    precos = {produto['id']: produto['preco'] for produto in listar_produtos_por_escola(escola_id)}
+    itens_pedido = []
+    for item in itens:
+        produto_id = parametro_inteiro(campo(item, 'produto_id'), 'produto_id')
+        quantidade = parametro_inteiro(campo(item, 'quantidade'), 'quantidade')
+        if quantidade <= 0:
+            raise ErroRequisicao(400, "'quantidade' deve ser maior que zero")
+        if produto_id not in precos:
+            raise ErroRequisicao(400, f"Produto {produto_id} não pertence à escola {escola_id}")
+        preco_unitario = precos[produto_id] or 0.0
+        itens_pedido.append({
+            'produto_id': produto_id,
+            'quantidade': quantidade,
+            'preco_unitario': preco_unitario,
+            'subtotal': preco_unitario * quantidade,
+        })
+
+    # Só a ausência vira Dinheiro: {} ou 0 são recusados como qualquer outro valor desconhecido
+    forma_pagamento = dados.get('forma_pagamento')
+    forma_pagamento = 'Dinheiro' if forma_pagamento in (None, '') else forma_pagamento
+    if forma_pagamento not in FORMAS_PAGAMENTO:
+        raise ErroRequisicao(400, f"Forma de pagamento inválida. Use uma de: {', '.join(FORMAS_PAGAMENTO)}")
+    data_entrega = parametro_data(dados.get('data_entrega'), 'data_entrega')
+    return {
+        'cliente_id': cliente_id,
+        'escola_id': escola_id,
+        'itens': itens_pedido,
+        'data_entrega': data_entrega.isoformat() if data_entrega else None,
+        'forma_pagamento': forma_pagamento,
+        'observacoes': dados.get('observacoes') or '',
+    }
+
+def resultado(sucesso, mensagem, **extras):
+    return (200 if sucesso else 422), {'sucesso': sucesso, 'mensagem': mensagem, **extras}
+
+# =========================================
+# 🌐 ROTAS
+# =========================================
+
+def rota_escolas(consulta, dados):
+    return 200, linhas_para_json(listar_escolas())
+
+def rota_produtos(consulta, dados):
+    return 200, linhas_para_json(buscar_produtos(
+        parametro_inteiro(consulta.get('escola_id'), 'escola_id'), consulta.get('categoria'), consulta.get('tamanho')
+    ))
+
+def rota_pedidos(consulta, dados):
+    return 200, linhas_para_json(listar_pedidos_por_escola(parametro_inteiro(consulta.get('escola_id'), 'escola_id')))
+
+MAXIMO_IDS_ITENS = 500
+
+def rota_itens_pedidos(consulta, dados):
+    try:
+        ids = [int(valor) for valor in (consulta.get('ids') or '').split(',') if valor.strip()]
+    except ValueError:
+        raise ErroRequisicao(400, "'ids' deve ser uma lista de números separados por vírgula")
+    if not ids:
+        raise ErroRequisicao(400, "Informe 'ids'")
+    if len(ids) > MAXIMO_IDS_ITENS:
+        raise ErroRequisicao(413, f"No máximo {MAXIMO_IDS_ITENS} pedidos por requisição")
+    itens = listar_itens_pedidos(ids)
+    return 200, {str(pedido_id): linhas_para_json(itens_pedido) for pedido_id, itens_pedido in itens.items()}
+
+MAXIMO_POR_PAGINA = 200
+
+def rota_historico_cliente(consulta, dados, cliente_id):
+    pagina = parametro_inteiro(consulta.get('pagina'), 'pagina')
+    pagina = 1 if pagina is None else pagina
+    por_pagina = parametro_inteiro(consulta.get('por_pagina'), 'por_pagina')
+    por_pagina = 50 if por_pagina is None else por_pagina
+    if pagina < 1 or not 0 < por_pagina <= MAXIMO_POR_PAGINA:
+        raise ErroRequisicao(400, f"'pagina' deve ser positiva e 'por_pagina' estar entre 1 e {MAXIMO_POR_PAGINA}")
+    historico = historico_cliente(int(cliente_id))
+    pedidos = listar_pedidos_cliente(int(cliente_id), por_pagina, (pagina - 1) * por_pagina,
+                                     [escola['escola_id'] for escola in historico['escolas']])
+    return 200, {**historico, 'pagina': pagina, 'pedidos_pagina': linhas_para_json(pedidos)}
+
+def rota_criar_pedido(consulta, dados):
+    pedido = montar_pedido(dados)
+    sucesso, mensagem = adicionar_pedido(
+        pedido['cliente_id'], pedido['escola_id'], pedido['itens'],
+        pedido['data_entrega'], pedido['forma_pagamento'], pedido['observacoes']
+    )
+    return resultado(sucesso, mensagem)
+
+def rota_criar_pedidos_lote(consulta, dados):
+    pedidos, resultados = [], []
+    for dados_pedido in lista_lote(dados, 'pedidos'):
+        try:
+            pedidos.append(montar_pedido(dados_pedido))
+            resultados.append(None)
+        except ErroRequisicao as e:
+            resultados.append({'sucesso': False, 'mensagem': e.mensagem, 'pedido_id': None})
+
+    # Os válidos vão juntos em uma transação; os inválidos mantêm a posição na resposta
+    gravados = iter(adicionar_pedidos_lote(pedidos) if pedidos else [])
+    resultados = [r if r is not None else next(gravados) for r in resultados]
+    return 200, {'resultados': resultados, 'criados': sum(r['sucesso'] for r in resultados)}
+
+def rota_status_pedido(consulta, dados, pedido_id):
+    pedido_id = exigir_particao(int(pedido_id), 'Pedido')
+    sucesso, mensagem = atualizar_status_pedido(pedido_id, validar_status(campo(dados, 'status')))
+    if mensagem == PEDIDO_NAO_ENCONTRADO:
+        raise ErroRequisicao(404, f"Pedido {pedido_id} não encontrado")
+    return resultado(sucesso, mensagem)
+
+def validar_lote(itens, chave, validar):
+    """Aplica validar a cada item do lote; retorna (válidos, resultados com None onde o item é válido)"""
+    validos, resultados = [], []
+    for item in itens:
+        try:
+            validos.append(validar(item))
+            resultados.append(None)
+        except ErroRequisicao as e:
+            valor = item.get(chave) if isinstance(item, dict) else None
+            resultados.append({chave: valor, 'sucesso': False, 'mensagem': e.mensagem})
+    return validos, resultados
+
+def rota_status_lote(consulta, dados):
+    atualizacoes, resultados = validar_lote(lista_lote(dados, 'atualizacoes'), 'pedido_id', lambda item: (
+        exigir_particao(parametro_inteiro(campo(item, 'pedido_id'), 'pedido_id'), 'Pedido'),
+        validar_status(campo(item, 'status'))
+    ))
+    # Os válidos vão juntos; os inválidos mantêm a posição na resposta
+    gravados = iter([
+        {'pedido_id': pedido_id, 'sucesso': sucesso, 'mensagem': mensagem}
+        for (pedido_id, _), (sucesso, mensagem) in zip(atualizacoes, atualizar_status_pedidos_lote(atualizacoes))
+    ] if atualizacoes else [])
+    resultados = [r if r is not None else next(gravados) for r in resultados]
+    return 200, {'resultados': resultados, 'atualizados': sum(r['sucesso'] for r in resultados)}
+
+def rota_estoque_produto(consulta, dados, produto_id):
+    produto_id = exigir_particao(int(produto_id), 'Produto')
+    estoque = parametro_nao_negativo(campo(dados, 'estoque'), 'estoque')
+    sucesso, mensagem = atualizar_estoque(produto_id, estoque)
+    if mensagem == PRODUTO_NAO_ENCONTRADO:
+        raise ErroRequisicao(404, f"Produto {produto_id} não encontrado")
+    return resultado(sucesso, mensagem)
+
+def rota_estoque_lote(consulta, dados):
+    ajustes, resultados = validar_lote(lista_lote(dados, 'ajustes'), 'produto_id', lambda item: (
+        exigir_particao(parametro_inteiro(campo(item, 'produto_id'), 'produto_id'), 'Produto'),
+        parametro_nao_negativo(campo(item, 'estoque'), 'estoque')
+    ))
+    # Os válidos são gravados juntos, na mesma transação: todos recebem o mesmo resultado
+    sucesso, mensagem = atualizar_estoques_lote(ajustes) if ajustes else (False, "")
+    ajustados = iter(ajustes)
+    resultados = [r if r is not None else {'produto_id': next(ajustados)[0], 'sucesso': sucesso, 'mensagem': mensagem}
+                  for r in resultados]
+    return 200, {'resultados': resultados, 'atualizados': sum(r['sucesso'] for r in resultados)}
+
+def rota_sincronizacao(consulta, dados):
+    # Reenviar o mesmo lote é seguro: cada uuid é aplicado uma vez só
+    resultados = receber_operacoes(lista_lote(dados, 'operacoes'))
+    return 200, {'resultados': resultados, 'aplicadas': sum(r['sucesso'] for r in resultados)}
+
+MAXIMO_EVENTOS = 1000
+
+def rota_eventos(consulta, dados):
+    limite = parametro_inteiro(consulta.get('limite'), 'limite')
+    limite = 100 if limite is None else limite
+    if not 0 < limite <= MAXIMO_EVENTOS:
+        raise ErroRequisicao(400, f"'limite' deve estar entre 1 e {MAXIMO_EVENTOS}")
+    try:
+        eventos, cursor, mais = ler_eventos(consulta.get('depois'), limite)
+    except ValueError as e:
+        raise ErroRequisicao(400, str(e))
+    return 200, {'eventos': eventos, 'cursor': cursor, 'mais': mais}
+
+def rota_relatorio_vendas(consulta, dados):
+    granularidade = consulta.get('granularidade') or 'dia'
+    if granularidade not in EXPRESSOES_GRANULARIDADE:
+        raise ErroRequisicao(400, f"'granularidade' deve ser um de: {', '.join(EXPRESSOES_GRANULARIDADE)}")
+    df = gerar_relatorio_vendas_por_escola(
+        parametro_inteiro(consulta.get('escola_id'), 'escola_id'),
+        parametro_data(consulta.get('inicio'), 'inicio'),
+        parametro_data(consulta.get('fim'), 'fim'),
+        granularidade,
+    )
+    return 200, relatorio_para_json(df)
+
+def rota_relatorio_produtos(consulta, dados):
+    return 200, relatorio_para_json(gerar_relatorio_produtos_por_escola(parametro_inteiro(consulta.get('escola_id'), 'escola_id')))
+
+ROTAS = [
+    ('GET', re.compile(r'/escolas'), rota_escolas),
+    ('GET', re.compile(r'/produtos'), rota_produtos),
+    ('GET', re.compile(r'/pedidos'), rota_pedidos),
+    ('GET', re.compile(r'/pedidos/itens'), rota_itens_pedidos),
+    ('GET', re.compile(r'/clientes/(\d+)/historico'), rota_historico_cliente),
+    ('POST', re.compile(r'/pedidos'), rota_criar_pedido),
+    ('POST', re.compile(r'/pedidos/lote'), rota_criar_pedidos_lote),
+    ('PUT', re.compile(r'/pedidos/(\d+)/status'), rota_status_pedido),
+    ('POST', re.compile(r'/pedidos/status/lote'), rota_status_lote),
+    ('PUT', re.compile(r'/produtos/(\d+)/estoque'), rota_estoque_produto),
+    ('POST', re.compile(r'/estoque/lote'), rota_estoque_lote),
+    ('POST', re.compile(r'/sincronizacao'), rota_sincronizacao),
+    ('GET', re.compile(r'/eventos'), rota_eventos),
+    ('GET', re.compile(r'/relatorios/vendas'), rota_relatorio_vendas),
+    ('GET', re.compile(r'/relatorios/produtos'), rota_relatorio_produtos),
+]
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    # HTTP/1.1 mantém a conexão aberta entre requisições do mesmo tablet
+    protocol_version = 'HTTP/1.1'
+    # Sem isso o Nagle segura a resposta ~40 ms esperando o ACK do cabeçalho
+    disable_nagle_algorithm = True
+    server_version = 'FardamentosAPI/1.0'
+
+    def do_GET(self):
+        self.atender('GET')
+
+    def do_POST(self):
+        self.atender('POST')
+
+    def do_PUT(self):
+        self.atender('PUT')
+
+    def atender(self, metodo):
+        try:
+            url = urlsplit(self.path)
+            corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if url.path == '/saude':
+                return self.responder(200, {'status': 'ok'})
+
+            # Com keep-alive a mesma thread atende várias requisições: loja e usuário valem por requisição
+            username, tipo, loja = autenticar(self.headers.get('Authorization'))
+            definir_loja(loja)
+            definir_usuario(username)
+            consulta = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+            try:
+                dados = json.loads(corpo) if corpo else {}
+            except ValueError:
+                raise ErroRequisicao(400, "JSON inválido")
+
+            caminho_encontrado = False
+            for metodo_rota, padrao, rota in ROTAS:
+                encontrado = padrao.fullmatch(url.path.rstrip('/'))
+                if not encontrado:
+                    continue
+                caminho_encontrado = True
+                if metodo_rota == metodo:
+                    if metodo != 'GET' and tipo not in TIPOS_QUE_GRAVAM:
+                        raise ErroRequisicao(403, f"Usuário do tipo '{tipo}' não pode fazer alterações")
+                    return self.responder(*rota(consulta, dados, *encontrado.groups()))
+            if caminho_encontrado:
+                raise ErroRequisicao(405, "Método não permitido")
+            raise ErroRequisicao(404, "Rota não encontrada")
+
+        except ErroRequisicao as e:
+            self.responder(e.status, {'sucesso': False, 'mensagem': e.mensagem})
+        except Exception as e:
+            logger.exception("Erro ao atender %s %s", metodo, self.path)
+            # O detalhe fica no log: a mensagem da exceção pode expor SQL ou dados de outro cliente
+            self.responder(500, {'sucesso': False, 'mensagem': "Erro interno"})
+
+    def responder(self, status, conteudo):
+        corpo = json.dumps(conteudo, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        if status == 401:
+            self.send_header('WWW-Authenticate', 'Basic realm="fardamentos"')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        logger.debug("%s - %s", self.address_string(), formato % args)
+
+def criar_servidor(host='127.0.0.1', porta=8502):
+    # Tabelas, pool e catálogo prontos antes da primeira requisição
+    aquecer()
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorAPI)
+    servidor.daemon_threads = True
+    return servidor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta', type=int, default=8502)
+    parser.add_argument('--verbose', action='store_true', help="Registra cada requisição")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    servidor = criar_servidor(args.host, args.porta)
+    logger.info("API de fardamentos em http://%s:%s", args.host, servidor.server_address[1])
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == '__main__':
+    main()
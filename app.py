@@ -1,249 +1,41 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime, date
-import json
-import os
-import hashlib
-import sqlite3
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from database.banco import definir_notificador_erros, aquecer, verificar_login
+from database.lojas import loja_do_usuario
+
+# Erros das funções de leitura aparecem na tela
+definir_notificador_erros(st.error)
 
 # =========================================
-# 🔐 SISTEMA DE AUTENTICAÇÃO - SQLITE
+# 🔥 AQUECIMENTO DO PROCESSO
 # =========================================
 
-def make_hashes(password):
-    return hashlib.sha256(str.encode(password)).hexdigest()
-
-def check_hashes(password, hashed_text):
-    return make_hashes(password) == hashed_text
+# Módulos das páginas, carregados em segundo plano enquanto a tela de login está aberta
+MODULOS_PAGINAS = ('pandas', 'plotly.express', 'database.relatorios', 'database.importacao', 'database.precalculo')
 
-def get_connection():
-    """Estabelece conexão com SQLite"""
-    try:
-        conn = sqlite3.connect('fardamentos.db', check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except Exception as e:
-        st.error(f"Erro de conexão com o banco: {str(e)}")
-        return None
-
-def init_db():
-    """Inicializa o banco SQLite"""
-    conn = get_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            
-            # Tabela de usuários
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    nome_completo TEXT,
-                    tipo TEXT DEFAULT 'vendedor',
-                    ativo BOOLEAN DEFAULT 1,
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Tabela de escolas
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS escolas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT UNIQUE NOT NULL
-                )
-            ''')
-            
-            # Tabela de clientes
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    telefone TEXT,
-                    email TEXT,
-                    data_cadastro DATE DEFAULT CURRENT_DATE
-                )
-            ''')
-            
-            # Tabela de produtos
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS produtos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    categoria TEXT,
-                    tamanho TEXT,
-                    cor TEXT,
-                    preco REAL,
-                    estoque INTEGER DEFAULT 0,
-                    descricao TEXT,
-                    escola_id INTEGER REFERENCES escolas(id),
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(nome, tamanho, cor, escola_id)  -- EVITA PRODUTOS DUPLICADOS
-                )
-            ''')
-            
-            # Tabela de pedidos
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS pedidos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cliente_id INTEGER REFERENCES clientes(id),
-                    escola_id INTEGER REFERENCES escolas(id),
-                    status TEXT DEFAULT 'Pendente',
-                    data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_entrega_prevista DATE,
-                    data_entrega_real DATE,
-                    forma_pagamento TEXT DEFAULT 'Dinheiro',
-                    quantidade_total INTEGER,
-                    valor_total REAL,
-                    observacoes TEXT
-                )
-            ''')
-            
-            # Tabela de itens do pedido
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS pedido_itens (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pedido_id INTEGER REFERENCES pedidos(id) ON DELETE CASCADE,
-                    produto_id INTEGER REFERENCES produtos(id),
-                    quantidade INTEGER,
-                    preco_unitario REAL,
-                    subtotal REAL
-                )
-            ''')
-            
-            # Inserir usuários padrão
-            usuarios_padrao = [
-                ('admin', make_hashes('Admin@2024!'), 'Administrador', 'admin'),
-                ('vendedor', make_hashes('Vendas@123'), 'Vendedor', 'vendedor')
-            ]
-            
-            for username, password_hash, nome, tipo in usuarios_padrao:
-                try:
-                    cur.execute('''
-                        INSERT OR IGNORE INTO usuarios (username, password_hash, nome_completo, tipo) 
-                        VALUES (?, ?, ?, ?)
-                    ''', (username, password_hash, nome, tipo))
-                except Exception as e:
-                    pass
-            
-            # Inserir escolas padrão
-            escolas_padrao = ['Municipal', 'Desperta', 'São Tadeu']
-            for escola in escolas_padrao:
-                try:
-                    cur.execute('INSERT OR IGNORE INTO escolas (nome) VALUES (?)', (escola,))
-                except Exception as e:
-                    pass
-            
-            conn.commit()
-            
-        except Exception as e:
-            st.error(f"Erro ao inicializar banco: {str(e)}")
-        finally:
-            conn.close()
-
-def verificar_login(username, password):
-    """Verifica credenciais no banco de dados"""
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão", None
-    
-    try:
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT password_hash, nome_completo, tipo 
-            FROM usuarios 
-            WHERE username = ? AND ativo = 1
-        ''', (username,))
-        
-        resultado = cur.fetchone()
-        
-        if resultado and check_hashes(password, resultado[0]):
-            return True, resultado[1], resultado[2]  # sucesso, nome, tipo
-        else:
-            return False, "Credenciais inválidas", None
-            
-    except Exception as e:
-        return False, f"Erro: {str(e)}", None
-    finally:
-        conn.close()
-
-def alterar_senha(username, senha_atual, nova_senha):
-    """Altera a senha do usuário"""
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
-    
-    try:
-        cur = conn.cursor()
-        
-        # Verificar senha atual
-        cur.execute('SELECT password_hash FROM usuarios WHERE username = ?', (username,))
-        resultado = cur.fetchone()
-        
-        if not resultado or not check_hashes(senha_atual, resultado[0]):
-            return False, "Senha atual incorreta"
-        
-        # Atualizar senha
-        nova_senha_hash = make_hashes(nova_senha)
-        cur.execute(
-            'UPDATE usuarios SET password_hash = ? WHERE username = ?',
-            (nova_senha_hash, username)
-        )
-        conn.commit()
-        return True, "Senha alterada com sucesso!"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
+def aquecer_app():
+    aquecer()
+    for modulo in MODULOS_PAGINAS:
+        importlib.import_module(modulo)
+    # Relatórios pré-calculados em segundo plano (uma thread por processo)
+    from database.precalculo import iniciar_agendador
+    iniciar_agendador()
 
-def listar_usuarios():
-    """Lista todos os usuários (apenas para admin)"""
-    conn = get_connection()
-    if not conn:
-        return []
-    
-    try:
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT id, username, nome_completo, tipo, ativo, data_criacao 
-            FROM usuarios 
-            ORDER BY username
-        ''')
-        return cur.fetchall()
-    except Exception as e:
-        st.error(f"Erro ao listar usuários: {e}")
-        return []
-    finally:
-        conn.close()
+@st.cache_resource(show_spinner=False)
+def aquecimento():
+    """Uma vez por processo, em segundo plano: tabelas, pool, catálogo e módulos das páginas"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='aquecimento')
+    tarefa = executor.submit(aquecer_app)
+    executor.shutdown(wait=False)
+    return tarefa
 
-def criar_usuario(username, password, nome_completo, tipo):
-    """Cria novo usuário (apenas para admin)"""
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
-    
+def aguardar_aquecimento():
     try:
-        cur = conn.cursor()
-        password_hash = make_hashes(password)
-        
-        cur.execute('''
-            INSERT INTO usuarios (username, password_hash, nome_completo, tipo)
-            VALUES (?, ?, ?, ?)
-        ''', (username, password_hash, nome_completo, tipo))
-        
-        conn.commit()
-        return True, "Usuário criado com sucesso!"
-        
-    except sqlite3.IntegrityError:
-        return False, "Username já existe"
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
+        aquecimento().result()
+    except Exception:
+        aquecimento.clear()  # A próxima visita tenta de novo
+        raise
 
 # =========================================
 # 🔐 SISTEMA DE LOGIN
@@ -256,12 +48,14 @@ def login():
     
     if st.sidebar.button("Entrar"):
         if username and password:
+            aguardar_aquecimento()  # Tabelas criadas antes de conferir a senha
             sucesso, mensagem, tipo_usuario = verificar_login(username, password)
             if sucesso:
                 st.session_state.logged_in = True
                 st.session_state.username = username
                 st.session_state.nome_usuario = mensagem
                 st.session_state.tipo_usuario = tipo_usuario
+                st.session_state.loja = loja_do_usuario(username)
                 st.sidebar.success(f"Bem-vindo, {mensagem}!")
                 st.rerun()
             else:
@@ -269,18 +63,55 @@ def login():
         else:
             st.sidebar.error("Preencha todos os campos")
 
-# Inicializar banco na primeira execução
-if 'db_initialized' not in st.session_state:
-    init_db()
-    st.session_state.db_initialized = True
-
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 
 if not st.session_state.logged_in:
     login()
+    # Com a tela já desenhada: o processo se prepara enquanto a senha é digitada
+    aquecimento()
     st.stop()
 
+aguardar_aquecimento()
+
+# Só depois do login: a tela de entrada não importa pandas, relatórios nem importação
+import json
+import os
+import tempfile
+from datetime import datetime, date
+
+import pandas as pd
+
+from database.banco import (
+    STATUS_ABERTOS, STATUS_PEDIDO, FORMAS_PAGAMENTO, alterar_senha, listar_usuarios, criar_usuario,
+    listar_escolas, adicionar_cliente, listar_clientes, contar_clientes, buscar_clientes, excluir_cliente,
+    historico_cliente, listar_pedidos_cliente, formatar_dia_brasil,
+    verificar_produto_duplicado, adicionar_produto, listar_produtos_por_escola, buscar_produtos,
+    atualizar_estoques_lote, excluir_produto,
+    adicionar_pedido, listar_pedidos_por_escola, listar_pedidos_por_status, contar_pedidos_por_status,
+    listar_itens_pedidos, atualizar_status_pedido, excluir_pedido,
+    gerar_relatorio_vendas_por_escola, gerar_relatorio_produtos_por_escola, gerar_resumo_escolas,
+    intervalo_vendas, escolher_granularidade, ROTULOS_GRANULARIDADE, gerar_lista_separacao,
+    atualizar_reposicao_estoque, buscar_auditoria, listar_usuarios_auditoria, ENTIDADES_AUDITORIA,
+    gerar_resumo_lojas, gerar_vendas_lojas
+)
+from database.auditoria import definir_usuario
+from database.lojas import definir_loja, listar_lojas, obter_loja
+from database.relatorios import (
+    formatar_exibicao, dias_para_datas, textos_para_datas, formatar_datas_brasil, formatar_moeda_brasil,
+    folha_separacao_html
+)
+from database.reposicao import dias_cobertura, ESTOQUE_MINIMO
+from database.importacao import importar_pre_pedidos
+from database.precalculo import ler_relatorio
+
+# Cada rerun roda em uma thread do servidor: loja e auditoria precisam saber quem está operando
+if 'loja' not in st.session_state:
+    st.session_state.loja = loja_do_usuario(st.session_state.username)
+definir_loja(st.session_state.loja)
+definir_usuario(st.session_state.username)
+lojas = listar_lojas()
+
 # =========================================
 # 🚀 SISTEMA PRINCIPAL
 # =========================================
@@ -300,7 +131,7 @@ todos_tamanhos = tamanhos_infantil + tamanhos_adulto
 categorias_produtos = ["Camisetas", "Calças/Shorts", "Agasalhos", "Acessórios", "Outros"]
 
 # =========================================
-# 🔧 FUNÇÕES DO BANCO DE DADOS - SQLITE
+# 🔧 FUNÇÕES AUXILIARES
 # =========================================
 
 # FUNÇÃO PARA FORMATAR DATA NO PADRÃO BRASILEIRO
@@ -319,534 +150,249 @@ def formatar_data_brasil(data_str):
     except:
         return data_str
 
-# FUNÇÕES PARA ESCOLAS
-def listar_escolas():
-    conn = get_connection()
-    if not conn:
-        return []
-    
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM escolas ORDER BY nome")
-        return cur.fetchall()
-    except Exception as e:
-        st.error(f"Erro ao listar escolas: {e}")
-        return []
-    finally:
-        conn.close()
+# =========================================
+# 📈 REPOSIÇÃO DE ESTOQUE
+# =========================================
 
-def obter_escola_por_id(escola_id):
-    conn = get_connection()
-    if not conn:
-        return None
-    
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM escolas WHERE id = ?", (escola_id,))
-        return cur.fetchone()
-    except Exception as e:
-        st.error(f"Erro ao obter escola: {e}")
-        return None
-    finally:
-        conn.close()
+def ponto_pedido_produto(produto):
+    """Ponto de pedido calculado pela velocidade de venda (ou o mínimo fixo, sem histórico)"""
+    return produto['ponto_pedido'] if produto['ponto_pedido'] is not None else ESTOQUE_MINIMO
 
-# FUNÇÕES PARA CLIENTES
-def adicionar_cliente(nome, telefone, email):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
-    
-    try:
-        cur = conn.cursor()
-        data_cadastro = datetime.now().strftime("%Y-%m-%d")
-        
-        cur.execute(
-            "INSERT INTO clientes (nome, telefone, email, data_cadastro) VALUES (?, ?, ?, ?)",
-            (nome, telefone, email, data_cadastro)
-        )
-        
-        conn.commit()
-        return True, "Cliente cadastrado com sucesso!"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
+def precisa_repor(produto):
+    return produto['disponivel'] < ponto_pedido_produto(produto)
 
-def listar_clientes():
-    conn = get_connection()
-    if not conn:
-        return []
-    
-    try:
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM clientes ORDER BY nome')
-        return cur.fetchall()
-    except Exception as e:
-        st.error(f"Erro ao listar clientes: {e}")
-        return []
-    finally:
-        conn.close()
+def icone_estoque(produto):
+    """❌ abaixo do ponto de pedido, ⚠️ com menos do dobro, ✅ estoque confortável"""
+    ponto = ponto_pedido_produto(produto)
+    if produto['disponivel'] < ponto:
+        return "❌"
+    if produto['disponivel'] < 2 * ponto:
+        return "⚠️"
+    return "✅"
 
-def excluir_cliente(cliente_id):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
-    
-    try:
-        cur = conn.cursor()
-        
-        # Verificar se tem pedidos
-        cur.execute("SELECT COUNT(*) FROM pedidos WHERE cliente_id = ?", (cliente_id,))
-        if cur.fetchone()[0] > 0:
-            return False, "Cliente possui pedidos e não pode ser excluído"
-        
-        cur.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
-        conn.commit()
-        return True, "Cliente excluído com sucesso"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
+def descrever_cobertura(produto):
+    cobertura = dias_cobertura(produto['disponivel'], produto['velocidade_diaria'])
+    if cobertura == float('inf'):
+        return "sem vendas recentes"
+    return f"cobertura de {cobertura:.0f} dias"
 
-# FUNÇÕES PARA PRODUTOS
-def verificar_produto_duplicado(nome, tamanho, cor, escola_id):
-    """Verifica se já existe um produto com as mesmas características"""
-    conn = get_connection()
-    if not conn:
-        return True  # Se não conseguiu conectar, assume que existe para evitar duplicação
-    
-    try:
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT COUNT(*) FROM produtos 
-            WHERE nome = ? AND tamanho = ? AND cor = ? AND escola_id = ?
-        ''', (nome, tamanho, cor, escola_id))
-        
-        count = cur.fetchone()[0]
-        return count > 0
-        
-    except Exception as e:
-        st.error(f"Erro ao verificar produto duplicado: {e}")
-        return True
-    finally:
-        conn.close()
+# =========================================
+# 🧩 COMPONENTES DE INTERFACE
+# =========================================
 
-def adicionar_produto(nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+def preparar_pedidos_exibicao(pedidos):
+    """Formata datas e valores de todos os pedidos de uma vez para as telas"""
+    if not pedidos:
+        return pd.DataFrame()
     
-    try:
-        # Verificar se produto já existe
-        if verificar_produto_duplicado(nome, tamanho, cor, escola_id):
-            return False, "❌ Já existe um produto com este nome, tamanho e cor para esta escola!"
-        
-        cur = conn.cursor()
-        
-        cur.execute('''
-            INSERT INTO produtos (nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id))
-        
-        conn.commit()
-        return True, "✅ Produto cadastrado com sucesso!"
-    except sqlite3.IntegrityError:
-        return False, "❌ Erro: Produto duplicado para esta escola!"
-    except Exception as e:
-        conn.rollback()
-        return False, f"❌ Erro: {str(e)}"
-    finally:
-        conn.close()
+    df = pd.DataFrame(pedidos)
+    df['data_pedido_br'] = formatar_datas_brasil(dias_para_datas(df['data_pedido_dia']))
+    df['entrega_prevista_br'] = formatar_datas_brasil(textos_para_datas(df['data_entrega_prevista']))
+    df['entrega_real_br'] = formatar_datas_brasil(textos_para_datas(df['data_entrega_real']))
+    df['valor_br'] = formatar_moeda_brasil(df['valor_total'])
+    return df
 
-def listar_produtos_por_escola(escola_id=None):
-    conn = get_connection()
-    if not conn:
-        return []
-    
-    try:
-        cur = conn.cursor()
-        
-        if escola_id:
-            cur.execute('''
-                SELECT p.*, e.nome as escola_nome 
-                FROM produtos p 
-                LEFT JOIN escolas e ON p.escola_id = e.id 
-                WHERE p.escola_id = ?
-                ORDER BY p.categoria, p.nome
-            ''', (escola_id,))
-        else:
-            cur.execute('''
-                SELECT p.*, e.nome as escola_nome 
-                FROM produtos p 
-                LEFT JOIN escolas e ON p.escola_id = e.id 
-                ORDER BY e.nome, p.categoria, p.nome
-            ''')
-        return cur.fetchall()
-    except Exception as e:
-        st.error(f"Erro ao listar produtos: {e}")
-        return []
-    finally:
-        conn.close()
+COLUNA_SELECAO = "✔"
 
-def atualizar_estoque(produto_id, nova_quantidade):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+def tabela_selecionavel(df, key, coluna_id, editaveis=(), colunas_config=None):
+    """Uma única tabela (st.data_editor) com uma coluna para marcar a linha a detalhar.
     
-    try:
-        cur = conn.cursor()
-        cur.execute("UPDATE produtos SET estoque = ? WHERE id = ?", (nova_quantidade, produto_id))
-        conn.commit()
-        return True, "Estoque atualizado com sucesso!"
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
-
-def excluir_produto(produto_id):
-    """Exclui um produto se não estiver em nenhum pedido"""
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+    Substitui o expander com widgets por linha: o rerun envia só a tabela e
+    apenas a linha marcada ganha painel de detalhes. Retorna a linha marcada
+    (ou None) e o DataFrame com as edições das colunas editáveis.
     
-    try:
-        cur = conn.cursor()
-        
-        # Verificar se o produto está em algum pedido
-        cur.execute("SELECT COUNT(*) FROM pedido_itens WHERE produto_id = ?", (produto_id,))
-        count = cur.fetchone()[0]
-        
-        if count > 0:
-            return False, "❌ Este produto está em pedidos e não pode ser excluído"
-        
-        # Excluir o produto
-        cur.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
-        conn.commit()
-        return True, "✅ Produto excluído com sucesso!"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"❌ Erro: {str(e)}"
-    finally:
-        conn.close()
-
-# FUNÇÕES PARA PEDIDOS
-def adicionar_pedido(cliente_id, escola_id, itens, data_entrega, forma_pagamento, observacoes):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+    A marcação é guardada pelo valor de coluna_id, não pela posição: se os
+    dados mudarem ou mudarem de ordem no rerun, continua valendo a mesma linha.
+    """
+    estado = st.session_state.setdefault(f"{key}_marcacao", {'versao': 0, 'id': None, 'edicoes': {}})
+    tabela = df.reset_index(drop=True)
+    ids = tabela[coluna_id].tolist()
     
-    try:
-        cur = conn.cursor()
-        data_pedido = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        quantidade_total = sum(item['quantidade'] for item in itens)
-        valor_total = sum(item['subtotal'] for item in itens)
-        
-        # VERIFICAR ESTOQUE APENAS COMO ALERTA, NÃO BLOQUEAR
-        alertas_estoque = []
-        for item in itens:
-            cur.execute("SELECT estoque, nome FROM produtos WHERE id = ?", (item['produto_id'],))
-            produto = cur.fetchone()
-            if produto and produto[0] < item['quantidade']:
-                alertas_estoque.append(f"{produto[1]} - Estoque: {produto[0]}, Pedido: {item['quantidade']}")
-        
-        # Criar pedido mesmo com estoque insuficiente (apenas alerta)
-        cur.execute('''
-            INSERT INTO pedidos (cliente_id, escola_id, data_entrega_prevista, forma_pagamento, quantidade_total, valor_total, observacoes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (cliente_id, escola_id, data_entrega, forma_pagamento, quantidade_total, valor_total, observacoes))
-        
-        pedido_id = cur.lastrowid
-        
-        for item in itens:
-            cur.execute('''
-                INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unitario, subtotal)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (pedido_id, item['produto_id'], item['quantidade'], item['preco_unitario'], item['subtotal']))
-            # ⚠️ REMOVIDA A ATUALIZAÇÃO DE ESTOQUE AQUI
-        
-        conn.commit()
-        
-        mensagem = f"✅ Pedido #{pedido_id} criado com sucesso!"
-        if alertas_estoque:
-            mensagem += f" ⚠️ Alertas de estoque: {', '.join(alertas_estoque)}"
-            
-        return True, mensagem
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"❌ Erro: {str(e)}"
-    finally:
-        conn.close()
-
-def listar_pedidos_por_escola(escola_id=None):
-    conn = get_connection()
-    if not conn:
-        return []
+    # Edições guardadas na troca de marcação voltam às mesmas linhas (pelo id);
+    # as que já coincidem com o banco (gravadas) são esquecidas
+    for posicao, valor_id in enumerate(ids if estado['edicoes'] else ()):
+        guardadas = estado['edicoes'].get(valor_id, {})
+        for coluna, valor in list(guardadas.items()):
+            if tabela.at[posicao, coluna] == valor:
+                del guardadas[coluna]
+            else:
+                tabela.at[posicao, coluna] = valor
+        if not guardadas:
+            estado['edicoes'].pop(valor_id, None)
+    tabela.insert(0, COLUNA_SELECAO, [valor_id == estado['id'] for valor_id in ids])
     
-    try:
-        cur = conn.cursor()
-        
-        if escola_id:
-            cur.execute('''
-                SELECT p.*, c.nome as cliente_nome, e.nome as escola_nome
-                FROM pedidos p
-                JOIN clientes c ON p.cliente_id = c.id
-                JOIN escolas e ON p.escola_id = e.id
-                WHERE p.escola_id = ?
-                ORDER BY p.data_pedido DESC
-            ''', (escola_id,))
-        else:
-            cur.execute('''
-                SELECT p.*, c.nome as cliente_nome, e.nome as escola_nome
-                FROM pedidos p
-                JOIN clientes c ON p.cliente_id = c.id
-                JOIN escolas e ON p.escola_id = e.id
-                ORDER BY p.data_pedido DESC
-            ''')
-        return cur.fetchall()
-    except Exception as e:
-        st.error(f"Erro ao listar pedidos: {e}")
-        return []
-    finally:
-        conn.close()
+    chave = f"{key}_{estado['versao']}"
+    editado = st.data_editor(
+        tabela, key=chave, hide_index=True, use_container_width=True,
+        disabled=[coluna for coluna in df.columns if coluna not in editaveis],
+        column_config={COLUNA_SELECAO: st.column_config.CheckboxColumn(COLUNA_SELECAO, help="Ver detalhes"),
+                       **(colunas_config or {})},
+        on_change=guardar_marcacao, args=(chave, estado, ids),
+    )
+    
+    selecionada = df.iloc[ids.index(estado['id'])] if estado['id'] in ids else None
+    return selecionada, editado.drop(columns=COLUNA_SELECAO)
+
+def guardar_marcacao(chave, estado, ids):
+    """Callback da tabela: traduz as posições editadas pelos ids da tabela que estava na tela"""
+    edicoes = st.session_state[chave].get('edited_rows', {})
+    marcacoes = [(ids[int(posicao)], mudancas[COLUNA_SELECAO]) for posicao, mudancas in edicoes.items()
+                 if COLUNA_SELECAO in mudancas and int(posicao) < len(ids)]
+    if not marcacoes:
+        return
+    for valor_id, marcada in marcacoes:
+        if marcada:
+            estado['id'] = valor_id
+        elif estado['id'] == valor_id:
+            estado['id'] = None
+    # As outras edições passam a valer pelo id; a tabela recomeça sem posições editadas
+    for posicao, mudancas in edicoes.items():
+        if int(posicao) < len(ids):
+            outras = {coluna: valor for coluna, valor in mudancas.items() if coluna != COLUNA_SELECAO}
+            if outras:
+                estado['edicoes'].setdefault(ids[int(posicao)], {}).update(outras)
+    estado['versao'] += 1
 
-def baixar_estoque_pedido(pedido_id):
-    """Baixa o estoque apenas quando o pedido é marcado como entregue"""
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+def tabela_estoque(produtos, key, colunas_extras=()):
+    """Tabela de produtos com o estoque editável e gravação das mudanças em lote; retorna o produto marcado"""
+    por_id = {p['id']: p for p in produtos}
+    df = pd.DataFrame({
+        '': [icone_estoque(p) for p in produtos],
+        'ID': [p['id'] for p in produtos],
+        'Produto': [p['nome'] for p in produtos],
+        'Tamanho': [p['tamanho'] for p in produtos],
+        'Cor': [p['cor'] for p in produtos],
+        'Estoque': [p['estoque'] for p in produtos],
+        'Disponível': [p['disponivel'] for p in produtos],
+        'Preço': [p['preco'] for p in produtos],
+        **{rotulo: [valor(p) for p in produtos] for rotulo, valor in colunas_extras},
+    })
+    selecionada, editado = tabela_selecionavel(
+        df, key, 'ID', editaveis=('Estoque',),
+        colunas_config={'Estoque': st.column_config.NumberColumn(min_value=0, step=1),
+                        'Preço': st.column_config.NumberColumn(format="R$ %.2f")}
+    )
     
-    try:
-        cur = conn.cursor()
-        
-        # Buscar itens do pedido
-        cur.execute('''
-            SELECT pi.produto_id, pi.quantidade, pr.nome, pr.estoque 
-            FROM pedido_itens pi 
-            JOIN produtos pr ON pi.produto_id = pr.id 
-            WHERE pi.pedido_id = ?
-        ''', (pedido_id,))
-        itens = cur.fetchall()
-        
-        # Verificar estoque antes de baixar
-        produtos_sem_estoque = []
-        for item in itens:
-            produto_id, quantidade, nome, estoque_atual = item
-            if estoque_atual < quantidade:
-                produtos_sem_estoque.append(f"{nome} (Estoque: {estoque_atual}, Necessário: {quantidade})")
-        
-        if produtos_sem_estoque:
-            return False, f"Estoque insuficiente para: {', '.join(produtos_sem_estoque)}"
-        
-        # Baixar estoque
-        for item in itens:
-            produto_id, quantidade, nome, estoque_atual = item
-            cur.execute("UPDATE produtos SET estoque = estoque - ? WHERE id = ?", (quantidade, produto_id))
-        
-        conn.commit()
-        return True, "✅ Estoque baixado com sucesso!"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"❌ Erro ao baixar estoque: {str(e)}"
-    finally:
-        conn.close()
+    alterados = editado[editado['Estoque'] != df['Estoque']]
+    if not alterados.empty:
+        st.caption(f"✏️ {len(alterados)} produto(s) com estoque alterado")
+        if st.button("💾 Salvar estoque", key=f"{key}_salvar", type="primary"):
+            sucesso, msg = atualizar_estoques_lote(
+                [(int(linha['ID']), int(linha['Estoque'])) for _, linha in alterados.iterrows()]
+            )
+            if sucesso:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
+    
+    return por_id[int(selecionada['ID'])] if selecionada is not None else None
+
+PEDIDOS_POR_PAGINA = 50
+
+ICONES_STATUS = {
+    'Pendente': '🟡',
+    'Em produção': '🟠',
+    'Pronto para entrega': '🔵',
+    'Entregue': '✅',
+    'Cancelado': '❌',
+}
+
+def resumir_itens(itens):
+    return "; ".join(f"{item.quantidade}× {item.nome} {item.tamanho} {item.cor}" for item in itens)
 
-def atualizar_status_pedido(pedido_id, novo_status):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+def seletor_pagina(total, key):
+    """Página escolhida (1 quando tudo cabe em uma)"""
+    paginas = -(-total // PEDIDOS_POR_PAGINA)
+    if paginas <= 1:
+        return 1
+    return st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, key=f"{key}_pagina")
+
+def tabela_pedidos(status, total, key, icone):
+    """Tabela paginada dos pedidos com os status informados; só a página escolhida sai do banco.
+    Retorna o pedido marcado como dict"""
+    pagina = seletor_pagina(total, key)
+    pedidos = preparar_pedidos_exibicao(
+        listar_pedidos_por_status(status, PEDIDOS_POR_PAGINA, (pagina - 1) * PEDIDOS_POR_PAGINA)
+    )
+    if pedidos.empty:
+        return None
+    return tabela_pagina_pedidos(pedidos, f"{key}_{pagina}", icone)
+
+def tabela_pagina_pedidos(pedidos, key, icone):
+    """Uma página de pedidos; os itens de todos eles vêm em uma única consulta"""
+    itens = listar_itens_pedidos(pedidos['id'].tolist())
     
-    try:
-        cur = conn.cursor()
-        
-        if novo_status == 'Entregue':
-            data_entrega = datetime.now().strftime("%Y-%m-%d")
-            
-            # Primeiro atualiza o status
-            cur.execute('''
-                UPDATE pedidos 
-                SET status = ?, data_entrega_real = ? 
-                WHERE id = ?
-            ''', (novo_status, data_entrega, pedido_id))
-            
-            conn.commit()  # COMMIT ANTES DE BAIXAR ESTOQUE
-            
-            # Depois baixa o estoque em uma transação separada
-            sucesso, msg = baixar_estoque_pedido(pedido_id)
-            if not sucesso:
-                # Se não conseguiu baixar estoque, reverte o status
-                cur.execute('''
-                    UPDATE pedidos 
-                    SET status = 'Pronto para entrega', data_entrega_real = NULL 
-                    WHERE id = ?
-                ''', (pedido_id,))
-                conn.commit()
-                return False, f"Status não atualizado: {msg}"
-            
-            return True, "✅ Status do pedido atualizado e estoque baixado com sucesso!"
-        else:
-            cur.execute('''
-                UPDATE pedidos 
-                SET status = ? 
-                WHERE id = ?
-            ''', (novo_status, pedido_id))
-            
-            conn.commit()
-            return True, "✅ Status do pedido atualizado com sucesso!"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"❌ Erro: {str(e)}"
-    finally:
-        conn.close()
+    df = pd.DataFrame({
+        '': pedidos['status'].map(icone),
+        'Pedido': pedidos['id'],
+        'Cliente': pedidos['cliente_nome'],
+        'Escola': pedidos['escola_nome'],
+        'Data': pedidos['data_pedido_br'],
+        'Entrega Prevista': pedidos['entrega_prevista_br'],
+        'Valor': pedidos['valor_br'],
+        'Status': pedidos['status'],
+        'Itens': [resumir_itens(itens[pedido_id]) for pedido_id in pedidos['id']],
+    })
+    selecionada, _ = tabela_selecionavel(df, key, 'Pedido')
+    if selecionada is None:
+        st.caption("☝️ Marque um pedido na tabela para ver os detalhes")
+        return None
+    pedido = pedidos[pedidos['id'] == selecionada['Pedido']].iloc[0].to_dict()
+    pedido['itens'] = itens[pedido['id']]
+    return pedido
 
-def excluir_pedido(pedido_id):
-    conn = get_connection()
-    if not conn:
-        return False, "Erro de conexão"
+def detalhes_pedido(pedido):
+    """Painel com os dados do pedido selecionado"""
+    st.subheader(f"Pedido #{pedido['id']} - {pedido['cliente_nome']}")
+    col1, col2 = st.columns(2)
     
-    try:
-        cur = conn.cursor()
-        
-        # Excluir pedido (estoque não é restaurado pois não foi baixado ainda)
-        cur.execute("DELETE FROM pedidos WHERE id = ?", (pedido_id,))
-        
-        conn.commit()
-        return True, "Pedido excluído com sucesso"
-        
-    except Exception as e:
-        conn.rollback()
-        return False, f"Erro: {str(e)}"
-    finally:
-        conn.close()
+    with col1:
+        st.write(f"**Cliente:** {pedido['cliente_nome']}")
+        st.write(f"**Escola:** {pedido['escola_nome']}")
+        st.write(f"**Data do Pedido:** {pedido['data_pedido_br']}")
+        st.write(f"**Entrega Prevista:** {pedido['entrega_prevista_br']}")
+        if pedido['status'] == 'Entregue':
+            st.write(f"**Entregue em:** {pedido['entrega_real_br']}")
+    
+    with col2:
+        st.write(f"**Forma de Pagamento:** {pedido['forma_pagamento']}")
+        st.write(f"**Quantidade Total:** {pedido['quantidade_total']}")
+        st.write(f"**Valor Total:** {pedido['valor_br']}")
+        if pedido['observacoes']:
+            st.write(f"**Observações:** {pedido['observacoes']}")
+    
+    if pedido['itens']:
+        st.dataframe(pd.DataFrame({
+            'Produto': [item.nome for item in pedido['itens']],
+            'Tamanho': [item.tamanho for item in pedido['itens']],
+            'Cor': [item.cor for item in pedido['itens']],
+            'Quantidade': [item.quantidade for item in pedido['itens']],
+            'Preço Unitário': formatar_moeda_brasil(pd.Series([item.preco_unitario for item in pedido['itens']])),
+            'Subtotal': formatar_moeda_brasil(pd.Series([item.subtotal for item in pedido['itens']])),
+        }), use_container_width=True, hide_index=True)
 
-# =========================================
-# 📊 FUNÇÕES PARA RELATÓRIOS - SQLITE
-# =========================================
+# Agrupamento do gráfico de vendas; None escolhe pelo tamanho do período
+OPCOES_AGRUPAMENTO = {"Automático": None, "Dia": 'dia', "Semana": 'semana', "Mês": 'mes'}
 
-def gerar_relatorio_vendas_por_escola(escola_id=None):
-    """Gera relatório de vendas por período e escola (exclui pedidos cancelados)"""
-    conn = get_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    try:
-        cur = conn.cursor()
-        
-        if escola_id:
-            cur.execute('''
-                SELECT 
-                    DATE(p.data_pedido) as data,
-                    COUNT(*) as total_pedidos,
-                    SUM(p.quantidade_total) as total_itens,
-                    SUM(p.valor_total) as total_vendas
-                FROM pedidos p
-                WHERE p.escola_id = ? AND p.status != 'Cancelado'
-                GROUP BY DATE(p.data_pedido)
-                ORDER BY data DESC
-            ''', (escola_id,))
-        else:
-            cur.execute('''
-                SELECT 
-                    DATE(p.data_pedido) as data,
-                    e.nome as escola,
-                    COUNT(*) as total_pedidos,
-                    SUM(p.quantidade_total) as total_itens,
-                    SUM(p.valor_total) as total_vendas
-                FROM pedidos p
-                JOIN escolas e ON p.escola_id = e.id
-                WHERE p.status != 'Cancelado'
-                GROUP BY DATE(p.data_pedido), e.nome
-                ORDER BY data DESC
-            ''')
-            
-        dados = cur.fetchall()
-        
-        if dados:
-            if escola_id:
-                df = pd.DataFrame(dados, columns=['Data', 'Total Pedidos', 'Total Itens', 'Total Vendas (R$)'])
-            else:
-                df = pd.DataFrame(dados, columns=['Data', 'Escola', 'Total Pedidos', 'Total Itens', 'Total Vendas (R$)'])
-            
-            # Formatar data no padrão brasileiro
-            df['Data'] = df['Data'].apply(formatar_data_brasil)
-            return df
-        else:
-            return pd.DataFrame()
-            
-    except Exception as e:
-        st.error(f"Erro ao gerar relatório: {e}")
-        return pd.DataFrame()
-    finally:
-        conn.close()
+def obter_relatorio(tipo, consultar, escola_id=None, parametros=None):
+    """Usa o relatório pré-calculado em Parquet; se ausente, vencido ou de outro período, consulta ao vivo"""
+    df, calculado_em = ler_relatorio(tipo, escola_id, parametros)
+    if df is None:
+        return consultar()
+    st.caption(f"⏱️ Pré-calculado em {calculado_em.strftime('%d/%m/%Y %H:%M')}")
+    return df
 
-def gerar_relatorio_produtos_por_escola(escola_id=None):
-    """Gera relatório de produtos mais vendidos por escola (exclui pedidos cancelados)"""
-    conn = get_connection()
-    if not conn:
-        return pd.DataFrame()
+def seletor_cliente(rotulo, key):
+    """Busca incremental de clientes; retorna o ID do cliente selecionado"""
+    termo = st.text_input("🔎 Buscar cliente (nome ou telefone):", key=f"{key}_busca")
+    clientes = buscar_clientes(termo)
     
-    try:
-        cur = conn.cursor()
-        
-        if escola_id:
-            cur.execute('''
-                SELECT 
-                    pr.nome as produto,
-                    pr.categoria,
-                    pr.tamanho,
-                    pr.cor,
-                    SUM(pi.quantidade) as total_vendido,
-                    SUM(pi.subtotal) as total_faturado
-                FROM pedido_itens pi
-                JOIN produtos pr ON pi.produto_id = pr.id
-                JOIN pedidos p ON pi.pedido_id = p.id
-                WHERE p.escola_id = ? AND p.status != 'Cancelado'
-                GROUP BY pr.id, pr.nome, pr.categoria, pr.tamanho, pr.cor
-                ORDER BY total_vendido DESC
-            ''', (escola_id,))
-        else:
-            cur.execute('''
-                SELECT 
-                    pr.nome as produto,
-                    pr.categoria,
-                    pr.tamanho,
-                    pr.cor,
-                    e.nome as escola,
-                    SUM(pi.quantidade) as total_vendido,
-                    SUM(pi.subtotal) as total_faturado
-                FROM pedido_itens pi
-                JOIN produtos pr ON pi.produto_id = pr.id
-                JOIN pedidos p ON pi.pedido_id = p.id
-                JOIN escolas e ON p.escola_id = e.id
-                WHERE p.status != 'Cancelado'
-                GROUP BY pr.id, pr.nome, pr.categoria, pr.tamanho, pr.cor, e.nome
-                ORDER BY total_vendido DESC
-            ''')
-            
-        dados = cur.fetchall()
-        
-        if dados:
-            if escola_id:
-                df = pd.DataFrame(dados, columns=['Produto', 'Categoria', 'Tamanho', 'Cor', 'Total Vendido', 'Total Faturado (R$)'])
-            else:
-                df = pd.DataFrame(dados, columns=['Produto', 'Categoria', 'Tamanho', 'Cor', 'Escola', 'Total Vendido', 'Total Faturado (R$)'])
-            return df
-        else:
-            return pd.DataFrame()
-            
-    except Exception as e:
-        st.error(f"Erro ao gerar relatório: {e}")
-        return pd.DataFrame()
-    finally:
-        conn.close()
+    if not clientes:
+        return None
+    
+    opcoes = {f"{c[1]} - {c[2] or 'Sem telefone'} (ID: {c[0]})": c[0] for c in clientes}
+    return opcoes[st.selectbox(rotulo, list(opcoes), key=key)]
 
 # =========================================
 # 🎨 INTERFACE PRINCIPAL
@@ -855,6 +401,8 @@ def gerar_relatorio_produtos_por_escola(escola_id=None):
 # Sidebar - Informações do usuário
 st.sidebar.markdown("---")
 st.sidebar.write(f"👤 **Usuário:** {st.session_state.nome_usuario}")
+if len(lojas) > 1:
+    st.sidebar.write(f"🏬 **Loja:** {obter_loja(st.session_state.loja).nome}")
 st.sidebar.write(f"🎯 **Tipo:** {st.session_state.tipo_usuario}")
 
 # Menu de gerenciamento de usuários (apenas para admin)
@@ -909,6 +457,7 @@ if st.sidebar.button("🚪 Sair"):
     st.session_state.username = None
     st.session_state.nome_usuario = None
     st.session_state.tipo_usuario = None
+    del st.session_state.loja
     st.rerun()
 
 # Menu principal - ORGANIZADO POR ESCOLA
@@ -940,8 +489,8 @@ if menu == "📊 Dashboard":
     st.header("🎯 Métricas em Tempo Real")
     
     # Carregar dados
+    atualizar_reposicao_estoque()
     escolas = listar_escolas()
-    clientes = listar_clientes()
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -960,13 +509,13 @@ if menu == "📊 Dashboard":
         st.metric("Pedidos Pendentes", pedidos_pendentes)
     
     with col3:
-        st.metric("Clientes Ativos", len(clientes))
+        st.metric("Clientes Ativos", contar_clientes())
     
     with col4:
         produtos_baixo_estoque = 0
         for escola in escolas:
             produtos = listar_produtos_por_escola(escola[0])
-            produtos_baixo_estoque += len([p for p in produtos if p[6] < 5])
+            produtos_baixo_estoque += len([p for p in produtos if precisa_repor(p)])
         st.metric("Alertas de Estoque", produtos_baixo_estoque, delta=-produtos_baixo_estoque)
     
     # Métricas por Escola
@@ -983,7 +532,7 @@ if menu == "📊 Dashboard":
             
             # Produtos da escola
             produtos_escola = listar_produtos_por_escola(escola[0])
-            produtos_baixo_estoque_escola = len([p for p in produtos_escola if p[6] < 5])
+            produtos_baixo_estoque_escola = len([p for p in produtos_escola if precisa_repor(p)])
             
             st.metric("Pedidos", len(pedidos_escola))
             st.metric("Pendentes", pedidos_pendentes_escola)
@@ -1010,7 +559,8 @@ if menu == "📊 Dashboard":
             st.rerun()
 
 elif menu == "👥 Clientes":
-    tab1, tab2, tab3 = st.tabs(["➕ Cadastrar Cliente", "📋 Listar Clientes", "🗑️ Excluir Cliente"])
+    tab1, tab2, tab3, tab4 = st.tabs(["➕ Cadastrar Cliente", "📋 Listar Clientes", "🧾 Histórico de Compras",
+                                      "🗑️ Excluir Cliente"])
     
     with tab1:
         st.header("➕ Novo Cliente")
@@ -1035,45 +585,90 @@ elif menu == "👥 Clientes":
         clientes = listar_clientes()
         
         if clientes:
-            dados = []
-            for cliente in clientes:
-                dados.append({
-                    'ID': cliente[0],
-                    'Nome': cliente[1],
-                    'Telefone': cliente[2] or 'N/A',
-                    'Email': cliente[3] or 'N/A',
-                    'Data Cadastro': formatar_data_brasil(cliente[4])
-                })
+            df_clientes = pd.DataFrame.from_records(
+                [tuple(c)[:5] for c in clientes],
+                columns=['ID', 'Nome', 'Telefone', 'Email', 'Data Cadastro']
+            )
+            for coluna in ['Telefone', 'Email']:
+                df_clientes[coluna] = df_clientes[coluna].fillna('').replace('', 'N/A')
+            df_clientes['Data Cadastro'] = formatar_datas_brasil(textos_para_datas(df_clientes['Data Cadastro']))
             
-            st.dataframe(pd.DataFrame(dados), use_container_width=True)
+            st.dataframe(df_clientes, use_container_width=True)
         else:
             st.info("👥 Nenhum cliente cadastrado")
     
     with tab3:
-        st.header("🗑️ Excluir Cliente")
-        clientes = listar_clientes()
+        st.header("🧾 Histórico de Compras")
+        cliente_id = seletor_cliente("Selecione o cliente:", key="cliente_historico")
         
-        if clientes:
-            cliente_selecionado = st.selectbox(
-                "Selecione o cliente para excluir:",
-                [f"{c[1]} (ID: {c[0]})" for c in clientes]
-            )
+        if cliente_id is not None:
+            # Totais do resumo por cliente; só a página aberta dos pedidos é lida
+            historico = historico_cliente(cliente_id)
+            compras = historico['pedidos'] - historico['cancelados']
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Compras", compras, help=f"{historico['cancelados']} pedido(s) cancelado(s) não contam")
+            with col2:
+                st.metric("Total gasto", formatar_moeda_brasil(pd.Series([historico['valor_total']]))[0])
+            with col3:
+                ticket = historico['valor_total'] / compras if compras else 0
+                st.metric("Ticket médio", formatar_moeda_brasil(pd.Series([ticket]))[0])
+            with col4:
+                st.metric("Última compra", formatar_dia_brasil(historico['ultima_compra_dia']) or "-")
             
-            if cliente_selecionado:
-                cliente_id = int(cliente_selecionado.split("(ID: ")[1].replace(")", ""))
+            if historico['escolas']:
+                st.subheader("🏫 Por Escola")
+                st.dataframe(pd.DataFrame({
+                    'Escola': [escola['escola_nome'] for escola in historico['escolas']],
+                    'Compras': [escola['pedidos'] - escola['cancelados'] for escola in historico['escolas']],
+                    'Total gasto': formatar_moeda_brasil(
+                        pd.Series([escola['valor_total'] for escola in historico['escolas']])),
+                    'Última compra': [formatar_dia_brasil(escola['ultima_compra_dia'])
+                                      for escola in historico['escolas']],
+                    # Tamanho mais comprado em cada categoria
+                    'Tamanhos preferidos': [
+                        " · ".join(f"{categoria or 'Sem categoria'}: {tamanhos[0][0] or '-'}"
+                                   for categoria, tamanhos in escola['tamanhos'].items())
+                        for escola in historico['escolas']
+                    ],
+                }), use_container_width=True, hide_index=True)
                 
-                st.warning("⚠️ Esta ação não pode ser desfeita!")
-                if st.button("🗑️ Confirmar Exclusão", type="primary"):
-                    sucesso, msg = excluir_cliente(cliente_id)
-                    if sucesso:
-                        st.success(msg)
-                        st.rerun()
-                    else:
-                        st.error(msg)
+                st.subheader("📦 Pedidos")
+                pagina = seletor_pagina(historico['pedidos'], f"historico_{cliente_id}")
+                pedidos_cliente = preparar_pedidos_exibicao(listar_pedidos_cliente(
+                    cliente_id, PEDIDOS_POR_PAGINA, (pagina - 1) * PEDIDOS_POR_PAGINA,
+                    [escola['escola_id'] for escola in historico['escolas']]
+                ))
+                if not pedidos_cliente.empty:
+                    pedido = tabela_pagina_pedidos(pedidos_cliente, f"historico_{cliente_id}_{pagina}",
+                                                   ICONES_STATUS.get)
+                    if pedido:
+                        detalhes_pedido(pedido)
+            else:
+                st.info("🛒 Nenhuma compra registrada para este cliente")
         else:
-            st.info("👥 Nenhum cliente cadastrado")
+            st.info("👥 Nenhum cliente encontrado")
+    
+    with tab4:
+        st.header("🗑️ Excluir Cliente")
+        cliente_id = seletor_cliente("Selecione o cliente para excluir:", key="cliente_excluir")
+        
+        if cliente_id is not None:
+            st.warning("⚠️ Esta ação não pode ser desfeita!")
+            if st.button("🗑️ Confirmar Exclusão", type="primary"):
+                sucesso, msg = excluir_cliente(cliente_id)
+                if sucesso:
+                    st.success(msg)
+                    st.rerun()
+                else:
+                    st.error(msg)
+        else:
+            st.info("👥 Nenhum cliente encontrado")
 
 elif menu == "👕 Produtos":
+    import plotly.express as px  # Só as páginas com gráfico carregam o plotly
+    atualizar_reposicao_estoque()
     escolas = listar_escolas()
     
     if not escolas:
@@ -1106,38 +701,25 @@ elif menu == "👕 Produtos":
             with col3:
                 busca_nome = st.text_input("Buscar por nome:")
             
-            # Aplicar filtros
-            produtos_filtrados = produtos
-            if filtro_categoria != "Todas":
-                produtos_filtrados = [p for p in produtos_filtrados if p[2] == filtro_categoria]
-            if filtro_tamanho != "Todos":
-                produtos_filtrados = [p for p in produtos_filtrados if p[3] == filtro_tamanho]
+            # Aplicar filtros (categoria e tamanho pelos índices do catálogo em memória)
+            produtos_filtrados = buscar_produtos(
+                escola_id,
+                categoria=None if filtro_categoria == "Todas" else filtro_categoria,
+                tamanho=None if filtro_tamanho == "Todos" else filtro_tamanho,
+            )
             if busca_nome:
                 produtos_filtrados = [p for p in produtos_filtrados if busca_nome.lower() in p[1].lower()]
             
-            # Exibir produtos
-            for produto in produtos_filtrados:
-                status_estoque = "✅" if produto[6] >= 10 else "⚠️" if produto[6] >= 5 else "❌"
-                
-                with st.expander(f"{status_estoque} {produto[1]} - {produto[3]} - {produto[4]} | Estoque: {produto[6]} | R$ {produto[5]:.2f}"):
-                    col1, col2 = st.columns([3,1])
-                    with col1:
-                        st.write(f"**Categoria:** {produto[2]}")
-                        st.write(f"**Descrição:** {produto[7] or 'Sem descrição'}")
-                        st.write(f"**Data Cadastro:** {formatar_data_brasil(produto[9])}")
-                    with col2:
-                        # Edição rápida de estoque
-                        novo_estoque = st.number_input("Estoque:", value=produto[6], min_value=0, key=f"estoque_{produto[0]}")
-                        if st.button("💾 Atualizar", key=f"btn_{produto[0]}"):
-                            if novo_estoque != produto[6]:
-                                sucesso, msg = atualizar_estoque(produto[0], novo_estoque)
-                                if sucesso:
-                                    st.success(msg)
-                                    st.rerun()
-                                else:
-                                    st.error(msg)
-                            else:
-                                st.info("Quantidade não foi alterada")
+            # Uma tabela para a lista toda; detalhes só do produto marcado
+            if produtos_filtrados:
+                produto = tabela_estoque(produtos_filtrados, key=f"tabela_produtos_{escola_id}")
+                if produto:
+                    st.subheader(f"{icone_estoque(produto)} {produto['nome']} - {produto['tamanho']} - {produto['cor']}")
+                    st.write(f"**Categoria:** {produto['categoria']}")
+                    st.write(f"**Descrição:** {produto['descricao'] or 'Sem descrição'}")
+                    st.write(f"**Data Cadastro:** {formatar_data_brasil(produto['data_cadastro'])}")
+            else:
+                st.info("🔎 Nenhum produto encontrado com esses filtros")
         else:
             st.info("📭 Nenhum produto cadastrado para esta escola")
     
@@ -1186,7 +768,7 @@ elif menu == "👕 Produtos":
                 total_estoque = sum(p[6] for p in produtos)
                 st.metric("Estoque Total", total_estoque)
             with col3:
-                baixo_estoque = len([p for p in produtos if p[6] < 5])
+                baixo_estoque = len([p for p in produtos if precisa_repor(p)])
                 st.metric("Produtos com Estoque Baixo", baixo_estoque)
             
             # Gráfico por categoria
@@ -1230,6 +812,7 @@ elif menu == "👕 Produtos":
             st.info("📭 Nenhum produto cadastrado para esta escola")
 
 elif menu == "📦 Estoque":
+    atualizar_reposicao_estoque()
     escolas = listar_escolas()
     
     if not escolas:
@@ -1250,13 +833,14 @@ elif menu == "📦 Estoque":
                 col1, col2, col3, col4 = st.columns(4)
                 total_produtos = len(produtos)
                 total_estoque = sum(p[6] for p in produtos)
-                produtos_baixo_estoque = len([p for p in produtos if p[6] < 5])
-                produtos_sem_estoque = len([p for p in produtos if p[6] == 0])
+                total_reservado = sum(p['reservado'] for p in produtos)
+                produtos_baixo_estoque = len([p for p in produtos if precisa_repor(p)])
+                produtos_sem_estoque = len([p for p in produtos if p['disponivel'] <= 0])
                 
                 with col1:
                     st.metric("Total Produtos", total_produtos)
                 with col2:
-                    st.metric("Estoque Total", total_estoque)
+                    st.metric("Estoque Total", total_estoque, delta=f"{total_reservado} reservados", delta_color="off")
                 with col3:
                     st.metric("Estoque Baixo", produtos_baixo_estoque)
                 with col4:
@@ -1264,46 +848,29 @@ elif menu == "📦 Estoque":
                 
                 # Tabela interativa de estoque
                 st.subheader("📋 Ajuste de Estoque")
-                
-                for produto in produtos:
-                    status_estoque = "✅" if produto[6] >= 10 else "⚠️" if produto[6] >= 5 else "❌"
-                    
-                    with st.expander(f"{status_estoque} {produto[1]} - {produto[3]} - {produto[4]} (Estoque: {produto[6]})"):
-                        col1, col2, col3 = st.columns([2, 1, 1])
-                        
-                        with col1:
-                            st.write(f"**Categoria:** {produto[2]}")
-                            st.write(f"**Preço:** R$ {produto[5]:.2f}")
-                            if produto[7]:
-                                st.write(f"**Descrição:** {produto[7]}")
-                        
-                        with col2:
-                            nova_quantidade = st.number_input(
-                                "Nova quantidade",
-                                min_value=0,
-                                value=produto[6],
-                                key=f"estoque_{produto[0]}_{idx}"
-                            )
-                        
-                        with col3:
-                            if st.button("💾 Atualizar", key=f"btn_{produto[0]}_{idx}"):
-                                if nova_quantidade != produto[6]:
-                                    sucesso, msg = atualizar_estoque(produto[0], nova_quantidade)
-                                    if sucesso:
-                                        st.success(msg)
-                                        st.rerun()
-                                    else:
-                                        st.error(msg)
-                                else:
-                                    st.info("Quantidade não foi alterada")
+                produto = tabela_estoque(
+                    produtos, key=f"tabela_estoque_{escola[0]}",
+                    colunas_extras=(("Reservado", lambda p: p['reservado']), ("Ponto de Pedido", ponto_pedido_produto))
+                )
+                if produto:
+                    st.write(f"**{icone_estoque(produto)} {produto['nome']} - {produto['tamanho']} - {produto['cor']}** "
+                             f"({produto['categoria']}, R$ {produto['preco']:.2f})")
+                    st.write(f"**Ponto de pedido:** {ponto_pedido_produto(produto)} ({descrever_cobertura(produto)})")
+                    if produto['descricao']:
+                        st.write(f"**Descrição:** {produto['descricao']}")
                 
                 # Alertas de estoque baixo
-                produtos_alerta = [p for p in produtos if p[6] < 5]
+                produtos_alerta = [p for p in produtos if precisa_repor(p)]
                 if produtos_alerta:
                     st.subheader("🚨 Alertas de Estoque Baixo")
+                    # Os que acabam primeiro aparecem no topo
+                    produtos_alerta.sort(key=lambda p: dias_cobertura(p['disponivel'], p['velocidade_diaria']))
                     for produto in produtos_alerta:
-                        status = "⚠️" if produto[6] > 0 else "❌"
-                        st.warning(f"{status} **{produto[1]} - {produto[3]} - {produto[4]}**: Apenas {produto[6]} unidades em estoque")
+                        status = "⚠️" if produto['disponivel'] > 0 else "❌"
+                        st.warning(
+                            f"{status} **{produto[1]} - {produto[3]} - {produto[4]}**: Apenas {produto['disponivel']} unidades disponíveis "
+                            f"({descrever_cobertura(produto)}, ponto de pedido {ponto_pedido_produto(produto)})"
+                        )
             
             else:
                 st.info(f"📭 Nenhum produto cadastrado para {escola[1]}")
@@ -1315,7 +882,11 @@ elif menu == "📦 Pedidos":
         st.error("❌ Nenhuma escola cadastrada.")
         st.stop()
     
-    tab1, tab2, tab3, tab4 = st.tabs(["🆕 Novo Pedido", "📋 Pedidos em Andamento", "✅ Pedidos Entregues", "❌ Pedidos Cancelados"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🆕 Novo Pedido", "📋 Pedidos em Andamento", "✅ Pedidos Entregues", "❌ Pedidos Cancelados", "📥 Importar Pré-pedidos"])
+    
+    # Só as contagens para as três abas de listagem; cada uma lê do banco apenas a página exibida
+    contagens = contar_pedidos_por_status()
+    total_pedidos = sum(contagens.values())
     
     with tab1:
         st.header("🆕 Criar Novo Pedido")
@@ -1325,14 +896,10 @@ elif menu == "📦 Pedidos":
         escola_id = next(e[0] for e in escolas if e[1] == escola_nome)
         
         # Passo 2: Selecionar Cliente
-        clientes = listar_clientes()
-        if not clientes:
-            st.error("❌ Nenhum cliente cadastrado.")
+        cliente_id = seletor_cliente("👤 Cliente:", key="cliente_pedido")
+        if cliente_id is None:
+            st.error("❌ Nenhum cliente encontrado.")
         else:
-            cliente_opcoes = [f"{c[1]} (ID: {c[0]})" for c in clientes]
-            cliente_selecionado = st.selectbox("👤 Cliente:", cliente_opcoes)
-            cliente_id = int(cliente_selecionado.split("(ID: ")[1].replace(")", ""))
-            
             # Passo 3: Adicionar Itens
             st.subheader("🛒 Itens do Pedido")
             produtos = listar_produtos_por_escola(escola_id)
@@ -1346,22 +913,25 @@ elif menu == "📦 Pedidos":
                 
                 col1, col2, col3, col4 = st.columns([3,1,1,1])
                 with col1:
-                    produto_opcoes = [f"{p[1]} | T: {p[3]} | C: {p[4]} | Est: {p[6]} | R$ {p[5]:.2f}" for p in produtos]
-                    produto_sel = st.selectbox("Produto:", produto_opcoes)
+                    # Disponível = estoque - reservado por pedidos em aberto (já vem calculado na consulta)
+                    produto_opcoes = {
+                        f"{p[1]} | T: {p[3]} | C: {p[4]} | Disp: {p['disponivel']} | R$ {p[5]:.2f}": p for p in produtos
+                    }
+                    produto = produto_opcoes[st.selectbox("Produto:", list(produto_opcoes))]
                 with col2:
                     qtd = st.number_input("Qtd:", min_value=1, value=1)
                 with col3:
-                    preco_unit = next(p[5] for p in produtos if f"{p[1]} | T: {p[3]} | C: {p[4]} | Est: {p[6]} | R$ {p[5]:.2f}" == produto_sel)
+                    preco_unit = produto[5]
                     st.write(f"R$ {preco_unit:.2f}")
+                    if qtd > produto['disponivel']:
+                        st.caption(f"⚠️ Disponível: {produto['disponivel']}")
                 with col4:
                     if st.button("➕ Add", use_container_width=True):
-                        produto_id = next(p[0] for p in produtos if f"{p[1]} | T: {p[3]} | C: {p[4]} | Est: {p[6]} | R$ {p[5]:.2f}" == produto_sel)
-                        
                         item = {
-                            'produto_id': produto_id,
-                            'nome': next(p[1] for p in produtos if p[0] == produto_id),
-                            'tamanho': next(p[3] for p in produtos if p[0] == produto_id),
-                            'cor': next(p[4] for p in produtos if p[0] == produto_id),
+                            'produto_id': produto[0],
+                            'nome': produto[1],
+                            'tamanho': produto[3],
+                            'cor': produto[4],
                             'quantidade': qtd,
                             'preco_unitario': preco_unit,
                             'subtotal': preco_unit * qtd
@@ -1399,7 +969,7 @@ elif menu == "📦 Pedidos":
                     col1, col2 = st.columns(2)
                     with col1:
                         data_entrega = st.date_input("📅 Previsão de Entrega", min_value=date.today())
-                        forma_pagamento = st.selectbox("💳 Pagamento:", ["Dinheiro", "Cartão", "PIX", "Transferência"])
+                        forma_pagamento = st.selectbox("💳 Pagamento:", list(FORMAS_PAGAMENTO))
                     with col2:
                         observacoes = st.text_area("📝 Observações")
                     
@@ -1423,64 +993,50 @@ elif menu == "📦 Pedidos":
     
     with tab2:
         st.header("📋 Pedidos em Andamento")
-        pedidos = listar_pedidos_por_escola()
         
-        if pedidos:
-            # Filtrar apenas pedidos não entregues e não cancelados
-            pedidos_em_andamento = [p for p in pedidos if p[3] not in ['Entregue', 'Cancelado']]
+        if total_pedidos:
+            # Apenas pedidos não entregues e não cancelados
+            em_andamento = sum(contagens.get(status, 0) for status in STATUS_ABERTOS)
             
-            if pedidos_em_andamento:
-                for pedido in pedidos_em_andamento:
-                    status_icon = {
-                        'Pendente': '🟡',
-                        'Em produção': '🟠', 
-                        'Pronto para entrega': '🔵'
-                    }.get(pedido[3], '⚪')
+            if em_andamento:
+                pedido = tabela_pedidos(STATUS_ABERTOS, em_andamento, key="tabela_andamento", icone={
+                    'Pendente': '🟡',
+                    'Em produção': '🟠', 
+                    'Pronto para entrega': '🔵'
+                }.get)
+                
+                if pedido:
+                    detalhes_pedido(pedido)
                     
-                    with st.expander(f"{status_icon} Pedido #{pedido[0]} - {pedido[11]} - {pedido[12]} - R$ {float(pedido[9]):.2f} - {pedido[3]}"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.write(f"**Cliente:** {pedido[11]}")
-                            st.write(f"**Escola:** {pedido[12]}")
-                            st.write(f"**Data do Pedido:** {formatar_data_brasil(pedido[4])}")
-                            st.write(f"**Entrega Prevista:** {formatar_data_brasil(pedido[5])}")
-                        
-                        with col2:
-                            st.write(f"**Forma de Pagamento:** {pedido[7]}")
-                            st.write(f"**Quantidade Total:** {pedido[8]}")
-                            st.write(f"**Valor Total:** R$ {float(pedido[9]):.2f}")
-                            if pedido[10]:
-                                st.write(f"**Observações:** {pedido[10]}")
-                        
-                        # Alterar status do pedido
-                        st.subheader("🔄 Alterar Status do Pedido")
-                        col1, col2, col3 = st.columns([2, 1, 1])
-                        with col1:
-                            novo_status = st.selectbox(
-                                "Novo status:",
-                                ["Pendente", "Em produção", "Pronto para entrega", "Entregue", "Cancelado"],
-                                key=f"status_{pedido[0]}"
-                            )
-                        with col2:
-                            if st.button("🔄 Atualizar", key=f"upd_{pedido[0]}"):
-                                if novo_status != pedido[3]:
-                                    sucesso, msg = atualizar_status_pedido(pedido[0], novo_status)
-                                    if sucesso:
-                                        st.success(msg)
-                                        st.rerun()
-                                    else:
-                                        st.error(msg)
-                        with col3:
-                            if st.button("🗑️ Excluir Pedido", key=f"del_{pedido[0]}"):
-                                st.warning("⚠️ Esta ação não pode ser desfeita!")
-                                if st.button("✅ Confirmar Exclusão", key=f"conf_del_{pedido[0]}"):
-                                    sucesso, msg = excluir_pedido(pedido[0])
-                                    if sucesso:
-                                        st.success(msg)
-                                        st.rerun()
-                                    else:
-                                        st.error(msg)
+                    # Alterar status do pedido
+                    st.subheader("🔄 Alterar Status do Pedido")
+                    col1, col2, col3 = st.columns([2, 1, 1])
+                    with col1:
+                        novo_status = st.selectbox(
+                            "Novo status:",
+                            list(STATUS_PEDIDO),
+                            index=list(STATUS_PEDIDO).index(pedido['status']),
+                            key=f"status_{pedido['id']}"
+                        )
+                    with col2:
+                        if st.button("🔄 Atualizar", key=f"upd_{pedido['id']}"):
+                            if novo_status != pedido['status']:
+                                sucesso, msg = atualizar_status_pedido(pedido['id'], novo_status)
+                                if sucesso:
+                                    st.success(msg)
+                                    st.rerun()
+                                else:
+                                    st.error(msg)
+                    with col3:
+                        if st.button("🗑️ Excluir Pedido", key=f"del_{pedido['id']}"):
+                            st.warning("⚠️ Esta ação não pode ser desfeita!")
+                            if st.button("✅ Confirmar Exclusão", key=f"conf_del_{pedido['id']}"):
+                                sucesso, msg = excluir_pedido(pedido['id'])
+                                if sucesso:
+                                    st.success(msg)
+                                    st.rerun()
+                                else:
+                                    st.error(msg)
             else:
                 st.info("📦 Nenhum pedido em andamento")
         else:
@@ -1488,30 +1044,15 @@ elif menu == "📦 Pedidos":
     
     with tab3:
         st.header("✅ Pedidos Entregues")
-        pedidos = listar_pedidos_por_escola()
         
-        if pedidos:
-            # Filtrar apenas pedidos entregues
-            pedidos_entregues = [p for p in pedidos if p[3] == 'Entregue']
+        if total_pedidos:
+            # Apenas pedidos entregues
+            entregues = contagens.get('Entregue', 0)
             
-            if pedidos_entregues:
-                for pedido in pedidos_entregues:
-                    with st.expander(f"✅ Pedido #{pedido[0]} - {pedido[11]} - {pedido[12]} - R$ {float(pedido[9]):.2f}"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.write(f"**Cliente:** {pedido[11]}")
-                            st.write(f"**Escola:** {pedido[12]}")
-                            st.write(f"**Data do Pedido:** {formatar_data_brasil(pedido[4])}")
-                            st.write(f"**Entrega Prevista:** {formatar_data_brasil(pedido[5])}")
-                            st.write(f"**Entregue em:** {formatar_data_brasil(pedido[6])}")
-                        
-                        with col2:
-                            st.write(f"**Forma de Pagamento:** {pedido[7]}")
-                            st.write(f"**Quantidade Total:** {pedido[8]}")
-                            st.write(f"**Valor Total:** R$ {float(pedido[9]):.2f}")
-                            if pedido[10]:
-                                st.write(f"**Observações:** {pedido[10]}")
+            if entregues:
+                pedido = tabela_pedidos(('Entregue',), entregues, key="tabela_entregues", icone={'Entregue': '✅'}.get)
+                if pedido:
+                    detalhes_pedido(pedido)
             else:
                 st.info("✅ Nenhum pedido entregue")
         else:
@@ -1519,47 +1060,78 @@ elif menu == "📦 Pedidos":
     
     with tab4:
         st.header("❌ Pedidos Cancelados")
-        pedidos = listar_pedidos_por_escola()
         
-        if pedidos:
-            # Filtrar apenas pedidos cancelados
-            pedidos_cancelados = [p for p in pedidos if p[3] == 'Cancelado']
+        if total_pedidos:
+            # Apenas pedidos cancelados
+            cancelados = contagens.get('Cancelado', 0)
             
-            if pedidos_cancelados:
-                for pedido in pedidos_cancelados:
-                    with st.expander(f"❌ Pedido #{pedido[0]} - {pedido[11]} - {pedido[12]} - R$ {float(pedido[9]):.2f}"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.write(f"**Cliente:** {pedido[11]}")
-                            st.write(f"**Escola:** {pedido[12]}")
-                            st.write(f"**Data do Pedido:** {formatar_data_brasil(pedido[4])}")
-                            st.write(f"**Entrega Prevista:** {formatar_data_brasil(pedido[5])}")
-                        
-                        with col2:
-                            st.write(f"**Forma de Pagamento:** {pedido[7]}")
-                            st.write(f"**Quantidade Total:** {pedido[8]}")
-                            st.write(f"**Valor Total:** R$ {float(pedido[9]):.2f}")
-                            if pedido[10]:
-                                st.write(f"**Observações:** {pedido[10]}")
-                        
-                        # Opção para reativar pedido cancelado
-                        if st.button("🔄 Reativar Pedido", key=f"reativar_{pedido[0]}"):
-                            sucesso, msg = atualizar_status_pedido(pedido[0], "Pendente")
-                            if sucesso:
-                                st.success(msg)
-                                st.rerun()
-                            else:
-                                st.error(msg)
+            if cancelados:
+                pedido = tabela_pedidos(('Cancelado',), cancelados, key="tabela_cancelados", icone={'Cancelado': '❌'}.get)
+                if pedido:
+                    detalhes_pedido(pedido)
+                    
+                    # Opção para reativar pedido cancelado
+                    if st.button("🔄 Reativar Pedido", key=f"reativar_{pedido['id']}"):
+                        sucesso, msg = atualizar_status_pedido(pedido['id'], "Pendente")
+                        if sucesso:
+                            st.success(msg)
+                            st.rerun()
+                        else:
+                            st.error(msg)
             else:
                 st.info("❌ Nenhum pedido cancelado")
         else:
             st.info("📦 Nenhum pedido realizado")
+    
+    with tab5:
+        st.header("📥 Importar Pré-pedidos das Escolas")
+        st.caption("CSV ou JSONL com as colunas: nome, telefone, escola, produto, tamanho, cor, quantidade "
+                   "(e opcionalmente referencia, data_entrega, forma_pagamento, observacoes)")
+        
+        arquivo = st.file_uploader("📄 Arquivo:", type=["csv", "jsonl"], key="arquivo_pre_pedidos")
+        escola_padrao = st.selectbox("🏫 Escola para linhas sem a coluna 'escola':", [e[1] for e in escolas],
+                                     key="escola_importacao")
+        simular = st.checkbox("🔍 Apenas simular (não grava nada)", value=True)
+        
+        if arquivo and st.button("📥 Importar", type="primary"):
+            conteudo = arquivo.getvalue()
+            total_linhas = max(conteudo.count(b'\n'), 1)
+            # Arquivo enviado e linhas rejeitadas ficam na pasta temporária, apagada ao final
+            with tempfile.TemporaryDirectory() as pasta:
+                caminho = os.path.join(pasta, os.path.basename(arquivo.name))
+                with open(caminho, 'wb') as destino:
+                    destino.write(conteudo)
+            
+                barra = st.progress(0.0, text="Validando...")
+                def mostrar_progresso(resumo):
+                    barra.progress(min(resumo['linhas'] / total_linhas, 1.0),
+                                   text=f"{resumo['linhas']} linhas | {resumo['pedidos']} pedidos | {resumo['rejeitados']} rejeitadas")
+            
+                try:
+                    resumo = importar_pre_pedidos(caminho, escola_padrao, simular, progresso=mostrar_progresso)
+                except Exception as e:
+                    st.error(f"❌ Erro na importação: {e}")
+                else:
+                    barra.progress(1.0, text="Concluído")
+                    acao = "seriam criados" if resumo['simulacao'] else "criados"
+                    st.success(f"✅ {resumo['pedidos']} pedidos {acao} | {resumo['clientes_novos']} clientes novos")
+                    if resumo['arquivo_rejeitados']:
+                        st.warning(f"⚠️ {resumo['rejeitados']} linhas rejeitadas")
+                        with open(resumo['arquivo_rejeitados'], 'rb') as rejeitados:
+                            st.download_button("📥 Baixar linhas rejeitadas", rejeitados.read(),
+                                               file_name="rejeitados.csv", mime="text/csv")
 
 elif menu == "📈 Relatórios":
+    import plotly.express as px
     escolas = listar_escolas()
     
-    tab1, tab2, tab3 = st.tabs(["📊 Vendas por Escola", "📦 Produtos Mais Vendidos", "👥 Análise Completa"])
+    abas = ["📊 Vendas por Escola", "📦 Produtos Mais Vendidos", "👥 Análise Completa",
+            "🧺 Lista de Separação", "📜 Auditoria"]
+    # Relatório geral das lojas: só para administradores, quando há mais de uma
+    todas_as_lojas = st.session_state.tipo_usuario == 'admin' and len(lojas) > 1
+    if todas_as_lojas:
+        abas.append("🏬 Todas as Lojas")
+    tab1, tab2, tab3, tab4, tab5, *tab_lojas = st.tabs(abas)
     
     with tab1:
         st.header("📊 Relatório de Vendas por Escola")
@@ -1571,21 +1143,45 @@ elif menu == "📈 Relatórios":
         )
         
         if escola_relatorio == "Todas as escolas":
-            relatorio_vendas = gerar_relatorio_vendas_por_escola()
+            escola_id = None
         else:
             escola_id = next(e[0] for e in escolas if e[1] == escola_relatorio)
-            relatorio_vendas = gerar_relatorio_vendas_por_escola(escola_id)
+        
+        inicio_dados, fim_dados = intervalo_vendas()
+        relatorio_vendas = pd.DataFrame()
+        if inicio_dados:
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                periodo = st.date_input("📅 Período:", value=(inicio_dados, fim_dados), format="DD/MM/YYYY",
+                                        key="periodo_vendas")
+            with col2:
+                agrupamento = st.selectbox("Agrupar por:", list(OPCOES_AGRUPAMENTO), key="agrupamento_vendas")
+            
+            # Enquanto o intervalo é escolhido o componente devolve só a data inicial
+            data_inicio, data_fim = (periodo[0], periodo[-1]) if periodo else (inicio_dados, fim_dados)
+            granularidade = OPCOES_AGRUPAMENTO[agrupamento] or escolher_granularidade(data_inicio, data_fim)
+            parametros = {'inicio': data_inicio.isoformat(), 'fim': data_fim.isoformat(),
+                          'granularidade': granularidade}
+            relatorio_vendas = obter_relatorio(
+                'vendas',
+                lambda: gerar_relatorio_vendas_por_escola(escola_id, data_inicio, data_fim, granularidade),
+                escola_id, parametros
+            )
         
         if not relatorio_vendas.empty:
-            st.dataframe(relatorio_vendas, use_container_width=True)
+            rotulo = ROTULOS_GRANULARIDADE[granularidade]
+            st.dataframe(
+                formatar_exibicao(relatorio_vendas, datas=['Data'], moedas=['Total Vendas (R$)']),
+                use_container_width=True
+            )
             
-            # Gráfico de vendas
+            # Gráfico de vendas: um ponto por período, já somado no banco
             if escola_relatorio == "Todas as escolas":
                 fig = px.line(relatorio_vendas, x='Data', y='Total Vendas (R$)', color='Escola',
-                             title='Evolução das Vendas por Escola')
+                             title=f'Evolução das Vendas por Escola (por {rotulo})')
             else:
                 fig = px.line(relatorio_vendas, x='Data', y='Total Vendas (R$)', 
-                             title=f'Evolução das Vendas - {escola_relatorio}')
+                             title=f'Evolução das Vendas - {escola_relatorio} (por {rotulo})')
             st.plotly_chart(fig, use_container_width=True)
             
             # Métricas resumidas
@@ -1593,9 +1189,11 @@ elif menu == "📈 Relatórios":
             with col1:
                 st.metric("Total Período", f"R$ {relatorio_vendas['Total Vendas (R$)'].sum():.2f}")
             with col2:
-                st.metric("Média Diária", f"R$ {relatorio_vendas['Total Vendas (R$)'].mean():.2f}")
+                st.metric(f"Média por {rotulo.capitalize()}",
+                          f"R$ {relatorio_vendas.groupby('Data')['Total Vendas (R$)'].sum().mean():.2f}")
             with col3:
-                st.metric("Maior Venda", f"R$ {relatorio_vendas['Total Vendas (R$)'].max():.2f}")
+                st.metric(f"Maior Venda ({rotulo})",
+                          f"R$ {relatorio_vendas.groupby('Data')['Total Vendas (R$)'].sum().max():.2f}")
         else:
             st.info("📊 Nenhum dado de venda disponível")
     
@@ -1609,13 +1207,16 @@ elif menu == "📈 Relatórios":
         )
         
         if escola_produtos == "Todas as escolas":
-            relatorio_produtos = gerar_relatorio_produtos_por_escola()
+            escola_id = None
         else:
             escola_id = next(e[0] for e in escolas if e[1] == escola_produtos)
-            relatorio_produtos = gerar_relatorio_produtos_por_escola(escola_id)
+        relatorio_produtos = obter_relatorio('produtos', lambda: gerar_relatorio_produtos_por_escola(escola_id), escola_id)
         
         if not relatorio_produtos.empty:
-            st.dataframe(relatorio_produtos, use_container_width=True)
+            st.dataframe(
+                formatar_exibicao(relatorio_produtos, moedas=['Total Faturado (R$)']),
+                use_container_width=True
+            )
             
             # Gráfico de produtos mais vendidos
             top_produtos = relatorio_produtos.head(10)
@@ -1632,6 +1233,9 @@ elif menu == "📈 Relatórios":
     with tab3:
         st.header("👥 Análise Completa do Sistema")
         
+        # Resumo por escola (produtos, pedidos e vendas sem cancelados)
+        resumo_escolas = obter_relatorio('resumo_escolas', gerar_resumo_escolas)
+        
         col1, col2, col3 = st.columns(3)
         
         with col1:
@@ -1641,41 +1245,142 @@ elif menu == "📈 Relatórios":
             
         with col2:
             st.subheader("👥 Clientes")
-            clientes = listar_clientes()
-            st.metric("Total de Clientes", len(clientes))
+            st.metric("Total de Clientes", contar_clientes())
             
         with col3:
             st.subheader("👕 Produtos")
-            total_produtos = 0
-            for escola in escolas:
-                produtos = listar_produtos_por_escola(escola[0])
-                total_produtos += len(produtos)
+            total_produtos = int(resumo_escolas['Produtos'].sum()) if not resumo_escolas.empty else 0
             st.metric("Total de Produtos", total_produtos)
         
-        # Resumo por escola
         st.subheader("📋 Resumo por Escola")
-        resumo_data = []
-        for escola in escolas:
-            produtos_escola = listar_produtos_por_escola(escola[0])
-            pedidos_escola = listar_pedidos_por_escola(escola[0])
-            # Filtrar apenas pedidos não cancelados para as vendas
-            pedidos_nao_cancelados = [p for p in pedidos_escola if p[3] != 'Cancelado']
-            total_vendas = sum(float(p[9]) for p in pedidos_nao_cancelados)
-            
-            resumo_data.append({
-                'Escola': escola[1],
-                'Produtos': len(produtos_escola),
-                'Pedidos': len(pedidos_nao_cancelados),
-                'Vendas (R$)': total_vendas
-            })
-        
-        if resumo_data:
-            st.dataframe(pd.DataFrame(resumo_data), use_container_width=True)
+        if not resumo_escolas.empty:
+            st.dataframe(resumo_escolas, use_container_width=True)
             
             # Gráfico de comparação entre escolas
-            fig = px.bar(pd.DataFrame(resumo_data), x='Escola', y='Vendas (R$)',
+            fig = px.bar(resumo_escolas, x='Escola', y='Vendas (R$)',
                         title='Comparação de Vendas por Escola')
             st.plotly_chart(fig, use_container_width=True)
+    
+    with tab4:
+        st.header("🧺 Lista de Separação")
+        st.caption("Quanto separar de cada produto para os pedidos em aberto, comparado ao estoque atual")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            escola_separacao = st.selectbox(
+                "Selecione a escola:",
+                ["Todas as escolas"] + [e[1] for e in escolas],
+                key="separacao_escola"
+            )
+        with col2:
+            status_separacao = st.multiselect("Status dos pedidos:", list(STATUS_ABERTOS),
+                                              default=list(STATUS_ABERTOS), key="separacao_status")
+        
+        if escola_separacao == "Todas as escolas":
+            escola_id = None
+        else:
+            escola_id = next(e[0] for e in escolas if e[1] == escola_separacao)
+        lista_separacao = gerar_lista_separacao(escola_id, status_separacao)
+        
+        if not lista_separacao.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Produtos", len(lista_separacao))
+            with col2:
+                st.metric("Peças a Separar", int(lista_separacao['A Separar'].sum()))
+            with col3:
+                st.metric("Com Estoque Insuficiente", int((lista_separacao['Falta'] > 0).sum()))
+            
+            st.dataframe(lista_separacao, use_container_width=True, hide_index=True)
+            
+            titulo = f"Lista de Separação - {escola_separacao} ({', '.join(status_separacao)})"
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("🖨️ Baixar folha para impressão (HTML)",
+                                   folha_separacao_html(lista_separacao, titulo, datetime.now()),
+                                   file_name="lista_separacao.html", mime="text/html")
+            with col2:
+                st.download_button("📥 Baixar CSV", lista_separacao.to_csv(index=False, sep=';').encode('utf-8-sig'),
+                                   file_name="lista_separacao.csv", mime="text/csv")
+        else:
+            st.info("🧺 Nenhum item a separar nos status escolhidos")
+    
+    with tab5:
+        st.header("📜 Histórico de Alterações")
+        st.caption("Estoque, status, cadastros e exclusões, com quem fez e quando")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            usuario_auditoria = st.selectbox("Usuário:", ["Todos"] + listar_usuarios_auditoria(),
+                                             key="auditoria_usuario")
+        with col2:
+            entidade_auditoria = st.selectbox("Registro:", ["Todos"] + list(ENTIDADES_AUDITORIA),
+                                              key="auditoria_entidade")
+        with col3:
+            id_auditoria = st.number_input("ID:", min_value=0, value=0, step=1, key="auditoria_id",
+                                           help="0 mostra todos")
+        with col4:
+            periodo_auditoria = st.date_input("Período:", value=(), format="DD/MM/YYYY", key="auditoria_periodo")
+        
+        inicio_auditoria = periodo_auditoria[0] if len(periodo_auditoria) > 0 else None
+        fim_auditoria = periodo_auditoria[-1] if len(periodo_auditoria) > 0 else None
+        entradas = buscar_auditoria(
+            None if usuario_auditoria == "Todos" else usuario_auditoria,
+            None if entidade_auditoria == "Todos" else entidade_auditoria,
+            id_auditoria or None, inicio_auditoria, fim_auditoria
+        )
+        
+        if entradas:
+            df_auditoria = pd.DataFrame([dict(entrada) for entrada in entradas])
+            df_auditoria['Data/Hora'] = pd.to_datetime(df_auditoria['momento_epoch'], unit='s', utc=True) \
+                .dt.tz_convert(datetime.now().astimezone().tzinfo).dt.strftime("%d/%m/%Y %H:%M:%S")
+            df_auditoria = df_auditoria.rename(columns={
+                'usuario': 'Usuário', 'acao': 'Ação', 'entidade': 'Registro', 'entidade_id': 'ID', 'detalhes': 'Detalhes'
+            })
+            st.dataframe(df_auditoria[['Data/Hora', 'Usuário', 'Ação', 'Registro', 'ID', 'Detalhes']],
+                         use_container_width=True, hide_index=True)
+        else:
+            st.info("📜 Nenhuma alteração registrada com esses filtros")
+    
+    if todas_as_lojas:
+        with tab_lojas[0]:
+            st.header("🏬 Todas as Lojas")
+            st.caption(f"{len(lojas)} lojas consultadas em paralelo, cada uma no seu banco")
+            
+            resumo_lojas = gerar_resumo_lojas()
+            if not resumo_lojas.empty:
+                por_loja = resumo_lojas.groupby('Loja', as_index=False)[['Produtos', 'Pedidos', 'Vendas (R$)']].sum()
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Lojas", len(por_loja))
+                with col2:
+                    st.metric("Pedidos", int(por_loja['Pedidos'].sum()))
+                with col3:
+                    st.metric("Vendas", formatar_moeda_brasil(pd.Series([por_loja['Vendas (R$)'].sum()]))[0])
+                
+                fig = px.bar(por_loja, x='Loja', y='Vendas (R$)', title="Vendas por Loja")
+                st.plotly_chart(fig, use_container_width=True)
+                
+                st.subheader("Escolas de cada loja")
+                st.dataframe(formatar_exibicao(resumo_lojas, moedas=['Vendas (R$)']), use_container_width=True,
+                             hide_index=True)
+            
+            st.subheader("Vendas no período")
+            periodo_lojas = st.date_input("Período:", value=(date.today().replace(day=1), date.today()),
+                                          format="DD/MM/YYYY", key="periodo_lojas")
+            if len(periodo_lojas) == 2:
+                granularidade_lojas = escolher_granularidade(*periodo_lojas)
+                vendas_lojas = gerar_vendas_lojas(*periodo_lojas, granularidade_lojas)
+                if not vendas_lojas.empty:
+                    serie_lojas = vendas_lojas.groupby(['Data', 'Loja'], as_index=False)['Total Vendas (R$)'].sum()
+                    fig = px.line(serie_lojas, x='Data', y='Total Vendas (R$)', color='Loja',
+                                  title=f"Vendas por {ROTULOS_GRANULARIDADE[granularidade_lojas]}")
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.dataframe(formatar_exibicao(vendas_lojas, datas=['Data'], moedas=['Total Vendas (R$)']),
+                                 use_container_width=True, hide_index=True)
+                else:
+                    st.info("📊 Nenhuma venda no período")
 
 # Rodapé
 st.sidebar.markdown("---")
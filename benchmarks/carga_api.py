@@ -0,0 +1,154 @@
+"""Teste de carga local da API HTTP (e, opcionalmente, do caminho pela interface)
+
+Uso: python -m benchmarks.carga_api [--clientes 8] [--duracao 10] [--lote 20] [--comparar-ui]
+
+Sobe a API em uma thread com um banco temporário e dispara, de vários
+clientes com conexão persistente, uma mistura de consultas ao catálogo,
+pedidos avulsos e pedidos em lote. Com --comparar-ui mede também quanto
+custa um rerun completo do app.py, que é o que cada clique faz hoje.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+CREDENCIAIS = 'Basic ' + base64.b64encode(b'admin:Admin@2024!').decode()
+
+def preparar_banco(escolas, clientes, produtos_por_escola):
+    from database.banco import adicionar_cliente, adicionar_produto, listar_escolas, listar_produtos_por_escola
+    for i in range(clientes):
+        adicionar_cliente(f"Cliente {i}", f"1199{i:07d}", "")
+    catalogo = {}
+    for escola in listar_escolas()[:escolas]:
+        for i in range(produtos_por_escola):
+            adicionar_produto(f"Produto {i}", "Camisetas", "M", f"Cor {i}", 30.0 + i, 1000, "", escola['id'])
+        catalogo[escola['id']] = [produto['id'] for produto in listar_produtos_por_escola(escola['id'])]
+    return catalogo
+
+def novo_pedido(aleatorio, catalogo, clientes):
+    escola_id = aleatorio.choice(list(catalogo))
+    return {
+        'cliente_id': aleatorio.randint(1, clientes),
+        'escola_id': escola_id,
+        'itens': [{'produto_id': produto_id, 'quantidade': aleatorio.randint(1, 3)}
+                  for produto_id in aleatorio.sample(catalogo[escola_id], 2)],
+    }
+
+def cliente_carga(porta, indice, fim, catalogo, clientes, lote, estatisticas, lock):
+    aleatorio = random.Random(indice)
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+    latencias = {'catalogo': [], 'pedido': [], 'lote': []}
+    erros = pedidos_criados = 0
+
+    while time.perf_counter() < fim:
+        sorteio = aleatorio.random()
+        if sorteio < 0.7:
+            tipo, metodo, caminho, corpo = 'catalogo', 'GET', f"/produtos?escola_id={aleatorio.choice(list(catalogo))}", None
+        elif sorteio < 0.95:
+            tipo, metodo, caminho, corpo = 'pedido', 'POST', '/pedidos', novo_pedido(aleatorio, catalogo, clientes)
+        else:
+            tipo, metodo, caminho = 'lote', 'POST', '/pedidos/lote'
+            corpo = {'pedidos': [novo_pedido(aleatorio, catalogo, clientes) for _ in range(lote)]}
+
+        inicio = time.perf_counter()
+        conexao.request(metodo, caminho, body=json.dumps(corpo) if corpo else None,
+                        headers={'Authorization': CREDENCIAIS, 'Content-Type': 'application/json'})
+        resposta = conexao.getresponse()
+        conteudo = json.loads(resposta.read())
+        latencias[tipo].append(time.perf_counter() - inicio)
+
+        if resposta.status != 200:
+            erros += 1
+        elif tipo == 'pedido':
+            pedidos_criados += 1
+        elif tipo == 'lote':
+            pedidos_criados += conteudo['criados']
+
+    conexao.close()
+    with lock:
+        for tipo, valores in latencias.items():
+            estatisticas['latencias'][tipo].extend(valores)
+        estatisticas['erros'] += erros
+        estatisticas['pedidos'] += pedidos_criados
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+def medir_ui(repeticoes):
+    """Tempo de um rerun completo do app.py na página de pedidos (um clique na interface)"""
+    from streamlit.testing.v1 import AppTest
+
+    caminho_app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    at = AppTest.from_file(caminho_app, default_timeout=120)
+    at.session_state['db_initialized'] = True
+    at.session_state['logged_in'] = True
+    at.session_state['username'] = 'admin'
+    at.session_state['nome_usuario'] = 'Administrador'
+    at.session_state['tipo_usuario'] = 'admin'
+    at.run()
+    at.sidebar.radio[0].set_value("📦 Pedidos").run()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        at.run()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=8, help="Conexões simultâneas")
+    parser.add_argument('--duracao', type=float, default=10, help="Segundos de carga")
+    parser.add_argument('--lote', type=int, default=20, help="Pedidos por requisição de lote")
+    parser.add_argument('--comparar-ui', action='store_true')
+    args = parser.parse_args()
+
+    # O caminho do banco é lido na importação do módulo
+    os.environ['FARDAMENTOS_DB'] = os.path.join(tempfile.mkdtemp(), 'carga.db')
+    from api import criar_servidor
+
+    servidor = criar_servidor('127.0.0.1', 0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    porta = servidor.server_address[1]
+    total_clientes = 200
+    catalogo = preparar_banco(escolas=3, clientes=total_clientes, produtos_por_escola=20)
+
+    estatisticas = {'latencias': {'catalogo': [], 'pedido': [], 'lote': []}, 'erros': 0, 'pedidos': 0}
+    lock = threading.Lock()
+    fim = time.perf_counter() + args.duracao
+    threads = [
+        threading.Thread(target=cliente_carga,
+                         args=(porta, i, fim, catalogo, total_clientes, args.lote, estatisticas, lock))
+        for i in range(args.clientes)
+    ]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    total = sum(len(valores) for valores in estatisticas['latencias'].values())
+    print(f"{args.clientes} clientes por {duracao:.1f}s: {total} requisições ({total / duracao:.0f} req/s), "
+          f"{estatisticas['erros']} erros")
+    print(f"Pedidos gravados: {estatisticas['pedidos']} ({estatisticas['pedidos'] / duracao:.0f} pedidos/s)")
+    for tipo, valores in estatisticas['latencias'].items():
+        print(f"  {tipo:9s} {len(valores):6d} req | p50 {percentil(valores, 0.5):6.1f} ms | "
+              f"p95 {percentil(valores, 0.95):6.1f} ms")
+
+    if args.comparar_ui:
+        rerun = medir_ui(repeticoes=5)
+        print(f"Interface: um rerun da página de pedidos leva {rerun * 1000:.0f} ms "
+              f"(~{1 / rerun:.1f} interações/s por sessão)")
+
+if __name__ == '__main__':
+    main()
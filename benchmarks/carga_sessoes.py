@@ -0,0 +1,206 @@
+"""Teste de carga da interface com várias sessões simultâneas de vendedores
+
+Uso: python -m benchmarks.carga_sessoes [--sessoes 8] [--rodadas 3] [--pedidos-base 2000]
+
+Cada sessão roda o app.py pelo streamlit.testing (AppTest) em um processo
+próprio, contra um banco temporário já povoado, e repete um roteiro de
+vendedor: login, catálogo de produtos, carrinho, finalização do pedido,
+mudança de status e relatórios. No fim mostra os percentis de latência
+por ação, os erros de banco travado e a vazão.
+
+O AppTest desta versão do Streamlit não é seguro entre threads e não
+acompanha o st.rerun() disparado por um botão; por isso cada sessão é um
+processo, e um clique é reproduzido como ele acontece no servidor: um
+rerun com a mesma chamada ao banco que o botão faz, seguido do rerun
+pedido pelo st.rerun().
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.carga_api import percentil
+
+USUARIO, SENHA = 'vendedor', 'Vendas@123'
+ACOES = ('login', 'produtos', 'carrinho', 'finalizar', 'status', 'relatorios')
+ITENS_POR_CARRINHO = 3
+
+def montar_itens(aleatorio, produtos, quantidade_itens):
+    """Itens no formato do carrinho da página de pedidos (st.session_state.itens_pedido)"""
+    itens = []
+    for produto in aleatorio.sample(produtos, quantidade_itens):
+        quantidade = aleatorio.randint(1, 3)
+        itens.append({
+            'produto_id': produto['id'], 'nome': produto['nome'], 'tamanho': produto['tamanho'],
+            'cor': produto['cor'], 'quantidade': quantidade, 'preco_unitario': produto['preco'],
+            'subtotal': produto['preco'] * quantidade,
+        })
+    return itens
+
+def preparar_banco(clientes, produtos_por_escola, pedidos_base):
+    """Catálogo, clientes e um histórico de pedidos (a maioria já entregue) para as listagens terem volume real"""
+    from benchmarks.carga_api import preparar_banco as preparar_catalogo
+    from database.banco import init_db, listar_produtos_por_escola, adicionar_pedidos_lote, atualizar_status_pedidos_lote
+
+    init_db()
+    catalogo = preparar_catalogo(escolas=3, clientes=clientes, produtos_por_escola=produtos_por_escola)
+    produtos = {escola_id: listar_produtos_por_escola(escola_id) for escola_id in catalogo}
+    aleatorio = random.Random(0)
+    for inicio in range(0, pedidos_base, 500):
+        pedidos = []
+        for _ in range(min(500, pedidos_base - inicio)):
+            escola_id = aleatorio.choice(list(catalogo))
+            pedidos.append({'cliente_id': aleatorio.randint(1, clientes), 'escola_id': escola_id,
+                            'itens': montar_itens(aleatorio, produtos[escola_id], 2), 'forma_pagamento': 'PIX'})
+        criados = [resultado['pedido_id'] for resultado in adicionar_pedidos_lote(pedidos) if resultado['sucesso']]
+        atualizar_status_pedidos_lote([(pedido_id, 'Entregue') for pedido_id in criados if aleatorio.random() < 0.9])
+    return catalogo
+
+def erro_de_bloqueio(texto):
+    return 'locked' in str(texto) or 'busy' in str(texto)
+
+class Sessao:
+    """Um vendedor usando o app.py: cada ação devolve (segundos, mensagem de erro ou None)"""
+
+    def __init__(self, caminho_app, catalogo, clientes, semente):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(caminho_app, default_timeout=300)
+        self.catalogo = catalogo
+        self.clientes = clientes
+        self.aleatorio = random.Random(semente)
+        self.pedido_id = None
+
+    def rerun(self):
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+        erros = [erro.value for erro in self.at.error]
+        return erros[0] if erros else None
+
+    def pagina(self, nome):
+        self.at.sidebar.radio[0].set_value(nome)
+        return self.rerun()
+
+    def login(self):
+        from database.banco import verificar_login
+
+        for chave in ('logged_in', 'itens_pedido'):
+            if chave in self.at.session_state:
+                del self.at.session_state[chave]
+        self.rerun()  # Tela de login
+        self.at.sidebar.text_input[0].input(USUARIO)
+        self.at.sidebar.text_input[1].input(SENHA)
+        sucesso, nome, tipo = verificar_login(USUARIO, SENHA)
+        if not sucesso:
+            return nome
+        self.at.session_state['logged_in'] = True
+        self.at.session_state['username'] = USUARIO
+        self.at.session_state['nome_usuario'] = nome
+        self.at.session_state['tipo_usuario'] = tipo
+        return self.rerun()  # st.rerun() do botão Entrar
+
+    def produtos(self):
+        return self.pagina("👕 Produtos")
+
+    def carrinho(self):
+        from database.banco import listar_produtos_por_escola
+
+        erro = self.pagina("📦 Pedidos")
+        self.escola_id = self.aleatorio.choice(list(self.catalogo))
+        itens = montar_itens(self.aleatorio, listar_produtos_por_escola(self.escola_id), ITENS_POR_CARRINHO)
+        for quantidade in range(1, len(itens) + 1):
+            # Botão "➕ Add": rerun do clique e o do st.rerun()
+            self.at.session_state['itens_pedido'] = itens[:quantidade]
+            erro = self.rerun() or self.rerun() or erro
+        return erro
+
+    def finalizar(self):
+        from database.banco import adicionar_pedido
+
+        erro = self.rerun()  # Rerun do clique em "✅ Finalizar Pedido"
+        sucesso, resultado = adicionar_pedido(
+            self.aleatorio.randint(1, self.clientes), self.escola_id,
+            self.at.session_state['itens_pedido'], None, 'PIX', ''
+        )
+        if not sucesso:
+            return resultado
+        self.pedido_id = int(resultado.split('#')[1].split()[0].rstrip('!.,'))
+        del self.at.session_state['itens_pedido']
+        return self.rerun() or erro
+
+    def status(self):
+        from database.banco import atualizar_status_pedido
+
+        erro = self.rerun()  # Rerun do clique em "🔄 Atualizar"
+        sucesso, mensagem = atualizar_status_pedido(self.pedido_id, 'Em produção')
+        if not sucesso:
+            return mensagem
+        return self.rerun() or erro
+
+    def relatorios(self):
+        return self.pagina("📈 Relatórios")
+
+def executar_sessao(caminho_app, catalogo, clientes, indice, rodadas, comeca_em):
+    """Roda em um processo próprio; devolve [(ação, segundos, erro)]"""
+    sessao = Sessao(caminho_app, catalogo, clientes, semente=indice)
+    sessao.login()  # Aquece imports e caches fora da medição
+    sessao.pagina("📦 Pedidos")
+    time.sleep(max(comeca_em - time.time(), 0))
+
+    medicoes = []
+    for _ in range(rodadas):
+        for acao in ACOES:
+            inicio = time.perf_counter()
+            try:
+                erro = getattr(sessao, acao)()
+            except Exception as e:
+                erro = f"{type(e).__name__}: {e}"
+            medicoes.append((acao, time.perf_counter() - inicio, erro))
+    return medicoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=8, help="Vendedores simultâneos (um processo cada)")
+    parser.add_argument('--rodadas', type=int, default=3, help="Repetições do roteiro por sessão")
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--produtos', type=int, default=20, help="Produtos por escola")
+    parser.add_argument('--pedidos-base', type=int, default=2000, help="Pedidos já existentes no banco")
+    args = parser.parse_args()
+
+    # Os processos filhos herdam o ambiente: todos usam o mesmo banco temporário
+    pasta = tempfile.mkdtemp()
+    os.environ['FARDAMENTOS_DB'] = os.path.join(pasta, 'carga.db')
+    os.environ['FARDAMENTOS_RELATORIOS'] = os.path.join(pasta, 'relatorios')
+    catalogo = preparar_banco(args.clientes, args.produtos, args.pedidos_base)
+    caminho_app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+    # Margem para todas as sessões subirem antes da largada comum
+    comeca_em = time.time() + 20 + 3 * args.sessoes
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.sessoes, mp_context=contexto) as executor:
+        futuros = [
+            executor.submit(executar_sessao, caminho_app, catalogo, args.clientes, i, args.rodadas, comeca_em)
+            for i in range(args.sessoes)
+        ]
+        medicoes = [medicao for futuro in futuros for medicao in futuro.result()]
+    duracao = time.time() - comeca_em
+
+    erros = [erro for _, _, erro in medicoes if erro]
+    bloqueios = [erro for erro in erros if erro_de_bloqueio(erro)]
+    pedidos = sum(1 for acao, _, erro in medicoes if acao == 'finalizar' and not erro)
+    print(f"{args.sessoes} sessões x {args.rodadas} rodadas em {duracao:.1f}s: {len(medicoes)} ações "
+          f"({len(medicoes) / duracao:.1f} ações/s), {pedidos} pedidos ({pedidos / duracao:.2f} pedidos/s)")
+    print(f"Erros: {len(erros)} ({len(bloqueios)} de banco travado)")
+    for acao in ACOES:
+        tempos = [segundos for nome, segundos, _ in medicoes if nome == acao]
+        print(f"  {acao:10s} {len(tempos):5d} | p50 {percentil(tempos, 0.5):8.0f} ms | "
+              f"p95 {percentil(tempos, 0.95):8.0f} ms | máx {max(tempos, default=0) * 1000:8.0f} ms")
+    for erro in sorted(set(erros))[:10]:
+        print(f"  ! {erro}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Leituras do catálogo: consulta no SQLite x cache descartado a cada commit x catálogo em memória
+
+Uso: python -m benchmarks.catalogo [--produtos 300] [--leituras 2000] [--pedidos 300]
+
+Monta um banco temporário com --produtos produtos por escola e mede:
+1. leituras seguidas, sem escrita entre elas;
+2. a leitura logo depois de cada pedido gravado (o pedido reserva estoque
+   e muda os produtos dele), que é o caso comum com vendedores ao mesmo
+   tempo: o cache antigo relê tudo, o catálogo em memória relê só os
+   produtos alterados;
+3. quanto os gatilhos do catálogo custam na gravação do pedido.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+CATEGORIAS = ["Camisetas", "Calças/Shorts", "Agasalhos", "Acessórios", "Outros"]
+TAMANHOS = ["2", "4", "6", "8", "10", "12", "PP", "P", "M", "G", "GG"]
+
+def preparar_banco(produtos_por_escola):
+    from benchmarks.carga_api import preparar_banco as preparar_catalogo
+    from database.banco import init_db, get_connection
+
+    init_db()
+    catalogo = preparar_catalogo(escolas=3, clientes=50, produtos_por_escola=produtos_por_escola)
+    # Categorias e tamanhos variados, como nas escolas de verdade
+    conn = get_connection()
+    try:
+        conn.executemany("UPDATE produtos SET categoria = ?, tamanho = ? WHERE id = ?", [
+            (CATEGORIAS[indice % len(CATEGORIAS)], TAMANHOS[indice // len(CATEGORIAS) % len(TAMANHOS)], produto_id)
+            for produto_ids in catalogo.values() for indice, produto_id in enumerate(produto_ids)
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    return catalogo
+
+def medir(funcao, vezes):
+    inicio = time.perf_counter()
+    for _ in range(vezes):
+        funcao()
+    return (time.perf_counter() - inicio) / vezes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--produtos', type=int, default=300, help="Produtos por escola")
+    parser.add_argument('--leituras', type=int, default=2000)
+    parser.add_argument('--pedidos', type=int, default=300, help="Pedidos gravados nas medições com escrita")
+    args = parser.parse_args()
+
+    os.environ['FARDAMENTOS_DB'] = os.path.join(tempfile.mkdtemp(), 'catalogo.db')
+    from database.banco import roteador, get_connection, listar_produtos_por_escola, buscar_produtos, adicionar_pedido
+    from database.repositorio import Repositorio
+
+    catalogo = preparar_banco(args.produtos)
+    escola_id = next(iter(catalogo))
+    precos = {produto['id']: produto['preco'] for produto in listar_produtos_por_escola(escola_id)}
+    aleatorio = random.Random(0)
+
+    def consulta_sql():
+        conn = get_connection()
+        try:
+            return Repositorio(conn).todos('produtos.da_escola', (escola_id,))
+        finally:
+            conn.close()
+
+    # Como era antes: resultado guardado até o próximo commit em qualquer tabela
+    cache_antigo = roteador.banco().cache.memorizar(consulta_sql)
+
+    def em_memoria():
+        return listar_produtos_por_escola(escola_id)
+
+    def gravar_pedido():
+        itens = [{'produto_id': produto_id, 'quantidade': 1, 'preco_unitario': precos[produto_id],
+                  'subtotal': precos[produto_id]} for produto_id in aleatorio.sample(catalogo[escola_id], 2)]
+        sucesso, mensagem = adicionar_pedido(1, escola_id, itens, None, 'PIX', '')
+        assert sucesso, mensagem
+
+    assert sorted(em_memoria()) == sorted(consulta_sql())
+    print(f"{len(em_memoria())} produtos na escola, {sum(len(ids) for ids in catalogo.values())} no catálogo")
+
+    print("\nLeituras sem escrita entre elas (por leitura):")
+    for nome, funcao in (("Consulta SQL", consulta_sql), ("Cache por commit", cache_antigo), ("Em memória", em_memoria)):
+        funcao()
+        print(f"  {nome:<22} {medir(funcao, args.leituras) * 1e6:9.1f} µs")
+    filtro = medir(lambda: buscar_produtos(escola_id, 'Camisetas', 'M'), args.leituras)
+    print(f"  {'Filtro categoria+tam.':<22} {filtro * 1e6:9.1f} µs (índices em memória)")
+
+    print("\nLeitura logo depois de cada pedido (por leitura, sem contar a gravação):")
+    for nome, funcao in (("Cache por commit", cache_antigo), ("Em memória", em_memoria)):
+        total = 0.0
+        for _ in range(args.pedidos):
+            gravar_pedido()
+            inicio = time.perf_counter()
+            funcao()
+            total += time.perf_counter() - inicio
+        print(f"  {nome:<22} {total / args.pedidos * 1e6:9.1f} µs")
+    assert sorted(em_memoria()) == sorted(consulta_sql())
+    memoria = roteador.banco().catalogo
+    print(f"  (catálogo em memória: {memoria.remendos} remendos, {memoria.recargas} recargas completas)")
+
+    print("\nGravação de um pedido:")
+    com_gatilhos = medir(gravar_pedido, args.pedidos)
+    conn = get_connection()
+    try:
+        gatilhos = [linha[0] for linha in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_catalogo_%'")]
+        for nome in gatilhos:
+            conn.execute(f"DROP TRIGGER {nome}")
+        conn.commit()
+    finally:
+        conn.close()
+    sem_gatilhos = medir(gravar_pedido, args.pedidos)
+    print(f"  com os gatilhos do catálogo {com_gatilhos * 1000:6.2f} ms | sem {sem_gatilhos * 1000:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
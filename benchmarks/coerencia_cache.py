@@ -0,0 +1,99 @@
+"""Teste de coerência do cache entre processos que escrevem e leem o mesmo banco
+
+Uso: python -m benchmarks.coerencia_cache [--processos 4] [--escritas 100]
+
+Cada processo mantém o próprio CacheCoerente e, a cada rodada, grava uma
+escola e lê a lista memorizada. A leitura precisa enxergar a própria escrita
+e nunca pode ter menos escolas que a leitura anterior; no final, todos os
+processos precisam enxergar as escritas de todos os outros.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from database.cache import obter_cache
+
+def preparar_banco(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS escolas (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT UNIQUE NOT NULL)")
+    conn.commit()
+    conn.close()
+
+def trabalhador(caminho, indice, escritas, barreira, resultados):
+    cache = obter_cache(caminho)
+
+    @cache.memorizar
+    def listar_escolas():
+        conn = sqlite3.connect(caminho, timeout=30)
+        try:
+            return tuple(nome for (nome,) in conn.execute("SELECT nome FROM escolas ORDER BY nome"))
+        finally:
+            conn.close()
+
+    erros = []
+    anterior = 0
+    barreira.wait()
+    for rodada in range(escritas):
+        nome = f"Escola {indice}-{rodada}"
+        conn = sqlite3.connect(caminho, timeout=30)
+        try:
+            conn.execute("INSERT INTO escolas (nome) VALUES (?)", (nome,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Leituras repetidas seguidas: a primeira busca no banco, as demais vêm do cache
+        for _ in range(5):
+            escolas = listar_escolas()
+        if nome not in escolas:
+            erros.append(f"processo {indice} não viu a própria escrita {nome}")
+        if len(escolas) < anterior:
+            erros.append(f"processo {indice} viu a lista encolher ({anterior} -> {len(escolas)})")
+        anterior = len(escolas)
+
+    barreira.wait()  # Todos terminaram de escrever
+    total_final = len(listar_escolas())
+    resultados.put((indice, erros, total_final, cache.acertos, cache.falhas))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--escritas', type=int, default=100)
+    args = parser.parse_args()
+
+    caminho = os.path.join(tempfile.mkdtemp(), 'coerencia.db')
+    preparar_banco(caminho)
+
+    barreira = multiprocessing.Barrier(args.processos)
+    resultados = multiprocessing.Queue()
+    processos = [
+        multiprocessing.Process(target=trabalhador, args=(caminho, i, args.escritas, barreira, resultados))
+        for i in range(args.processos)
+    ]
+    inicio = time.perf_counter()
+    for processo in processos:
+        processo.start()
+    saidas = [resultados.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+    duracao = time.perf_counter() - inicio
+
+    esperado = args.processos * args.escritas
+    falhou = False
+    for indice, erros, total_final, acertos, falhas in sorted(saidas):
+        situacao = "ok" if not erros and total_final == esperado else "FALHOU"
+        falhou = falhou or situacao != "ok"
+        print(f"Processo {indice}: {situacao} | viu {total_final}/{esperado} escolas | "
+              f"cache: {acertos} acertos, {falhas} consultas ao banco")
+        for erro in erros[:5]:
+            print(f"  - {erro}")
+    print(f"Duração: {duracao:.2f}s")
+    sys.exit(1 if falhou else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Custo de acompanhar mudanças: reler a tabela de pedidos inteira x ler os eventos depois do cursor
+
+Uso: python -m benchmarks.eventos [--pedidos 20000] [--mudancas 200]
+
+Monta um banco temporário com --pedidos pedidos, guarda o cursor atual dos
+eventos e faz --mudancas trocas de status. Depois mede o que cada consumidor
+faz para descobrir o que mudou: reler todos os pedidos e comparar com a
+cópia anterior, ou pedir os eventos depois do cursor.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+def preparar_banco(total_pedidos):
+    from benchmarks.carga_api import preparar_banco as preparar_catalogo, novo_pedido
+    from database.banco import init_db, adicionar_pedidos_lote
+
+    init_db()
+    catalogo = preparar_catalogo(escolas=3, clientes=200, produtos_por_escola=20)
+    aleatorio = random.Random(0)
+    pedido_ids = []
+    for inicio in range(0, total_pedidos, 500):
+        pedidos = []
+        for _ in range(min(500, total_pedidos - inicio)):
+            pedido = novo_pedido(aleatorio, catalogo, 200)
+            for item in pedido['itens']:
+                item.update(preco_unitario=30.0, subtotal=30.0 * item['quantidade'])
+            pedidos.append(pedido)
+        pedido_ids += [resultado['pedido_id'] for resultado in adicionar_pedidos_lote(pedidos) if resultado['sucesso']]
+    return pedido_ids
+
+def medir(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=20_000)
+    parser.add_argument('--mudancas', type=int, default=200, help="Trocas de status entre duas leituras")
+    args = parser.parse_args()
+
+    os.environ['FARDAMENTOS_DB'] = os.path.join(tempfile.mkdtemp(), 'eventos.db')
+    from database.banco import listar_pedidos_por_escola, atualizar_status_pedidos_lote, ler_eventos
+
+    inicio = time.perf_counter()
+    pedido_ids = preparar_banco(args.pedidos)
+    print(f"Banco com {len(pedido_ids)} pedidos montado em {time.perf_counter() - inicio:.1f}s")
+
+    # Estado visto pelos dois consumidores antes das mudanças
+    anterior = {pedido['id']: pedido['status'] for pedido in listar_pedidos_por_escola()}
+    _, cursor, _ = ler_eventos(None, 1)
+    while True:
+        eventos, cursor, mais = ler_eventos(cursor, 1000)
+        if not mais:
+            break
+
+    alterados = random.Random(1).sample(pedido_ids, args.mudancas)
+    atualizar_status_pedidos_lote([(pedido_id, 'Em produção') for pedido_id in alterados])
+
+    def reler_tabela():
+        atual = {pedido['id']: pedido['status'] for pedido in listar_pedidos_por_escola()}
+        return [pedido_id for pedido_id, status in atual.items() if anterior.get(pedido_id) != status]
+
+    def seguir_cursor():
+        eventos, _, _ = ler_eventos(cursor, 1000)
+        return [evento['entidade_id'] for evento in eventos if evento['evento'] == 'pedido.status']
+
+    tempo_tabela, mudados_tabela = medir(reler_tabela)
+    tempo_cursor, mudados_cursor = medir(seguir_cursor)
+    print(f"Reler a tabela:  {tempo_tabela * 1000:8.1f} ms, {len(mudados_tabela)} pedidos mudados")
+    print(f"Eventos (cursor): {tempo_cursor * 1000:7.1f} ms, {len(mudados_cursor)} pedidos mudados "
+          f"({tempo_tabela / tempo_cursor:.0f}x mais rápido)")
+    print("Mesmo resultado" if sorted(mudados_tabela) == sorted(mudados_cursor) else "Resultados diferentes!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Histórico de compras de um cliente: varrer os pedidos x agregar na consulta x resumo mantido por gatilhos
+
+Uso: python -m benchmarks.historico_clientes [--pedidos 20000] [--fiel 2000] [--leituras 200]
+
+Monta um banco temporário com --pedidos pedidos de 200 clientes, dos quais
+--fiel são do cliente 1 (o maior cliente recorrente), e mede a abertura do
+histórico dele (totais, última compra, tamanhos por escola e a primeira
+página de pedidos):
+1. como a tela faria sem o histórico: listar todos os pedidos e filtrar;
+2. somando os pedidos do cliente na consulta, pelo índice (cliente_id, data);
+3. com o resumo mantido por gatilhos e a página pelo mesmo índice.
+Por fim, quanto os gatilhos do resumo custam na gravação de um pedido.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+CLIENTES = 200
+
+def preparar_banco(total_pedidos, pedidos_fiel):
+    from benchmarks.carga_api import preparar_banco as preparar_catalogo, novo_pedido
+    from database.banco import init_db, adicionar_pedidos_lote
+
+    init_db()
+    catalogo = preparar_catalogo(escolas=3, clientes=CLIENTES, produtos_por_escola=20)
+    aleatorio = random.Random(0)
+    fieis = set(aleatorio.sample(range(total_pedidos), pedidos_fiel))
+    for inicio in range(0, total_pedidos, 500):
+        pedidos = []
+        for indice in range(inicio, min(inicio + 500, total_pedidos)):
+            pedido = novo_pedido(aleatorio, catalogo, CLIENTES)
+            if indice in fieis:
+                pedido['cliente_id'] = 1
+            for item in pedido['itens']:
+                item.update(preco_unitario=30.0, subtotal=30.0 * item['quantidade'])
+            pedidos.append(pedido)
+        adicionar_pedidos_lote(pedidos)
+    return catalogo
+
+def medir(funcao, vezes):
+    inicio = time.perf_counter()
+    for _ in range(vezes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / vezes, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=20_000)
+    parser.add_argument('--fiel', type=int, default=2000, help="Pedidos do cliente 1")
+    parser.add_argument('--leituras', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ['FARDAMENTOS_DB'] = os.path.join(tempfile.mkdtemp(), 'historico.db')
+    from database.banco import (
+        get_connection, listar_pedidos_por_escola, historico_cliente, listar_pedidos_cliente, adicionar_pedido
+    )
+
+    inicio = time.perf_counter()
+    catalogo = preparar_banco(args.pedidos, args.fiel)
+    print(f"Banco com {args.pedidos} pedidos ({args.fiel} do cliente 1) montado em {time.perf_counter() - inicio:.1f}s")
+
+    def varrer_pedidos():
+        pedidos = [pedido for pedido in listar_pedidos_por_escola() if pedido.cliente_id == 1]
+        compras = [pedido for pedido in pedidos if pedido.status != 'Cancelado']
+        return len(pedidos), round(sum(pedido.valor_total for pedido in compras), 2), pedidos[:50]
+
+    def agregar_na_consulta():
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute('''
+                SELECT COUNT(*), SUM(CASE WHEN status = 'Cancelado' THEN 0 ELSE valor_total END),
+                       MAX(CASE WHEN status = 'Cancelado' THEN NULL ELSE data_pedido_epoch END)
+                FROM pedidos WHERE cliente_id = ?
+            ''', (1,))
+            total, valor, _ = cur.fetchone()
+            cur.execute('''
+                SELECT p.escola_id, pr.categoria, pr.tamanho, SUM(pi.quantidade) FROM pedidos p
+                JOIN pedido_itens pi ON pi.pedido_id = p.id JOIN produtos pr ON pr.id = pi.produto_id
+                WHERE p.cliente_id = ? AND p.status != 'Cancelado'
+                GROUP BY 1, 2, 3
+            ''', (1,))
+            cur.fetchall()
+        finally:
+            conn.close()
+        return total, round(valor, 2), listar_pedidos_cliente(1, 50)
+
+    def resumo():
+        historico = historico_cliente(1)
+        pagina = listar_pedidos_cliente(1, 50, 0, [escola['escola_id'] for escola in historico['escolas']])
+        return historico['pedidos'], round(historico['valor_total'], 2), pagina
+
+    print("\nAbrir o histórico do cliente 1 (por abertura):")
+    resultados = []
+    for nome, funcao, vezes in (("Varrer os pedidos", varrer_pedidos, max(args.leituras // 20, 3)),
+                                ("Agregar na consulta", agregar_na_consulta, args.leituras),
+                                ("Resumo por gatilhos", resumo, args.leituras)):
+        funcao()
+        tempo, resultado = medir(funcao, vezes)
+        resultados.append(resultado)
+        print(f"  {nome:<22} {tempo * 1000:8.2f} ms")
+    mesmos = all(r[:2] == resultados[0][:2] and [p.id for p in r[2]] == [p.id for p in resultados[0][2]]
+                 for r in resultados)
+    print("Mesmo resultado" if mesmos else f"Resultados diferentes! {[r[:2] for r in resultados]}")
+
+    aleatorio = random.Random(1)
+    escola_id = next(iter(catalogo))
+
+    def gravar_pedido():
+        itens = [{'produto_id': produto_id, 'quantidade': 1, 'preco_unitario': 30.0, 'subtotal': 30.0}
+                 for produto_id in aleatorio.sample(catalogo[escola_id], 2)]
+        sucesso, mensagem = adicionar_pedido(1, escola_id, itens, None, 'PIX', '')
+        assert sucesso, mensagem
+
+    print("\nGravação de um pedido:")
+    com_gatilhos, _ = medir(gravar_pedido, args.leituras)
+    conn = get_connection()
+    try:
+        gatilhos = [linha[0] for linha in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_resumo_clientes_%'")]
+        for nome in gatilhos:
+            conn.execute(f"DROP TRIGGER {nome}")
+        conn.commit()
+    finally:
+        conn.close()
+    sem_gatilhos, _ = medir(gravar_pedido, args.leituras)
+    print(f"  com os gatilhos do resumo {com_gatilhos * 1000:6.2f} ms | sem {sem_gatilhos * 1000:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Partida a frio: tempo até a primeira tela, até entrar e o que a API e as linhas de comando importam
+
+Uso: python -m benchmarks.inicializacao [--rodadas 3]
+
+Cada rodada é um processo Python novo, como o app acordando depois de
+dormir. Dentro dele, o AppTest do Streamlit desenha a tela de login; depois
+de SEGUNDOS_DIGITANDO (a senha sendo digitada), entra como admin e abre os
+Relatórios. Um segundo visitante no mesmo processo mostra o custo de quem
+chega depois. Em outro processo novo, mede a importação do banco que a API
+e as linhas de comando fazem e quais módulos pesados ela puxa.
+
+'streamlit importado' e 'tela de login' contam a partir do início do
+processo filho, com o interpretador; os demais são a duração de cada passo.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ('pandas', 'numpy', 'plotly.express')
+SEGUNDOS_DIGITANDO = 2  # Entre a tela de login e o clique em Entrar
+
+# Rodam no processo filho; INICIO é o time.time() do pai logo antes de criar o processo.
+# Vão pelo ambiente: argumentos extras em sys.argv atrapalham o rerun do AppTest
+RODADA_APP = '''
+import json, os, sys, time
+inicio = float(os.environ['INICIO'])
+marcas = {}
+from streamlit.testing.v1 import AppTest
+marcas['streamlit importado'] = time.time() - inicio
+app = AppTest.from_file(os.environ['APP'], default_timeout=120).run()
+marcas['tela de login'] = time.time() - inicio
+time.sleep(%(digitacao)r)
+app.sidebar.text_input[0].input('admin'); app.sidebar.text_input[1].input('Admin@2024!')
+antes = time.time()
+app.sidebar.button[0].click().run()
+marcas['entrar até o dashboard'] = time.time() - antes
+antes = time.time()
+app.sidebar.radio[0].set_value("📈 Relatórios").run()
+marcas['abrir os relatórios'] = time.time() - antes
+antes = time.time()
+AppTest.from_file(os.environ['APP'], default_timeout=120).run()
+marcas['login do segundo visitante'] = time.time() - antes
+print(json.dumps({'marcas': marcas, 'erros': [e.value for e in app.exception]}))
+''' % {'digitacao': SEGUNDOS_DIGITANDO}
+
+RODADA_BANCO = '''
+import json, os, sys, time
+inicio = float(os.environ['INICIO'])
+import database.banco
+print(json.dumps({'marcas': {'import database.banco': time.time() - inicio},
+                  'pesados': [nome for nome in %(pesados)r if nome in sys.modules]}))
+''' % {'pesados': PESADOS}
+
+def rodar(codigo, tentativas=3):
+    # O AppTest às vezes perde o estado do cliente no st.rerun do login (KeyError 'client_state'): repete a rodada
+    for _ in range(tentativas):
+        ambiente = {**os.environ, 'PYTHONPATH': RAIZ, 'APP': os.path.join(RAIZ, 'app.py'), 'INICIO': str(time.time())}
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, env=ambiente)
+        if saida.returncode == 0:
+            return json.loads(saida.stdout.strip().splitlines()[-1])
+    raise RuntimeError(saida.stderr[-2000:])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rodadas', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['FARDAMENTOS_DB'] = os.path.join(tempfile.mkdtemp(), 'inicializacao.db')
+    # Banco já criado: mede a partida do processo, não a criação das tabelas
+    rodar(RODADA_APP)
+
+    for nome, codigo in (("App (Streamlit)", RODADA_APP), ("API / linhas de comando", RODADA_BANCO)):
+        resultados = [rodar(codigo) for _ in range(args.rodadas)]
+        print(f"\n{nome}, mediana de {args.rodadas} processos novos:")
+        for r in resultados:
+            if 'tela de login' in r['marcas']:
+                r['marcas']['(execução da tela de login)'] = r['marcas']['tela de login'] - r['marcas']['streamlit importado']
+        for marca in resultados[0]['marcas']:
+            print(f"  {marca:<28} {statistics.median(r['marcas'][marca] for r in resultados) * 1000:7.0f} ms")
+        if 'pesados' in resultados[0]:
+            print(f"  módulos pesados importados: {', '.join(resultados[0]['pesados']) or 'nenhum'}")
+        if resultados[0].get('erros'):
+            print(f"  ERROS: {resultados[0]['erros']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Tempo da verificação de integridade sobre um banco grande com inconsistências plantadas
+
+Uso: python -m benchmarks.integridade [--itens 1000000] [--corrigir]
+
+Monta um banco temporário com a estrutura do sistema (init_db) e grava
+pedidos e itens direto em lote, já com as reservas dos pedidos em aberto.
+Depois estraga alguns registros de propósito (totais, reservas, itens
+órfãos, estoque negativo) e mede a verificação, conferindo se cada
+inconsistência plantada foi encontrada.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+ITENS_POR_PEDIDO = 4
+PLANTADOS = 25   # Registros estragados por regra
+
+def preparar_banco(total_itens):
+    """Catálogo pequeno e total_itens itens distribuídos em pedidos de ITENS_POR_PEDIDO itens"""
+    from database.banco import init_db, get_connection, STATUS_PEDIDO, STATUS_ABERTOS
+
+    init_db()
+    aleatorio = random.Random(0)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT INTO clientes (nome) VALUES (?)", [(f"Cliente {i}",) for i in range(1000)])
+        cur.executemany(
+            "INSERT INTO produtos (nome, categoria, tamanho, cor, preco, estoque, escola_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(f"Produto {i}", 'Camisetas', 'M', 'Branco', 30.0 + i % 20, 10_000, 1 + i % 3) for i in range(300)]
+        )
+
+        pedidos, itens = [], []
+        reservado = [0] * 301
+        for pedido_id in range(1, total_itens // ITENS_POR_PEDIDO + 1):
+            status = aleatorio.choice(STATUS_PEDIDO)
+            quantidade_total = valor_total = 0
+            for _ in range(ITENS_POR_PEDIDO):
+                produto_id, quantidade = aleatorio.randint(1, 300), aleatorio.randint(1, 3)
+                preco = 30.0 + (produto_id - 1) % 20
+                itens.append((pedido_id, produto_id, quantidade, preco, quantidade * preco))
+                quantidade_total += quantidade
+                valor_total += quantidade * preco
+                if status in STATUS_ABERTOS:
+                    reservado[produto_id] += quantidade
+            pedidos.append((pedido_id, aleatorio.randint(1, 1000), 1 + pedido_id % 3, status,
+                            quantidade_total, valor_total))
+        cur.executemany('''
+            INSERT INTO pedidos (id, cliente_id, escola_id, status, quantidade_total, valor_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', pedidos)
+        cur.executemany('''
+            INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unitario, subtotal)
+            VALUES (?, ?, ?, ?, ?)
+        ''', itens)
+        cur.executemany("UPDATE produtos SET reservado = ? WHERE id = ?",
+                        [(reservado[produto_id], produto_id) for produto_id in range(1, 301)])
+
+        # Inconsistências plantadas
+        total_pedidos = len(pedidos)
+        cur.executemany("UPDATE pedidos SET valor_total = valor_total + 10 WHERE id = ?",
+                        [(i,) for i in range(1, total_pedidos, total_pedidos // PLANTADOS)][:PLANTADOS])
+        cur.executemany("UPDATE produtos SET reservado = reservado + 1 WHERE id = ?",
+                        [(i,) for i in range(1, PLANTADOS + 1)])
+        cur.executemany("UPDATE produtos SET estoque = -1 WHERE id = ?",
+                        [(i,) for i in range(300 - PLANTADOS + 1, 301)])
+        cur.executemany(
+            "INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unitario, subtotal) VALUES (?, 1, 1, 30, 30)",
+            [(total_pedidos + 1 + i,) for i in range(PLANTADOS)]
+        )
+        conn.commit()
+        return len(itens)
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--itens', type=int, default=1_000_000)
+    parser.add_argument('--corrigir', action='store_true', help="Mede também a correção (e confere de novo)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ['FARDAMENTOS_DB'] = os.path.join(pasta, 'integridade.db')
+    from database.integridade import verificar_integridade, VERIFICACOES
+
+    inicio = time.perf_counter()
+    total_itens = preparar_banco(args.itens)
+    print(f"Banco com {total_itens} itens montado em {time.perf_counter() - inicio:.1f}s")
+
+    inicio = time.perf_counter()
+    problemas, corrigidos = verificar_integridade(args.corrigir)
+    print(f"Verificação{' e correção' if args.corrigir else ''} em {time.perf_counter() - inicio:.2f}s")
+    for nome, descricao in VERIFICACOES.items():
+        print(f"  {descricao}: {len(problemas[nome])}"
+              + (f" ({corrigidos[nome]} corrigidos)" if nome in corrigidos else ""))
+
+    esperados = {'totais': PLANTADOS, 'itens_orfaos': PLANTADOS, 'estoque': PLANTADOS, 'reservas': PLANTADOS}
+    faltando = {nome: len(problemas[nome]) for nome, quantidade in esperados.items() if len(problemas[nome]) != quantidade}
+    print("Todas as inconsistências plantadas foram encontradas" if not faltando
+          else f"Diferente do plantado ({PLANTADOS} por regra): {faltando}")
+
+    if args.corrigir:
+        inicio = time.perf_counter()
+        problemas, _ = verificar_integridade()
+        restantes = {nome: len(df) for nome, df in problemas.items() if len(df)}
+        print(f"Nova verificação em {time.perf_counter() - inicio:.2f}s; restam {restantes or 'nenhuma'}")
+
+if __name__ == '__main__':
+    main()
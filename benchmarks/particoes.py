@@ -0,0 +1,98 @@
+"""Vazão de escrita com vários processos gravando pedidos de escolas diferentes: um arquivo x partições por escola
+
+Uso: python -m benchmarks.particoes [--processos 6] [--segundos 10] [--produtos 20]
+
+Cada modo roda em um banco temporário próprio: primeiro só o banco da loja,
+depois com FARDAMENTOS_POR_ESCOLA=1. Os processos gravadores são divididos
+entre as escolas e repetem o caminho do formulário (pedido novo e troca de
+status) até o fim do tempo. No fim mostra pedidos/s, os percentis de
+latência por escrita e os erros de banco travado de cada modo.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.carga_api import percentil
+from benchmarks.carga_sessoes import erro_de_bloqueio
+
+CLIENTES = 200
+MODOS = {'um arquivo': '0', 'por escola': '1'}
+
+def preparar_banco(produtos_por_escola):
+    """Estrutura (com as partições, se for o caso) e catálogo; roda em um processo com o ambiente do modo"""
+    from benchmarks.carga_api import preparar_banco as preparar_catalogo
+    from database.banco import init_db
+
+    init_db()
+    return preparar_catalogo(escolas=3, clientes=CLIENTES, produtos_por_escola=produtos_por_escola)
+
+def gravador(escola_id, produtos, indice, comeca_em, segundos):
+    """Grava pedidos da escola até o fim do tempo; devolve [(segundos, erro ou None)]"""
+    from database.banco import adicionar_pedido, atualizar_status_pedido, listar_produtos_por_escola
+
+    precos = {produto['id']: produto['preco'] for produto in listar_produtos_por_escola(escola_id)}
+    aleatorio = random.Random(indice)
+    time.sleep(max(comeca_em - time.time(), 0))
+
+    medicoes = []
+    fim = comeca_em + segundos
+    while time.time() < fim:
+        itens = []
+        for produto_id in aleatorio.sample(produtos, 2):
+            quantidade = aleatorio.randint(1, 3)
+            itens.append({'produto_id': produto_id, 'quantidade': quantidade, 'preco_unitario': precos[produto_id],
+                          'subtotal': precos[produto_id] * quantidade})
+        inicio = time.perf_counter()
+        sucesso, mensagem = adicionar_pedido(aleatorio.randint(1, CLIENTES), escola_id, itens, None, 'PIX', '')
+        if sucesso:
+            pedido_id = int(mensagem.split('#')[1].split()[0].rstrip('!.,'))
+            sucesso, mensagem = atualizar_status_pedido(pedido_id, 'Em produção')
+        medicoes.append((time.perf_counter() - inicio, None if sucesso else mensagem))
+    return medicoes
+
+def medir_modo(por_escola, processos, segundos, produtos_por_escola):
+    """Banco novo no modo pedido; retorna (pedidos por segundo, latências, erros)"""
+    pasta = tempfile.mkdtemp()
+    # Os processos filhos herdam o ambiente e leem FARDAMENTOS_POR_ESCOLA ao importar o banco
+    os.environ['FARDAMENTOS_DB'] = os.path.join(pasta, 'particoes.db')
+    os.environ['FARDAMENTOS_POR_ESCOLA'] = por_escola
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        catalogo = executor.submit(preparar_banco, produtos_por_escola).result()
+
+    escolas = list(catalogo)
+    comeca_em = time.time() + 5 + processos
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+        futuros = [
+            executor.submit(gravador, escolas[i % len(escolas)], catalogo[escolas[i % len(escolas)]],
+                            i, comeca_em, segundos)
+            for i in range(processos)
+        ]
+        medicoes = [medicao for futuro in futuros for medicao in futuro.result()]
+
+    tempos = [tempo for tempo, erro in medicoes if not erro]
+    erros = [erro for _, erro in medicoes if erro]
+    return len(tempos) / segundos, tempos, erros
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processos', type=int, default=6, help="Gravadores simultâneos (divididos entre 3 escolas)")
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--produtos', type=int, default=20, help="Produtos por escola")
+    args = parser.parse_args()
+
+    vazoes = {}
+    for nome, por_escola in MODOS.items():
+        vazoes[nome], tempos, erros = medir_modo(por_escola, args.processos, args.segundos, args.produtos)
+        bloqueios = [erro for erro in erros if erro_de_bloqueio(erro)]
+        print(f"{nome:10s} {vazoes[nome]:8.1f} pedidos/s | p50 {percentil(tempos, 0.5):6.1f} ms | "
+              f"p95 {percentil(tempos, 0.95):6.1f} ms | erros {len(erros)} ({len(bloqueios)} de banco travado)")
+    if vazoes['um arquivo']:
+        print(f"Partições por escola: {vazoes['por escola'] / vazoes['um arquivo']:.2f}x a vazão de um arquivo")
+
+if __name__ == '__main__':
+    main()
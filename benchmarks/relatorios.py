@@ -0,0 +1,86 @@
+"""Microbenchmark: pós-processamento de relatórios linha a linha x vetorizado
+
+Uso: python -m benchmarks.relatorios [--linhas 100000] [--repeticoes 3]
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from database.relatorios import carregar_dataframe, formatar_exibicao
+
+COLUNAS = ['Data', 'Escola', 'Total Pedidos', 'Total Itens', 'Total Vendas (R$)']
+
+def criar_banco(linhas):
+    """Banco em memória com o formato de saída do relatório de vendas"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    aleatorio = random.Random(42)
+    escolas = [f"Escola {i}" for i in range(40)]
+    conn.execute("CREATE TABLE vendas (dia INTEGER, data TEXT, escola TEXT, pedidos INTEGER, itens INTEGER, total REAL)")
+    registros = []
+    for _ in range(linhas):
+        ano, mes, dia = aleatorio.randint(2018, 2025), aleatorio.randint(1, 12), aleatorio.randint(1, 28)
+        registros.append((ano * 10000 + mes * 100 + dia, f"{ano:04d}-{mes:02d}-{dia:02d}", aleatorio.choice(escolas),
+                          aleatorio.randint(1, 30), aleatorio.randint(1, 90), round(aleatorio.uniform(10, 9000), 2)))
+    conn.executemany("INSERT INTO vendas VALUES (?, ?, ?, ?, ?, ?)", registros)
+    return conn
+
+def formatar_data_brasil(data_str):
+    """Implementação linha a linha usada antes do pipeline vetorizado"""
+    if not data_str:
+        return ""
+    try:
+        return datetime.strptime(data_str, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return data_str
+
+def pipeline_linha_a_linha(conn):
+    cur = conn.execute("SELECT data, escola, pedidos, itens, total FROM vendas")
+    df = pd.DataFrame(cur.fetchall(), columns=COLUNAS)
+    df['Data'] = df['Data'].apply(formatar_data_brasil)
+    df['Total Vendas (R$)'] = df['Total Vendas (R$)'].apply(lambda valor: f"R$ {valor:.2f}")
+    return df
+
+def pipeline_vetorizado(conn):
+    cur = conn.execute("SELECT dia, escola, pedidos, itens, total FROM vendas")
+    df = carregar_dataframe(cur, COLUNAS, {
+        'Data': 'dia', 'Escola': 'category', 'Total Pedidos': 'int64',
+        'Total Itens': 'int64', 'Total Vendas (R$)': 'float64'
+    })
+    return formatar_exibicao(df, datas=['Data'], moedas=['Total Vendas (R$)'])
+
+def somente_consulta(conn):
+    conn.execute("SELECT dia, escola, pedidos, itens, total FROM vendas").fetchall()
+
+def medir(funcao, conn, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(conn)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    conn = criar_banco(args.linhas)
+    consulta = medir(somente_consulta, conn, args.repeticoes)
+    anterior = medir(pipeline_linha_a_linha, conn, args.repeticoes)
+    vetorizado = medir(pipeline_vetorizado, conn, args.repeticoes)
+
+    print(f"Linhas: {args.linhas:,}".replace(',', '.'))
+    print(f"Somente a consulta:    {consulta * 1000:8.1f} ms")
+    print(f"Linha a linha (apply): {anterior * 1000:8.1f} ms")
+    print(f"Vetorizado:            {vetorizado * 1000:8.1f} ms")
+    print(f"Ganho total:           {anterior / vetorizado:8.1f}x")
+    print(f"Ganho pós-consulta:    {(anterior - consulta) / max(vetorizado - consulta, 1e-9):8.1f}x")
+
+if __name__ == '__main__':
+    main()
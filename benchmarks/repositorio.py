@@ -0,0 +1,67 @@
+"""Custo das consultas do caminho quente com e sem reaproveitamento de conexão/statement
+
+Uso: python -m benchmarks.repositorio [--repeticoes 5000]
+
+Compara, sobre um banco temporário povoado, três formas de rodar as
+mesmas consultas nomeadas do repositório:
+  conexão nova     abre e fecha uma conexão por chamada (como antes do pool)
+  sem cache        conexão longa, mas preparando o statement toda vez
+  repositório      conexão longa com o cache de statements do sqlite3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# Consultas curtas e frequentes: aqui a preparação pesa mais que a execução
+CONSULTAS = (
+    ('escolas.por_id', lambda aleatorio: (aleatorio.randint(1, 3),)),
+    ('produtos.disponivel', lambda aleatorio: (aleatorio.randint(1, 60),)),
+    ('pedidos.status', lambda aleatorio: (aleatorio.randint(1, 2000),)),
+    ('itens.movimento_do_pedido', lambda aleatorio: (aleatorio.randint(1, 2000),)),
+)
+
+def medir(repeticoes, obter_repositorio, devolver):
+    from database.repositorio import CONSULTAS as SQL
+
+    aleatorio = random.Random(0)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for nome, parametros in CONSULTAS:
+            repositorio = obter_repositorio()
+            if SQL[nome].tipo:
+                repositorio.todos(nome, parametros(aleatorio))
+            else:
+                repositorio.um(nome, parametros(aleatorio))
+            devolver(repositorio)
+    return (time.perf_counter() - inicio) / (repeticoes * len(CONSULTAS)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ['FARDAMENTOS_DB'] = caminho = os.path.join(tempfile.mkdtemp(), 'repositorio.db')
+    from benchmarks.carga_sessoes import preparar_banco
+    from database.repositorio import Repositorio
+
+    preparar_banco(clientes=200, produtos_por_escola=20, pedidos_base=2000)
+
+    def conexao_nova():
+        return Repositorio(sqlite3.connect(caminho))
+
+    sem_cache = Repositorio(sqlite3.connect(caminho, cached_statements=0))
+    longo = Repositorio.abrir(caminho)
+
+    resultados = {
+        'conexão nova': medir(args.repeticoes, conexao_nova, Repositorio.fechar),
+        'sem cache': medir(args.repeticoes, lambda: sem_cache, lambda repositorio: None),
+        'repositório': medir(args.repeticoes, lambda: longo, lambda repositorio: None),
+    }
+    for nome, microssegundos in resultados.items():
+        print(f"{nome:13s} {microssegundos:8.1f} µs por consulta")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Vazão da sincronização do caixa offline contra uma API local, e reenvio sem duplicar
+
+Uso: python -m benchmarks.sincronizacao [--operacoes 5000] [--lotes 1,50,200]
+
+Sobe a API (api.py) em outro processo com um banco temporário, como o
+servidor da loja. Para cada tamanho de lote, um caixa grava --operacoes
+operações na fila local (pedidos, parte com cliente novo, e ajustes de
+estoque) sem falar com o servidor e depois sincroniza tudo. No fim,
+simula respostas perdidas: marca tudo como pendente de novo, reenvia e
+confere que nenhum pedido foi gravado duas vezes e que a verificação de
+integridade continua limpa.
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+USUARIO, SENHA = 'admin', 'Admin@2024!'
+CLIENTES = 200
+
+def porta_livre():
+    with socket.socket() as soquete:
+        soquete.bind(('127.0.0.1', 0))
+        return soquete.getsockname()[1]
+
+def subir_servidor(porta):
+    """API em outro processo; espera responder em /saude"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processo = subprocess.Popen([sys.executable, os.path.join(raiz, 'api.py'), '--host', '127.0.0.1', '--porta', str(porta)],
+                                cwd=raiz, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=1).close()
+            return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError("A API não subiu")
+
+def gravar_operacoes(fila, catalogo, quantidade, aleatorio):
+    """Vendas de um evento: 90% pedidos (1 em 5 com cliente novo) e 10% ajustes de estoque"""
+    for i in range(quantidade):
+        escola_id = aleatorio.choice(list(catalogo))
+        if aleatorio.random() < 0.9:
+            itens = [{'produto_id': produto_id, 'quantidade': aleatorio.randint(1, 3)}
+                     for produto_id in aleatorio.sample(catalogo[escola_id], 2)]
+            if aleatorio.random() < 0.2:
+                fila.registrar_pedido(escola_id, itens, cliente={'nome': f"Aluno {aleatorio.randint(1, 500)}",
+                                                                 'telefone': f"8198{aleatorio.randint(0, 9999999):07d}"},
+                                      forma_pagamento='PIX')
+            else:
+                fila.registrar_pedido(escola_id, itens, cliente_id=aleatorio.randint(1, CLIENTES))
+        else:
+            fila.registrar_ajuste_estoque(aleatorio.choice(catalogo[escola_id]), aleatorio.choice([-2, -1, 5, 10]))
+
+def contar_pedidos():
+    from database.banco import em_todas_as_escolas, get_connection
+    from database.particoes import POR_ESCOLA
+
+    def contar():
+        conn = get_connection()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0]
+        finally:
+            conn.close()
+    return sum(em_todas_as_escolas(contar).values()) if POR_ESCOLA else contar()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operacoes', type=int, default=5000, help="Operações por caixa")
+    parser.add_argument('--lotes', default='1,50,200', help="Tamanhos de lote a comparar")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    # O servidor herda o ambiente: este processo e a API usam o mesmo banco
+    os.environ['FARDAMENTOS_DB'] = os.path.join(pasta, 'servidor.db')
+    porta = porta_livre()
+    servidor = subir_servidor(porta)
+    try:
+        from benchmarks.carga_api import preparar_banco
+        from database.offline import FilaOffline, ClienteAPI, sincronizar
+        from database.integridade import verificar_integridade
+
+        catalogo = preparar_banco(escolas=3, clientes=CLIENTES, produtos_por_escola=20)
+        cliente = ClienteAPI(f"http://127.0.0.1:{porta}", USUARIO, SENHA)
+        filas = []
+        for tamanho_lote in [int(valor) for valor in args.lotes.split(',')]:
+            fila = FilaOffline(os.path.join(pasta, f"caixa_{tamanho_lote}.db"))
+            filas.append(fila)
+            inicio = time.perf_counter()
+            gravar_operacoes(fila, catalogo, args.operacoes, random.Random(tamanho_lote))
+            gravacao = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            resumo = sincronizar(fila, cliente, tamanho_lote)
+            duracao = time.perf_counter() - inicio
+            print(f"Lote {tamanho_lote:4d}: fila local {args.operacoes / gravacao:7.0f} op/s | sincronização "
+                  f"{resumo['enviadas'] / duracao:6.0f} op/s ({duracao:.1f}s) | {resumo['aplicadas']} aplicadas, "
+                  f"{resumo['recusadas']} recusadas, {resumo['conflitos']} com conflito"
+                  + (f" | erro: {resumo['erro']}" if resumo['erro'] else ""))
+
+        # Respostas perdidas: o caixa não sabe que já enviou e manda tudo de novo
+        pedidos_antes = contar_pedidos()
+        repetidas = enviadas = 0
+        inicio = time.perf_counter()
+        for fila in filas:
+            with fila.conn:
+                fila.conn.execute("UPDATE operacoes SET enviada_em = NULL, resultado = NULL")
+            resumo = sincronizar(fila, cliente)
+            repetidas += resumo['repetidas']
+            enviadas += resumo['enviadas']
+        duracao = time.perf_counter() - inicio
+        pedidos_depois = contar_pedidos()
+        print(f"Reenvio: {enviadas} operações em {duracao:.1f}s, {repetidas} reconhecidas como já recebidas; "
+              f"pedidos no servidor {pedidos_antes} -> {pedidos_depois}"
+              + (" (sem duplicatas)" if pedidos_antes == pedidos_depois else " (DUPLICADOS!)"))
+
+        problemas, _ = verificar_integridade()
+        restantes = {nome: len(df) for nome, df in problemas.items() if len(df)}
+        print(f"Integridade depois da sincronização: {restantes or 'sem inconsistências'}")
+        cliente.fechar()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Arquivamento de pedidos fechados (Entregue/Cancelado) antigos
+
+Uso: python -m database.arquivamento [--antes-de AAAA-MM-DD] [--lote 2000] [--simular]
+
+Move pedidos entregues ou cancelados feitos antes do corte (padrão: 1º de
+janeiro do ano letivo atual) e os seus itens para o banco de arquivo
+(FARDAMENTOS_ARQUIVO, padrão fardamentos_arquivo.db; com várias lojas, o
+da loja de FARDAMENTOS_LOJA; com partições por escola, o de cada escola).
+Os relatórios só consultam o arquivo quando o período pedido chega aos dias
+arquivados.
+
+Cada lote é copiado para o arquivo e confirmado antes de ser apagado da
+base quente; se o processo parar entre os dois passos, o pedido fica nos
+dois bancos (as consultas ignoram a cópia) e a próxima execução conclui.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from database.banco import (
+    get_connection, anexar_arquivo, iniciar_escrita, colunas_tabela, data_para_dia, listar_escolas, tabelas_pedidos
+)
+from database.lojas import roteador
+from database.particoes import POR_ESCOLA, na_escola
+from database.reposicao import PESOS_JANELAS
+from database.resumo_clientes import recalcular_resumo_clientes
+
+STATUS_FECHADOS = ('Entregue', 'Cancelado')
+TAMANHO_LOTE = 2000
+
+def corte_padrao(hoje=None):
+    """Início do ano letivo atual: pedidos de anos anteriores vão para o arquivo"""
+    hoje = hoje or date.today()
+    return date(hoje.year, 1, 1)
+
+def corte_maximo(hoje=None):
+    """A reposição lê as vendas das suas janelas; elas precisam continuar na base quente"""
+    hoje = hoje or date.today()
+    return hoje - timedelta(days=max(PESOS_JANELAS))
+
+def preparar_arquivo(cur):
+    """Cria no arquivo as tabelas de pedidos com o mesmo formato da base quente"""
+    for tabela in ('pedidos', 'pedido_itens'):
+        cur.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+        definicao = cur.fetchone()[0]
+        cur.execute(definicao.replace(f"CREATE TABLE {tabela}", f"CREATE TABLE IF NOT EXISTS arquivo.{tabela}", 1))
+
+        # Colunas adicionadas por migrações depois que o arquivo foi criado
+        no_arquivo = set(colunas_tabela(cur, tabela, 'arquivo'))
+        cur.execute(f"PRAGMA main.table_info({tabela})")
+        for _, coluna, tipo, *_ in cur.fetchall():
+            if coluna not in no_arquivo:
+                cur.execute(f"ALTER TABLE arquivo.{tabela} ADD COLUMN {coluna} {tipo}")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arq_pedidos_dia ON pedidos(data_pedido_dia)")
+    cur.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arq_pedidos_escola_dia ON pedidos(escola_id, data_pedido_dia)")
+    cur.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arq_pedidos_cliente_data ON pedidos(cliente_id, data_pedido_epoch)")
+    cur.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arq_itens_pedido ON pedido_itens(pedido_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arq_itens_produto ON pedido_itens(produto_id)")
+
+def arquivar_lote(conn, ids, dia_corte):
+    """Copia um lote para o arquivo, confirma, e só então apaga da base quente"""
+    cur = conn.cursor()
+    marcadores = ', '.join('?' * len(ids))
+    colunas_pedidos = ', '.join(colunas_tabela(cur, 'pedidos'))
+    colunas_itens = ', '.join(colunas_tabela(cur, 'pedido_itens'))
+
+    iniciar_escrita(conn)
+    cur.execute(f'''
+        INSERT OR REPLACE INTO arquivo.pedidos ({colunas_pedidos})
+        SELECT {colunas_pedidos} FROM main.pedidos WHERE id IN ({marcadores})
+    ''', ids)
+    cur.execute(f"DELETE FROM arquivo.pedido_itens WHERE pedido_id IN ({marcadores})", ids)
+    cur.execute(f'''
+        INSERT INTO arquivo.pedido_itens ({colunas_itens})
+        SELECT {colunas_itens} FROM main.pedido_itens WHERE pedido_id IN ({marcadores})
+    ''', ids)
+    conn.commit()
+
+    iniciar_escrita(conn)
+    # Um pedido reaberto entre os dois passos fica na base quente
+    cur.execute(f'''
+        SELECT id, data_pedido_dia, cliente_id FROM main.pedidos
+        WHERE id IN ({marcadores}) AND status IN ({', '.join('?' * len(STATUS_FECHADOS))}) AND data_pedido_dia < ?
+    ''', list(ids) + list(STATUS_FECHADOS) + [dia_corte])
+    fechados = cur.fetchall()
+    movidos = [pedido_id for pedido_id, _, _ in fechados]
+    reabertos = sorted(set(ids) - set(movidos))
+
+    if movidos:
+        marcadores_movidos = ', '.join('?' * len(movidos))
+        cur.execute(f"DELETE FROM main.pedido_itens WHERE pedido_id IN ({marcadores_movidos})", movidos)
+        cur.execute(f"DELETE FROM main.pedidos WHERE id IN ({marcadores_movidos})", movidos)
+        cur.execute('''
+            UPDATE arquivamento_controle SET dia_limite = MAX(COALESCE(dia_limite, 0), ?) WHERE id = 1
+        ''', (max(dia for _, dia, _ in fechados),))
+        # Os gatilhos do resumo descontaram os pedidos apagados; eles continuam sendo compras do cliente
+        recalcular_resumo_clientes(cur, *tabelas_pedidos(conn),
+                                   cliente_ids={cliente_id for _, _, cliente_id in fechados if cliente_id is not None})
+    if reabertos:
+        marcadores_reabertos = ', '.join('?' * len(reabertos))
+        cur.execute(f"DELETE FROM arquivo.pedido_itens WHERE pedido_id IN ({marcadores_reabertos})", reabertos)
+        cur.execute(f"DELETE FROM arquivo.pedidos WHERE id IN ({marcadores_reabertos})", reabertos)
+    conn.commit()
+    return len(movidos)
+
+def arquivar_pedidos(antes_de=None, tamanho_lote=TAMANHO_LOTE, simular=False, progresso=None):
+    """Arquiva os pedidos fechados anteriores ao corte; retorna quantos foram (ou seriam) movidos"""
+    antes_de = antes_de or corte_padrao()
+    if antes_de > corte_maximo():
+        raise ValueError(f"O corte não pode passar de {corte_maximo():%d/%m/%Y}: "
+                         f"a reposição usa as vendas dos últimos {max(PESOS_JANELAS)} dias")
+    dia_corte = data_para_dia(antes_de)
+    if not POR_ESCOLA:
+        return arquivar_banco(dia_corte, tamanho_lote, simular, progresso)
+
+    # Com partições, uma escola por vez, cada uma no próprio arquivo
+    total = 0
+    for escola in listar_escolas():
+        with na_escola(escola.id):
+            total += arquivar_banco(dia_corte, tamanho_lote, simular,
+                                    progresso and (lambda n, anteriores=total: progresso(anteriores + n)))
+    return total
+
+def arquivar_banco(dia_corte, tamanho_lote, simular, progresso):
+    """Arquiva os pedidos do banco em uso (da loja ou da partição da escola atual)"""
+    filtro = f"status IN ({', '.join('?' * len(STATUS_FECHADOS))}) AND data_pedido_dia < ?"
+    parametros = list(STATUS_FECHADOS) + [dia_corte]
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        if simular:
+            cur.execute(f"SELECT COUNT(*) FROM pedidos WHERE {filtro}", parametros)
+            return cur.fetchone()[0]
+
+        anexar_arquivo(conn, criar=True)
+        iniciar_escrita(conn)
+        preparar_arquivo(cur)
+        conn.commit()
+
+        total = 0
+        ultimo_id = 0
+        while True:
+            cur.execute(f"SELECT id FROM pedidos WHERE {filtro} AND id > ? ORDER BY id LIMIT ?",
+                        parametros + [ultimo_id, tamanho_lote])
+            ids = [linha[0] for linha in cur.fetchall()]
+            if not ids:
+                return total
+            total += arquivar_lote(conn, ids, dia_corte)
+            ultimo_id = ids[-1]
+            if progresso:
+                progresso(total)
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--antes-de', type=date.fromisoformat, help="Corte AAAA-MM-DD (padrão: 1º de janeiro deste ano)")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Pedidos por transação")
+    parser.add_argument('--simular', action='store_true', help="Só conta os pedidos que seriam arquivados")
+    args = parser.parse_args()
+
+    try:
+        total = arquivar_pedidos(args.antes_de, args.lote, args.simular,
+                                 lambda n: print(f"\r{n} pedidos arquivados", end='', file=sys.stderr, flush=True))
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print(file=sys.stderr)
+    destino = "no arquivo de cada escola" if POR_ESCOLA else f"em {roteador.banco().caminho_arquivo}"
+    if args.simular:
+        print(f"{total} pedidos seriam arquivados {destino}")
+    else:
+        print(f"{total} pedidos arquivados {destino}")
+
+if __name__ == '__main__':
+    main()
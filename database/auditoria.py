@@ -0,0 +1,193 @@
+"""Trilha de auditoria das alterações (estoque, status, cadastros e exclusões)
+
+As funções de escrita do banco chamam registrar() dentro da sua transação.
+A entrada só entra no buffer quando essa transação faz commit (um rollback
+a descarta) e o buffer é gravado em lote por uma thread do processo: ao
+juntar LIMITE_BUFFER entradas ou a cada INTERVALO_GRAVACAO segundos, e
+também na saída do processo. Quem altera o estoque ou o status não espera
+pela gravação do histórico. Se a gravação falhar, as entradas esperam a
+próxima rodada, até MAXIMO_PENDENTES; as mais antigas além disso vão para
+um arquivo _pendentes.jsonl ao lado do banco de auditoria.
+
+A tabela fica em um arquivo próprio: o lote de auditoria não disputa a
+trava de escrita da base principal nem invalida o cache do catálogo.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+LIMITE_BUFFER = 200        # Entradas que disparam a gravação antes do intervalo
+INTERVALO_GRAVACAO = 2     # Segundos máximos de uma entrada no buffer
+MAXIMO_PENDENTES = 50_000  # Entradas guardadas em memória enquanto a gravação falha
+
+# Quem está operando: o app define pelo login, a API pelo usuário autenticado
+usuario_atual = ContextVar('usuario_auditoria', default='Sistema')
+
+def definir_usuario(usuario):
+    usuario_atual.set(usuario or 'Sistema')
+
+def criar_tabela_auditoria(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS auditoria (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            momento_epoch INTEGER NOT NULL,
+            usuario TEXT,
+            acao TEXT NOT NULL,
+            entidade TEXT NOT NULL,
+            entidade_id INTEGER,
+            detalhes TEXT
+        )
+    ''')
+    # Consultas por período, por usuário e pelo histórico de um registro
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_momento ON auditoria(momento_epoch)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON auditoria(usuario, momento_epoch)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_entidade ON auditoria(entidade, entidade_id, momento_epoch)")
+    conn.commit()
+
+# =========================================
+# 📜 BUFFER DE AUDITORIA
+# =========================================
+
+class BufferAuditoria:
+    """Acumula as entradas em memória e grava em lote no arquivo de auditoria"""
+
+    def __init__(self, caminho_db, limite=LIMITE_BUFFER, intervalo=INTERVALO_GRAVACAO, maximo=MAXIMO_PENDENTES):
+        self.caminho_db = caminho_db
+        self.caminho_excedente = os.path.splitext(caminho_db)[0] + '_pendentes.jsonl'
+        self.limite = limite
+        self.intervalo = intervalo
+        self.maximo = maximo
+        self._entradas = []
+        self._lock = threading.Lock()
+        # Uma gravação por vez; também protege a conexão, usada só aqui dentro
+        self._gravacao_lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._conn = None
+        self.gravadas = 0
+
+    def registrar(self, acao, entidade, entidade_id=None, detalhes=None, conn=None, usuario=None):
+        """Enfileira uma entrada; com conn em transação, só depois do commit dela"""
+        # Os detalhes viram JSON só na gravação, fora do caminho de quem escreve
+        entrada = (int(time.time()), usuario or usuario_atual.get(), acao, entidade, entidade_id, detalhes)
+        apos_commit = getattr(conn, 'apos_commit', None)
+        if apos_commit is not None and conn.in_transaction:
+            apos_commit.append(functools.partial(self._enfileirar, entrada))
+        else:
+            self._enfileirar(entrada)
+
+    def _enfileirar(self, entrada):
+        with self._lock:
+            self._entradas.append(entrada)
+            cheio = len(self._entradas) >= self.limite
+            if self._thread is None:
+                self._iniciar_thread()
+        if cheio:
+            self._acordar.set()
+
+    def _iniciar_thread(self):
+        self._thread = threading.Thread(target=self._rodar, name='auditoria', daemon=True)
+        self._thread.start()
+        # A thread é daemon: o que sobrou no buffer é gravado na saída
+        atexit.register(self.gravar)
+
+    def _rodar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            self.gravar()
+
+    def _conexao(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.caminho_db, check_same_thread=False)
+            criar_tabela_auditoria(self._conn)
+        return self._conn
+
+    def gravar(self):
+        """Grava o buffer em uma transação; retorna quantas entradas foram gravadas"""
+        with self._gravacao_lock:
+            with self._lock:
+                entradas, self._entradas = self._entradas, []
+            if not entradas:
+                return 0
+            try:
+                conn = self._conexao()
+                conn.executemany('''
+                    INSERT INTO auditoria (momento_epoch, usuario, acao, entidade, entidade_id, detalhes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [self._linha(entrada) for entrada in entradas])
+                conn.commit()
+            except Exception as e:
+                # Volta para o buffer, na frente das novas, e tenta na próxima rodada
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+                with self._lock:
+                    self._entradas[:0] = entradas
+                    excedente = len(self._entradas) - self.maximo
+                    if excedente > 0:
+                        # Sem limite, uma falha longa do arquivo de auditoria esgotaria a memória
+                        antigas, self._entradas = self._entradas[:excedente], self._entradas[excedente:]
+                logger.error("Erro ao gravar auditoria: %s", e)
+                if excedente > 0:
+                    self._guardar_excedente(antigas)
+                return 0
+            self.gravadas += len(entradas)
+            return len(entradas)
+
+    @staticmethod
+    def _linha(entrada):
+        return entrada[:5] + (json.dumps(entrada[5], ensure_ascii=False, default=str)
+                              if entrada[5] is not None else None,)
+
+    def _guardar_excedente(self, entradas):
+        """Entradas mais antigas além do máximo, uma por linha em JSON com as colunas da tabela"""
+        colunas = ('momento_epoch', 'usuario', 'acao', 'entidade', 'entidade_id', 'detalhes')
+        try:
+            with open(self.caminho_excedente, 'a', encoding='utf-8') as arquivo:
+                for entrada in entradas:
+                    arquivo.write(json.dumps(dict(zip(colunas, entrada)), ensure_ascii=False, default=str) + '\n')
+            logger.error("Buffer de auditoria cheio: %d entradas antigas gravadas em %s",
+                         len(entradas), self.caminho_excedente)
+        except OSError as e:
+            logger.error("Buffer de auditoria cheio: %d entradas antigas descartadas (%s)", len(entradas), e)
+
+    def buscar(self, usuario=None, entidade=None, entidade_id=None, desde=None, ate=None, limite=100):
+        """Entradas mais recentes primeiro; desde/ate em epoch (segundos)"""
+        # O que ainda está no buffer também aparece
+        self.gravar()
+        filtros, parametros = [], []
+        for coluna, valor, operador in (('usuario', usuario, '='), ('entidade', entidade, '='),
+                                        ('entidade_id', entidade_id, '='),
+                                        ('momento_epoch', desde, '>='), ('momento_epoch', ate, '<')):
+            if valor is not None:
+                filtros.append(f"{coluna} {operador} ?")
+                parametros.append(valor)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+        with self._gravacao_lock:
+            cur = self._conexao().cursor()
+            cur.row_factory = sqlite3.Row
+            cur.execute(f'''
+                SELECT id, momento_epoch, usuario, acao, entidade, entidade_id, detalhes
+                FROM auditoria {where}
+                ORDER BY momento_epoch DESC, id DESC
+                LIMIT ?
+            ''', parametros + [limite])
+            return cur.fetchall()
+
+    def usuarios(self):
+        """Usuários que já aparecem na trilha, para os filtros da tela"""
+        self.gravar()
+        with self._gravacao_lock:
+            return [linha[0] for linha in self._conexao().execute(
+                "SELECT DISTINCT usuario FROM auditoria WHERE usuario IS NOT NULL ORDER BY usuario"
+            )]
@@ -0,0 +1,1956 @@
+import functools
+import hashlib
+import heapq
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import unicodedata
+from datetime import date, datetime, timezone
+
+# pandas (e database.relatorios, que depende dele) só é importado dentro das funções de
+# relatório: login, gravações, API e linhas de comando não pagam pela importação
+from database.lojas import (
+    roteador, AuditoriaDaLoja, loja_do_usuario, loja_vinculada, vincular_usuario, desvincular_usuario, na_loja,
+    em_todas_as_lojas, juntar_por_loja
+)
+from database.particoes import POR_ESCOLA, escola_atual, na_escola, escola_do_id, inicio_faixa, em_cada_escola
+from database.eventos import (
+    criar_tabela_eventos, publicar_evento, decodificar_cursor, codificar_cursor, ler_eventos_banco, juntar_eventos,
+    compactar_banco, ORIGEM_LOJA, DIAS_RETENCAO
+)
+from database.catalogo import criar_controle_catalogo
+from database.resumo_clientes import criar_resumo_clientes, recalcular_resumo_clientes
+from database.repositorio import Repositorio, Pedido
+from database.reposicao import criar_tabelas_reposicao, atualizar_reposicao, invalidar_reposicao_pedido
+
+logger = logging.getLogger(__name__)
+
+# Quem usa o módulo decide como mostrar erros de leitura: st.error na interface, log na API
+notificar_erro = logger.error
+
+def definir_notificador_erros(funcao):
+    global notificar_erro
+    notificar_erro = funcao
+
+# =========================================
+# 🔐 SISTEMA DE AUTENTICAÇÃO - SQLITE
+# =========================================
+
+def make_hashes(password):
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+def check_hashes(password, hashed_text):
+    return make_hashes(password) == hashed_text
+
+def normalizar_texto(texto):
+    """Remove acentos, espaços extras e diferenças de maiúsculas"""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+def normalizar_telefone(telefone):
+    """Mantém apenas os dígitos do telefone"""
+    return ''.join(c for c in str(telefone or '') if c.isdigit())
+
+# Pedidos nesses status reservam estoque; 'Entregue' já baixou o estoque
+STATUS_ABERTOS = ('Pendente', 'Em produção', 'Pronto para entrega')
+STATUS_PEDIDO = STATUS_ABERTOS + ('Entregue', 'Cancelado')
+FORMAS_PAGAMENTO = ('Dinheiro', 'Cartão', 'PIX', 'Transferência')
+PEDIDO_NAO_ENCONTRADO = "❌ Pedido não encontrado"
+PRODUTO_NAO_ENCONTRADO = "❌ Produto não encontrado"
+
+# Pool de conexões, cache e auditoria de cada loja ficam no roteador (ver database/lojas.py)
+auditoria = AuditoriaDaLoja()
+
+def get_connection():
+    """Empresta uma conexão do pool da loja atual (ou da partição da escola); close() devolve ao pool"""
+    try:
+        return roteador.banco().pool.obter()
+    except Exception as e:
+        notificar_erro(f"Erro de conexão com o banco: {str(e)}")
+        return None
+
+def iniciar_escrita(conn):
+    """Abre a transação já com a trava de escrita, como BEGIN IMMEDIATE.
+    
+    Nas partições, BEGIN IMMEDIATE travaria também o catálogo anexado e as
+    escolas voltariam a esperar umas pelas outras: a transação começa adiada
+    e uma escrita vazia pega a trava só da partição.
+    """
+    if 'catalogo' in getattr(conn, 'anexos', ()):
+        conn.execute("BEGIN")
+        conn.execute("UPDATE main.versao_relatorios SET versao = versao WHERE 0")
+    else:
+        conn.execute("BEGIN IMMEDIATE")
+
+# =========================================
+# 🏫 PARTIÇÕES POR ESCOLA
+# =========================================
+
+def em_todas_as_escolas(funcao, *args, **kwargs):
+    """Roda funcao na partição de cada escola, em paralelo; retorna {escola_id: resultado}"""
+    return em_cada_escola([escola.id for escola in listar_escolas()], funcao, *args, **kwargs)
+
+def na_particao(parametro, escola_de=None):
+    """Decorador: roda a função na partição da escola tirada do argumento indicado
+    (escola_id, ou o id de um produto/pedido com escola_de=escola_do_id)"""
+    def decorador(funcao):
+        posicao = list(inspect.signature(funcao).parameters).index(parametro)
+        
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not POR_ESCOLA:
+                return funcao(*args, **kwargs)
+            valor = args[posicao] if posicao < len(args) else kwargs[parametro]
+            with na_escola(escola_de(valor) if escola_de else valor):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def particao_existe(registro_id):
+    """Se o id de produto/pedido cai na faixa de uma escola com partição (sem partições, sempre)"""
+    return not POR_ESCOLA or roteador.recursos().particoes.existe(escola_do_id(registro_id))
+
+def por_escola(juntar):
+    """Decorador de leituras cujo primeiro argumento é escola_id.
+    
+    Com partições, a escola informada vai para a partição dela e None
+    (todas as escolas) roda em cada partição; juntar recebe
+    {escola_id: resultado} e monta o resultado único.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(escola_id=None, *args, **kwargs):
+            if not POR_ESCOLA:
+                return funcao(escola_id, *args, **kwargs)
+            if escola_id:
+                if not roteador.recursos().particoes.existe(escola_id):
+                    return juntar({})  # Escola sem partição: nada cadastrado
+                with na_escola(escola_id):
+                    return funcao(escola_id, *args, **kwargs)
+            return juntar(em_todas_as_escolas(funcao, None, *args, **kwargs))
+        return envolvida
+    return decorador
+
+def juntar_listas(resultados):
+    """Listas das partições em sequência, na ordem das escolas (por nome)"""
+    return [linha for linhas in resultados.values() for linha in linhas]
+
+def juntar_pedidos(resultados):
+    """Pedidos das partições intercalados, mais recentes primeiro (cada lista já vem assim)"""
+    return list(heapq.merge(*resultados.values(), key=lambda pedido: pedido.data_pedido_epoch or 0, reverse=True))
+
+def juntar_relatorios(ordem=None):
+    """Junta os DataFrames das partições, reordenando pela coluna ordem (decrescente)"""
+    def juntar(resultados):
+        import pandas as pd
+        partes = [df for df in resultados.values() if not df.empty]
+        if not partes:
+            return pd.DataFrame()
+        df = pd.concat(partes, ignore_index=True)
+        # Categorias diferentes em cada partição viram object no concat
+        for coluna in partes[0].select_dtypes('category').columns:
+            df[coluna] = df[coluna].astype('category')
+        return df.sort_values(ordem, ascending=False, kind='stable', ignore_index=True) if ordem else df
+    return juntar
+
+def agrupar_por_escola(itens, escola_de):
+    """{escola_id: [(posição, item)]} pela partição de cada item; sem partições, um grupo só"""
+    if not POR_ESCOLA:
+        return {None: list(enumerate(itens))}
+    grupos = {}
+    for posicao, item in enumerate(itens):
+        grupos.setdefault(escola_de(item), []).append((posicao, item))
+    return grupos
+
+def em_lotes_por_escola(itens, escola_de, funcao):
+    """Roda funcao(lote) na partição de cada escola; os resultados voltam na ordem dos itens"""
+    resultados = [None] * len(itens)
+    for escola_id, grupo in agrupar_por_escola(itens, escola_de).items():
+        with na_escola(escola_id):
+            for (posicao, _), resultado in zip(grupo, funcao([item for _, item in grupo])):
+                resultados[posicao] = resultado
+    return resultados
+
+def init_db():
+    """Inicializa o banco SQLite"""
+    conn = get_connection()
+    if conn:
+        try:
+            cur = conn.cursor()
+            
+            # WAL: leitores de outros processos não bloqueiam a escrita
+            cur.execute("PRAGMA journal_mode=WAL")
+            
+            # Tabela de usuários
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS usuarios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    nome_completo TEXT,
+                    tipo TEXT DEFAULT 'vendedor',
+                    ativo BOOLEAN DEFAULT 1,
+                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Tabela de escolas
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS escolas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT UNIQUE NOT NULL
+                )
+            ''')
+            
+            # Tabela de clientes
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS clientes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    telefone TEXT,
+                    email TEXT,
+                    data_cadastro DATE DEFAULT CURRENT_DATE
+                )
+            ''')
+            
+            criar_tabelas_pedidos(cur)
+            migrar_busca_clientes(cur)
+            
+            # Inserir usuários padrão
+            usuarios_padrao = [
+                ('admin', make_hashes('Admin@2024!'), 'Administrador', 'admin'),
+                ('vendedor', make_hashes('Vendas@123'), 'Vendedor', 'vendedor')
+            ]
+            
+            for username, password_hash, nome, tipo in usuarios_padrao:
+                try:
+                    cur.execute('''
+                        INSERT OR IGNORE INTO usuarios (username, password_hash, nome_completo, tipo) 
+                        VALUES (?, ?, ?, ?)
+                    ''', (username, password_hash, nome, tipo))
+                except Exception as e:
+                    pass
+            
+            # Inserir escolas padrão
+            escolas_padrao = ['Municipal', 'Desperta', 'São Tadeu']
+            for escola in escolas_padrao:
+                try:
+                    cur.execute('INSERT OR IGNORE INTO escolas (nome) VALUES (?)', (escola,))
+                except Exception as e:
+                    pass
+            
+            conn.commit()
+            
+        except Exception as e:
+            notificar_erro(f"Erro ao inicializar banco: {str(e)}")
+        finally:
+            conn.close()
+    
+    if POR_ESCOLA:
+        for escola in listar_escolas():
+            init_particao(escola.id)
+
+def criar_tabelas_pedidos(cur, particao=False):
+    """Produtos, pedidos e itens com as suas migrações, no banco da loja ou na partição de uma escola"""
+    # Tabela de produtos
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            categoria TEXT,
+            tamanho TEXT,
+            cor TEXT,
+            preco REAL,
+            estoque INTEGER DEFAULT 0,
+            descricao TEXT,
+            escola_id INTEGER REFERENCES escolas(id),
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(nome, tamanho, cor, escola_id)  -- EVITA PRODUTOS DUPLICADOS
+        )
+    ''')
+    
+    # Tabela de pedidos
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER REFERENCES clientes(id),
+            escola_id INTEGER REFERENCES escolas(id),
+            status TEXT DEFAULT 'Pendente',
+            data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_entrega_prevista DATE,
+            data_entrega_real DATE,
+            forma_pagamento TEXT DEFAULT 'Dinheiro',
+            quantidade_total INTEGER,
+            valor_total REAL,
+            observacoes TEXT
+        )
+    ''')
+    
+    # Tabela de itens do pedido
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS pedido_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER REFERENCES pedidos(id) ON DELETE CASCADE,
+            produto_id INTEGER REFERENCES produtos(id),
+            quantidade INTEGER,
+            preco_unitario REAL,
+            subtotal REAL
+        )
+    ''')
+    
+    # Índices de apoio para junções com os itens
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedido_itens_pedido ON pedido_itens(pedido_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedido_itens_produto ON pedido_itens(produto_id)")
+    
+    migrar_datas_pedidos(cur)
+    migrar_reservas_estoque(cur)
+    criar_tabelas_reposicao(cur)
+    criar_controle_catalogo(cur, particao)
+    # Escolas ficam no catálogo: a partição não tem gatilho para elas
+    migrar_versao_relatorios(cur, {tabela: colunas for tabela, colunas in COLUNAS_RELATORIOS.items()
+                                   if not particao or tabela != 'escolas'})
+    criar_controle_arquivamento(cur)
+    criar_tabela_sincronizacao(cur)
+    criar_tabela_eventos(cur)
+    migrar_resumo_clientes(cur)
+
+def init_particao(escola_id):
+    """Cria as tabelas da partição da escola, com os ids começando na faixa dela"""
+    roteador.recursos().particoes.obter(escola_id, criar=True)
+    with na_escola(escola_id):
+        conn = get_connection()
+        if not conn:
+            return
+        
+        try:
+            cur = conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            criar_tabelas_pedidos(cur, particao=True)
+            cur.executemany('''
+                INSERT INTO main.sqlite_sequence (name, seq)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = ?)
+            ''', [(tabela, inicio_faixa(escola_id), tabela) for tabela in ('produtos', 'pedidos', 'pedido_itens')])
+            conn.commit()
+        except Exception as e:
+            notificar_erro(f"Erro ao inicializar partição da escola {escola_id}: {str(e)}")
+        finally:
+            conn.close()
+
+def init_lojas():
+    """Inicializa o banco de cada loja (uma só, sem cadastro de lojas)"""
+    em_todas_as_lojas(init_db)
+
+def aquecer():
+    """Prepara o processo antes do primeiro usuário: tabelas, conexões do pool e catálogo em memória de cada loja"""
+    init_lojas()
+    em_todas_as_lojas(_aquecer_loja)
+
+def _aquecer_loja():
+    roteador.banco().pool.preencher()
+    if POR_ESCOLA:
+        em_todas_as_escolas(lambda: roteador.banco().pool.preencher())
+    # Monta o catálogo em memória do banco da loja e o de cada partição
+    listar_produtos_por_escola()
+
+def migrar_busca_clientes(cur):
+    """Adiciona colunas normalizadas e índices para a busca de clientes"""
+    cur.execute("PRAGMA table_info(clientes)")
+    colunas = {coluna[1] for coluna in cur.fetchall()}
+    
+    if 'nome_normalizado' not in colunas:
+        cur.execute("ALTER TABLE clientes ADD COLUMN nome_normalizado TEXT")
+    if 'telefone_normalizado' not in colunas:
+        cur.execute("ALTER TABLE clientes ADD COLUMN telefone_normalizado TEXT")
+    
+    # Preenche clientes cadastrados antes da migração
+    cur.execute("SELECT id, nome, telefone FROM clientes WHERE nome_normalizado IS NULL")
+    pendentes = cur.fetchall()
+    if pendentes:
+        cur.executemany(
+            "UPDATE clientes SET nome_normalizado = ?, telefone_normalizado = ? WHERE id = ?",
+            [(normalizar_texto(nome), normalizar_telefone(telefone), cliente_id)
+             for cliente_id, nome, telefone in pendentes]
+        )
+    
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome_normalizado ON clientes(nome_normalizado)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_clientes_telefone_normalizado ON clientes(telefone_normalizado)")
+
+def migrar_datas_pedidos(cur):
+    """Adiciona colunas numéricas e indexadas para a data dos pedidos"""
+    cur.execute("PRAGMA table_info(pedidos)")
+    colunas = {coluna[1] for coluna in cur.fetchall()}
+    
+    # data_pedido_epoch: segundos UTC | data_pedido_dia: AAAAMMDD no horário local
+    if 'data_pedido_epoch' not in colunas:
+        cur.execute("ALTER TABLE pedidos ADD COLUMN data_pedido_epoch INTEGER")
+    if 'data_pedido_dia' not in colunas:
+        cur.execute("ALTER TABLE pedidos ADD COLUMN data_pedido_dia INTEGER")
+    
+    # Pedidos antigos usam o padrão CURRENT_TIMESTAMP da tabela, que é UTC
+    cur.execute('''
+        UPDATE pedidos SET
+            data_pedido_epoch = CAST(strftime('%s', data_pedido) AS INTEGER),
+            data_pedido_dia = CAST(strftime('%Y%m%d', data_pedido, 'localtime') AS INTEGER)
+        WHERE data_pedido_epoch IS NULL
+    ''')
+    
+    # Mantém as colunas preenchidas para inserções que não as informam
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_pedidos_datas
+        AFTER INSERT ON pedidos
+        WHEN NEW.data_pedido_epoch IS NULL
+        BEGIN
+            UPDATE pedidos SET
+                data_pedido_epoch = CAST(strftime('%s', NEW.data_pedido) AS INTEGER),
+                data_pedido_dia = CAST(strftime('%Y%m%d', NEW.data_pedido, 'localtime') AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    ''')
+    
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_data_dia ON pedidos(data_pedido_dia)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_escola_dia ON pedidos(escola_id, data_pedido_dia)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_data_epoch ON pedidos(data_pedido_epoch)")
+    # Páginas da tela de pedidos por status, já na ordem de exibição
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_status_data ON pedidos(status, data_pedido_epoch)")
+
+def migrar_reservas_estoque(cur):
+    """Adiciona a coluna de estoque reservado por pedidos em aberto"""
+    cur.execute("PRAGMA table_info(produtos)")
+    colunas = {coluna[1] for coluna in cur.fetchall()}
+    
+    if 'reservado' not in colunas:
+        cur.execute("ALTER TABLE produtos ADD COLUMN reservado INTEGER DEFAULT 0")
+        # Reservas dos pedidos que já estavam em aberto antes da migração
+        cur.execute(f'''
+            UPDATE produtos SET reservado = COALESCE((
+                SELECT SUM(pi.quantidade)
+                FROM pedido_itens pi
+                JOIN pedidos p ON p.id = pi.pedido_id
+                WHERE pi.produto_id = produtos.id
+                  AND p.status IN ({', '.join('?' * len(STATUS_ABERTOS))})
+            ), 0)
+        ''', STATUS_ABERTOS)
+    
+    # Pedidos em aberto por status e escola (lista de separação)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_status_escola ON pedidos(status, escola_id)")
+
+# Colunas que mudam o resultado dos relatórios, por tabela
+COLUNAS_RELATORIOS = {
+    'pedidos': 'status, valor_total, quantidade_total, escola_id, data_pedido_dia',
+    'pedido_itens': 'produto_id, quantidade, subtotal',
+    'produtos': 'nome, categoria, tamanho, cor, escola_id',
+    'escolas': 'nome',
+}
+
+def migrar_versao_relatorios(cur, colunas_relatorios=COLUNAS_RELATORIOS):
+    """Contador mantido por gatilhos: muda a cada alteração que afeta os relatórios"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS versao_relatorios (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute("INSERT OR IGNORE INTO versao_relatorios (id, versao) VALUES (1, 0)")
+    
+    for tabela, colunas in colunas_relatorios.items():
+        for evento in ('INSERT', 'DELETE', f'UPDATE OF {colunas}'):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_versao_relatorios_{tabela}_{evento.split()[0].lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    UPDATE versao_relatorios SET versao = versao + 1 WHERE id = 1;
+                END
+            ''')
+
+def migrar_resumo_clientes(cur):
+    """Resumo de compras por cliente; ao ser criado, preenchido com os pedidos já gravados, inclusive os arquivados"""
+    if criar_resumo_clientes(cur):
+        # ATTACH do arquivo não pode ocorrer dentro da transação das migrações
+        cur.connection.commit()
+        recalcular_resumo_clientes(cur, *tabelas_pedidos(cur.connection))
+
+def criar_controle_arquivamento(cur):
+    """Guarda o dia mais recente já movido para o arquivo (NULL: nada arquivado)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS arquivamento_controle (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            dia_limite INTEGER
+        )
+    ''')
+    cur.execute("INSERT OR IGNORE INTO arquivamento_controle (id, dia_limite) VALUES (1, NULL)")
+
+def criar_tabela_sincronizacao(cur):
+    """Operações do caixa offline já aplicadas, pelo uuid gerado no aparelho (reenvio não duplica)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sync_recebidos (
+            uuid TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            resultado TEXT NOT NULL,
+            recebido_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+def anexar_arquivo(conn, criar=False):
+    """Anexa o banco de arquivo como 'arquivo' (uma vez por conexão do pool)"""
+    if getattr(conn, 'arquivo_anexado', False):
+        return True
+    caminho_arquivo = roteador.banco().caminho_arquivo
+    if not criar and not os.path.exists(caminho_arquivo):
+        return False
+    conn.execute("ATTACH DATABASE ? AS arquivo", (caminho_arquivo,))
+    conn.arquivo_anexado = True
+    return True
+
+def colunas_tabela(cur, tabela, banco='main'):
+    cur.execute(f"PRAGMA {banco}.table_info({tabela})")
+    return [coluna[1] for coluna in cur.fetchall()]
+
+def tabelas_pedidos(conn, dia_inicio=0):
+    """Origem de pedidos e itens para consultas de leitura.
+    
+    Só a base quente, a menos que o período comece em um dia já arquivado:
+    aí cada tabela vira a união da base quente com o arquivo. Cópias no
+    arquivo de pedidos que ainda estão na base quente são ignoradas.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT dia_limite FROM arquivamento_controle WHERE id = 1")
+    dia_limite = cur.fetchone()[0]
+    if dia_limite is None or dia_inicio > dia_limite or not anexar_arquivo(conn):
+        return 'pedidos', 'pedido_itens'
+    
+    origens = []
+    for tabela, chave in (('pedidos', 'id'), ('pedido_itens', 'pedido_id')):
+        colunas = colunas_tabela(cur, tabela)
+        # Colunas criadas depois do último arquivamento ficam nulas nos pedidos arquivados
+        no_arquivo = set(colunas_tabela(cur, tabela, 'arquivo'))
+        colunas_arquivo = [c if c in no_arquivo else f"NULL AS {c}" for c in colunas]
+        origens.append(f'''(
+            SELECT {', '.join(colunas)} FROM main.{tabela}
+            UNION ALL
+            SELECT {', '.join(colunas_arquivo)} FROM arquivo.{tabela} a
+            WHERE NOT EXISTS (SELECT 1 FROM main.pedidos h WHERE h.id = a.{chave})
+        )''')
+    return tuple(origens)
+
+def versao_relatorios():
+    """Versão dos dados dos relatórios; com partições, a soma das versões do catálogo e de cada escola"""
+    if POR_ESCOLA:
+        versoes = [_versao_relatorios()] + list(em_todas_as_escolas(_versao_relatorios).values())
+        return None if None in versoes else sum(versoes)
+    return _versao_relatorios()
+
+def _versao_relatorios():
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT versao FROM versao_relatorios WHERE id = 1")
+        return cur.fetchone()[0]
+    except Exception as e:
+        notificar_erro(f"Erro ao ler versão dos relatórios: {e}")
+        return None
+    finally:
+        conn.close()
+
+def verificar_login(username, password):
+    """Verifica credenciais no banco da loja do usuário"""
+    try:
+        loja = loja_do_usuario(username)
+    except LookupError as e:
+        return False, str(e), None
+    
+    with na_loja(loja):
+        return _verificar_login_na_loja(username, password)
+
+def _verificar_login_na_loja(username, password):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão", None
+    
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT password_hash, nome_completo, tipo 
+            FROM usuarios 
+            WHERE username = ? AND ativo = 1
+        ''', (username,))
+        
+        resultado = cur.fetchone()
+        
+        if resultado and check_hashes(password, resultado[0]):
+            return True, resultado[1], resultado[2]  # sucesso, nome, tipo
+        else:
+            return False, "Credenciais inválidas", None
+            
+    except Exception as e:
+        return False, f"Erro: {str(e)}", None
+    finally:
+        conn.close()
+
+def alterar_senha(username, senha_atual, nova_senha):
+    """Altera a senha do usuário"""
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        
+        # Verificar senha atual
+        cur.execute('SELECT password_hash FROM usuarios WHERE username = ?', (username,))
+        resultado = cur.fetchone()
+        
+        if not resultado or not check_hashes(senha_atual, resultado[0]):
+            return False, "Senha atual incorreta"
+        
+        # Atualizar senha
+        nova_senha_hash = make_hashes(nova_senha)
+        cur.execute(
+            'UPDATE usuarios SET password_hash = ? WHERE username = ?',
+            (nova_senha_hash, username)
+        )
+        auditoria.registrar('senha', 'usuario', detalhes={'username': username}, conn=conn)
+        conn.commit()
+        return True, "Senha alterada com sucesso!"
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        conn.close()
+
+def listar_usuarios():
+    """Lista todos os usuários (apenas para admin)"""
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT id, username, nome_completo, tipo, ativo, data_criacao 
+            FROM usuarios 
+            ORDER BY username
+        ''')
+        return cur.fetchall()
+    except Exception as e:
+        notificar_erro(f"Erro ao listar usuários: {e}")
+        return []
+    finally:
+        conn.close()
+
+def criar_usuario(username, password, nome_completo, tipo):
+    """Cria novo usuário (apenas para admin)"""
+    # O vínculo com a loja vem antes: username de outra loja não chega a ser criado aqui
+    loja = roteador.loja().codigo
+    vinculado_antes = loja_vinculada(username) == loja
+    sucesso, mensagem = vincular_usuario(username, loja)
+    if not sucesso:
+        return False, mensagem
+    
+    conn = get_connection()
+    if not conn:
+        if not vinculado_antes:
+            desvincular_usuario(username, loja)
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        password_hash = make_hashes(password)
+        
+        cur.execute('''
+            INSERT INTO usuarios (username, password_hash, nome_completo, tipo)
+            VALUES (?, ?, ?, ?)
+        ''', (username, password_hash, nome_completo, tipo))
+        auditoria.registrar('criar', 'usuario', cur.lastrowid, {'username': username, 'tipo': tipo}, conn=conn)
+        
+        conn.commit()
+        return True, "Usuário criado com sucesso!"
+        
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        mensagem = "Username já existe"
+    except Exception as e:
+        conn.rollback()
+        mensagem = f"Erro: {str(e)}"
+    finally:
+        conn.close()
+    # Não criado: o vínculo feito agora não pode mandar o login desse username para esta loja
+    if not vinculado_antes:
+        desvincular_usuario(username, loja)
+    return False, mensagem
+
+
+# =========================================
+# 🔧 FUNÇÕES DO BANCO DE DADOS - SQLITE
+# =========================================
+
+def data_para_dia(data):
+    """Converte date/datetime para a chave inteira AAAAMMDD"""
+    return data.year * 10000 + data.month * 100 + data.day
+
+def dia_para_data(dia):
+    """Converte a chave inteira AAAAMMDD para date"""
+    dia = int(dia)
+    return date(dia // 10000, dia // 100 % 100, dia % 100)
+
+def formatar_dia_brasil(dia):
+    """Converte a chave inteira AAAAMMDD para DD/MM/AAAA"""
+    if not dia:
+        return ""
+    dia = int(dia)
+    return f"{dia % 100:02d}/{dia // 100 % 100:02d}/{dia // 10000:04d}"
+
+# Escolas e produtos vêm do catálogo em memória do banco em uso (ver database/catalogo.py)
+def catalogo_em_memoria():
+    """Índices do catálogo em dia com o último commit, ou None se não foi possível ler"""
+    try:
+        return roteador.banco().catalogo.atualizado(get_connection)
+    except Exception as e:
+        notificar_erro(f"Erro ao carregar catálogo: {e}")
+        return None
+
+# FUNÇÕES PARA ESCOLAS
+def listar_escolas():
+    # Escolas ficam no banco da loja, mesmo dentro de uma partição
+    with na_escola(None):
+        catalogo = catalogo_em_memoria()
+    return catalogo.escolas if catalogo else []
+
+def obter_escola_por_id(escola_id):
+    with na_escola(None):
+        catalogo = catalogo_em_memoria()
+    return catalogo.escolas_por_id.get(escola_id) if catalogo else None
+
+# FUNÇÕES PARA CLIENTES
+def adicionar_cliente(nome, telefone, email):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        data_cadastro = datetime.now().strftime("%Y-%m-%d")
+        
+        cliente_id = Repositorio(conn).executar('clientes.inserir', (
+            nome, telefone, email, data_cadastro, normalizar_texto(nome), normalizar_telefone(telefone)
+        )).lastrowid
+        auditoria.registrar('criar', 'cliente', cliente_id, {'nome': nome, 'telefone': telefone}, conn=conn)
+        publicar_evento(conn, 'cliente', 'criado', cliente_id, {'nome': nome, 'telefone': telefone, 'email': email})
+        
+        conn.commit()
+        return True, "Cliente cadastrado com sucesso!"
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        conn.close()
+
+def listar_clientes():
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        return Repositorio(conn).todos('clientes.listar')
+    except Exception as e:
+        notificar_erro(f"Erro ao listar clientes: {e}")
+        return []
+    finally:
+        conn.close()
+
+def contar_clientes():
+    conn = get_connection()
+    if not conn:
+        return 0
+    
+    try:
+        return Repositorio(conn).valor('clientes.contar')
+    except Exception as e:
+        notificar_erro(f"Erro ao contar clientes: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def cliente_existe(cliente_id):
+    """Se o cliente está cadastrado (com partições, no banco da loja)"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    try:
+        return Repositorio(conn).valor('clientes.existe', (cliente_id,)) is not None
+    except Exception as e:
+        notificar_erro(f"Erro ao buscar cliente: {e}")
+        return False
+    finally:
+        conn.close()
+
+def buscar_clientes(termo="", limite=20):
+    """Busca clientes por prefixo do nome ou do telefone usando os índices normalizados"""
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        cur = conn.cursor()
+        prefixo_nome = normalizar_texto(termo)
+        prefixo_telefone = normalizar_telefone(termo)
+        
+        # Intervalo [prefixo, prefixo + maior caractere) permite busca pelo índice
+        consultas = ['''
+            SELECT id, nome, telefone, nome_normalizado FROM clientes
+            WHERE nome_normalizado >= ? AND nome_normalizado < ?
+            ORDER BY nome_normalizado LIMIT ?
+        ''']
+        parametros = [prefixo_nome, prefixo_nome + '\U0010ffff', limite]
+        
+        if len(prefixo_telefone) >= 2:
+            consultas.append('''
+                SELECT id, nome, telefone, nome_normalizado FROM clientes
+                WHERE telefone_normalizado >= ? AND telefone_normalizado < ?
+                ORDER BY telefone_normalizado LIMIT ?
+            ''')
+            parametros += [prefixo_telefone, prefixo_telefone + '\U0010ffff', limite]
+        
+        cur.execute(f'''
+            SELECT id, nome, telefone FROM (
+                {' UNION '.join(f'SELECT * FROM ({consulta})' for consulta in consultas)}
+            )
+            ORDER BY nome_normalizado LIMIT ?
+        ''', parametros + [limite])
+        return cur.fetchall()
+    except Exception as e:
+        notificar_erro(f"Erro ao buscar clientes: {e}")
+        return []
+    finally:
+        conn.close()
+
+def contar_pedidos_cliente(conn, cliente_id):
+    """Pedidos do cliente na base quente e no arquivo da conexão: (pedidos, arquivados)"""
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM pedidos WHERE cliente_id = ?", (cliente_id,))
+    pedidos = cur.fetchone()[0]
+    arquivados = 0
+    # Pedidos arquivados também apontam para o cliente
+    if getattr(conn, 'arquivo_anexado', False):
+        cur.execute("SELECT COUNT(*) FROM arquivo.pedidos WHERE cliente_id = ?", (cliente_id,))
+        arquivados = cur.fetchone()[0]
+    return pedidos, arquivados
+
+def travar_particoes():
+    """Conexões de todas as partições, com o arquivo anexado e a trava de escrita já pega,
+    na ordem das escolas; quem chama devolve com rollback() e close()"""
+    conexoes = []
+    try:
+        for escola in listar_escolas():
+            if not roteador.recursos().particoes.existe(escola.id):
+                continue
+            with na_escola(escola.id):
+                conn = get_connection()
+                if not conn:
+                    raise ConnectionError("Erro de conexão")
+                conexoes.append(conn)
+                anexar_arquivo(conn)  # ATTACH não pode ocorrer dentro da transação
+                iniciar_escrita(conn)
+        return conexoes
+    except Exception:
+        for conn in conexoes:
+            conn.rollback()
+            conn.close()
+        raise
+
+def excluir_cliente(cliente_id):
+    """Exclui o cliente se ele não tiver pedidos, nem arquivados.
+    
+    Contagem e DELETE ficam sob a mesma trava de escrita: um pedido gravado ao
+    mesmo tempo entra antes e impede a exclusão, ou espera e não acha mais o
+    cliente. Com partições, as travas das escolas vêm antes da do catálogo e
+    só são soltas depois do commit.
+    """
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    particoes = []
+    try:
+        if POR_ESCOLA:
+            particoes = travar_particoes()
+        else:
+            anexar_arquivo(conn)
+        cur = conn.cursor()
+        iniciar_escrita(conn)
+        
+        contagens = [contar_pedidos_cliente(conexao, cliente_id) for conexao in particoes or [conn]]
+        pedidos, arquivados = (sum(contagem) for contagem in zip((0, 0), *contagens))
+        if pedidos > 0:
+            conn.rollback()
+            return False, "Cliente possui pedidos e não pode ser excluído"
+        if arquivados > 0:
+            conn.rollback()
+            return False, "Cliente possui pedidos arquivados e não pode ser excluído"
+        
+        cur.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
+        if cur.rowcount:
+            auditoria.registrar('excluir', 'cliente', cliente_id, conn=conn)
+            publicar_evento(conn, 'cliente', 'excluido', cliente_id)
+        conn.commit()
+        return True, "Cliente excluído com sucesso"
+        
+    except ConnectionError:
+        conn.rollback()
+        return False, "Erro de conexão"
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        for particao in particoes:
+            particao.rollback()
+            particao.close()
+        conn.close()
+
+# HISTÓRICO DE COMPRAS: totais do resumo mantido por gatilhos (database/resumo_clientes.py),
+# pedidos pelo índice (cliente_id, data_pedido_epoch)
+def historico_cliente(cliente_id):
+    """Pedidos, valor gasto, última compra e tamanhos preferidos do cliente, no total e por escola"""
+    escolas = (juntar_listas(em_todas_as_escolas(_historico_cliente, cliente_id)) if POR_ESCOLA
+               else _historico_cliente(cliente_id))
+    ultimas = [escola for escola in escolas if escola['ultima_compra_epoch']]
+    ultima = max(ultimas, key=lambda escola: escola['ultima_compra_epoch'], default=None)
+    return {
+        'pedidos': sum(escola['pedidos'] for escola in escolas),
+        'cancelados': sum(escola['cancelados'] for escola in escolas),
+        'valor_total': sum(escola['valor_total'] for escola in escolas),
+        'ultima_compra_dia': ultima['ultima_compra_dia'] if ultima else None,
+        'escolas': sorted(escolas, key=lambda escola: escola['valor_total'], reverse=True),
+    }
+
+def _historico_cliente(cliente_id):
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT escola_id, pedidos, cancelados, valor_total FROM resumo_clientes WHERE cliente_id = ?
+        ''', (cliente_id,))
+        resumo = cur.fetchall()
+        if not resumo:
+            return []
+
+        # Tamanhos de cada categoria, do mais comprado para o menos
+        cur.execute('''
+            SELECT escola_id, categoria, tamanho, quantidade FROM resumo_clientes_tamanhos
+            WHERE cliente_id = ? ORDER BY escola_id, categoria, quantidade DESC, tamanho
+        ''', (cliente_id,))
+        tamanhos = {}
+        for escola_id, categoria, tamanho, quantidade in cur.fetchall():
+            tamanhos.setdefault(escola_id, {}).setdefault(categoria, []).append((tamanho, quantidade))
+
+        # Com MAX, o SQLite devolve o data_pedido_dia da mesma linha; percorre só os pedidos do cliente no índice
+        pedidos, _ = tabelas_pedidos(conn)
+        cur.execute(f'''
+            SELECT escola_id, MAX(data_pedido_epoch), data_pedido_dia FROM {pedidos} p
+            WHERE cliente_id = ? AND status IS NOT 'Cancelado'
+            GROUP BY escola_id
+        ''', (cliente_id,))
+        ultimas = {escola_id: (epoch, dia) for escola_id, epoch, dia in cur.fetchall()}
+
+        historico = []
+        for escola_id, total_pedidos, cancelados, valor_total in resumo:
+            escola = obter_escola_por_id(escola_id)
+            epoch, dia = ultimas.get(escola_id, (None, None))
+            historico.append({
+                'escola_id': escola_id, 'escola_nome': escola.nome if escola else f"Escola {escola_id}",
+                'pedidos': total_pedidos, 'cancelados': cancelados, 'valor_total': round(valor_total, 2),
+                'ultima_compra_epoch': epoch, 'ultima_compra_dia': dia,
+                'tamanhos': tamanhos.get(escola_id, {}),
+            })
+        return historico
+    except Exception as e:
+        notificar_erro(f"Erro ao carregar histórico do cliente: {e}")
+        return []
+    finally:
+        conn.close()
+
+def listar_pedidos_cliente(cliente_id, limite=50, inicio=0, escola_ids=None):
+    """Pedidos do cliente (inclusive arquivados), mais recentes primeiro, a partir da posição inicio.
+    escola_ids: escolas com pedidos do cliente (do histórico); com partições, só elas são consultadas"""
+    if not POR_ESCOLA:
+        return _listar_pedidos_cliente(cliente_id, limite, inicio)
+    if escola_ids is None:
+        escola_ids = [escola.id for escola in listar_escolas()]
+    # Cada partição devolve os seus primeiros inicio + limite; a página sai da intercalação
+    partes = em_cada_escola(escola_ids, _listar_pedidos_cliente, cliente_id, inicio + limite, 0)
+    return juntar_pedidos(partes)[inicio:inicio + limite]
+
+def _listar_pedidos_cliente(cliente_id, limite, inicio):
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        pedidos, _ = tabelas_pedidos(conn)
+        cur = conn.cursor()
+        # Tuplas cruas direto para o registro, como no Repositorio
+        cur.row_factory = None
+        cur.execute(f'''
+            SELECT p.id, p.cliente_id, p.escola_id, p.status, p.data_pedido, p.data_entrega_prevista,
+                   p.data_entrega_real, p.forma_pagamento, p.quantidade_total, p.valor_total, p.observacoes,
+                   p.data_pedido_epoch, p.data_pedido_dia,
+                   c.nome as cliente_nome, e.nome as escola_nome
+            FROM {pedidos} p
+            JOIN clientes c ON p.cliente_id = c.id
+            JOIN escolas e ON p.escola_id = e.id
+            WHERE p.cliente_id = ?
+            ORDER BY p.data_pedido_epoch DESC, p.id DESC
+            LIMIT ? OFFSET ?
+        ''', (cliente_id, limite, inicio))
+        return list(map(Pedido._make, cur.fetchall()))
+    except Exception as e:
+        notificar_erro(f"Erro ao listar pedidos do cliente: {e}")
+        return []
+    finally:
+        conn.close()
+
+# FUNÇÕES PARA PRODUTOS
+@na_particao('escola_id')
+def verificar_produto_duplicado(nome, tamanho, cor, escola_id):
+    """Verifica se já existe um produto com as mesmas características"""
+    conn = get_connection()
+    if not conn:
+        return True  # Se não conseguiu conectar, assume que existe para evitar duplicação
+    
+    try:
+        return Repositorio(conn).valor('produtos.duplicado', (nome, tamanho, cor, escola_id)) > 0
+        
+    except Exception as e:
+        notificar_erro(f"Erro ao verificar produto duplicado: {e}")
+        return True
+    finally:
+        conn.close()
+
+@na_particao('escola_id')
+def adicionar_produto(nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        # Verificar se produto já existe
+        if verificar_produto_duplicado(nome, tamanho, cor, escola_id):
+            return False, "❌ Já existe um produto com este nome, tamanho e cor para esta escola!"
+        
+        produto_id = Repositorio(conn).executar(
+            'produtos.inserir', (nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id)
+        ).lastrowid
+        auditoria.registrar('criar', 'produto', produto_id, {
+            'nome': nome, 'tamanho': tamanho, 'cor': cor, 'escola_id': escola_id, 'estoque': estoque
+        }, conn=conn)
+        publicar_evento(conn, 'produto', 'criado', produto_id, {
+            'nome': nome, 'categoria': categoria, 'tamanho': tamanho, 'cor': cor, 'preco': preco,
+            'estoque': estoque, 'escola_id': escola_id
+        })
+        
+        conn.commit()
+        return True, "✅ Produto cadastrado com sucesso!"
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return False, "❌ Erro: Produto duplicado para esta escola!"
+    except Exception as e:
+        conn.rollback()
+        return False, f"❌ Erro: {str(e)}"
+    finally:
+        conn.close()
+
+@por_escola(juntar_listas)
+def listar_produtos_por_escola(escola_id=None):
+    catalogo = catalogo_em_memoria()
+    if not catalogo:
+        return []
+    if escola_id:
+        return catalogo.por_escola.get(escola_id, [])
+    return catalogo.todos
+
+@por_escola(juntar_listas)
+def buscar_produtos(escola_id=None, categoria=None, tamanho=None):
+    """Produtos da escola (ou de todas) filtrados por categoria e tamanho pelos índices do catálogo"""
+    catalogo = catalogo_em_memoria()
+    return catalogo.buscar(escola_id or None, categoria, tamanho) if catalogo else []
+
+@na_particao('produto_id', escola_do_id)
+def atualizar_estoque(produto_id, nova_quantidade):
+    if nova_quantidade < 0:
+        return False, "Estoque não pode ser negativo"
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        if not Repositorio(conn).executar('produtos.atualizar_estoque', (nova_quantidade, produto_id)).rowcount:
+            conn.rollback()
+            return False, PRODUTO_NAO_ENCONTRADO
+        auditoria.registrar('estoque', 'produto', produto_id, {'estoque': nova_quantidade}, conn=conn)
+        publicar_evento(conn, 'produto', 'estoque', produto_id, {'estoque': nova_quantidade})
+        conn.commit()
+        return True, "Estoque atualizado com sucesso!"
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        conn.close()
+
+def atualizar_estoques_lote(ajustes):
+    """Grava vários pares (produto_id, nova_quantidade) em uma só transação (uma por partição de escola)"""
+    if any(nova_quantidade < 0 for _, nova_quantidade in ajustes):
+        return False, "Estoque não pode ser negativo"
+    atualizados = 0
+    for escola_id, grupo in agrupar_por_escola(ajustes, lambda ajuste: escola_do_id(ajuste[0])).items():
+        with na_escola(escola_id):
+            sucesso, resultado = gravar_estoques([ajuste for _, ajuste in grupo])
+        if not sucesso:
+            return False, resultado
+        atualizados += resultado
+    return True, f"Estoque de {atualizados} produto(s) atualizado com sucesso!"
+
+def gravar_estoques(ajustes):
+    """(True, produtos atualizados) ou (False, mensagem de erro)"""
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = Repositorio(conn).executar_varios(
+            'produtos.atualizar_estoque',
+            [(nova_quantidade, produto_id) for produto_id, nova_quantidade in ajustes]
+        )
+        atualizados = cur.rowcount
+        for produto_id, nova_quantidade in ajustes:
+            auditoria.registrar('estoque', 'produto', produto_id, {'estoque': nova_quantidade}, conn=conn)
+            publicar_evento(conn, 'produto', 'estoque', produto_id, {'estoque': nova_quantidade})
+        conn.commit()
+        return True, atualizados
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        conn.close()
+
+@na_particao('produto_id', escola_do_id)
+def excluir_produto(produto_id):
+    """Exclui um produto se não estiver em nenhum pedido"""
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        
+        # Verificar se o produto está em algum pedido
+        cur.execute("SELECT COUNT(*) FROM pedido_itens WHERE produto_id = ?", (produto_id,))
+        count = cur.fetchone()[0]
+        
+        if count > 0:
+            return False, "❌ Este produto está em pedidos e não pode ser excluído"
+        
+        if anexar_arquivo(conn):
+            cur.execute("SELECT COUNT(*) FROM arquivo.pedido_itens WHERE produto_id = ?", (produto_id,))
+            if cur.fetchone()[0] > 0:
+                return False, "❌ Este produto está em pedidos arquivados e não pode ser excluído"
+        
+        # Excluir o produto
+        cur.execute("DELETE FROM reposicao WHERE produto_id = ?", (produto_id,))
+        cur.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
+        if cur.rowcount:
+            auditoria.registrar('excluir', 'produto', produto_id, conn=conn)
+            publicar_evento(conn, 'produto', 'excluido', produto_id)
+        conn.commit()
+        return True, "✅ Produto excluído com sucesso!"
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"❌ Erro: {str(e)}"
+    finally:
+        conn.close()
+
+# FUNÇÕES PARA PEDIDOS
+def inserir_pedido(cur, cliente_id, escola_id, itens, data_entrega, forma_pagamento, observacoes, registrado_em=None):
+    """Grava pedido, itens e reservas na transação de quem chama; retorna (pedido_id, alertas de estoque).
+    registrado_em: hora da venda, quando o pedido chega depois (caixa offline)"""
+    agora = (registrado_em or datetime.now()).astimezone()
+    # Texto em UTC, igual ao padrão CURRENT_TIMESTAMP da tabela
+    data_pedido = agora.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    data_pedido_epoch = int(agora.timestamp())
+    data_pedido_dia = data_para_dia(agora)
+    quantidade_total = sum(item['quantidade'] for item in itens)
+    valor_total = sum(item['subtotal'] for item in itens)
+    
+    repositorio = Repositorio(cur.connection)
+    
+    # Sem chaves estrangeiras ativas no SQLite: cliente, produtos e quantidades são conferidos aqui,
+    # para todos os caminhos (interface, API, lote, caixa offline e importação)
+    if repositorio.valor('clientes.existe', (cliente_id,)) is None:
+        raise ValueError(f"Cliente {cliente_id} não encontrado")
+    
+    # VERIFICAR DISPONÍVEL APENAS COMO ALERTA, NÃO BLOQUEAR
+    alertas_estoque = []
+    for item in itens:
+        if not item['quantidade'] or item['quantidade'] <= 0:
+            raise ValueError(f"Quantidade inválida para o produto {item['produto_id']}: {item['quantidade']}")
+        produto = repositorio.um('produtos.disponivel', (item['produto_id'],))
+        if not produto or produto[2] != escola_id:
+            raise ValueError(f"Produto {item['produto_id']} não pertence à escola {escola_id}")
+        if produto[0] < item['quantidade']:
+            alertas_estoque.append(f"{produto[1]} - Disponível: {produto[0]}, Pedido: {item['quantidade']}")
+    
+    # Criar pedido mesmo com estoque insuficiente (apenas alerta)
+    pedido_id = repositorio.executar('pedidos.inserir', (
+        cliente_id, escola_id, data_pedido, data_pedido_epoch, data_pedido_dia,
+        data_entrega, forma_pagamento, quantidade_total, valor_total, observacoes
+    )).lastrowid
+    
+    repositorio.executar_varios('itens.inserir', [
+        (pedido_id, item['produto_id'], item['quantidade'], item['preco_unitario'], item['subtotal'])
+        for item in itens
+    ])
+    # Estoque só baixa na entrega; aqui apenas reserva
+    repositorio.executar_varios('produtos.reservar', [(item['quantidade'], item['produto_id']) for item in itens])
+    
+    auditoria.registrar('criar', 'pedido', pedido_id, {
+        'cliente_id': cliente_id, 'escola_id': escola_id, 'itens': len(itens),
+        'quantidade_total': quantidade_total, 'valor_total': valor_total
+    }, conn=cur.connection)
+    publicar_evento(cur.connection, 'pedido', 'criado', pedido_id, {
+        'cliente_id': cliente_id, 'escola_id': escola_id, 'status': 'Pendente', 'data_pedido': data_pedido,
+        'data_entrega': data_entrega, 'forma_pagamento': forma_pagamento,
+        'quantidade_total': quantidade_total, 'valor_total': valor_total,
+        'itens': [{'produto_id': item['produto_id'], 'quantidade': item['quantidade'],
+                   'preco_unitario': item['preco_unitario']} for item in itens],
+    })
+    return pedido_id, alertas_estoque
+
+def mensagem_pedido_criado(pedido_id, alertas_estoque):
+    mensagem = f"✅ Pedido #{pedido_id} criado com sucesso!"
+    if alertas_estoque:
+        mensagem += f" ⚠️ Alertas de estoque: {', '.join(alertas_estoque)}"
+    return mensagem
+
+@na_particao('escola_id')
+def adicionar_pedido(cliente_id, escola_id, itens, data_entrega, forma_pagamento, observacoes):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        # Trava de escrita já na leitura: disponível e reserva ficam consistentes
+        iniciar_escrita(conn)
+        pedido_id, alertas_estoque = inserir_pedido(
+            cur, cliente_id, escola_id, itens, data_entrega, forma_pagamento, observacoes
+        )
+        conn.commit()
+        return True, mensagem_pedido_criado(pedido_id, alertas_estoque)
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"❌ Erro: {str(e)}"
+    finally:
+        conn.close()
+
+def adicionar_pedidos_lote(pedidos):
+    """Grava vários pedidos em uma só transação (uma por partição de escola); um pedido com erro não derruba os outros.
+    
+    Cada pedido é um dict com os argumentos de adicionar_pedido. Retorna, na
+    mesma ordem, dicts com sucesso, mensagem e pedido_id.
+    """
+    return em_lotes_por_escola(pedidos, lambda pedido: pedido['escola_id'], gravar_pedidos_lote)
+
+def gravar_pedidos_lote(pedidos):
+    conn = get_connection()
+    if not conn:
+        return [{'sucesso': False, 'mensagem': "Erro de conexão", 'pedido_id': None} for _ in pedidos]
+    
+    resultados = []
+    try:
+        cur = conn.cursor()
+        iniciar_escrita(conn)
+        for pedido in pedidos:
+            marca = conn.abrir_ponto("pedido_lote")
+            try:
+                pedido_id, alertas_estoque = inserir_pedido(
+                    cur, pedido['cliente_id'], pedido['escola_id'], pedido['itens'],
+                    pedido.get('data_entrega'), pedido.get('forma_pagamento', 'Dinheiro'),
+                    pedido.get('observacoes')
+                )
+                cur.execute("RELEASE pedido_lote")
+                resultados.append({'sucesso': True, 'pedido_id': pedido_id,
+                                   'mensagem': mensagem_pedido_criado(pedido_id, alertas_estoque)})
+            except Exception as e:
+                conn.voltar_ao_ponto("pedido_lote", marca)
+                resultados.append({'sucesso': False, 'pedido_id': None, 'mensagem': f"❌ Erro: {str(e)}"})
+        conn.commit()
+        return resultados
+        
+    except Exception as e:
+        conn.rollback()
+        return [{'sucesso': False, 'mensagem': f"❌ Erro: {str(e)}", 'pedido_id': None} for _ in pedidos]
+    finally:
+        conn.close()
+
+@por_escola(juntar_pedidos)
+def listar_pedidos_por_escola(escola_id=None):
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        repositorio = Repositorio(conn)
+        if escola_id:
+            return repositorio.todos('pedidos.da_escola', (escola_id,))
+        return repositorio.todos('pedidos.listar')
+    except Exception as e:
+        notificar_erro(f"Erro ao listar pedidos: {e}")
+        return []
+    finally:
+        conn.close()
+
+def listar_pedidos_por_status(status, limite=50, inicio=0):
+    """Uma página dos pedidos com os status informados, mais recentes primeiro, a partir da posição inicio"""
+    if not POR_ESCOLA:
+        return _listar_pedidos_por_status(status, limite, inicio)
+    # Cada partição devolve os seus primeiros inicio + limite; a página sai da intercalação
+    partes = em_todas_as_escolas(_listar_pedidos_por_status, status, inicio + limite, 0)
+    return juntar_pedidos(partes)[inicio:inicio + limite]
+
+def _listar_pedidos_por_status(status, limite, inicio):
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        return Repositorio(conn).todos('pedidos.pagina_por_status', (json.dumps(list(status)), limite, inicio))
+    except Exception as e:
+        notificar_erro(f"Erro ao listar pedidos: {e}")
+        return []
+    finally:
+        conn.close()
+
+def juntar_contagens(resultados):
+    """Soma as contagens {chave: quantidade} das partições"""
+    total = {}
+    for contagens in resultados.values():
+        for chave, quantidade in contagens.items():
+            total[chave] = total.get(chave, 0) + quantidade
+    return total
+
+@por_escola(juntar_contagens)
+def contar_pedidos_por_status(escola_id=None):
+    """{status: quantidade} dos pedidos da base (os arquivados ficam no histórico dos clientes)"""
+    conn = get_connection()
+    if not conn:
+        return {}
+    
+    try:
+        return dict(Repositorio(conn).todos('pedidos.contar_por_status'))
+    except Exception as e:
+        notificar_erro(f"Erro ao contar pedidos: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def listar_itens_pedidos(pedido_ids):
+    """Itens (com os dados do produto) de vários pedidos em uma consulta por partição (mais uma no arquivo,
+    se algum pedido estiver arquivado); retorna {pedido_id: [itens]}"""
+    itens = {pedido_id: [] for pedido_id in pedido_ids}
+    for escola_id, grupo in agrupar_por_escola(list(itens), escola_do_id).items():
+        with na_escola(escola_id):
+            carregar_itens_pedidos(itens, [pedido_id for _, pedido_id in grupo])
+    return itens
+
+def carregar_itens_pedidos(itens, pedido_ids):
+    """Preenche itens[pedido_id] com os itens dos pedidos informados"""
+    conn = get_connection()
+    if not conn:
+        return itens
+    
+    try:
+        repositorio = Repositorio(conn)
+        for item in repositorio.todos('itens.dos_pedidos', (json.dumps([int(i) for i in pedido_ids]),)):
+            itens[item.pedido_id].append(item)
+        # Pedido sem itens na base quente só pode estar no arquivo (o histórico do cliente lista os arquivados)
+        arquivados = [int(i) for i in pedido_ids if not itens[i]]
+        if arquivados and anexar_arquivo(conn):
+            for item in repositorio.todos('itens.dos_pedidos_arquivados', (json.dumps(arquivados),)):
+                itens[item.pedido_id].append(item)
+        return itens
+    except Exception as e:
+        notificar_erro(f"Erro ao listar itens dos pedidos: {e}")
+        return itens
+    finally:
+        conn.close()
+
+def movimentar_estoque_pedido(cur, pedido_id, status_antigo, status_novo):
+    """Ajusta reservado/estoque dos itens na mesma transação da troca de status"""
+    reserva = int(status_novo in STATUS_ABERTOS) - int(status_antigo in STATUS_ABERTOS)
+    baixa = int(status_novo == 'Entregue') - int(status_antigo == 'Entregue')
+    if not reserva and not baixa:
+        return True, ""
+    
+    repositorio = Repositorio(cur.connection)
+    itens = repositorio.todos('itens.movimento_do_pedido', (pedido_id,))
+    
+    # Verificar estoque antes de baixar
+    if baixa > 0:
+        produtos_sem_estoque = [
+            f"{nome} (Estoque: {estoque_atual}, Necessário: {quantidade})"
+            for produto_id, quantidade, nome, estoque_atual in itens
+            if estoque_atual < quantidade
+        ]
+        if produtos_sem_estoque:
+            return False, f"Estoque insuficiente para: {', '.join(produtos_sem_estoque)}"
+    
+    repositorio.executar_varios(
+        'produtos.movimentar',
+        [(reserva * item.quantidade, baixa * item.quantidade, item.produto_id) for item in itens]
+    )
+    return True, ""
+
+def alterar_status_pedido(cur, pedido_id, novo_status):
+    """Troca o status movimentando reserva/estoque na transação de quem chama"""
+    repositorio = Repositorio(cur.connection)
+    status_antigo = repositorio.valor('pedidos.status', (pedido_id,))
+    if status_antigo is None:
+        return False, PEDIDO_NAO_ENCONTRADO
+    
+    sucesso, msg = movimentar_estoque_pedido(cur, pedido_id, status_antigo, novo_status)
+    if not sucesso:
+        return False, f"Status não atualizado: {msg}"
+    
+    data_entrega = datetime.now().strftime("%Y-%m-%d") if novo_status == 'Entregue' else None
+    repositorio.executar('pedidos.atualizar_status', (novo_status, data_entrega, pedido_id))
+    
+    # Cancelar ou reativar muda as vendas consideradas na reposição
+    invalidar_reposicao_pedido(cur, pedido_id)
+    auditoria.registrar('status', 'pedido', pedido_id, {'de': status_antigo, 'para': novo_status},
+                        conn=cur.connection)
+    publicar_evento(cur.connection, 'pedido', 'status', pedido_id, {'de': status_antigo, 'para': novo_status})
+    
+    if novo_status == 'Entregue' and status_antigo != 'Entregue':
+        return True, "✅ Status do pedido atualizado e estoque baixado com sucesso!"
+    return True, "✅ Status do pedido atualizado com sucesso!"
+
+@na_particao('pedido_id', escola_do_id)
+def atualizar_status_pedido(pedido_id, novo_status):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        iniciar_escrita(conn)
+        
+        # Status, reserva e baixa de estoque em uma única transação
+        sucesso, msg = alterar_status_pedido(cur, pedido_id, novo_status)
+        if not sucesso:
+            conn.rollback()
+            return False, msg
+        
+        conn.commit()
+        return True, msg
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"❌ Erro: {str(e)}"
+    finally:
+        conn.close()
+
+def atualizar_status_pedidos_lote(atualizacoes):
+    """Aplica várias trocas de status (pares pedido_id, status) em uma só transação (uma por partição de escola)"""
+    return em_lotes_por_escola(atualizacoes, lambda atualizacao: escola_do_id(atualizacao[0]), gravar_status_lote)
+
+def gravar_status_lote(atualizacoes):
+    conn = get_connection()
+    if not conn:
+        return [(False, "Erro de conexão") for _ in atualizacoes]
+    
+    resultados = []
+    try:
+        cur = conn.cursor()
+        iniciar_escrita(conn)
+        for pedido_id, novo_status in atualizacoes:
+            marca = conn.abrir_ponto("status_lote")
+            try:
+                sucesso, msg = alterar_status_pedido(cur, pedido_id, novo_status)
+            except Exception as e:
+                sucesso, msg = False, f"❌ Erro: {str(e)}"
+            if sucesso:
+                cur.execute("RELEASE status_lote")
+            else:
+                conn.voltar_ao_ponto("status_lote", marca)
+            resultados.append((sucesso, msg))
+        conn.commit()
+        return resultados
+        
+    except Exception as e:
+        conn.rollback()
+        return [(False, f"❌ Erro: {str(e)}") for _ in atualizacoes]
+    finally:
+        conn.close()
+
+@na_particao('pedido_id', escola_do_id)
+def excluir_pedido(pedido_id):
+    conn = get_connection()
+    if not conn:
+        return False, "Erro de conexão"
+    
+    try:
+        cur = conn.cursor()
+        arquivo_anexado = anexar_arquivo(conn)  # ATTACH não pode ocorrer dentro da transação
+        iniciar_escrita(conn)
+        
+        cur.execute("SELECT status FROM pedidos WHERE id = ?", (pedido_id,))
+        pedido = cur.fetchone()
+        if pedido and pedido[0] in STATUS_ABERTOS:
+            # Libera a reserva (estoque não é restaurado pois não foi baixado ainda)
+            movimentar_estoque_pedido(cur, pedido_id, pedido[0], 'Cancelado')
+        
+        invalidar_reposicao_pedido(cur, pedido_id)
+        cur.execute("DELETE FROM pedido_itens WHERE pedido_id = ?", (pedido_id,))
+        cur.execute("DELETE FROM pedidos WHERE id = ?", (pedido_id,))
+        if pedido:
+            auditoria.registrar('excluir', 'pedido', pedido_id, {'status': pedido[0]}, conn=conn)
+            publicar_evento(conn, 'pedido', 'excluido', pedido_id, {'status': pedido[0]})
+        if arquivo_anexado:
+            # Cópia arquivada (de um pedido reaberto) voltaria a aparecer nos relatórios
+            cur.execute("DELETE FROM arquivo.pedido_itens WHERE pedido_id = ?", (pedido_id,))
+            cur.execute("DELETE FROM arquivo.pedidos WHERE id = ?", (pedido_id,))
+        
+        conn.commit()
+        return True, "Pedido excluído com sucesso"
+        
+    except Exception as e:
+        conn.rollback()
+        return False, f"Erro: {str(e)}"
+    finally:
+        conn.close()
+
+# =========================================
+# 📣 EVENTOS DE MUDANÇA
+# =========================================
+
+def ler_eventos(depois=None, limite=100):
+    """Eventos depois do cursor, do banco da loja e de cada partição; retorna (eventos, próximo cursor, se há mais)"""
+    posicoes = decodificar_cursor(depois)
+    por_origem = {ORIGEM_LOJA: _ler_eventos(posicoes, limite)}
+    if POR_ESCOLA:
+        por_origem.update(em_todas_as_escolas(_ler_eventos, posicoes, limite))
+    eventos, posicoes, mais = juntar_eventos(por_origem, posicoes, limite)
+    return eventos, codificar_cursor(posicoes), mais
+
+def _ler_eventos(posicoes, limite):
+    # Arquivo fora do ar: o cursor dele não anda e os eventos vêm na próxima leitura
+    origem = escola_atual.get() or ORIGEM_LOJA
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        return ler_eventos_banco(conn, posicoes.get(origem, 0), limite, origem)
+    except Exception as e:
+        notificar_erro(f"Erro ao ler eventos: {e}")
+        return []
+    finally:
+        conn.close()
+
+def compactar_eventos(dias=DIAS_RETENCAO):
+    """Compacta os eventos mais antigos que dias no banco da loja e em cada partição; retorna quantos saíram"""
+    removidos = _compactar_eventos(dias)
+    if POR_ESCOLA:
+        removidos += sum(em_todas_as_escolas(_compactar_eventos, dias).values())
+    return removidos
+
+def _compactar_eventos(dias):
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Erro de conexão com o banco")
+    
+    try:
+        iniciar_escrita(conn)
+        removidos = compactar_banco(conn, dias)
+        conn.commit()
+        return removidos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# =========================================
+# 📜 AUDITORIA
+# =========================================
+
+ENTIDADES_AUDITORIA = ('pedido', 'item', 'produto', 'cliente', 'usuario')
+
+def buscar_auditoria(usuario=None, entidade=None, entidade_id=None, data_inicio=None, data_fim=None, limite=200):
+    """Histórico de alterações, mais recentes primeiro; período por datas (fim incluído)"""
+    try:
+        desde = int(datetime.combine(data_inicio, datetime.min.time()).timestamp()) if data_inicio else None
+        ate = int(datetime.combine(data_fim, datetime.max.time()).timestamp()) + 1 if data_fim else None
+        return auditoria.buscar(usuario, entidade, entidade_id, desde, ate, limite)
+    except Exception as e:
+        notificar_erro(f"Erro ao buscar auditoria: {e}")
+        return []
+
+def listar_usuarios_auditoria():
+    try:
+        return auditoria.usuarios()
+    except Exception as e:
+        notificar_erro(f"Erro ao listar usuários da auditoria: {e}")
+        return []
+
+# =========================================
+# 📊 FUNÇÕES PARA RELATÓRIOS - SQLITE
+# =========================================
+
+# Início do período de cada agrupamento, a partir da chave AAAAMMDD
+EXPRESSOES_GRANULARIDADE = {
+    'dia': "{dia}",
+    # Segunda-feira da semana: avança até domingo e volta seis dias
+    'semana': "CAST(strftime('%Y%m%d', printf('%04d-%02d-%02d', {dia} / 10000, {dia} / 100 % 100, {dia} % 100),"
+              " 'weekday 0', '-6 days') AS INTEGER)",
+    'mes': "({dia} / 100) * 100 + 1",
+}
+ROTULOS_GRANULARIDADE = {'dia': 'dia', 'semana': 'semana', 'mes': 'mês'}
+
+def escolher_granularidade(data_inicio, data_fim):
+    """Dia até um trimestre, semana até dois anos, mês acima disso"""
+    dias = (data_fim - data_inicio).days
+    if dias <= 92:
+        return 'dia'
+    if dias <= 731:
+        return 'semana'
+    return 'mes'
+
+def intervalo_vendas():
+    """Primeiro e último dia com pedidos (incluindo os arquivados)"""
+    if POR_ESCOLA:
+        intervalos = [i for i in em_todas_as_escolas(_intervalo_vendas).values() if i[0]]
+        if not intervalos:
+            return None, None
+        return min(inicio for inicio, _ in intervalos), max(fim for _, fim in intervalos)
+    return _intervalo_vendas()
+
+def _intervalo_vendas():
+    conn = get_connection()
+    if not conn:
+        return None, None
+    
+    try:
+        cur = conn.cursor()
+        # MIN/MAX de cada banco separados usam o índice; na união seria uma varredura
+        consultas = ["SELECT MIN(data_pedido_dia), MAX(data_pedido_dia) FROM main.pedidos"]
+        cur.execute("SELECT dia_limite FROM arquivamento_controle WHERE id = 1")
+        if cur.fetchone()[0] is not None and anexar_arquivo(conn):
+            consultas.append("SELECT MIN(data_pedido_dia), MAX(data_pedido_dia) FROM arquivo.pedidos")
+        
+        dias = []
+        for consulta in consultas:
+            cur.execute(consulta)
+            dias.extend(dia for dia in cur.fetchone() if dia)
+        if not dias:
+            return None, None
+        return dia_para_data(min(dias)), dia_para_data(max(dias))
+    except Exception as e:
+        notificar_erro(f"Erro ao consultar período de vendas: {e}")
+        return None, None
+    finally:
+        conn.close()
+
+@por_escola(juntar_relatorios('Data'))
+def gerar_relatorio_vendas_por_escola(escola_id=None, data_inicio=None, data_fim=None, granularidade='dia'):
+    """Gera relatório de vendas por período e escola (exclui pedidos cancelados).
+    
+    granularidade agrupa as datas por 'dia', 'semana' (começando na segunda) ou 'mes';
+    a coluna Data traz o primeiro dia de cada período.
+    """
+    import pandas as pd
+    from database.relatorios import carregar_dataframe
+    conn = get_connection()
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        cur = conn.cursor()
+        
+        # Intervalo sobre a chave inteira do dia permite busca pelo índice
+        dia_inicio = data_para_dia(data_inicio) if data_inicio else 0
+        dia_fim = data_para_dia(data_fim) if data_fim else 99991231
+        pedidos, _ = tabelas_pedidos(conn, dia_inicio)
+        periodo = EXPRESSOES_GRANULARIDADE[granularidade].format(dia='d.dia')
+        
+        # Agrupa por dia no índice e só depois por período: a conversão de data roda uma vez por dia
+        if escola_id:
+            cur.execute(f'''
+                SELECT 
+                    {periodo} as data,
+                    SUM(d.total_pedidos),
+                    SUM(d.total_itens),
+                    SUM(d.total_vendas)
+                FROM (
+                    SELECT 
+                        p.data_pedido_dia as dia,
+                        COUNT(*) as total_pedidos,
+                        COALESCE(SUM(p.quantidade_total), 0) as total_itens,
+                        COALESCE(SUM(p.valor_total), 0) as total_vendas
+                    FROM {pedidos} p
+                    WHERE p.escola_id = ? AND p.data_pedido_dia BETWEEN ? AND ?
+                      AND p.status != 'Cancelado'
+                    GROUP BY p.data_pedido_dia
+                ) d
+                GROUP BY data
+                ORDER BY data DESC
+            ''', (escola_id, dia_inicio, dia_fim))
+        else:
+            cur.execute(f'''
+                SELECT 
+                    {periodo} as data,
+                    e.nome as escola,
+                    SUM(d.total_pedidos),
+                    SUM(d.total_itens),
+                    SUM(d.total_vendas)
+                FROM (
+                    SELECT 
+                        p.data_pedido_dia as dia,
+                        p.escola_id,
+                        COUNT(*) as total_pedidos,
+                        COALESCE(SUM(p.quantidade_total), 0) as total_itens,
+                        COALESCE(SUM(p.valor_total), 0) as total_vendas
+                    FROM {pedidos} p
+                    WHERE p.data_pedido_dia BETWEEN ? AND ? AND p.status != 'Cancelado'
+                    GROUP BY p.data_pedido_dia, p.escola_id
+                ) d
+                JOIN escolas e ON d.escola_id = e.id
+                GROUP BY data, e.nome
+                ORDER BY data DESC
+            ''', (dia_inicio, dia_fim))
+            
+        if escola_id:
+            colunas = ['Data', 'Total Pedidos', 'Total Itens', 'Total Vendas (R$)']
+        else:
+            colunas = ['Data', 'Escola', 'Total Pedidos', 'Total Itens', 'Total Vendas (R$)']
+        
+        # Colunas tipadas; a formatação brasileira fica para a exibição
+        tipos = {'Data': 'dia', 'Total Pedidos': 'int64', 'Total Itens': 'int64', 'Total Vendas (R$)': 'float64'}
+        if not escola_id:
+            tipos['Escola'] = 'category'
+        
+        df = carregar_dataframe(cur, colunas, tipos)
+        return df if not df.empty else pd.DataFrame()
+            
+    except Exception as e:
+        notificar_erro(f"Erro ao gerar relatório: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@por_escola(juntar_relatorios('Total Vendido'))
+def gerar_relatorio_produtos_por_escola(escola_id=None):
+    """Gera relatório de produtos mais vendidos por escola (exclui pedidos cancelados)"""
+    import pandas as pd
+    from database.relatorios import carregar_dataframe
+    conn = get_connection()
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        cur = conn.cursor()
+        pedidos, itens = tabelas_pedidos(conn)
+        
+        if escola_id:
+            cur.execute(f'''
+                SELECT 
+                    pr.nome as produto,
+                    pr.categoria,
+                    pr.tamanho,
+                    pr.cor,
+                    COALESCE(SUM(pi.quantidade), 0) as total_vendido,
+                    COALESCE(SUM(pi.subtotal), 0) as total_faturado
+                FROM {itens} pi
+                JOIN produtos pr ON pi.produto_id = pr.id
+                JOIN {pedidos} p ON pi.pedido_id = p.id
+                WHERE p.escola_id = ? AND p.status != 'Cancelado'
+                GROUP BY pr.id, pr.nome, pr.categoria, pr.tamanho, pr.cor
+                ORDER BY total_vendido DESC
+            ''', (escola_id,))
+        else:
+            cur.execute(f'''
+                SELECT 
+                    pr.nome as produto,
+                    pr.categoria,
+                    pr.tamanho,
+                    pr.cor,
+                    e.nome as escola,
+                    COALESCE(SUM(pi.quantidade), 0) as total_vendido,
+                    COALESCE(SUM(pi.subtotal), 0) as total_faturado
+                FROM {itens} pi
+                JOIN produtos pr ON pi.produto_id = pr.id
+                JOIN {pedidos} p ON pi.pedido_id = p.id
+                JOIN escolas e ON p.escola_id = e.id
+                WHERE p.status != 'Cancelado'
+                GROUP BY pr.id, pr.nome, pr.categoria, pr.tamanho, pr.cor, e.nome
+                ORDER BY total_vendido DESC
+            ''')
+            
+        if escola_id:
+            colunas = ['Produto', 'Categoria', 'Tamanho', 'Cor', 'Total Vendido', 'Total Faturado (R$)']
+        else:
+            colunas = ['Produto', 'Categoria', 'Tamanho', 'Cor', 'Escola', 'Total Vendido', 'Total Faturado (R$)']
+        
+        tipos = {'Categoria': 'category', 'Tamanho': 'category', 'Cor': 'category',
+                 'Total Vendido': 'int64', 'Total Faturado (R$)': 'float64'}
+        if not escola_id:
+            tipos['Escola'] = 'category'
+        
+        df = carregar_dataframe(cur, colunas, tipos)
+        return df if not df.empty else pd.DataFrame()
+            
+    except Exception as e:
+        notificar_erro(f"Erro ao gerar relatório: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def gerar_resumo_escolas():
+    """Produtos cadastrados, pedidos e vendas (sem cancelados) de cada escola"""
+    import pandas as pd
+    if POR_ESCOLA:
+        # Cada partição traz todas as escolas, zeradas menos a dela: a soma por escola é o resumo
+        partes = [df for df in em_todas_as_escolas(_gerar_resumo_escolas).values() if not df.empty]
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True).groupby('Escola', sort=False, as_index=False).sum()
+    return _gerar_resumo_escolas()
+
+def _gerar_resumo_escolas():
+    import pandas as pd
+    from database.relatorios import carregar_dataframe
+    conn = get_connection()
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        cur = conn.cursor()
+        pedidos, _ = tabelas_pedidos(conn)
+        cur.execute(f'''
+            SELECT 
+                e.nome as escola,
+                (SELECT COUNT(*) FROM produtos pr WHERE pr.escola_id = e.id) as produtos,
+                COUNT(p.id) as pedidos,
+                COALESCE(SUM(p.valor_total), 0) as vendas
+            FROM escolas e
+            LEFT JOIN {pedidos} p ON p.escola_id = e.id AND p.status != 'Cancelado'
+            GROUP BY e.id, e.nome
+            ORDER BY e.nome
+        ''')
+        return carregar_dataframe(cur, ['Escola', 'Produtos', 'Pedidos', 'Vendas (R$)'],
+                                  {'Produtos': 'int64', 'Pedidos': 'int64', 'Vendas (R$)': 'float64'})
+            
+    except Exception as e:
+        notificar_erro(f"Erro ao gerar resumo por escola: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def gerar_resumo_lojas():
+    """Resumo por escola de todas as lojas, consultadas em paralelo"""
+    return juntar_por_loja(em_todas_as_lojas(gerar_resumo_escolas))
+
+def gerar_vendas_lojas(data_inicio=None, data_fim=None, granularidade='dia'):
+    """Vendas de todas as escolas de cada loja no período, lado a lado por loja"""
+    return juntar_por_loja(em_todas_as_lojas(
+        gerar_relatorio_vendas_por_escola, None, data_inicio, data_fim, granularidade
+    ))
+
+@por_escola(juntar_relatorios())
+def gerar_lista_separacao(escola_id=None, status=STATUS_ABERTOS):
+    """Quanto separar de cada produto para os pedidos nos status escolhidos, ao lado do estoque e das reservas.
+    
+    Pedidos em aberto nunca vão para o arquivo, então a consulta usa só a base quente.
+    """
+    import pandas as pd
+    from database.relatorios import carregar_dataframe
+    status = [s for s in status if s in STATUS_ABERTOS]
+    if not status:
+        return pd.DataFrame()
+    
+    conn = get_connection()
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        cur = conn.cursor()
+        parametros = list(status) + ([escola_id] if escola_id else [])
+        cur.execute(f'''
+            SELECT 
+                e.nome as escola,
+                pr.nome as produto,
+                pr.categoria,
+                pr.tamanho,
+                pr.cor,
+                COUNT(DISTINCT p.id) as pedidos,
+                SUM(pi.quantidade) as separar,
+                pr.estoque,
+                pr.reservado,
+                pr.estoque - pr.reservado as disponivel,
+                MAX(SUM(pi.quantidade) - pr.estoque, 0) as falta
+            FROM pedidos p
+            JOIN pedido_itens pi ON pi.pedido_id = p.id
+            JOIN produtos pr ON pr.id = pi.produto_id
+            JOIN escolas e ON e.id = pr.escola_id
+            WHERE p.status IN ({', '.join('?' * len(status))}) {'AND p.escola_id = ?' if escola_id else ''}
+            GROUP BY pr.id
+            ORDER BY e.nome, pr.categoria, pr.nome, pr.tamanho, pr.cor
+        ''', parametros)
+        
+        colunas = ['Escola', 'Produto', 'Categoria', 'Tamanho', 'Cor', 'Pedidos', 'A Separar',
+                   'Estoque', 'Reservado', 'Disponível', 'Falta']
+        tipos = {coluna: 'int64' for coluna in colunas[5:]}
+        return carregar_dataframe(cur, colunas, tipos)
+    
+    except Exception as e:
+        notificar_erro(f"Erro ao gerar lista de separação: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+# =========================================
+# 📈 REPOSIÇÃO DE ESTOQUE
+# =========================================
+
+def atualizar_reposicao_estoque():
+    """Atualiza incrementalmente a tabela de reposição antes de exibir alertas"""
+    if POR_ESCOLA:
+        em_todas_as_escolas(_atualizar_reposicao_estoque)
+    else:
+        _atualizar_reposicao_estoque()
+
+def _atualizar_reposicao_estoque():
+    conn = get_connection()
+    if not conn:
+        return
+    
+    try:
+        atualizar_reposicao(conn)
+    except Exception as e:
+        conn.rollback()
+        notificar_erro(f"Erro ao atualizar reposição: {e}")
+    finally:
+        conn.close()
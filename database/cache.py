@@ -0,0 +1,70 @@
+import functools
+import sqlite3
+import threading
+
+# =========================================
+# 🔄 CACHE COERENTE ENTRE PROCESSOS
+# =========================================
+
+class CacheCoerente:
+    """Cache em memória do processo, descartado quando qualquer conexão faz commit no banco.
+
+    Usa PRAGMA data_version de uma conexão sentinela: o valor muda sempre que
+    outra conexão (deste ou de outro processo) confirma uma escrita no arquivo.
+    """
+
+    def __init__(self, caminho_db):
+        self.caminho_db = caminho_db
+        self._sentinela = sqlite3.connect(caminho_db, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._versao = None
+        self._valores = {}
+        self.acertos = 0
+        self.falhas = 0
+
+    def verificar(self):
+        """Descarta o cache se houve commit desde a última verificação; retorna a versão atual"""
+        with self._lock:
+            versao = self._sentinela.execute("PRAGMA data_version").fetchone()[0]
+            if versao != self._versao:
+                self._valores.clear()
+                self._versao = versao
+            return versao
+
+    def limpar(self):
+        with self._lock:
+            self._valores.clear()
+
+    def memorizar(self, funcao):
+        """Decorador: guarda o resultado por argumentos até o próximo commit no banco"""
+        nome = funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            chave = (nome, args, tuple(sorted(kwargs.items())))
+            versao = self.verificar()
+            with self._lock:
+                if chave in self._valores:
+                    self.acertos += 1
+                    return self._valores[chave]
+            self.falhas += 1
+
+            resultado = funcao(*args, **kwargs)
+            # Vazio pode ser erro de conexão; não vale a pena guardar.
+            # Só guarda se nenhum commit aconteceu durante a consulta.
+            if resultado and self.verificar() == versao:
+                with self._lock:
+                    self._valores[chave] = resultado
+            return resultado
+
+        return envolvida
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def obter_cache(caminho_db):
+    """Cache único por processo para o arquivo informado (sobrevive aos reruns do Streamlit)"""
+    with _caches_lock:
+        if caminho_db not in _caches:
+            _caches[caminho_db] = CacheCoerente(caminho_db)
+        return _caches[caminho_db]
@@ -0,0 +1,225 @@
+"""Catálogo em memória: escolas e produtos do banco em uso, com índices por escola, categoria e tamanho
+
+Escolas e produtos são lidos em quase toda página. Cada arquivo (banco da
+loja ou partição de uma escola) tem, por processo, uma foto do catálogo em
+registros tipados (tuplas, sem __dict__) e listas já ordenadas como nas
+consultas 'produtos.listar' e 'produtos.da_escola'. A leitura só confere o
+PRAGMA data_version do cache coerente; se nada foi gravado, devolve as
+listas prontas.
+
+Gatilhos em produtos, reposicao e escolas anotam em catalogo_mudancas o id
+de cada produto alterado, com uma versão crescente. Quando o banco muda, a
+foto relê só os produtos com versão maior que a última vista (qualquer
+caminho de escrita, de qualquer processo: reservas, importação, correções
+de integridade) e monta a próxima foto sobre a anterior. Mudança em escolas
+ou muitos produtos de uma vez relê o catálogo inteiro.
+
+As fotos não são alteradas depois de prontas: quem recebeu uma lista
+continua com ela mesmo que outra thread troque a foto.
+"""
+import bisect
+import threading
+
+from database.cache import obter_cache
+from database.repositorio import Repositorio
+
+LIMITE_REMENDO = 200   # Produtos alterados acima disso: relê o catálogo inteiro
+MUDANCA_ESCOLAS = 0    # produto_id anotado quando muda alguma escola (muda o escola_nome de todos)
+
+def criar_controle_catalogo(cur, particao=False):
+    """Tabela de produtos alterados e os gatilhos que a mantêm"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_mudancas (
+            produto_id INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_catalogo_mudancas_versao ON catalogo_mudancas(versao)")
+
+    gatilhos = [
+        ('produtos', 'INSERT', 'NEW.id'), ('produtos', 'UPDATE', 'NEW.id'), ('produtos', 'DELETE', 'OLD.id'),
+        ('reposicao', 'INSERT', 'NEW.produto_id'),
+        ('reposicao', 'UPDATE OF ponto_pedido, velocidade_diaria', 'NEW.produto_id'),
+        ('reposicao', 'DELETE', 'OLD.produto_id'),
+    ]
+    # Escolas ficam no catálogo: a partição não tem gatilho para elas
+    if not particao:
+        gatilhos += [('escolas', evento, MUDANCA_ESCOLAS) for evento in ('INSERT', 'UPDATE', 'DELETE')]
+    for tabela, evento, produto_id in gatilhos:
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_catalogo_{tabela}_{evento.split()[0].lower()}
+            AFTER {evento} ON {tabela}
+            BEGIN
+                INSERT OR REPLACE INTO catalogo_mudancas (produto_id, versao)
+                VALUES ({produto_id}, (SELECT COALESCE(MAX(versao), 0) + 1 FROM catalogo_mudancas));
+            END
+        ''')
+
+# =========================================
+# 🗂️ FOTO DO CATÁLOGO
+# =========================================
+
+def _texto(valor):
+    """Chave de ordenação com NULL antes, como no ORDER BY do SQLite"""
+    return (valor is not None, valor or '')
+
+def ordem_geral(produto):
+    """Ordem de 'produtos.listar': escola, categoria, nome"""
+    return (_texto(produto.escola_nome), _texto(produto.categoria), produto.nome, produto.id)
+
+def ordem_escola(produto):
+    """Ordem de 'produtos.da_escola': categoria, nome"""
+    return (_texto(produto.categoria), produto.nome, produto.id)
+
+def _trocar(lista, antigo, novo, ordem):
+    """Tira antigo e põe novo na lista ordenada; no mesmo lugar se a posição não muda (estoque, preço)"""
+    if antigo is not None:
+        chave = ordem(antigo)
+        posicao = bisect.bisect_left(lista, chave, key=ordem)
+        if novo is not None and ordem(novo) == chave:
+            lista[posicao] = novo
+            return
+        del lista[posicao]
+    if novo is not None:
+        bisect.insort(lista, novo, key=ordem)
+
+class IndicesCatalogo:
+    """Foto do catálogo com listas ordenadas por escola, categoria e tamanho"""
+    __slots__ = ('escolas', 'escolas_por_id', 'produtos', 'todos', 'por_escola', 'por_categoria', 'por_tamanho')
+
+    # Índice -> (campo do produto, ordem da lista)
+    INDICES = {
+        'por_escola': ('escola_id', ordem_escola),
+        'por_categoria': ('categoria', ordem_geral),
+        'por_tamanho': ('tamanho', ordem_geral),
+    }
+
+    @classmethod
+    def montar(cls, escolas, produtos):
+        indices = cls()
+        indices.escolas = escolas
+        indices.escolas_por_id = {escola.id: escola for escola in escolas}
+        indices.produtos = {produto.id: produto for produto in produtos}
+        indices.todos = sorted(produtos, key=ordem_geral)
+        for nome, (campo, _) in cls.INDICES.items():
+            # Filtrar a lista geral já deixa cada lista na ordem dela (produtos de uma escola
+            # têm o mesmo escola_nome e seguem por categoria e nome)
+            indice = {}
+            for produto in indices.todos:
+                indice.setdefault(getattr(produto, campo), []).append(produto)
+            setattr(indices, nome, indice)
+        return indices
+
+    def remendar(self, alterados):
+        """Nova foto com {produto_id: Produto ou None (excluído)} aplicados; esta fica como estava"""
+        nova = IndicesCatalogo()
+        nova.escolas, nova.escolas_por_id = self.escolas, self.escolas_por_id
+        nova.produtos = dict(self.produtos)
+        nova.todos = list(self.todos)
+        for nome in self.INDICES:
+            setattr(nova, nome, dict(getattr(self, nome)))
+        copiadas = set()
+
+        def lista(nome, chave):
+            """Lista do índice, copiada na primeira alteração desta foto"""
+            indice = getattr(nova, nome)
+            if (nome, chave) not in copiadas:
+                indice[chave] = list(indice.get(chave, ()))
+                copiadas.add((nome, chave))
+            return indice[chave]
+
+        for produto_id, produto in alterados.items():
+            antigo = nova.produtos.pop(produto_id, None)
+            if produto is not None:
+                nova.produtos[produto_id] = produto
+            _trocar(nova.todos, antigo, produto, ordem_geral)
+            for nome, (campo, ordem) in self.INDICES.items():
+                chave_antiga = getattr(antigo, campo) if antigo is not None else None
+                chave_nova = getattr(produto, campo) if produto is not None else None
+                if antigo is not None and produto is not None and chave_antiga == chave_nova:
+                    _trocar(lista(nome, chave_nova), antigo, produto, ordem)
+                    continue
+                if antigo is not None:
+                    _trocar(lista(nome, chave_antiga), antigo, None, ordem)
+                if produto is not None:
+                    _trocar(lista(nome, chave_nova), None, produto, ordem)
+
+        for nome, chave in copiadas:
+            indice = getattr(nova, nome)
+            if not indice[chave]:
+                del indice[chave]
+        return nova
+
+    def buscar(self, escola_id=None, categoria=None, tamanho=None):
+        """Produtos que atendem a todos os filtros informados, partindo do menor índice"""
+        filtros = [(nome, campo, valor) for (nome, (campo, _)), valor
+                   in zip(self.INDICES.items(), (escola_id, categoria, tamanho)) if valor is not None]
+        if not filtros:
+            return self.todos
+        candidatos = min((getattr(self, nome).get(valor, []) for nome, _, valor in filtros), key=len)
+        return [produto for produto in candidatos
+                if all(getattr(produto, campo) == valor for _, campo, valor in filtros)]
+
+# =========================================
+# 🔄 CATÁLOGO DE UM ARQUIVO
+# =========================================
+
+class CatalogoMemoria:
+    """Foto do catálogo de um arquivo, posta em dia na leitura seguinte a cada commit"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._indices = None
+        self._versao = None     # data_version em que a foto foi conferida
+        self._mudanca = 0       # Maior versão de catalogo_mudancas já aplicada
+        self.recargas = 0
+        self.remendos = 0
+
+    def atualizado(self, abrir_conexao):
+        """Foto em dia com o último commit; abre conexão só se o banco mudou (None se nunca carregou)"""
+        versao = self.cache.verificar()
+        if versao == self._versao:
+            return self._indices
+        with self._lock:
+            if versao != self._versao:
+                conn = abrir_conexao()
+                if not conn:
+                    return self._indices
+                try:
+                    self._atualizar(Repositorio(conn))
+                finally:
+                    conn.close()
+                self._versao = versao
+            return self._indices
+
+    def _atualizar(self, repositorio):
+        if self._indices is not None:
+            mudancas = repositorio.todos('catalogo.mudancas', (self._mudanca,))
+            if not mudancas:
+                return
+            produto_ids = {linha[0] for linha in mudancas}
+            if len(produto_ids) <= LIMITE_REMENDO and MUDANCA_ESCOLAS not in produto_ids:
+                # Produto sem linha foi excluído; um commit entre as duas leituras só antecipa o remendo seguinte
+                alterados = dict.fromkeys(produto_ids)
+                alterados.update((produto.id, produto) for produto in
+                                 repositorio.todos('catalogo.produtos_alterados', (self._mudanca,)))
+                self._indices = self._indices.remendar(alterados)
+                self._mudanca = max(linha[1] for linha in mudancas)
+                self.remendos += 1
+                return
+
+        mudanca = repositorio.valor('catalogo.ultima_mudanca') or 0
+        self._indices = IndicesCatalogo.montar(repositorio.todos('escolas.listar'), repositorio.todos('produtos.listar'))
+        self._mudanca = mudanca
+        self.recargas += 1
+
+_catalogos = {}
+_catalogos_lock = threading.Lock()
+
+def obter_catalogo(caminho_db):
+    """Catálogo único por processo para o arquivo informado, sobre o cache coerente dele"""
+    with _catalogos_lock:
+        if caminho_db not in _catalogos:
+            _catalogos[caminho_db] = CatalogoMemoria(obter_cache(caminho_db))
+        return _catalogos[caminho_db]
@@ -0,0 +1,151 @@
+"""Eventos de mudança (outbox) para sistemas que acompanham o banco: contabilidade, avisos, planilhas
+
+Uso: python -m database.eventos ler [--depois CURSOR] [--limite 100]
+     python -m database.eventos compactar [--dias 30]
+
+Cada criação, troca de status, ajuste de estoque ou exclusão de pedido,
+produto ou cliente grava uma linha em 'eventos' na mesma transação da
+mudança: se a transação desfaz, o evento some junto. Quem consome lê os
+eventos depois de um cursor (GET /eventos?depois=...&limite=... na API) e
+guarda o cursor devolvido para a próxima leitura, em vez de reler as
+tabelas inteiras.
+
+O cursor é a sequência do último evento lido ("120"). Com partições por
+escola, cada arquivo tem a sua sequência e o cursor junta todas
+("0:15,1:120,2:33", 0 é o banco da loja); a ordem entre arquivos segue a
+hora do evento.
+
+'compactar' reduz os eventos mais antigos que --dias ao estado final de
+cada registro: fica o último ajuste de estoque e o último status, e de
+registros excluídos só a exclusão. Quem ficou parado mais tempo que isso
+ainda chega ao mesmo estado, só sem os passos intermediários.
+"""
+import argparse
+import heapq
+import json
+import sys
+import time
+
+DIAS_RETENCAO = 30
+# Ações que substituem a anterior do mesmo registro na compactação
+ACOES_DE_ESTADO = ('estoque', 'status')
+ORIGEM_LOJA = 0
+
+def criar_tabela_eventos(cur):
+    """Outbox de eventos, gravada na transação de cada mudança"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS eventos (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entidade TEXT NOT NULL,
+            acao TEXT NOT NULL,
+            entidade_id INTEGER,
+            dados TEXT,
+            criado_em INTEGER NOT NULL
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_eventos_entidade ON eventos(entidade, entidade_id, seq)")
+
+def publicar_evento(conn, entidade, acao, entidade_id, dados=None):
+    """Grava o evento na transação aberta em conn (ex.: 'pedido', 'status', 12, {'de': ..., 'para': ...})"""
+    conn.execute(
+        "INSERT INTO eventos (entidade, acao, entidade_id, dados, criado_em) VALUES (?, ?, ?, ?, ?)",
+        (entidade, acao, entidade_id, json.dumps(dados, ensure_ascii=False, default=str) if dados else None,
+         int(time.time()))
+    )
+
+# =========================================
+# 📖 LEITURA POR CURSOR
+# =========================================
+
+def decodificar_cursor(cursor):
+    """'120' ou '0:15,1:120' -> {origem: seq}"""
+    if cursor is None or str(cursor).strip() == '':
+        return {}
+    try:
+        if ':' not in str(cursor):
+            return {ORIGEM_LOJA: int(cursor)}
+        return {int(origem): int(seq) for origem, seq in (parte.split(':') for parte in str(cursor).split(','))}
+    except ValueError:
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+def codificar_cursor(posicoes):
+    if set(posicoes) <= {ORIGEM_LOJA}:
+        return str(posicoes.get(ORIGEM_LOJA, 0))
+    return ','.join(f"{origem}:{seq}" for origem, seq in sorted(posicoes.items()))
+
+def ler_eventos_banco(conn, depois, limite, origem=ORIGEM_LOJA):
+    """Até limite eventos de um arquivo com seq maior que depois, em ordem"""
+    cur = conn.execute('''
+        SELECT seq, entidade, acao, entidade_id, dados, criado_em FROM eventos
+        WHERE seq > ? ORDER BY seq LIMIT ?
+    ''', (depois, limite))
+    return [{
+        'origem': origem, 'seq': seq, 'evento': f"{entidade}.{acao}", 'entidade_id': entidade_id,
+        'dados': json.loads(dados) if dados else {}, 'criado_em': criado_em,
+    } for seq, entidade, acao, entidade_id, dados, criado_em in cur]
+
+def juntar_eventos(por_origem, posicoes, limite):
+    """Intercala os eventos de cada arquivo pela hora; retorna (eventos, posições novas, se há mais)"""
+    eventos = list(heapq.merge(*por_origem.values(), key=lambda evento: (evento['criado_em'], evento['origem'])))
+    mais = len(eventos) > limite or any(len(lista) == limite for lista in por_origem.values())
+    eventos = eventos[:limite]
+    posicoes = dict(posicoes)
+    for evento in eventos:
+        posicoes[evento['origem']] = evento['seq']
+    return eventos, posicoes, mais
+
+# =========================================
+# 🗜️ COMPACTAÇÃO
+# =========================================
+
+def compactar_banco(conn, dias=DIAS_RETENCAO):
+    """Nos eventos com mais de dias, só o estado final de cada registro; retorna quantos saíram"""
+    antes_de = int(time.time()) - dias * 86400
+    cur = conn.cursor()
+    marcadores = ', '.join('?' * len(ACOES_DE_ESTADO))
+    # Registro excluído depois: some tudo dele, menos a própria exclusão
+    cur.execute('''
+        DELETE FROM eventos WHERE criado_em < ? AND acao != 'excluido' AND EXISTS (
+            SELECT 1 FROM eventos x
+            WHERE x.entidade = eventos.entidade AND x.entidade_id = eventos.entidade_id
+              AND x.seq > eventos.seq AND x.acao = 'excluido'
+        )
+    ''', (antes_de,))
+    removidos = cur.rowcount
+    # Estoque e status: vale o último
+    cur.execute(f'''
+        DELETE FROM eventos WHERE criado_em < ? AND acao IN ({marcadores}) AND EXISTS (
+            SELECT 1 FROM eventos x
+            WHERE x.entidade = eventos.entidade AND x.entidade_id = eventos.entidade_id
+              AND x.seq > eventos.seq AND x.acao = eventos.acao
+        )
+    ''', (antes_de, *ACOES_DE_ESTADO))
+    return removidos + cur.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    ler = comandos.add_parser('ler', help="Mostra eventos depois do cursor (um JSON por linha)")
+    ler.add_argument('--depois', help="Cursor devolvido pela leitura anterior")
+    ler.add_argument('--limite', type=int, default=100)
+    compactar = comandos.add_parser('compactar', help="Reduz os eventos antigos ao estado final de cada registro")
+    compactar.add_argument('--dias', type=int, default=DIAS_RETENCAO, help="Eventos mais novos que isso ficam inteiros")
+    args = parser.parse_args()
+
+    # O banco importa este módulo para criar a tabela
+    from database.banco import ler_eventos, compactar_eventos
+
+    if args.comando == 'ler':
+        try:
+            eventos, cursor, mais = ler_eventos(args.depois, args.limite)
+        except ValueError as e:
+            print(f"Erro: {e}", file=sys.stderr)
+            sys.exit(2)
+        for evento in eventos:
+            print(json.dumps(evento, ensure_ascii=False))
+        print(f"cursor: {cursor}{' (há mais)' if mais else ''}", file=sys.stderr)
+    else:
+        print(f"{compactar_eventos(args.dias)} eventos compactados (anteriores a {args.dias} dias)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+"""Importação em massa de pré-pedidos enviados pelas escolas (CSV ou JSONL)
+
+Uso: python -m database.importacao arquivo.csv [--escola Municipal] [--simular]
+         [--lote 200] [--trabalhadores 4] [--rejeitados rejeitados.csv]
+
+Cada linha é um item de pedido com as colunas:
+
+    nome, telefone, email            aluno/cliente (criado se não existir)
+    escola                           opcional se --escola for informado
+    produto, tamanho, cor            produto do catálogo da escola
+    quantidade                       padrão 1
+    referencia                       linhas seguidas com a mesma referência viram um só pedido
+    data_entrega, forma_pagamento, observacoes    opcionais
+
+No JSONL cada linha pode trazer os itens juntos em "itens": [{produto, tamanho, cor, quantidade}].
+A validação roda em um pool de processos; a gravação é feita por um único
+escritor, em transações de até --lote pedidos (com partições por escola,
+uma transação por escola do lote). Linhas rejeitadas vão para um
+CSV com o número da linha e o motivo.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from database.banco import (
+    get_connection, iniciar_escrita, inserir_pedido, normalizar_texto, normalizar_telefone, FORMAS_PAGAMENTO,
+    em_todas_as_escolas, agrupar_por_escola, auditoria
+)
+from database.eventos import publicar_evento
+from database.particoes import POR_ESCOLA, na_escola
+
+TAMANHO_LOTE = 200
+
+# =========================================
+# 📄 LEITURA DO ARQUIVO
+# =========================================
+
+def ler_registros(caminho):
+    """Lê o arquivo em fluxo, devolvendo (número da linha, registro)"""
+    if caminho.lower().endswith(('.jsonl', '.ndjson')):
+        with open(caminho, encoding='utf-8') as arquivo:
+            for numero, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except ValueError as e:
+                    registro = {'_erro': f"JSON inválido: {e}"}
+                yield numero, registro if isinstance(registro, dict) else {'_erro': "Esperado um objeto JSON"}
+    else:
+        # utf-8-sig: planilhas exportadas pelo Excel começam com BOM
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+            except csv.Error:
+                dialeto = csv.excel
+            leitor = csv.DictReader(arquivo, dialect=dialeto)
+            leitor.fieldnames = [normalizar_texto(coluna).replace(' ', '_') for coluna in leitor.fieldnames or []]
+            for registro in leitor:
+                yield leitor.line_num, registro
+
+def agrupar_pre_pedidos(registros):
+    """Junta linhas seguidas com a mesma referência em um pré-pedido"""
+    grupo, referencia_atual = [], None
+    for numero, registro in registros:
+        referencia = str(registro.get('referencia') or '').strip()
+        if grupo and not (referencia and referencia == referencia_atual):
+            yield grupo
+            grupo = []
+        grupo.append((numero, registro))
+        referencia_atual = referencia
+    if grupo:
+        yield grupo
+
+def em_blocos(iteravel, tamanho):
+    bloco = []
+    for item in iteravel:
+        bloco.append(item)
+        if len(bloco) == tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+# =========================================
+# ✅ VALIDAÇÃO (POOL DE PROCESSOS)
+# =========================================
+
+def ler_produtos():
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT id, escola_id, nome, tamanho, cor, preco FROM produtos").fetchall()
+    finally:
+        conn.close()
+
+def carregar_catalogo():
+    """Escolas e produtos indexados pelos nomes normalizados"""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id, nome FROM escolas")
+        escolas = {normalizar_texto(nome): escola_id for escola_id, nome in cur.fetchall()}
+
+        produtos = {}
+        linhas = ([linha for linhas in em_todas_as_escolas(ler_produtos).values() for linha in linhas]
+                  if POR_ESCOLA else ler_produtos())
+        for produto_id, escola_id, nome, tamanho, cor, preco in linhas:
+            chave = (escola_id, normalizar_texto(nome), normalizar_texto(tamanho))
+            # Sem cor na planilha vale o produto se só houver uma cor para o tamanho
+            produtos.setdefault(chave, {})[normalizar_texto(cor)] = (produto_id, preco or 0)
+        return {'escolas': escolas, 'produtos': produtos}
+    finally:
+        conn.close()
+
+_catalogo = None
+_escola_padrao = None
+
+def _iniciar_trabalhador(catalogo, escola_padrao):
+    global _catalogo, _escola_padrao
+    _catalogo = catalogo
+    _escola_padrao = escola_padrao
+
+def converter_data(valor):
+    valor = str(valor or '').strip()
+    if not valor:
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"Data de entrega inválida: {valor}")
+
+def resolver_produto(escola_id, item):
+    nome = normalizar_texto(item.get('produto'))
+    if not nome:
+        raise ValueError("Produto não informado")
+    tamanho = normalizar_texto(item.get('tamanho'))
+    cor = normalizar_texto(item.get('cor'))
+    cores = _catalogo['produtos'].get((escola_id, nome, tamanho), {})
+
+    if cor in cores:
+        return cores[cor]
+    if not cor and len(cores) == 1:
+        return next(iter(cores.values()))
+    descricao = f"{item.get('produto')} {item.get('tamanho') or ''} {item.get('cor') or ''}".strip()
+    if not cor and cores:
+        raise ValueError(f"Informe a cor de '{descricao}' ({len(cores)} cores cadastradas)")
+    raise ValueError(f"Produto não encontrado na escola: {descricao}")
+
+def validar_pre_pedido(grupo):
+    """Converte as linhas de um pré-pedido no formato de inserir_pedido (ou lança ValueError)"""
+    numero, primeiro = grupo[0]
+    if '_erro' in primeiro:
+        raise ValueError(primeiro['_erro'])
+
+    nome = str(primeiro.get('nome') or '').strip()
+    if not nome:
+        raise ValueError("Nome do cliente não informado")
+    nome_escola = primeiro.get('escola') or _escola_padrao
+    escola_id = _catalogo['escolas'].get(normalizar_texto(nome_escola))
+    if not escola_id:
+        raise ValueError(f"Escola não encontrada: {nome_escola or '(vazia)'}")
+
+    forma_pagamento = str(primeiro.get('forma_pagamento') or 'Dinheiro').strip()
+    if forma_pagamento not in FORMAS_PAGAMENTO:
+        raise ValueError(f"Forma de pagamento inválida: {forma_pagamento}")
+
+    itens_linhas = []
+    for _, registro in grupo:
+        itens_linhas.extend(registro['itens'] if isinstance(registro.get('itens'), list) else [registro])
+
+    itens = []
+    for item in itens_linhas:
+        if not isinstance(item, dict):
+            raise ValueError("Cada item deve ser um objeto JSON")
+        try:
+            quantidade = int(item.get('quantidade') or 1)
+        except (TypeError, ValueError):
+            raise ValueError(f"Quantidade inválida: {item.get('quantidade')}")
+        if quantidade <= 0:
+            raise ValueError("Quantidade deve ser maior que zero")
+        produto_id, preco = resolver_produto(escola_id, item)
+        itens.append({'produto_id': produto_id, 'quantidade': quantidade,
+                      'preco_unitario': preco, 'subtotal': preco * quantidade})
+
+    telefone = str(primeiro.get('telefone') or '').strip()
+    return {
+        'cliente': {
+            'nome': nome,
+            'telefone': telefone,
+            'email': str(primeiro.get('email') or '').strip(),
+            'nome_normalizado': normalizar_texto(nome),
+            'telefone_normalizado': normalizar_telefone(telefone),
+        },
+        'escola_id': escola_id,
+        'itens': itens,
+        'data_entrega': converter_data(primeiro.get('data_entrega')),
+        'forma_pagamento': forma_pagamento,
+        'observacoes': str(primeiro.get('observacoes') or '').strip(),
+    }
+
+def validar_bloco(bloco):
+    """Executado nos trabalhadores: (grupo, pedido validado ou None, motivo da rejeição)"""
+    resultados = []
+    for grupo in bloco:
+        try:
+            resultados.append((grupo, validar_pre_pedido(grupo), None))
+        except ValueError as e:
+            resultados.append((grupo, None, str(e)))
+    return resultados
+
+# =========================================
+# 💾 GRAVAÇÃO (ESCRITOR ÚNICO)
+# =========================================
+
+def localizar_cliente(cur, cliente):
+    """Mesmo nome e telefone; sem telefone, só um cliente com aquele nome"""
+    if cliente['telefone_normalizado']:
+        cur.execute("SELECT id FROM clientes WHERE nome_normalizado = ? AND telefone_normalizado = ?",
+                    (cliente['nome_normalizado'], cliente['telefone_normalizado']))
+        encontrado = cur.fetchone()
+        return encontrado[0] if encontrado else None
+
+    cur.execute("SELECT id FROM clientes WHERE nome_normalizado = ? LIMIT 2", (cliente['nome_normalizado'],))
+    encontrados = cur.fetchall()
+    return encontrados[0][0] if len(encontrados) == 1 else None
+
+class Importacao:
+    """Estado de uma importação: contadores, clientes criados e arquivo de rejeitados"""
+
+    def __init__(self, caminho_rejeitados, simular):
+        self.caminho_rejeitados = caminho_rejeitados
+        self.simular = simular
+        self.linhas = 0
+        self.pedidos = 0
+        self.clientes_novos = 0
+        self.rejeitados = 0
+        self._clientes_criados = {}
+        self._arquivo_rejeitados = None
+        self._escritor_rejeitados = None
+
+    def rejeitar(self, grupo, motivo):
+        if self._escritor_rejeitados is None:
+            self._arquivo_rejeitados = open(self.caminho_rejeitados, 'w', encoding='utf-8', newline='')
+            self._escritor_rejeitados = csv.writer(self._arquivo_rejeitados)
+            self._escritor_rejeitados.writerow(['linha', 'motivo', 'registro'])
+        for numero, registro in grupo:
+            self._escritor_rejeitados.writerow([numero, motivo, json.dumps(registro, ensure_ascii=False)])
+            self.rejeitados += 1
+
+    def cliente_id(self, cur, cliente):
+        chave = (cliente['nome_normalizado'], cliente['telefone_normalizado'])
+        if chave in self._clientes_criados:
+            return self._clientes_criados[chave]
+        cliente_id = localizar_cliente(cur, cliente)
+        if cliente_id is None:
+            self.clientes_novos += 1
+            if not self.simular:
+                cur.execute('''
+                    INSERT INTO clientes (nome, telefone, email, data_cadastro, nome_normalizado, telefone_normalizado)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cliente['nome'], cliente['telefone'], cliente['email'], datetime.now().strftime("%Y-%m-%d"),
+                      cliente['nome_normalizado'], cliente['telefone_normalizado']))
+                cliente_id = cur.lastrowid
+                # Na trilha só depois do commit: o cliente de um pedido desfeito sai junto com o ponto de retorno
+                auditoria.registrar('criar', 'cliente', cliente_id, {
+                    'nome': cliente['nome'], 'telefone': cliente['telefone'], 'origem': 'importacao'
+                }, conn=cur.connection)
+                publicar_evento(cur.connection, 'cliente', 'criado', cliente_id, {
+                    'nome': cliente['nome'], 'telefone': cliente['telefone'], 'email': cliente['email']
+                })
+            self._clientes_criados[chave] = cliente_id
+        return cliente_id
+
+    def gravar(self, conn, validados):
+        """Grava um lote de pedidos validados em uma transação (nada é gravado na simulação)"""
+        cur = conn.cursor()
+        if self.simular:
+            for grupo, pedido in validados:
+                self.cliente_id(cur, pedido['cliente'])
+                self.pedidos += 1
+            return
+
+        clientes_antes = dict(self._clientes_criados), self.clientes_novos
+        iniciar_escrita(conn)
+        try:
+            for grupo, pedido in validados:
+                marca = conn.abrir_ponto("pre_pedido")
+                conhecidos, novos_antes = len(self._clientes_criados), self.clientes_novos
+                try:
+                    cliente_id = self.cliente_id(cur, pedido['cliente'])
+                    inserir_pedido(cur, cliente_id, pedido['escola_id'], pedido['itens'],
+                                   pedido['data_entrega'], pedido['forma_pagamento'], pedido['observacoes'])
+                    cur.execute("RELEASE pre_pedido")
+                    self.pedidos += 1
+                except Exception as e:
+                    conn.voltar_ao_ponto("pre_pedido", marca)
+                    if len(self._clientes_criados) > conhecidos:
+                        # O cliente gravado para este pedido também foi desfeito
+                        self._clientes_criados.popitem()
+                        self.clientes_novos = novos_antes
+                    self.rejeitar(grupo, f"Erro ao gravar: {e}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Clientes do lote desfeito não existem mais no banco
+            self._clientes_criados, self.clientes_novos = clientes_antes
+            raise
+
+    def fechar(self):
+        if self._arquivo_rejeitados:
+            self._arquivo_rejeitados.close()
+
+    def resumo(self):
+        return {
+            'linhas': self.linhas,
+            'pedidos': self.pedidos,
+            'clientes_novos': self.clientes_novos,
+            'rejeitados': self.rejeitados,
+            'simulacao': self.simular,
+            'arquivo_rejeitados': self.caminho_rejeitados if self._escritor_rejeitados else None,
+        }
+
+def importar_pre_pedidos(caminho, escola_padrao=None, simular=False, tamanho_lote=TAMANHO_LOTE,
+                         trabalhadores=None, caminho_rejeitados=None, progresso=None):
+    """Importa o arquivo inteiro; progresso(resumo) é chamado a cada lote gravado"""
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+    caminho_rejeitados = caminho_rejeitados or os.path.splitext(caminho)[0] + '.rejeitados.csv'
+    importacao = Importacao(caminho_rejeitados, simular)
+    blocos = em_blocos(agrupar_pre_pedidos(ler_registros(caminho)), tamanho_lote)
+
+    conn = get_connection()
+    # spawn: processos limpos mesmo quando chamado de dentro do Streamlit (que tem threads)
+    contexto = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(trabalhadores, mp_context=contexto, initializer=_iniciar_trabalhador,
+                                 initargs=(carregar_catalogo(), escola_padrao)) as pool:
+            # Poucos blocos em andamento: o arquivo é lido conforme a gravação avança
+            em_andamento = deque()
+            for bloco in blocos:
+                em_andamento.append(pool.submit(validar_bloco, bloco))
+                if len(em_andamento) >= 2 * trabalhadores:
+                    gravar_bloco(importacao, conn, em_andamento.popleft().result(), progresso)
+            while em_andamento:
+                gravar_bloco(importacao, conn, em_andamento.popleft().result(), progresso)
+    finally:
+        conn.close()
+        importacao.fechar()
+    return importacao.resumo()
+
+def gravar_bloco(importacao, conn, resultados, progresso):
+    validados = []
+    for grupo, pedido, motivo in resultados:
+        importacao.linhas += len(grupo)
+        if pedido is None:
+            importacao.rejeitar(grupo, motivo)
+        else:
+            validados.append((grupo, pedido))
+    if validados and POR_ESCOLA:
+        # Uma transação por escola do lote, cada uma na partição da escola
+        for escola_id, grupo in agrupar_por_escola(validados, lambda validado: validado[1]['escola_id']).items():
+            with na_escola(escola_id):
+                conexao = get_connection()
+                try:
+                    importacao.gravar(conexao, [validado for _, validado in grupo])
+                finally:
+                    conexao.close()
+    elif validados:
+        importacao.gravar(conn, validados)
+    if progresso:
+        progresso(importacao.resumo())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('arquivo')
+    parser.add_argument('--escola', help="Escola das linhas sem a coluna 'escola'")
+    parser.add_argument('--simular', action='store_true', help="Valida tudo sem gravar no banco")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Pedidos por transação")
+    parser.add_argument('--trabalhadores', type=int, default=None, help="Processos de validação")
+    parser.add_argument('--rejeitados', help="CSV com as linhas rejeitadas (padrão: <arquivo>.rejeitados.csv)")
+    args = parser.parse_args()
+
+    def mostrar_progresso(resumo):
+        print(f"\r{resumo['linhas']} linhas | {resumo['pedidos']} pedidos | "
+              f"{resumo['clientes_novos']} clientes novos | {resumo['rejeitados']} rejeitadas",
+              end='', file=sys.stderr, flush=True)
+
+    resumo = importar_pre_pedidos(args.arquivo, args.escola, args.simular, args.lote,
+                                  args.trabalhadores, args.rejeitados, mostrar_progresso)
+    print(file=sys.stderr)
+    if resumo['simulacao']:
+        print("Simulação: nada foi gravado no banco.")
+    if resumo['arquivo_rejeitados']:
+        print(f"Linhas rejeitadas em {resumo['arquivo_rejeitados']}")
+    sys.exit(1 if resumo['rejeitados'] else 0)
+
+if __name__ == '__main__':
+    main()
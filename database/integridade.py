@@ -0,0 +1,254 @@
+"""Verificação de integridade de pedidos, itens e estoque
+
+Uso: python -m database.integridade [--corrigir] [--exemplos 10]
+
+Carrega pedidos, itens e produtos (da base quente e do arquivo) em
+DataFrames e confere as regras com operações vetorizadas:
+
+  totais          quantidade_total/valor_total do pedido = soma dos itens
+  sem_itens       pedido sem nenhum item
+  itens_orfaos    item cujo pedido não existe no mesmo banco
+  sem_produto     item cujo produto não existe mais
+  estoque         estoque e reservado não podem ser negativos
+  reservas        reservado = soma dos itens dos pedidos em aberto
+
+Com --corrigir, a leitura e as correções acontecem na mesma transação:
+totais e reservas são recalculados a partir dos itens e itens órfãos são
+apagados. Pedidos sem itens, itens sem produto e estoque negativo não têm
+correção automática; ficam no relatório para conferência manual. Sai com
+código 1 se sobrar alguma inconsistência. Com partições por escola, cada
+partição é conferida (e corrigida) na própria transação, em paralelo.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from database.banco import (
+    get_connection, anexar_arquivo, iniciar_escrita, auditoria, em_todas_as_escolas, tabelas_pedidos, STATUS_ABERTOS
+)
+from database.particoes import POR_ESCOLA
+from database.relatorios import carregar_dataframe
+from database.resumo_clientes import recalcular_resumo_clientes
+
+# Diferença de arredondamento aceita entre valor_total e a soma dos subtotais
+TOLERANCIA_VALOR = 0.005
+ORIGENS = ('main', 'arquivo')
+
+VERIFICACOES = {
+    'totais': "Totais do pedido diferentes da soma dos itens",
+    'sem_itens': "Pedidos sem itens",
+    'itens_orfaos': "Itens de pedidos inexistentes",
+    'sem_produto': "Itens de produtos inexistentes",
+    'estoque': "Estoque ou reservado negativo",
+    'reservas': "Reservado diferente dos itens em aberto",
+}
+
+# =========================================
+# 📥 CARGA EM COLUNAS
+# =========================================
+
+def carregar_tabelas(conn):
+    """Pedidos, itens e produtos em DataFrames; pedidos e itens com a coluna origem (main/arquivo)"""
+    cur = conn.cursor()
+    bancos = ['main'] + (['arquivo'] if anexar_arquivo(conn) else [])
+
+    pedidos, itens = [], []
+    for banco in bancos:
+        cur.execute(f"SELECT id, status, quantidade_total, valor_total FROM {banco}.pedidos")
+        df = carregar_dataframe(cur, ['id', 'status', 'quantidade_total', 'valor_total'])
+        df['origem'] = banco
+        pedidos.append(df)
+
+        cur.execute(f"SELECT id, pedido_id, produto_id, quantidade, subtotal FROM {banco}.pedido_itens")
+        df = carregar_dataframe(cur, ['id', 'pedido_id', 'produto_id', 'quantidade', 'subtotal'])
+        df['origem'] = banco
+        itens.append(df)
+
+    # Tabelas vazias (arquivo recém-criado) ficam fora do concat, que decidiria os tipos das colunas por elas
+    pedidos = pd.concat([df for df in pedidos if not df.empty] or pedidos[:1], ignore_index=True)
+    itens = pd.concat([df for df in itens if not df.empty] or itens[:1], ignore_index=True)
+    if len(bancos) > 1:
+        # Cópia arquivada de um pedido ainda na base quente (arquivamento interrompido): vale a da base quente
+        na_base_quente = pedidos.loc[pedidos['origem'] == 'main', 'id']
+        pedidos = pedidos[(pedidos['origem'] == 'main') | ~pedidos['id'].isin(na_base_quente)]
+        itens = itens[(itens['origem'] == 'main') | ~itens['pedido_id'].isin(na_base_quente)]
+
+    for df in (pedidos, itens):
+        df['origem'] = pd.Categorical(df['origem'], categories=ORIGENS)
+        for coluna in ('quantidade_total', 'quantidade'):
+            if coluna in df:
+                df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0).astype('int64')
+        for coluna in ('valor_total', 'subtotal'):
+            if coluna in df:
+                df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0.0)
+
+    cur.execute("SELECT id, nome, estoque, reservado FROM produtos")
+    produtos = carregar_dataframe(cur, ['id', 'nome', 'estoque', 'reservado'])
+    produtos[['estoque', 'reservado']] = produtos[['estoque', 'reservado']].fillna(0).astype('int64')
+    return pedidos, itens.reset_index(drop=True), produtos
+
+# =========================================
+# 🔎 REGRAS
+# =========================================
+
+def conferir_pedidos(pedidos, itens):
+    """Totais recalculados pelos itens e pedidos sem itens"""
+    somas = itens.groupby(['origem', 'pedido_id'], observed=True).agg(
+        itens=('id', 'size'), quantidade_itens=('quantidade', 'sum'), valor_itens=('subtotal', 'sum')
+    )
+    df = pedidos.join(somas, on=['origem', 'id'])
+    sem_itens = df['itens'].isna()
+
+    divergentes = df[~sem_itens & (
+        (df['quantidade_total'] != df['quantidade_itens'])
+        | ((df['valor_total'] - df['valor_itens']).abs() > TOLERANCIA_VALOR)
+    )]
+    totais = divergentes[['origem', 'id', 'status', 'quantidade_total', 'quantidade_itens', 'valor_total', 'valor_itens']]
+    totais = totais.assign(quantidade_itens=totais['quantidade_itens'].astype('int64'),
+                           valor_itens=totais['valor_itens'].round(2))
+    return totais, df.loc[sem_itens, ['origem', 'id', 'status', 'quantidade_total', 'valor_total']]
+
+def conferir_itens(pedidos, itens, produtos):
+    """Itens cujo pedido (no mesmo banco) ou produto não existe"""
+    chaves_pedidos = pd.MultiIndex.from_frame(pedidos[['origem', 'id']])
+    chaves_itens = pd.MultiIndex.from_frame(itens[['origem', 'pedido_id']].set_axis(['origem', 'id'], axis=1))
+    orfaos = itens[~chaves_itens.isin(chaves_pedidos)]
+    sem_produto = itens[~itens['produto_id'].isin(produtos['id'])]
+    return orfaos, sem_produto
+
+def conferir_estoque(produtos):
+    return produtos[(produtos['estoque'] < 0) | (produtos['reservado'] < 0)]
+
+def conferir_reservas(pedidos, itens, produtos):
+    """Reservado de cada produto contra a soma dos itens dos pedidos em aberto (sempre na base quente)"""
+    abertos = pedidos.loc[(pedidos['origem'] == 'main') & pedidos['status'].isin(STATUS_ABERTOS), 'id']
+    em_aberto = itens[(itens['origem'] == 'main') & itens['pedido_id'].isin(abertos)]
+    esperado = em_aberto.groupby('produto_id')['quantidade'].sum()
+
+    df = produtos.assign(reservado_itens=produtos['id'].map(esperado).fillna(0).astype('int64'))
+    return df.loc[df['reservado'] != df['reservado_itens'], ['id', 'nome', 'estoque', 'reservado', 'reservado_itens']]
+
+def verificar(conn):
+    """Roda todas as regras; retorna {verificação: DataFrame com as linhas inconsistentes}"""
+    pedidos, itens, produtos = carregar_tabelas(conn)
+    totais, sem_itens = conferir_pedidos(pedidos, itens)
+    orfaos, sem_produto = conferir_itens(pedidos, itens, produtos)
+    return {
+        'totais': totais,
+        'sem_itens': sem_itens,
+        'itens_orfaos': orfaos,
+        'sem_produto': sem_produto,
+        'estoque': conferir_estoque(produtos),
+        'reservas': conferir_reservas(pedidos, itens, produtos),
+    }
+
+# =========================================
+# 🔧 CORREÇÕES
+# =========================================
+
+def corrigir(conn, problemas):
+    """Aplica as correções automáticas na transação aberta; retorna {verificação: linhas corrigidas}"""
+    cur = conn.cursor()
+    corrigidos = {}
+
+    totais = problemas['totais']
+    for origem in ORIGENS:
+        df = totais[totais['origem'] == origem]
+        if df.empty:
+            continue
+        cur.executemany(
+            f"UPDATE {origem}.pedidos SET quantidade_total = ?, valor_total = ? WHERE id = ?",
+            zip(df['quantidade_itens'].tolist(), df['valor_itens'].tolist(), df['id'].tolist())
+        )
+        corrigidos['totais'] = corrigidos.get('totais', 0) + len(df)
+    for linha in totais.itertuples(index=False):
+        auditoria.registrar('integridade', 'pedido', linha.id, {
+            'origem': linha.origem, 'quantidade_total': [linha.quantidade_total, linha.quantidade_itens],
+            'valor_total': [linha.valor_total, linha.valor_itens]
+        }, conn=conn)
+
+    orfaos = problemas['itens_orfaos']
+    for origem in ORIGENS:
+        ids = orfaos.loc[orfaos['origem'] == origem, 'id'].tolist()
+        if ids:
+            cur.executemany(f"DELETE FROM {origem}.pedido_itens WHERE id = ?", [(i,) for i in ids])
+            corrigidos['itens_orfaos'] = corrigidos.get('itens_orfaos', 0) + len(ids)
+    for linha in orfaos.itertuples(index=False):
+        auditoria.registrar('integridade', 'item', linha.id, {
+            'origem': linha.origem, 'pedido_id': linha.pedido_id, 'produto_id': linha.produto_id,
+            'quantidade': linha.quantidade, 'removido': True
+        }, conn=conn)
+
+    reservas = problemas['reservas']
+    if not reservas.empty:
+        cur.executemany("UPDATE produtos SET reservado = ? WHERE id = ?",
+                        zip(reservas['reservado_itens'].tolist(), reservas['id'].tolist()))
+        corrigidos['reservas'] = len(reservas)
+    for linha in reservas.itertuples(index=False):
+        auditoria.registrar('integridade', 'produto', linha.id,
+                            {'reservado': [linha.reservado, linha.reservado_itens]}, conn=conn)
+
+    # Totais do arquivo e itens órfãos mudam sem passar pelos gatilhos do resumo de clientes
+    if corrigidos.get('totais') or corrigidos.get('itens_orfaos'):
+        recalcular_resumo_clientes(cur, *tabelas_pedidos(conn))
+    return corrigidos
+
+def verificar_integridade(corrigir_problemas=False):
+    """Confere (e opcionalmente corrige) a base; retorna (problemas, corrigidos)"""
+    por_escola = list(em_todas_as_escolas(verificar_banco, corrigir_problemas).values()) if POR_ESCOLA else []
+    if not por_escola:
+        return verificar_banco(corrigir_problemas)
+
+    problemas = {nome: pd.concat([p[nome] for p, _ in por_escola], ignore_index=True) for nome in VERIFICACOES}
+    corrigidos = {}
+    for _, corrigidos_escola in por_escola:
+        for nome, quantidade in corrigidos_escola.items():
+            corrigidos[nome] = corrigidos.get(nome, 0) + quantidade
+    return problemas, corrigidos
+
+def verificar_banco(corrigir_problemas):
+    """Confere o banco em uso (da loja ou da partição da escola atual)"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Erro de conexão com o banco")
+
+    try:
+        if not corrigir_problemas:
+            return verificar(conn), {}
+
+        # ATTACH antes da transação; leitura e correção sob a mesma trava de escrita
+        anexar_arquivo(conn)
+        iniciar_escrita(conn)
+        problemas = verificar(conn)
+        corrigidos = corrigir(conn, problemas)
+        conn.commit()
+        return problemas, corrigidos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corrigir', action='store_true', help="Recalcula totais e reservas e apaga itens órfãos")
+    parser.add_argument('--exemplos', type=int, default=10, help="Linhas mostradas por verificação")
+    args = parser.parse_args()
+
+    problemas, corrigidos = verificar_integridade(args.corrigir)
+
+    pendentes = 0
+    for nome, descricao in VERIFICACOES.items():
+        df = problemas[nome]
+        corrigido = corrigidos.get(nome, 0)
+        marca = "✅" if df.empty else ("🔧" if corrigido == len(df) else "❌")
+        print(f"{marca} {descricao}: {len(df)}" + (f" ({corrigido} corrigidos)" if corrigido else ""))
+        if not df.empty and args.exemplos:
+            print(df.head(args.exemplos).to_string(index=False), end='\n\n')
+        pendentes += len(df) - corrigido
+
+    sys.exit(1 if pendentes else 0)
+
+if __name__ == '__main__':
+    main()
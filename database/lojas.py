@@ -0,0 +1,328 @@
+"""Lojas: cada loja tem o próprio banco SQLite (com arquivo morto, auditoria e relatórios)
+
+Uso: python -m database.lojas listar
+     python -m database.lojas adicionar CODIGO "Nome da loja" [--banco caminho.db]
+     python -m database.lojas vincular USUARIO CODIGO [--mover]
+
+Sem FARDAMENTOS_LOJAS o sistema tem uma loja só, 'principal', no
+FARDAMENTOS_DB de sempre. Com ele, o arquivo indicado guarda o cadastro
+das lojas e a loja de cada usuário; quem não está vinculado entra na loja
+padrão (FARDAMENTOS_LOJA, ou a primeira cadastrada).
+
+O roteador mantém por processo, para cada loja, um pool de conexões, o
+cache do catálogo e o buffer de auditoria. A loja da sessão ou requisição
+fica em uma ContextVar (definir_loja); as linhas de comando usam a loja de
+FARDAMENTOS_LOJA. Como cada loja escreve no próprio arquivo, a trava de
+escrita de uma não segura as outras. Com FARDAMENTOS_POR_ESCOLA=1, cada
+loja ainda divide os pedidos em partições por escola (database.particoes).
+"""
+import argparse
+import contextvars
+import functools
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from database.auditoria import BufferAuditoria
+from database.cache import obter_cache
+from database.catalogo import obter_catalogo
+from database.particoes import POR_ESCOLA, ParticoesEscolas, escola_atual, em_paralelo
+from database.pool import PoolConexoes
+
+# Vários processos do Streamlit podem apontar para o mesmo arquivo
+CAMINHO_BANCO = os.environ.get('FARDAMENTOS_DB', 'fardamentos.db')
+# Pedidos fechados antigos vão para este arquivo (ver database/arquivamento.py)
+CAMINHO_ARQUIVO = os.environ.get('FARDAMENTOS_ARQUIVO', os.path.splitext(CAMINHO_BANCO)[0] + '_arquivo.db')
+# Trilha de auditoria em arquivo próprio (ver database/auditoria.py)
+CAMINHO_AUDITORIA = os.environ.get('FARDAMENTOS_AUDITORIA', os.path.splitext(CAMINHO_BANCO)[0] + '_auditoria.db')
+PASTA_RELATORIOS = os.environ.get(
+    'FARDAMENTOS_RELATORIOS',
+    os.path.join(os.path.dirname(os.path.abspath(CAMINHO_BANCO)), 'relatorios')
+)
+
+# Cadastro de lojas; sem ele, loja única
+CAMINHO_LOJAS = os.environ.get('FARDAMENTOS_LOJAS')
+LOJA_UNICA = 'principal'
+
+MAXIMO_THREADS = 8   # Lojas consultadas ao mesmo tempo nos relatórios gerais
+
+class Loja(NamedTuple):
+    codigo: str
+    nome: str
+    caminho_db: str
+    caminho_arquivo: str
+    caminho_auditoria: str
+    pasta_relatorios: str
+
+def montar_loja(codigo, nome, caminho_db):
+    """Arquivo morto, auditoria e relatórios ao lado do banco da loja"""
+    base = os.path.splitext(caminho_db)[0]
+    return Loja(codigo, nome, caminho_db, base + '_arquivo.db', base + '_auditoria.db',
+                os.path.join(os.path.dirname(os.path.abspath(caminho_db)), 'relatorios', codigo))
+
+LOJA_PRINCIPAL = Loja(LOJA_UNICA, 'Loja', CAMINHO_BANCO, CAMINHO_ARQUIVO, CAMINHO_AUDITORIA, PASTA_RELATORIOS)
+
+# =========================================
+# 🏬 CADASTRO DE LOJAS
+# =========================================
+
+def _conectar_cadastro():
+    conn = sqlite3.connect(CAMINHO_LOJAS)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS lojas (
+            codigo TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            caminho_db TEXT UNIQUE NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usuarios_lojas (
+            username TEXT PRIMARY KEY,
+            loja TEXT NOT NULL REFERENCES lojas(codigo)
+        )
+    ''')
+    return conn
+
+def _caminho_absoluto(caminho_db):
+    """Caminhos relativos no cadastro valem a partir da pasta do próprio cadastro"""
+    return os.path.join(os.path.dirname(os.path.abspath(CAMINHO_LOJAS)), caminho_db)
+
+def _memorizar_cadastro(funcao):
+    """Guarda as leituras do cadastro até o próximo commit nele (de qualquer processo)"""
+    memorizada = None
+
+    @functools.wraps(funcao)
+    def envolvida(*args):
+        nonlocal memorizada
+        if memorizada is None:
+            _conectar_cadastro().close()  # Cria as tabelas antes da sentinela do cache
+            memorizada = obter_cache(CAMINHO_LOJAS).memorizar(funcao)
+        return memorizada(*args)
+
+    return envolvida
+
+@_memorizar_cadastro
+def _lojas_cadastradas():
+    conn = _conectar_cadastro()
+    try:
+        return tuple(montar_loja(codigo, nome, _caminho_absoluto(caminho_db))
+                     for codigo, nome, caminho_db in conn.execute("SELECT codigo, nome, caminho_db FROM lojas ORDER BY codigo"))
+    finally:
+        conn.close()
+
+@_memorizar_cadastro
+def _vinculo_usuario(username):
+    conn = _conectar_cadastro()
+    try:
+        linha = conn.execute("SELECT loja FROM usuarios_lojas WHERE username = ?", (username,)).fetchone()
+        # Tupla: resultado vazio não fica no cache
+        return (linha[0] if linha else None,)
+    finally:
+        conn.close()
+
+def listar_lojas():
+    if not CAMINHO_LOJAS:
+        return [LOJA_PRINCIPAL]
+    return list(_lojas_cadastradas())
+
+def obter_loja(codigo):
+    for loja in listar_lojas():
+        if loja.codigo == codigo:
+            return loja
+    raise LookupError(f"Loja '{codigo}' não cadastrada")
+
+def loja_padrao():
+    lojas = listar_lojas()
+    if not lojas:
+        raise LookupError(f"Nenhuma loja cadastrada em {CAMINHO_LOJAS}")
+    codigo = os.environ.get('FARDAMENTOS_LOJA')
+    return obter_loja(codigo) if codigo else lojas[0]
+
+def loja_vinculada(username):
+    """Código da loja a que o usuário está vinculado, ou None"""
+    return _vinculo_usuario(username)[0] if CAMINHO_LOJAS else None
+
+def loja_do_usuario(username):
+    """Código da loja do usuário (a padrão, se ele não estiver vinculado)"""
+    return loja_vinculada(username) or loja_padrao().codigo
+
+def adicionar_loja(codigo, nome, caminho_db=None):
+    conn = _conectar_cadastro()
+    try:
+        conn.execute("INSERT INTO lojas (codigo, nome, caminho_db) VALUES (?, ?, ?)",
+                     (codigo, nome, caminho_db or f"{codigo}.db"))
+        conn.commit()
+        return True, f"Loja {codigo} ({nome}) cadastrada"
+    except sqlite3.IntegrityError:
+        return False, "Já existe uma loja com este código ou banco"
+    finally:
+        conn.close()
+
+def vincular_usuario(username, codigo, mover=False):
+    """Liga o usuário à loja; sem cadastro de lojas não há o que vincular.
+    Usuário de outra loja só muda de loja com mover=True"""
+    if not CAMINHO_LOJAS:
+        return True, ""
+    obter_loja(codigo)
+    conn = _conectar_cadastro()
+    try:
+        if mover:
+            conn.execute("UPDATE usuarios_lojas SET loja = ? WHERE username = ?", (codigo, username))
+        try:
+            conn.execute("INSERT INTO usuarios_lojas (username, loja) VALUES (?, ?)", (username, codigo))
+        except sqlite3.IntegrityError:
+            atual = conn.execute("SELECT loja FROM usuarios_lojas WHERE username = ?", (username,)).fetchone()[0]
+            if atual != codigo:
+                conn.rollback()
+                return False, f"Usuário {username} já pertence à loja {atual}"
+        conn.commit()
+        return True, f"Usuário {username} vinculado à loja {codigo}"
+    finally:
+        conn.close()
+
+def desvincular_usuario(username, codigo):
+    """Desfaz o vínculo do usuário com a loja (se ainda for esta)"""
+    if not CAMINHO_LOJAS:
+        return
+    conn = _conectar_cadastro()
+    try:
+        conn.execute("DELETE FROM usuarios_lojas WHERE username = ? AND loja = ?", (username, codigo))
+        conn.commit()
+    finally:
+        conn.close()
+
+# =========================================
+# 🔀 ROTEADOR
+# =========================================
+
+loja_atual = contextvars.ContextVar('loja_atual', default=None)
+
+def definir_loja(codigo):
+    loja_atual.set(codigo)
+
+@contextmanager
+def na_loja(codigo):
+    """Roda o bloco na loja indicada e volta à anterior"""
+    token = loja_atual.set(codigo)
+    try:
+        yield
+    finally:
+        loja_atual.reset(token)
+
+class RecursosLoja:
+    """Pool, cache do catálogo e auditoria de uma loja, criados uma vez por processo"""
+
+    def __init__(self, loja):
+        self.loja = loja
+        self.caminho_arquivo = loja.caminho_arquivo
+        self.pool = PoolConexoes(loja.caminho_db)
+        self.cache = obter_cache(loja.caminho_db)
+        self.catalogo = obter_catalogo(loja.caminho_db)
+        self.auditoria = BufferAuditoria(loja.caminho_auditoria)
+        # Com partições por escola, o banco da loja fica só com o catálogo (ver database/particoes.py)
+        self.particoes = ParticoesEscolas(loja) if POR_ESCOLA else None
+
+    def banco(self):
+        """Pool, cache, catálogo e arquivo morto em uso: a partição da escola atual ou o banco da loja"""
+        escola_id = escola_atual.get()
+        if self.particoes is None or escola_id is None:
+            return self
+        return self.particoes.obter(escola_id)
+
+class RoteadorLojas:
+    def __init__(self):
+        self._recursos = {}
+        self._lock = threading.Lock()
+
+    def recursos(self, codigo=None):
+        """Recursos da loja indicada ou da loja atual"""
+        codigo = codigo or loja_atual.get() or loja_padrao().codigo
+        recursos = self._recursos.get(codigo)
+        if recursos is None:
+            loja = obter_loja(codigo)
+            with self._lock:
+                recursos = self._recursos.setdefault(codigo, RecursosLoja(loja))
+        return recursos
+
+    def loja(self):
+        return self.recursos().loja
+
+    def banco(self):
+        return self.recursos().banco()
+
+    def auditoria(self):
+        return self.recursos().auditoria
+
+roteador = RoteadorLojas()
+
+class AuditoriaDaLoja:
+    """Encaminha registrar/buscar/gravar para o buffer de auditoria da loja atual"""
+
+    def __getattr__(self, nome):
+        return getattr(roteador.auditoria(), nome)
+
+# =========================================
+# 🌐 CONSULTAS EM TODAS AS LOJAS
+# =========================================
+
+def em_todas_as_lojas(funcao, *args, lojas=None, **kwargs):
+    """Roda funcao em cada loja, em paralelo; retorna {Loja: resultado} na ordem do cadastro"""
+    lojas = lojas or listar_lojas()
+    resultados = em_paralelo(loja_atual, [loja.codigo for loja in lojas], funcao, args, kwargs,
+                             maximo=MAXIMO_THREADS, nome='lojas')
+    return dict(zip(lojas, resultados))
+
+def juntar_por_loja(resultados, coluna='Loja'):
+    """Um DataFrame só, com a coluna da loja na frente"""
+    import pandas as pd
+    partes = [df.assign(**{coluna: loja.nome}) for loja, df in resultados.items() if df is not None and not df.empty]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    return df[[coluna] + [c for c in df.columns if c != coluna]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('listar', help="Lojas cadastradas")
+    adicionar = comandos.add_parser('adicionar', help="Cadastra uma loja e cria o seu banco")
+    adicionar.add_argument('codigo')
+    adicionar.add_argument('nome')
+    adicionar.add_argument('--banco', help="Arquivo SQLite da loja (padrão: CODIGO.db ao lado do cadastro)")
+    vincular = comandos.add_parser('vincular', help="Define a loja de um usuário")
+    vincular.add_argument('username')
+    vincular.add_argument('codigo')
+    vincular.add_argument('--mover', action='store_true', help="Tira o usuário da loja em que já está")
+    args = parser.parse_args()
+
+    if args.comando != 'listar' and not CAMINHO_LOJAS:
+        print("Erro: defina FARDAMENTOS_LOJAS com o arquivo do cadastro de lojas", file=sys.stderr)
+        sys.exit(2)
+
+    if args.comando == 'listar':
+        for loja in listar_lojas():
+            print(f"{loja.codigo:15s} {loja.nome:30s} {loja.caminho_db}")
+        return
+
+    if args.comando == 'adicionar':
+        sucesso, mensagem = adicionar_loja(args.codigo, args.nome, args.banco)
+        if sucesso:
+            # Como __main__, este módulo não é o database.lojas que o banco usa para rotear
+            from database import lojas
+            from database.banco import init_db
+            os.makedirs(os.path.dirname(obter_loja(args.codigo).caminho_db), exist_ok=True)
+            with lojas.na_loja(args.codigo):
+                init_db()
+    else:
+        try:
+            sucesso, mensagem = vincular_usuario(args.username, args.codigo, args.mover)
+        except LookupError as e:
+            sucesso, mensagem = False, str(e)
+    print(mensagem if sucesso else f"Erro: {mensagem}", file=sys.stdout if sucesso else sys.stderr)
+    sys.exit(0 if sucesso else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,584 @@
+"""Caixa offline: pedidos e movimentos de estoque gravados no aparelho e sincronizados depois
+
+Uso: python -m database.offline sincronizar --servidor http://servidor:8502 --usuario vendedor [--lote 200]
+     python -m database.offline status
+
+No aparelho do caixa (tablet ou notebook do evento), FilaOffline grava cada
+operação em um SQLite local (FARDAMENTOS_FILA) com um uuid gerado ali
+mesmo, sem depender da rede. O catálogo das escolas fica guardado junto e
+é renovado a cada sincronização, para o caixa ter ids e preços.
+
+'sincronizar' envia as operações pendentes para POST /sincronizacao da API,
+em lotes. No servidor, receber_operacoes aplica o lote em uma transação
+(uma por escola, com partições) e grava o uuid em sync_recebidos na mesma
+transação: o reenvio de um lote cuja resposta se perdeu devolve o
+resultado guardado em vez de duplicar o pedido. Clientes cadastrados no
+caixa são criados antes dos pedidos e excluídos de novo se nenhum pedido
+deles entrar. A senha vem de FARDAMENTOS_SENHA ou é pedida no terminal.
+
+Conflitos de estoque: vale o servidor. Pedidos entram mesmo sem
+disponível, como no formulário, com os alertas em 'conflitos'. Movimentos
+de estoque chegam como ajuste (+/-), não como valor final, e somam com o
+que mudou no servidor enquanto o caixa estava sem rede. Uma saída que
+deixaria o estoque abaixo do reservado pelos pedidos em aberto (ou
+negativo) para ali, sem deixar o disponível negativo, e também volta em
+'conflitos'.
+"""
+import argparse
+import base64
+import getpass
+import http.client
+import json
+import os
+import sqlite3
+import sys
+import uuid
+from datetime import date, datetime
+from urllib.parse import urlsplit
+
+from database.banco import (
+    get_connection, iniciar_escrita, inserir_pedido, mensagem_pedido_criado, listar_escolas, excluir_cliente, auditoria,
+    normalizar_texto, normalizar_telefone, em_lotes_por_escola, FORMAS_PAGAMENTO
+)
+from database.eventos import publicar_evento
+from database.particoes import POR_ESCOLA, escola_do_id
+
+CAMINHO_FILA = os.environ.get('FARDAMENTOS_FILA', 'fardamentos_fila.db')
+TAMANHO_LOTE = 200   # Operações por requisição (a API aceita até 500)
+TIPOS = ('pedido', 'estoque')
+
+# =========================================
+# 📱 FILA NO APARELHO
+# =========================================
+
+class FilaOffline:
+    """Operações do caixa guardadas no aparelho até a sincronização"""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or CAMINHO_FILA
+        self.conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS operacoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid TEXT UNIQUE NOT NULL,
+                tipo TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                criada_em TEXT NOT NULL,
+                enviada_em TEXT,
+                resultado TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_operacoes_pendentes ON operacoes(seq) WHERE enviada_em IS NULL;
+            CREATE TABLE IF NOT EXISTS catalogo (
+                escola_id INTEGER PRIMARY KEY,
+                nome TEXT,
+                produtos TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL
+            );
+        ''')
+
+    def registrar(self, tipo, dados):
+        """Grava a operação na fila; retorna o uuid dela"""
+        identificador = str(uuid.uuid4())
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO operacoes (uuid, tipo, dados, criada_em) VALUES (?, ?, ?, ?)",
+                (identificador, tipo, json.dumps(dados, ensure_ascii=False), datetime.now().astimezone().isoformat())
+            )
+        return identificador
+
+    def registrar_pedido(self, escola_id, itens, cliente_id=None, cliente=None, data_entrega=None,
+                         forma_pagamento='Dinheiro', observacoes=''):
+        """Pedido vendido sem rede: cliente_id de um cliente já cadastrado ou cliente={nome, telefone, email}"""
+        if not cliente_id and not (cliente and cliente.get('nome')):
+            raise ValueError("Informe o cliente do pedido")
+        if not itens:
+            raise ValueError("Pedido sem itens")
+        return self.registrar('pedido', {
+            'cliente_id': cliente_id,
+            'cliente': None if cliente_id else cliente,
+            'escola_id': escola_id,
+            'itens': [{'produto_id': item['produto_id'], 'quantidade': item['quantidade'],
+                       'preco_unitario': item.get('preco_unitario')} for item in itens],
+            'data_entrega': data_entrega,
+            'forma_pagamento': forma_pagamento,
+            'observacoes': observacoes,
+        })
+
+    def registrar_ajuste_estoque(self, produto_id, ajuste, motivo=''):
+        """Entrada (+) ou saída (-) de estoque"""
+        if not ajuste:
+            raise ValueError("O ajuste não pode ser zero")
+        return self.registrar('estoque', {'produto_id': produto_id, 'ajuste': ajuste, 'motivo': motivo})
+
+    def pendentes(self, limite=TAMANHO_LOTE):
+        """Próximas operações a enviar, na ordem em que foram feitas"""
+        cur = self.conn.execute('''
+            SELECT uuid, tipo, dados, criada_em FROM operacoes
+            WHERE enviada_em IS NULL ORDER BY seq LIMIT ?
+        ''', (limite,))
+        return [{'uuid': linha['uuid'], 'tipo': linha['tipo'], 'dados': json.loads(linha['dados']),
+                 'criada_em': linha['criada_em']} for linha in cur]
+
+    def marcar_enviadas(self, resultados):
+        """Guarda o resultado das operações que o servidor resolveu (aplicadas ou recusadas de vez)"""
+        agora = datetime.now().astimezone().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE operacoes SET enviada_em = ?, resultado = ? WHERE uuid = ?",
+                [(agora, json.dumps(resultado, ensure_ascii=False), identificador)
+                 for identificador, resultado in resultados]
+            )
+
+    def resumo(self):
+        linha = self.conn.execute('''
+            SELECT COUNT(*) FILTER (WHERE enviada_em IS NULL),
+                   COUNT(*) FILTER (WHERE json_extract(resultado, '$.sucesso')),
+                   COUNT(*) FILTER (WHERE enviada_em IS NOT NULL AND NOT json_extract(resultado, '$.sucesso')),
+                   COUNT(*) FILTER (WHERE json_array_length(resultado, '$.conflitos') > 0)
+            FROM operacoes
+        ''').fetchone()
+        return dict(zip(('pendentes', 'aplicadas', 'recusadas', 'conflitos'), linha))
+
+    def com_aviso(self, limite=50):
+        """Operações recusadas ou aplicadas com conflito, mais recentes primeiro, para conferência"""
+        cur = self.conn.execute('''
+            SELECT criada_em, tipo, dados, resultado FROM operacoes
+            WHERE NOT json_extract(resultado, '$.sucesso') OR json_array_length(resultado, '$.conflitos') > 0
+            ORDER BY seq DESC LIMIT ?
+        ''', (limite,))
+        return [(linha['criada_em'], linha['tipo'], json.loads(linha['dados']), json.loads(linha['resultado']))
+                for linha in cur]
+
+    def guardar_catalogo(self, escolas, produtos):
+        """Troca o catálogo guardado pelo que veio do servidor ({escola_id: [produtos]})"""
+        agora = datetime.now().astimezone().isoformat()
+        with self.conn:
+            self.conn.execute("DELETE FROM catalogo")
+            self.conn.executemany(
+                "INSERT INTO catalogo (escola_id, nome, produtos, atualizado_em) VALUES (?, ?, ?, ?)",
+                [(escola['id'], escola['nome'], json.dumps(produtos.get(escola['id'], []), ensure_ascii=False), agora)
+                 for escola in escolas]
+            )
+
+    def escolas(self):
+        return [dict(linha) for linha in self.conn.execute("SELECT escola_id AS id, nome FROM catalogo ORDER BY nome")]
+
+    def produtos(self, escola_id):
+        """Produtos da escola como estavam na última sincronização"""
+        linha = self.conn.execute("SELECT produtos FROM catalogo WHERE escola_id = ?", (escola_id,)).fetchone()
+        return json.loads(linha['produtos']) if linha else []
+
+    def fechar(self):
+        self.conn.close()
+
+# =========================================
+# 🔁 RECEPÇÃO NO SERVIDOR
+# =========================================
+
+def falha(operacao, mensagem, reenviar=False):
+    """Operação não aplicada; reenviar=True é erro passageiro e o caixa manda de novo depois"""
+    identificador = operacao.get('uuid') if isinstance(operacao, dict) else None
+    return {'uuid': identificador, 'sucesso': False, 'mensagem': mensagem, 'reenviar': reenviar}
+
+def _inteiro(valor, nome):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{nome}' deve ser um número inteiro")
+
+def validar_pedido(dados, escolas):
+    escola_id = _inteiro(dados.get('escola_id'), 'escola_id')
+    if escola_id not in escolas:
+        raise ValueError(f"Escola {escola_id} não encontrada")
+
+    itens = dados.get('itens')
+    if not isinstance(itens, list) or not itens:
+        raise ValueError("'itens' deve ser uma lista não vazia")
+    itens_validos = []
+    for item in itens:
+        if not isinstance(item, dict):
+            raise ValueError("Cada item deve ser um objeto JSON")
+        quantidade = _inteiro(item.get('quantidade'), 'quantidade')
+        if quantidade <= 0:
+            raise ValueError("'quantidade' deve ser maior que zero")
+        preco_unitario = item.get('preco_unitario')
+        try:
+            preco_unitario = None if preco_unitario is None else float(preco_unitario)
+        except (TypeError, ValueError):
+            raise ValueError("'preco_unitario' deve ser um número")
+        if preco_unitario is not None and not preco_unitario >= 0:
+            raise ValueError("'preco_unitario' não pode ser negativo")
+        itens_validos.append({'produto_id': _inteiro(item.get('produto_id'), 'produto_id'),
+                              'quantidade': quantidade, 'preco_unitario': preco_unitario})
+
+    forma_pagamento = dados.get('forma_pagamento') or 'Dinheiro'
+    if forma_pagamento not in FORMAS_PAGAMENTO:
+        raise ValueError(f"Forma de pagamento inválida: {forma_pagamento}")
+    data_entrega = dados.get('data_entrega') or None
+    if data_entrega:
+        try:
+            data_entrega = date.fromisoformat(str(data_entrega)).isoformat()
+        except ValueError:
+            raise ValueError("'data_entrega' deve estar no formato AAAA-MM-DD")
+
+    cliente = dados.get('cliente')
+    if dados.get('cliente_id') is not None:
+        cliente_id, cliente = _inteiro(dados['cliente_id'], 'cliente_id'), None
+    elif isinstance(cliente, dict) and str(cliente.get('nome') or '').strip():
+        cliente_id = None
+        cliente = {campo: str(cliente.get(campo) or '').strip() for campo in ('nome', 'telefone', 'email')}
+    else:
+        raise ValueError("Informe 'cliente_id' ou 'cliente' com o nome")
+
+    return {
+        'cliente_id': cliente_id, 'cliente': cliente, 'escola_id': escola_id, 'itens': itens_validos,
+        'data_entrega': data_entrega, 'forma_pagamento': forma_pagamento,
+        'observacoes': str(dados.get('observacoes') or '').strip(),
+    }
+
+def validar_ajuste(dados, escolas):
+    produto_id = _inteiro(dados.get('produto_id'), 'produto_id')
+    ajuste = _inteiro(dados.get('ajuste'), 'ajuste')
+    if not ajuste:
+        raise ValueError("'ajuste' não pode ser zero")
+    if POR_ESCOLA and escola_do_id(produto_id) not in escolas:
+        raise ValueError(f"Produto {produto_id} não encontrado")
+    return {'produto_id': produto_id, 'ajuste': ajuste, 'motivo': str(dados.get('motivo') or '').strip()}
+
+def validar_operacao(operacao, escolas):
+    """Confere o formato de uma operação do caixa; retorna a versão normalizada ou lança ValueError"""
+    if not isinstance(operacao, dict):
+        raise ValueError("Cada operação deve ser um objeto JSON")
+    identificador = operacao.get('uuid')
+    if not isinstance(identificador, str) or not 0 < len(identificador) <= 64:
+        raise ValueError("'uuid' inválido")
+    tipo, dados = operacao.get('tipo'), operacao.get('dados')
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de operação inválido: {tipo}. Use um de: {', '.join(TIPOS)}")
+    if not isinstance(dados, dict):
+        raise ValueError("'dados' deve ser um objeto JSON")
+
+    # Hora da venda no aparelho; relógio adiantado não cria pedido no futuro
+    agora = datetime.now().astimezone()
+    try:
+        registrado_em = min(datetime.fromisoformat(operacao.get('criada_em') or '').astimezone(), agora)
+    except (TypeError, ValueError):
+        registrado_em = agora
+    return {
+        'uuid': identificador,
+        'tipo': tipo,
+        'dados': (validar_pedido if tipo == 'pedido' else validar_ajuste)(dados, escolas),
+        'registrado_em': registrado_em,
+    }
+
+def resolver_clientes(pedidos):
+    """Clientes cadastrados no caixa: acha pelo nome e telefone ou cria (o reenvio acha o mesmo).
+    Retorna os ids dos clientes criados"""
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("Erro de conexão")
+
+    criados = set()
+    try:
+        cur = conn.cursor()
+        iniciar_escrita(conn)
+        for pedido in pedidos:
+            cliente = pedido['dados']['cliente']
+            nome_normalizado, telefone_normalizado = normalizar_texto(cliente['nome']), normalizar_telefone(cliente['telefone'])
+            cur.execute('''
+                SELECT id FROM clientes WHERE nome_normalizado = ? AND telefone_normalizado = ?
+                ORDER BY id LIMIT 1
+            ''', (nome_normalizado, telefone_normalizado))
+            encontrado = cur.fetchone()
+            if encontrado:
+                pedido['dados']['cliente_id'] = encontrado[0]
+                continue
+            cur.execute('''
+                INSERT INTO clientes (nome, telefone, email, data_cadastro, nome_normalizado, telefone_normalizado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (cliente['nome'], cliente['telefone'], cliente['email'], datetime.now().strftime("%Y-%m-%d"),
+                  nome_normalizado, telefone_normalizado))
+            pedido['dados']['cliente_id'] = cur.lastrowid
+            criados.add(cur.lastrowid)
+            auditoria.registrar('criar', 'cliente', cur.lastrowid,
+                                {'nome': cliente['nome'], 'telefone': cliente['telefone']}, conn=conn)
+            publicar_evento(conn, 'cliente', 'criado', cur.lastrowid, cliente)
+        conn.commit()
+        return criados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def aplicar_pedido(cur, operacao):
+    dados = operacao['dados']
+    cur.execute("SELECT 1 FROM clientes WHERE id = ?", (dados['cliente_id'],))
+    if not cur.fetchone():
+        raise ValueError(f"Cliente {dados['cliente_id']} não encontrado")
+
+    produto_ids = [item['produto_id'] for item in dados['itens']]
+    cur.execute("SELECT id, preco FROM produtos WHERE escola_id = ? AND id IN (SELECT value FROM json_each(?))",
+                (dados['escola_id'], json.dumps(produto_ids)))
+    precos = dict(cur.fetchall())
+    faltando = sorted(set(produto_ids) - set(precos))
+    if faltando:
+        raise ValueError(f"Produto(s) {', '.join(map(str, faltando))} não encontrado(s) na escola {dados['escola_id']}")
+
+    # Vale o preço cobrado no caixa; sem ele, o do catálogo
+    itens = []
+    for item in dados['itens']:
+        preco_unitario = item['preco_unitario'] if item['preco_unitario'] is not None else (precos[item['produto_id']] or 0)
+        itens.append({'produto_id': item['produto_id'], 'quantidade': item['quantidade'],
+                      'preco_unitario': preco_unitario, 'subtotal': preco_unitario * item['quantidade']})
+    pedido_id, alertas_estoque = inserir_pedido(
+        cur, dados['cliente_id'], dados['escola_id'], itens, dados['data_entrega'],
+        dados['forma_pagamento'], dados['observacoes'], operacao['registrado_em']
+    )
+    return {'uuid': operacao['uuid'], 'sucesso': True, 'pedido_id': pedido_id,
+            'mensagem': mensagem_pedido_criado(pedido_id, alertas_estoque), 'conflitos': alertas_estoque}
+
+def aplicar_ajuste(cur, operacao):
+    dados = operacao['dados']
+    cur.execute("SELECT estoque, reservado FROM produtos WHERE id = ?", (dados['produto_id'],))
+    linha = cur.fetchone()
+    if linha is None:
+        raise ValueError(f"Produto {dados['produto_id']} não encontrado")
+
+    atual, reservado = linha[0] or 0, max(linha[1] or 0, 0)
+    calculado = atual + dados['ajuste']
+    # Saída não leva o estoque abaixo do reservado (se já estava abaixo, não baixa mais)
+    piso = max(min(reservado, atual), 0) if dados['ajuste'] < 0 else 0
+    estoque = max(calculado, piso)
+    cur.execute("UPDATE produtos SET estoque = ? WHERE id = ?", (estoque, dados['produto_id']))
+    auditoria.registrar('estoque', 'produto', dados['produto_id'],
+                        {'estoque': estoque, 'ajuste': dados['ajuste'], 'motivo': dados['motivo'], 'origem': 'offline'},
+                        conn=cur.connection)
+    publicar_evento(cur.connection, 'produto', 'estoque', dados['produto_id'],
+                    {'estoque': estoque, 'ajuste': dados['ajuste']})
+    conflitos = [] if estoque == calculado else [
+        f"Estoque ficaria em {calculado}, com {reservado} reservado(s) para pedidos em aberto; ajustado para {estoque}"
+        if reservado else f"Estoque ficaria em {calculado}; ajustado para {estoque}"
+    ]
+    return {'uuid': operacao['uuid'], 'sucesso': True, 'estoque': estoque,
+            'mensagem': "Estoque atualizado com sucesso!", 'conflitos': conflitos}
+
+APLICAR = {'pedido': aplicar_pedido, 'estoque': aplicar_ajuste}
+
+def gravar_operacoes(operacoes):
+    """Aplica as operações de uma escola em uma transação, pulando os uuids já recebidos"""
+    conn = get_connection()
+    if not conn:
+        return [falha(operacao, "Erro de conexão", reenviar=True) for operacao in operacoes]
+
+    resultados = []
+    try:
+        cur = conn.cursor()
+        # Com a trava de escrita, o reenvio simultâneo do mesmo lote espera e acha os uuids já gravados
+        iniciar_escrita(conn)
+        cur.execute("SELECT uuid, resultado FROM sync_recebidos WHERE uuid IN (SELECT value FROM json_each(?))",
+                    (json.dumps([operacao['uuid'] for operacao in operacoes]),))
+        recebidos = {identificador: json.loads(resultado) for identificador, resultado in cur.fetchall()}
+        for operacao in operacoes:
+            if operacao['uuid'] in recebidos:
+                resultados.append({**recebidos[operacao['uuid']], 'repetida': True})
+                continue
+            marca = conn.abrir_ponto("operacao_offline")
+            try:
+                resultado = APLICAR[operacao['tipo']](cur, operacao)
+                cur.execute("INSERT INTO sync_recebidos (uuid, tipo, resultado) VALUES (?, ?, ?)",
+                            (operacao['uuid'], operacao['tipo'], json.dumps(resultado, ensure_ascii=False)))
+                cur.execute("RELEASE operacao_offline")
+            except Exception as e:
+                conn.voltar_ao_ponto("operacao_offline", marca)
+                resultado = falha(operacao, f"❌ Erro: {str(e)}")
+            recebidos[operacao['uuid']] = resultado
+            resultados.append(resultado)
+        conn.commit()
+        return resultados
+    except Exception as e:
+        conn.rollback()
+        return [falha(operacao, f"❌ Erro: {str(e)}", reenviar=True) for operacao in operacoes]
+    finally:
+        conn.close()
+
+def receber_operacoes(operacoes):
+    """Aplica um lote vindo de um caixa; cada uuid é aplicado uma vez só. Retorna um resultado por operação, na ordem"""
+    resultados = [None] * len(operacoes)
+    escolas = {escola['id'] for escola in listar_escolas()}
+    validas = []
+    for posicao, operacao in enumerate(operacoes):
+        try:
+            validas.append((posicao, validar_operacao(operacao, escolas)))
+        except ValueError as e:
+            resultados[posicao] = falha(operacao, str(e))
+
+    # Clientes novos vão para o catálogo antes, em transação própria (com partições, o
+    # catálogo e o pedido ficam em arquivos diferentes); os que ficarem sem pedido saem depois
+    novos_clientes = [(posicao, operacao) for posicao, operacao in validas
+                      if operacao['tipo'] == 'pedido' and operacao['dados']['cliente_id'] is None]
+    criados = set()
+    if novos_clientes:
+        try:
+            criados = resolver_clientes([operacao for _, operacao in novos_clientes])
+        except Exception as e:
+            for posicao, operacao in novos_clientes:
+                resultados[posicao] = falha(operacao, f"❌ Erro ao cadastrar cliente: {str(e)}", reenviar=True)
+            validas = [(posicao, operacao) for posicao, operacao in validas if resultados[posicao] is None]
+
+    escola_de = lambda operacao: (operacao['dados']['escola_id'] if operacao['tipo'] == 'pedido'
+                                  else escola_do_id(operacao['dados']['produto_id']))
+    aplicados = em_lotes_por_escola([operacao for _, operacao in validas], escola_de, gravar_operacoes)
+    for (posicao, _), resultado in zip(validas, aplicados):
+        resultados[posicao] = resultado
+
+    if criados:
+        desfazer_clientes_sem_pedido(criados, novos_clientes, resultados)
+    return resultados
+
+def desfazer_clientes_sem_pedido(criados, novos_clientes, resultados):
+    """Exclui os clientes criados neste lote cujos pedidos foram todos recusados.
+    A exclusão confere os pedidos sob a trava de escrita: se outro pedido chegou para o cliente, ele fica"""
+    com_pedido = {operacao['dados']['cliente_id'] for posicao, operacao in novos_clientes
+                  if resultados[posicao]['sucesso']}
+    for cliente_id in sorted(criados - com_pedido):
+        excluir_cliente(cliente_id)
+
+# =========================================
+# 📡 SINCRONIZAÇÃO
+# =========================================
+
+class ServidorIndisponivel(Exception):
+    pass
+
+class ClienteAPI:
+    """Conexão HTTP (keep-alive) com a API, com autenticação Basic"""
+
+    def __init__(self, url, usuario, senha, timeout=60):
+        partes = urlsplit(url)
+        self.https = partes.scheme == 'https'
+        self.host = partes.hostname
+        self.porta = partes.port or (443 if self.https else 80)
+        self.autorizacao = 'Basic ' + base64.b64encode(f"{usuario}:{senha}".encode()).decode()
+        self.timeout = timeout
+        self._conexao = None
+
+    def requisitar(self, metodo, caminho, corpo=None):
+        """(status HTTP, JSON da resposta); ServidorIndisponivel se a rede ou o servidor falharem"""
+        # Conexão keep-alive fechada pelo servidor: reabre uma vez (reenviar é seguro, a sincronização é idempotente)
+        for tentativa in range(2):
+            if self._conexao is None:
+                classe = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self._conexao = classe(self.host, self.porta, timeout=self.timeout)
+            try:
+                self._conexao.request(metodo, caminho,
+                                      body=json.dumps(corpo).encode('utf-8') if corpo is not None else None,
+                                      headers={'Authorization': self.autorizacao, 'Content-Type': 'application/json'})
+                resposta = self._conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self.fechar()
+                if tentativa:
+                    raise ServidorIndisponivel(str(e))
+        try:
+            return resposta.status, json.loads(conteudo)
+        except ValueError:
+            raise ServidorIndisponivel(f"Resposta inválida do servidor (HTTP {resposta.status})")
+
+    def fechar(self):
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
+
+def sincronizar(fila, cliente, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Envia as operações pendentes em lotes até esvaziar a fila ou o servidor falhar (o resto espera a próxima)"""
+    resumo = {'enviadas': 0, 'aplicadas': 0, 'repetidas': 0, 'recusadas': 0, 'conflitos': 0, 'erro': None}
+    while True:
+        operacoes = fila.pendentes(tamanho_lote)
+        if not operacoes:
+            return resumo
+        try:
+            status, resposta = cliente.requisitar('POST', '/sincronizacao', {'operacoes': operacoes})
+        except ServidorIndisponivel as e:
+            resumo['erro'] = str(e)
+            return resumo
+        if status != 200:
+            resumo['erro'] = resposta.get('mensagem') or f"HTTP {status}"
+            return resumo
+
+        resolvidas = [(operacao['uuid'], resultado) for operacao, resultado in zip(operacoes, resposta['resultados'])
+                      if not resultado.get('reenviar')]
+        fila.marcar_enviadas(resolvidas)
+        resumo['enviadas'] += len(resolvidas)
+        for _, resultado in resolvidas:
+            resumo['aplicadas'] += bool(resultado['sucesso'])
+            resumo['recusadas'] += not resultado['sucesso']
+            resumo['repetidas'] += bool(resultado.get('repetida'))
+            resumo['conflitos'] += bool(resultado.get('conflitos'))
+        if progresso:
+            progresso(resumo)
+        if len(resolvidas) < len(operacoes):
+            # Erro passageiro no servidor: tenta de novo na próxima sincronização, na mesma ordem
+            resumo['erro'] = next(r['mensagem'] for r in resposta['resultados'] if r.get('reenviar'))
+            return resumo
+
+def atualizar_catalogo(fila, cliente):
+    """Baixa escolas e produtos do servidor para o caixa vender sem rede"""
+    status, escolas = cliente.requisitar('GET', '/escolas')
+    if status != 200:
+        raise ServidorIndisponivel(escolas.get('mensagem') or f"HTTP {status}")
+    produtos = {}
+    for escola in escolas:
+        status, produtos[escola['id']] = cliente.requisitar('GET', f"/produtos?escola_id={escola['id']}")
+        if status != 200:
+            raise ServidorIndisponivel(produtos[escola['id']].get('mensagem') or f"HTTP {status}")
+    fila.guardar_catalogo(escolas, produtos)
+    return sum(len(lista) for lista in produtos.values())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fila', help=f"Banco local do caixa (padrão: FARDAMENTOS_FILA ou {CAMINHO_FILA})")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    enviar = comandos.add_parser('sincronizar', help="Envia as operações pendentes e renova o catálogo")
+    enviar.add_argument('--servidor', required=True, help="URL da API, ex.: http://servidor:8502")
+    enviar.add_argument('--usuario', required=True)
+    enviar.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Operações por requisição")
+    comandos.add_parser('status', help="Operações pendentes, recusadas e com conflito")
+    args = parser.parse_args()
+
+    fila = FilaOffline(args.fila)
+    try:
+        if args.comando == 'status':
+            resumo = fila.resumo()
+            print(f"{resumo['pendentes']} pendentes | {resumo['aplicadas']} aplicadas | "
+                  f"{resumo['recusadas']} recusadas | {resumo['conflitos']} com conflito")
+            for criada_em, tipo, _, resultado in fila.com_aviso():
+                avisos = resultado.get('conflitos') or [resultado['mensagem']]
+                print(f"  {criada_em[:16]} {tipo}: {'; '.join(avisos)}")
+            return
+
+        senha = os.environ.get('FARDAMENTOS_SENHA') or getpass.getpass(f"Senha de {args.usuario}: ")
+        cliente = ClienteAPI(args.servidor, args.usuario, senha)
+        try:
+            resumo = sincronizar(fila, cliente, args.lote)
+            print(f"{resumo['enviadas']} operações sincronizadas | {resumo['aplicadas']} aplicadas "
+                  f"({resumo['repetidas']} já recebidas antes) | {resumo['recusadas']} recusadas | "
+                  f"{resumo['conflitos']} com conflito de estoque")
+            if resumo['erro']:
+                print(f"Sincronização interrompida: {resumo['erro']} "
+                      f"({fila.resumo()['pendentes']} continuam na fila)", file=sys.stderr)
+                sys.exit(1)
+            print(f"Catálogo atualizado: {atualizar_catalogo(fila, cliente)} produtos")
+        except ServidorIndisponivel as e:
+            print(f"Servidor indisponível: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            cliente.fechar()
+    finally:
+        fila.fechar()
+
+if __name__ == '__main__':
+    main()
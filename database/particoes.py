@@ -0,0 +1,265 @@
+"""Partições por escola: produtos, pedidos e itens de cada escola no próprio arquivo SQLite
+
+Uso: python -m database.particoes dividir
+
+Com FARDAMENTOS_POR_ESCOLA=1, o banco da loja guarda só o catálogo comum
+(usuários, escolas e clientes) e cada escola ganha um arquivo em
+<banco>_escolas/escola_<id>.db, com arquivo morto ao lado. As conexões de
+uma partição anexam o catálogo como 'catalogo': as consultas continuam
+juntando pedidos com clientes e escolas sem mudar o SQL.
+
+Cada partição numera produtos, pedidos e itens a partir de
+escola_id * FAIXA_IDS, então o id já diz em que arquivo o registro está.
+A escola da operação fica em uma ContextVar (na_escola); as consultas de
+todas as escolas rodam em cada partição, em paralelo, e juntam o resultado.
+Como cada escola escreve no próprio arquivo, pedidos de escolas diferentes
+não disputam a mesma trava de escrita.
+
+'dividir' copia os produtos, pedidos e itens que estão no banco da loja
+(e no arquivo morto dela) para as partições, já com os ids na faixa de
+cada escola, e só depois os apaga do banco da loja. Pode ser repetido se
+for interrompido.
+"""
+import argparse
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from database.cache import obter_cache
+from database.catalogo import obter_catalogo
+from database.pool import PoolConexoes
+
+POR_ESCOLA = os.environ.get('FARDAMENTOS_POR_ESCOLA') == '1'
+
+# Ids de cada partição: escola 3 numera a partir de 3_000_000_000
+FAIXA_IDS = 10 ** 9
+MAXIMO_THREADS = 8   # Partições consultadas ao mesmo tempo nas consultas de todas as escolas
+
+escola_atual = contextvars.ContextVar('escola_atual', default=None)
+
+@contextmanager
+def na_escola(escola_id):
+    """Roda o bloco na partição da escola (sem partições, não muda nada)"""
+    token = escola_atual.set(escola_id)
+    try:
+        yield
+    finally:
+        escola_atual.reset(token)
+
+def escola_do_id(registro_id):
+    """Escola dona de um produto, pedido ou item pela faixa do id"""
+    return int(registro_id) // FAIXA_IDS
+
+def inicio_faixa(escola_id):
+    return escola_id * FAIXA_IDS
+
+# =========================================
+# 🗂️ PARTIÇÕES DE UMA LOJA
+# =========================================
+
+def caminho_particao(caminho_db, escola_id):
+    base = os.path.splitext(caminho_db)[0]
+    return os.path.join(base + '_escolas', f'escola_{escola_id}.db')
+
+class ParticaoEscola:
+    """Pool, cache e catálogo do arquivo de uma escola, com o catálogo da loja anexado"""
+
+    def __init__(self, caminho_catalogo, escola_id):
+        self.escola_id = escola_id
+        self.caminho_db = caminho_particao(caminho_catalogo, escola_id)
+        self.caminho_arquivo = os.path.splitext(self.caminho_db)[0] + '_arquivo.db'
+        os.makedirs(os.path.dirname(self.caminho_db), exist_ok=True)
+        self.pool = PoolConexoes(self.caminho_db, anexos={'catalogo': caminho_catalogo})
+        self.cache = obter_cache(self.caminho_db)
+        self.catalogo = obter_catalogo(self.caminho_db)
+
+class ParticoesEscolas:
+    """Partições das escolas de uma loja, abertas conforme são usadas"""
+
+    def __init__(self, loja):
+        self.loja = loja
+        self._particoes = {}
+        self._lock = threading.Lock()
+
+    def existe(self, escola_id):
+        return escola_id in self._particoes or os.path.exists(caminho_particao(self.loja.caminho_db, escola_id))
+
+    def obter(self, escola_id, criar=False):
+        """Partição da escola; só init_particao cria o arquivo (ids de escolas desconhecidas dão LookupError)"""
+        particao = self._particoes.get(escola_id)
+        if particao is None:
+            with self._lock:
+                particao = self._particoes.get(escola_id)
+                if particao is None:
+                    if not criar and not self.existe(escola_id):
+                        raise LookupError(f"Escola {escola_id} sem partição em {self.loja.codigo}")
+                    particao = self._particoes[escola_id] = ParticaoEscola(self.loja.caminho_db, escola_id)
+        return particao
+
+# =========================================
+# 🌐 CONSULTAS EM PARALELO
+# =========================================
+
+def em_paralelo(variavel, valores, funcao, args=(), kwargs=None, maximo=MAXIMO_THREADS, nome='particoes'):
+    """Roda funcao uma vez para cada valor da ContextVar, em threads; retorna os resultados na ordem"""
+    kwargs = kwargs or {}
+
+    def rodar(valor, contexto):
+        def com_valor():
+            variavel.set(valor)
+            return funcao(*args, **kwargs)
+        return contexto.run(com_valor)
+
+    # Cada tarefa roda em uma cópia do contexto de quem chamou (loja, usuário da auditoria etc.)
+    contextos = [contextvars.copy_context() for _ in valores]
+    if len(valores) == 1:
+        return [rodar(valores[0], contextos[0])]
+    with ThreadPoolExecutor(max_workers=min(len(valores), maximo), thread_name_prefix=nome) as executor:
+        return list(executor.map(rodar, valores, contextos))
+
+def em_cada_escola(escola_ids, funcao, *args, **kwargs):
+    """Roda funcao na partição de cada escola; retorna {escola_id: resultado} na ordem recebida"""
+    escola_ids = list(escola_ids)
+    if not escola_ids:
+        return {}
+    return dict(zip(escola_ids, em_paralelo(escola_atual, escola_ids, funcao, args, kwargs)))
+
+# =========================================
+# ✂️ DIVISÃO DO BANCO DA LOJA
+# =========================================
+
+def _copiar_tabela(cur, tabela, origem, destino, substituicoes, filtro, parametros):
+    """INSERT OR IGNORE de origem.tabela em destino.tabela trocando as colunas de id pelas expressões"""
+    cur.execute(f"PRAGMA {destino}.table_info({tabela})")
+    colunas = [coluna[1] for coluna in cur.fetchall()]
+    cur.execute(f"PRAGMA {origem}.table_info({tabela})")
+    na_origem = {coluna[1] for coluna in cur.fetchall()}
+    expressoes = [substituicoes.get(c, f"o.{c}") if c in na_origem else "NULL" for c in colunas]
+    cur.execute(f'''
+        INSERT OR IGNORE INTO {destino}.{tabela} ({', '.join(colunas)})
+        SELECT {', '.join(expressoes)} FROM {origem}.{tabela} o {filtro}
+    ''', parametros)
+    return cur.rowcount
+
+def _copiar_pedidos(cur, origem, destino, escola_id):
+    """Pedidos da escola e os seus itens, com ids na faixa da escola; retorna quantos pedidos"""
+    faixa = f"{inicio_faixa(escola_id)}"
+    copiados = _copiar_tabela(cur, 'pedidos', origem, destino, {'id': f"o.id + {faixa}"},
+                              "WHERE o.escola_id = ?", (escola_id,))
+    # O produto do item fica na faixa da escola dele (a mesma do pedido, pelo formulário)
+    _copiar_tabela(cur, 'pedido_itens', origem, destino, {
+        'id': f"o.id + {faixa}",
+        'pedido_id': f"o.pedido_id + {faixa}",
+        'produto_id': f"o.produto_id + COALESCE((SELECT pr.escola_id FROM catalogo.produtos pr "
+                      f"WHERE pr.id = o.produto_id), {escola_id}) * {FAIXA_IDS}",
+    }, f"WHERE o.pedido_id IN (SELECT id FROM {origem}.pedidos WHERE escola_id = ?)", (escola_id,))
+    return copiados
+
+def dividir_escola(escola_id):
+    """Copia para a partição da escola o que ainda está no banco da loja; retorna (produtos, pedidos)"""
+    from database.banco import get_connection, anexar_arquivo, iniciar_escrita, tabelas_pedidos
+    from database.arquivamento import preparar_arquivo
+    from database.resumo_clientes import recalcular_resumo_clientes
+    from database.lojas import roteador
+
+    with na_escola(escola_id):
+        conn = get_connection()
+        tem_arquivo = False
+        try:
+            cur = conn.cursor()
+            faixa = inicio_faixa(escola_id)
+            arquivo_loja = roteador.loja().caminho_arquivo
+            tem_arquivo = os.path.exists(arquivo_loja)
+            if tem_arquivo:
+                # ATTACH fora da transação; o arquivo da partição recebe o que estava no da loja
+                anexar_arquivo(conn, criar=True)
+                cur.execute("ATTACH DATABASE ? AS arquivo_loja", (arquivo_loja,))
+
+            iniciar_escrita(conn)
+            produtos = _copiar_tabela(cur, 'produtos', 'catalogo', 'main', {'id': f"o.id + {faixa}"},
+                                      "WHERE o.escola_id = ?", (escola_id,))
+            _copiar_tabela(cur, 'reposicao', 'catalogo', 'main', {'produto_id': f"o.produto_id + {faixa}"},
+                           "WHERE o.produto_id IN (SELECT id FROM catalogo.produtos WHERE escola_id = ?)",
+                           (escola_id,))
+            pedidos = _copiar_pedidos(cur, 'catalogo', 'main', escola_id)
+            cur.execute('''
+                UPDATE main.arquivamento_controle
+                SET dia_limite = (SELECT dia_limite FROM catalogo.arquivamento_controle WHERE id = 1)
+                WHERE id = 1 AND dia_limite IS NULL
+            ''')
+            if tem_arquivo:
+                preparar_arquivo(cur)
+                pedidos += _copiar_pedidos(cur, 'arquivo_loja', 'arquivo', escola_id)
+                # Pedidos copiados direto para o arquivo não passam pelos gatilhos do resumo de clientes
+                recalcular_resumo_clientes(cur, *tabelas_pedidos(conn))
+            conn.commit()
+            return produtos, pedidos
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if tem_arquivo:
+                conn.execute("DETACH DATABASE arquivo_loja")
+            conn.close()
+
+def limpar_loja(escola_ids):
+    """Apaga do banco da loja (e do arquivo dela) o que já foi copiado para as partições"""
+    from database.banco import get_connection, anexar_arquivo
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        bancos = ['main'] + (['arquivo'] if anexar_arquivo(conn) else [])
+        marcadores = ', '.join('?' * len(escola_ids))
+        cur.execute("BEGIN IMMEDIATE")
+        for banco in bancos:
+            cur.execute(f'''
+                DELETE FROM {banco}.pedido_itens WHERE pedido_id IN (
+                    SELECT id FROM {banco}.pedidos WHERE escola_id IN ({marcadores}))
+            ''', escola_ids)
+            cur.execute(f"DELETE FROM {banco}.pedidos WHERE escola_id IN ({marcadores})", escola_ids)
+        cur.execute(f'''
+            DELETE FROM reposicao WHERE produto_id IN (SELECT id FROM produtos WHERE escola_id IN ({marcadores}))
+        ''', escola_ids)
+        cur.execute(f"DELETE FROM produtos WHERE escola_id IN ({marcadores})", escola_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def dividir():
+    """Move produtos e pedidos de cada escola do banco da loja para a partição dela"""
+    from database.banco import init_db, listar_escolas
+
+    init_db()
+    escola_ids = [escola.id for escola in listar_escolas()]
+    resultado = {escola_id: dividir_escola(escola_id) for escola_id in escola_ids}
+    # Só apaga depois que todas as cópias foram confirmadas
+    if escola_ids:
+        limpar_loja(escola_ids)
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('dividir', help="Move produtos e pedidos do banco da loja para as partições das escolas")
+    parser.parse_args()
+
+    # Como __main__, este módulo não é o database.particoes que o banco usa para rotear
+    from database import particoes
+    if not particoes.POR_ESCOLA:
+        print("Erro: defina FARDAMENTOS_POR_ESCOLA=1 para usar partições por escola", file=sys.stderr)
+        sys.exit(2)
+
+    from database.lojas import roteador
+    caminho_loja = roteador.loja().caminho_db
+    for escola_id, (produtos, pedidos) in particoes.dividir().items():
+        print(f"Escola {escola_id}: {produtos} produtos e {pedidos} pedidos em {caminho_particao(caminho_loja, escola_id)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import queue
+import sqlite3
+
+# =========================================
+# 🔌 POOL DE CONEXÕES SQLITE
+# =========================================
+
+# Statements preparados guardados por conexão (o padrão do sqlite3 é 128)
+TAMANHO_CACHE_SQL = 256
+
+class ConexaoReutilizavel(sqlite3.Connection):
+    """Conexão cujo close() devolve ao pool em vez de fechar o arquivo"""
+
+    pool = None
+    # Bancos anexados na abertura (ex.: o catálogo da loja, nas partições por escola)
+    anexos = ()
+    # Ações adiadas para depois do commit da transação atual (ex.: entradas de auditoria)
+    apos_commit = None
+
+    def commit(self):
+        super().commit()
+        if self.apos_commit:
+            acoes, self.apos_commit = self.apos_commit, []
+            for acao in acoes:
+                acao()
+
+    def rollback(self):
+        super().rollback()
+        if self.apos_commit:
+            self.apos_commit = []
+
+    def abrir_ponto(self, nome):
+        """SAVEPOINT; devolve a marca das ações pós-commit para voltar_ao_ponto"""
+        self.execute(f"SAVEPOINT {nome}")
+        return len(self.apos_commit or ())
+
+    def voltar_ao_ponto(self, nome, marca):
+        """ROLLBACK TO + RELEASE: as ações pós-commit registradas depois do SAVEPOINT
+        (entradas de auditoria de um pedido desfeito) também são descartadas"""
+        self.execute(f"ROLLBACK TO {nome}")
+        self.execute(f"RELEASE {nome}")
+        if self.apos_commit:
+            del self.apos_commit[marca:]
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        # Transação esquecida aberta travaria o próximo usuário da conexão
+        if self.in_transaction:
+            self.rollback()
+        self.pool.devolver(self)
+
+    def fechar_definitivamente(self):
+        super().close()
+
+class PoolConexoes:
+    """Mantém conexões abertas para reaproveitar entre chamadas e threads.
+
+    Abrir uma conexão SQLite custa mais que a maioria das consultas do
+    sistema; com o pool, cada função continua chamando get_connection() e
+    close() como antes, mas a conexão volta para a fila.
+    """
+
+    def __init__(self, caminho_db, tamanho=8, anexos=None):
+        self.caminho_db = caminho_db
+        self.anexos = anexos or {}
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.caminho_db, check_same_thread=False, factory=ConexaoReutilizavel,
+                               cached_statements=TAMANHO_CACHE_SQL)
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        conn.apos_commit = []
+        for nome, caminho in self.anexos.items():
+            conn.execute(f"ATTACH DATABASE ? AS {nome}", (caminho,))
+        conn.anexos = tuple(self.anexos)
+        return conn
+
+    def preencher(self):
+        """Abre as conexões que faltam para encher o pool (aquecimento: o primeiro usuário não paga a abertura)"""
+        for _ in range(self._livres.maxsize - self._livres.qsize()):
+            self.devolver(self._abrir())
+
+    def obter(self):
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            return self._abrir()
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def devolver(self, conn):
+        try:
+            self._livres.put_nowait(conn)
+        except queue.Full:
+            conn.fechar_definitivamente()
+
+    def fechar(self):
+        """Fecha todas as conexões livres (as emprestadas fecham ao voltar)"""
+        while True:
+            try:
+                self._livres.get_nowait().fechar_definitivamente()
+            except queue.Empty:
+                return
@@ -0,0 +1,180 @@
+"""Pré-cálculo agendado dos relatórios em arquivos Parquet
+
+Uso: python -m database.precalculo [--intervalo 600]
+
+Sem --intervalo calcula uma vez e sai (para usar no cron). O app também
+pode manter o cálculo rodando em uma thread com iniciar_agendador().
+O manifesto guarda a versão dos dados (versao_relatorios, mantida por
+gatilhos) usada em cada cálculo; a página de relatórios lê os arquivos e
+volta às consultas ao vivo quando o banco mudou desde então. As vendas são
+calculadas para a visão inicial da página (todo o período, agrupado pela
+granularidade automática); outros períodos são consultados ao vivo.
+
+Cada loja tem a sua pasta de relatórios; o agendador e a linha de comando
+calculam todas as lojas.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+from database.lojas import roteador, listar_lojas, na_loja
+from database.banco import (
+    listar_escolas, versao_relatorios, intervalo_vendas, escolher_granularidade,
+    gerar_relatorio_vendas_por_escola, gerar_relatorio_produtos_por_escola, gerar_resumo_escolas
+)
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PADRAO = 600   # Segundos entre verificações do agendador
+INTERVALO_MINIMO = 30     # Mesmo acordado por leitura vencida, não recalcula antes disso
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+def parametros_vendas():
+    """Período e agrupamento da visão inicial de vendas (todo o histórico)"""
+    inicio, fim = intervalo_vendas()
+    if inicio is None:
+        return {}
+    return {'inicio': inicio.isoformat(), 'fim': fim.isoformat(),
+            'granularidade': escolher_granularidade(inicio, fim)}
+
+def nome_arquivo(tipo, escola_id=None):
+    return f"{tipo}_{'escola_' + str(escola_id) if escola_id else 'todas'}.parquet"
+
+def gravar_atomico(caminho, escrever):
+    """Escreve em um temporário e troca de uma vez: leitores nunca veem arquivo pela metade"""
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def pasta_relatorios():
+    """Pasta dos relatórios da loja atual"""
+    return roteador.loja().pasta_relatorios
+
+def ler_manifesto(pasta=None):
+    pasta = pasta or pasta_relatorios()
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+def precalcular_relatorios(pasta=None):
+    """Calcula todos os relatórios (geral e por escola) da loja atual e registra no manifesto"""
+    pasta = pasta or pasta_relatorios()
+    os.makedirs(pasta, exist_ok=True)
+    # Lida antes das consultas: escritas durante o cálculo deixam o resultado vencido
+    versao = versao_relatorios()
+    vendas = parametros_vendas()
+    tarefas = [('resumo_escolas.parquet', gerar_resumo_escolas, (), None)]
+    for escola_id in [None] + [escola['id'] for escola in listar_escolas()]:
+        if vendas:
+            tarefas.append((nome_arquivo('vendas', escola_id), gerar_relatorio_vendas_por_escola,
+                            (escola_id, date.fromisoformat(vendas['inicio']), date.fromisoformat(vendas['fim']),
+                             vendas['granularidade']), vendas))
+        tarefas.append((nome_arquivo('produtos', escola_id), gerar_relatorio_produtos_por_escola, (escola_id,), None))
+
+    manifesto = {}
+    for arquivo, gerar, argumentos, parametros in tarefas:
+        inicio = time.perf_counter()
+        df = gerar(*argumentos)
+        gravar_atomico(os.path.join(pasta, arquivo), lambda caminho: df.to_parquet(caminho, index=False))
+        manifesto[arquivo] = {
+            'calculado_em': datetime.now().isoformat(timespec='seconds'),
+            'versao': versao,
+            'linhas': len(df),
+            'segundos': round(time.perf_counter() - inicio, 3),
+        }
+        if parametros:
+            manifesto[arquivo]['parametros'] = parametros
+
+    gravar_atomico(os.path.join(pasta, ARQUIVO_MANIFESTO), lambda caminho: _escrever_json(caminho, manifesto))
+    return manifesto
+
+def _escrever_json(caminho, conteudo):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=2)
+
+def ler_relatorio(tipo, escola_id=None, parametros=None, pasta=None):
+    """Relatório pré-calculado e o horário do cálculo; (None, None) se ausente, vencido
+    ou calculado com outros parâmetros (período/agrupamento)"""
+    pasta = pasta or pasta_relatorios()
+    arquivo = 'resumo_escolas.parquet' if tipo == 'resumo_escolas' else nome_arquivo(tipo, escola_id)
+    registro = ler_manifesto(pasta).get(arquivo)
+    if registro and registro.get('parametros') != parametros:
+        return None, None
+    if not registro or registro.get('versao') is None or registro['versao'] != versao_relatorios():
+        # Avisa o agendador (se houver) para não esperar o intervalo inteiro
+        _acordar.set()
+        return None, None
+    try:
+        return pd.read_parquet(os.path.join(pasta, arquivo)), datetime.fromisoformat(registro['calculado_em'])
+    except Exception as e:
+        logger.warning("Relatório pré-calculado ilegível (%s): %s", arquivo, e)
+        return None, None
+
+# =========================================
+# ⏰ AGENDADOR
+# =========================================
+
+_agendador = None
+_agendador_lock = threading.Lock()
+_acordar = threading.Event()
+
+def relatorios_atualizados(pasta=None):
+    versoes = {registro.get('versao') for registro in ler_manifesto(pasta).values()}
+    return versoes == {versao_relatorios()}
+
+def _executar_agendador(intervalo):
+    while True:
+        for loja in listar_lojas():
+            try:
+                with na_loja(loja.codigo):
+                    # Outro processo (ou o cron) pode já ter calculado esta versão
+                    if not relatorios_atualizados():
+                        precalcular_relatorios()
+            except Exception:
+                logger.exception("Erro ao pré-calcular relatórios da loja %s", loja.codigo)
+        time.sleep(INTERVALO_MINIMO)
+        _acordar.wait(max(intervalo - INTERVALO_MINIMO, 0))
+        _acordar.clear()
+
+def iniciar_agendador(intervalo=INTERVALO_PADRAO):
+    """Inicia (uma vez por processo) a thread que recalcula os relatórios de todas as lojas periodicamente"""
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None or not _agendador.is_alive():
+            _agendador = threading.Thread(target=_executar_agendador, args=(intervalo,),
+                                          name='precalculo-relatorios', daemon=True)
+            _agendador.start()
+    return _agendador
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--intervalo', type=int, help="Segundos entre cálculos; sem ele calcula uma vez")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    while True:
+        for loja in listar_lojas():
+            with na_loja(loja.codigo):
+                inicio = time.perf_counter()
+                manifesto = precalcular_relatorios()
+                logger.info("%d relatórios calculados em %.2fs (%s)", len(manifesto), time.perf_counter() - inicio,
+                            loja.pasta_relatorios)
+        if not args.intervalo:
+            break
+        time.sleep(args.intervalo)
+
+if __name__ == '__main__':
+    main()
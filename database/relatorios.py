@@ -0,0 +1,106 @@
+import html
+
+import numpy as np
+import pandas as pd
+
+# =========================================
+# 📊 PIPELINE VETORIZADO DE RELATÓRIOS
+# =========================================
+
+def carregar_dataframe(cur, colunas, tipos=None):
+    """Carrega o resultado do cursor direto em colunas tipadas"""
+    cur.row_factory = None  # Tuplas simples, sem o custo de sqlite3.Row
+    df = pd.DataFrame.from_records(cur.fetchall(), columns=colunas)
+
+    for coluna, tipo in (tipos or {}).items():
+        if tipo == 'dia':
+            df[coluna] = dias_para_datas(df[coluna])
+        elif tipo == 'data':
+            df[coluna] = textos_para_datas(df[coluna])
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+def dias_para_datas(serie):
+    """Converte chaves inteiras AAAAMMDD em datetime64"""
+    dias = pd.to_numeric(serie, errors='coerce')
+    return pd.to_datetime(
+        pd.DataFrame({'year': dias // 10000, 'month': dias // 100 % 100, 'day': dias % 100}),
+        errors='coerce'
+    )
+
+def textos_para_datas(serie):
+    """Converte textos 'AAAA-MM-DD[ HH:MM:SS]' em datetime64"""
+    return pd.to_datetime(serie.astype('string').str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+
+# Tabelas de consulta: formatar por indexação evita strftime/format linha a linha
+_DOIS_DIGITOS = np.array([f"{i:02d}" for i in range(100)], dtype=object)
+_TRES_DIGITOS = np.array([f"{i:03d}" for i in range(1000)], dtype=object)
+_SEM_ZEROS = np.array([str(i) for i in range(1000)], dtype=object)
+
+def formatar_datas_brasil(serie):
+    """Formata uma coluna datetime64 como DD/MM/AAAA (vazio para datas ausentes)"""
+    validas = serie.notna().to_numpy()
+    dia = serie.dt.day.fillna(0).to_numpy(dtype=np.int64)
+    mes = serie.dt.month.fillna(0).to_numpy(dtype=np.int64)
+    ano = serie.dt.year.fillna(0).to_numpy(dtype=np.int64)
+
+    texto = (_DOIS_DIGITOS[dia] + '/' + _DOIS_DIGITOS[mes] + '/'
+             + _DOIS_DIGITOS[ano // 100 % 100] + _DOIS_DIGITOS[ano % 100])
+    return pd.Series(np.where(validas, texto, ''), index=serie.index, dtype=object)
+
+def formatar_moeda_brasil(serie):
+    """Formata valores numéricos como R$ 1.234,56"""
+    valores = pd.to_numeric(serie, errors='coerce').fillna(0).to_numpy(dtype=float)
+    centavos = np.round(np.abs(valores) * 100).astype(np.int64)
+
+    # Monta a parte inteira de três em três dígitos, da direita para a esquerda
+    resto = centavos // 100
+    texto = np.where(resto >= 1000, _TRES_DIGITOS[resto % 1000], _SEM_ZEROS[resto % 1000])
+    resto = resto // 1000
+    while resto.any():
+        grupo = np.where(resto >= 1000, _TRES_DIGITOS[resto % 1000], _SEM_ZEROS[resto % 1000])
+        texto = np.where(resto > 0, grupo + '.' + texto, texto)
+        resto = resto // 1000
+
+    sinal = np.where(np.round(valores * 100) < 0, '-R$ ', 'R$ ').astype(object)
+    return pd.Series(sinal + texto + ',' + _DOIS_DIGITOS[centavos % 100], index=serie.index, dtype=object)
+
+def formatar_exibicao(df, datas=(), moedas=()):
+    """Cópia do relatório com datas e valores no padrão brasileiro para exibição"""
+    exibicao = df.copy()
+    for coluna in datas:
+        exibicao[coluna] = formatar_datas_brasil(exibicao[coluna])
+    for coluna in moedas:
+        exibicao[coluna] = formatar_moeda_brasil(exibicao[coluna])
+    return exibicao
+
+def folha_separacao_html(df, titulo, gerado_em):
+    """Lista de separação como página HTML para imprimir, com uma coluna para marcar o que já foi separado"""
+    tabela = df.copy()
+    tabela['Separado'] = '☐'
+    faltas = int((df['Falta'] > 0).sum()) if 'Falta' in df else 0
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(titulo)}</title>
+<style>
+  body {{ font-family: Arial, sans-serif; font-size: 12px; margin: 16px; }}
+  h1 {{ font-size: 18px; margin: 0 0 4px; }}
+  p {{ margin: 0 0 12px; color: #444; }}
+  table {{ border-collapse: collapse; width: 100%; }}
+  th, td {{ border: 1px solid #999; padding: 4px 6px; text-align: left; }}
+  th {{ background: #eee; }}
+  tr {{ page-break-inside: avoid; }}
+  @media print {{ body {{ margin: 0; }} }}
+</style>
+</head>
+<body>
+<h1>{html.escape(titulo)}</h1>
+<p>Gerado em {gerado_em:%d/%m/%Y %H:%M} &middot; {len(df)} produtos &middot; {int(df['A Separar'].sum())} peças a separar
+&middot; {faltas} com estoque insuficiente</p>
+{tabela.to_html(index=False, border=0)}
+</body>
+</html>
+"""
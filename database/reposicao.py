@@ -0,0 +1,135 @@
+import math
+from datetime import date
+
+# numpy e pandas só entram no cálculo: criar as tabelas e invalidar produtos (feitos na
+# inicialização e a cada mudança de status) não carregam os dois
+
+# =========================================
+# 📈 MOTOR DE REPOSIÇÃO POR VELOCIDADE DE VENDA
+# =========================================
+
+# Janelas de venda (dias) e o peso de cada uma na velocidade diária
+PESOS_JANELAS = {7: 0.5, 30: 0.3, 90: 0.2}
+PRAZO_REPOSICAO_DIAS = 15     # Tempo médio até o fornecedor entregar
+ESTOQUE_SEGURANCA_DIAS = 7    # Folga para picos de venda
+ESTOQUE_MINIMO = 5            # Regra fixa para produtos ainda sem histórico
+LIMITE_FILTRO_PRODUTOS = 500  # Acima disso lê a janela inteira em vez de usar IN (...)
+
+def criar_tabelas_reposicao(cur):
+    """Cria a tabela pré-calculada de reposição e o controle incremental"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS reposicao (
+            produto_id INTEGER PRIMARY KEY REFERENCES produtos(id) ON DELETE CASCADE,
+            vendas_7d INTEGER DEFAULT 0,
+            vendas_30d INTEGER DEFAULT 0,
+            vendas_90d INTEGER DEFAULT 0,
+            velocidade_diaria REAL DEFAULT 0,
+            ponto_pedido INTEGER,
+            atualizado_dia INTEGER
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS reposicao_controle (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ultimo_item_id INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute("INSERT OR IGNORE INTO reposicao_controle (id, ultimo_item_id) VALUES (1, 0)")
+
+def invalidar_reposicao_pedido(cur, pedido_id):
+    """Marca para recálculo os produtos de um pedido cancelado, reativado ou excluído"""
+    cur.execute('''
+        UPDATE reposicao SET atualizado_dia = NULL
+        WHERE produto_id IN (SELECT produto_id FROM pedido_itens WHERE pedido_id = ?)
+    ''', (pedido_id,))
+
+def calcular_reposicao(vendas, produto_ids, hoje):
+    """Calcula vendas por janela, velocidade diária e ponto de pedido (vetorizado)"""
+    import numpy as np
+    import pandas as pd
+    from database.relatorios import dias_para_datas
+
+    resultado = pd.DataFrame(index=pd.Index(produto_ids, name='produto_id'))
+    idade = (pd.Timestamp(hoje) - dias_para_datas(vendas['dia'])).dt.days.to_numpy()
+
+    velocidade = np.zeros(len(resultado))
+    for janela, peso in PESOS_JANELAS.items():
+        na_janela = vendas.loc[(idade >= 0) & (idade < janela)]
+        total = na_janela.groupby('produto_id')['quantidade'].sum()
+        resultado[f'vendas_{janela}d'] = total.reindex(resultado.index, fill_value=0).astype(np.int64)
+        velocidade += peso * resultado[f'vendas_{janela}d'].to_numpy() / janela
+
+    maior_janela = max(PESOS_JANELAS)
+    cobertura_alvo = PRAZO_REPOSICAO_DIAS + ESTOQUE_SEGURANCA_DIAS
+    resultado['velocidade_diaria'] = velocidade
+    resultado['ponto_pedido'] = np.where(
+        resultado[f'vendas_{maior_janela}d'] > 0,
+        np.maximum(np.ceil(velocidade * cobertura_alvo), 1),
+        ESTOQUE_MINIMO
+    ).astype(np.int64)
+    return resultado
+
+def atualizar_reposicao(conn, hoje=None):
+    """Recalcula só os produtos com vendas novas, invalidados ou desatualizados (virada do dia)"""
+    from database.relatorios import carregar_dataframe
+
+    hoje = hoje or date.today()
+    dia_hoje = hoje.year * 10000 + hoje.month * 100 + hoje.day
+    maior_janela = max(PESOS_JANELAS)
+    cur = conn.cursor()
+
+    cur.execute("SELECT ultimo_item_id FROM reposicao_controle WHERE id = 1")
+    ultimo_item_id = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM pedido_itens")
+    novo_ultimo_item_id = cur.fetchone()[0]
+
+    cur.execute("SELECT DISTINCT produto_id FROM pedido_itens WHERE id > ?", (ultimo_item_id,))
+    pendentes = {linha[0] for linha in cur.fetchall()}
+    cur.execute('''
+        SELECT p.id FROM produtos p
+        LEFT JOIN reposicao r ON r.produto_id = p.id
+        WHERE r.produto_id IS NULL OR r.atualizado_dia IS NULL OR r.atualizado_dia != ?
+    ''', (dia_hoje,))
+    pendentes.update(linha[0] for linha in cur.fetchall())
+
+    if not pendentes:
+        return 0
+
+    dia_inicio = date.fromordinal(hoje.toordinal() - maior_janela + 1)
+    parametros = [dia_inicio.year * 10000 + dia_inicio.month * 100 + dia_inicio.day]
+    filtro_produtos = ""
+    if len(pendentes) <= LIMITE_FILTRO_PRODUTOS:
+        filtro_produtos = f"AND pi.produto_id IN ({', '.join('?' * len(pendentes))})"
+        parametros += sorted(pendentes)
+
+    cur.execute(f'''
+        SELECT pi.produto_id, pi.quantidade, p.data_pedido_dia
+        FROM pedidos p
+        JOIN pedido_itens pi ON pi.pedido_id = p.id
+        WHERE p.data_pedido_dia >= ? AND p.status != 'Cancelado' {filtro_produtos}
+    ''', parametros)
+    vendas = carregar_dataframe(cur, ['produto_id', 'quantidade', 'dia'])
+    cur = conn.cursor()
+
+    resultado = calcular_reposicao(vendas, sorted(pendentes), hoje)
+    cur.executemany('''
+        INSERT OR REPLACE INTO reposicao
+            (produto_id, vendas_7d, vendas_30d, vendas_90d, velocidade_diaria, ponto_pedido, atualizado_dia)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (produto_id, v7, v30, v90, velocidade, ponto, dia_hoje)
+        for produto_id, v7, v30, v90, velocidade, ponto in zip(
+            resultado.index.tolist(),
+            resultado['vendas_7d'].tolist(), resultado['vendas_30d'].tolist(), resultado['vendas_90d'].tolist(),
+            resultado['velocidade_diaria'].tolist(), resultado['ponto_pedido'].tolist()
+        )
+    ])
+    cur.execute("UPDATE reposicao_controle SET ultimo_item_id = ? WHERE id = 1", (novo_ultimo_item_id,))
+    conn.commit()
+    return len(pendentes)
+
+def dias_cobertura(estoque, velocidade_diaria):
+    """Quantos dias o estoque atual dura na velocidade de venda calculada"""
+    if not velocidade_diaria:
+        return math.inf
+    return max(estoque, 0) / velocidade_diaria
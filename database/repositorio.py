@@ -0,0 +1,286 @@
+"""Consultas nomeadas e resultados tipados sobre o banco SQLite
+
+Cada consulta do caminho quente (catálogo, clientes, pedidos e movimentação
+de estoque) tem um nome e um texto fixo. O sqlite3 guarda, por conexão, os
+statements já preparados indexados pelo texto; como as conexões do pool
+vivem pelo processo inteiro, a preparação é feita uma vez e reaproveitada.
+
+Não depende do Streamlit: benchmarks, CLIs e jobs podem usar
+Repositorio.abrir(caminho) e manter a própria conexão.
+"""
+import sqlite3
+from typing import NamedTuple, Optional
+
+from database.pool import TAMANHO_CACHE_SQL
+
+# =========================================
+# 🧾 REGISTROS TIPADOS
+# =========================================
+
+def registro(cls):
+    """Acesso também por nome (produto['disponivel']) e dict(registro), como no sqlite3.Row"""
+    indices = {campo: indice for indice, campo in enumerate(cls._fields)}
+    por_posicao = tuple.__getitem__
+
+    def __getitem__(self, chave):
+        if isinstance(chave, str):
+            return por_posicao(self, indices[chave])
+        return por_posicao(self, chave)
+
+    def keys(self):
+        return cls._fields
+
+    cls.__getitem__ = __getitem__
+    cls.keys = keys
+    return cls
+
+@registro
+class Escola(NamedTuple):
+    id: int
+    nome: str
+
+@registro
+class Cliente(NamedTuple):
+    id: int
+    nome: str
+    telefone: Optional[str]
+    email: Optional[str]
+    data_cadastro: Optional[str]
+    nome_normalizado: Optional[str]
+    telefone_normalizado: Optional[str]
+
+@registro
+class Produto(NamedTuple):
+    # Mesma ordem da tabela: a interface ainda lê algumas colunas por posição
+    id: int
+    nome: str
+    categoria: str
+    tamanho: str
+    cor: str
+    preco: float
+    estoque: int
+    descricao: Optional[str]
+    escola_id: int
+    data_cadastro: Optional[str]
+    reservado: int
+    escola_nome: Optional[str]
+    ponto_pedido: Optional[int]
+    velocidade_diaria: Optional[float]
+    disponivel: int
+
+@registro
+class Pedido(NamedTuple):
+    id: int
+    cliente_id: int
+    escola_id: int
+    status: str
+    data_pedido: str
+    data_entrega_prevista: Optional[str]
+    data_entrega_real: Optional[str]
+    forma_pagamento: Optional[str]
+    quantidade_total: int
+    valor_total: float
+    observacoes: Optional[str]
+    data_pedido_epoch: Optional[int]
+    data_pedido_dia: Optional[int]
+    cliente_nome: str
+    escola_nome: str
+
+@registro
+class ItemPedido(NamedTuple):
+    pedido_id: int
+    produto_id: int
+    nome: str
+    categoria: str
+    tamanho: str
+    cor: str
+    quantidade: int
+    preco_unitario: float
+    subtotal: float
+
+@registro
+class ItemMovimento(NamedTuple):
+    produto_id: int
+    quantidade: int
+    nome: str
+    estoque: int
+
+# =========================================
+# 📜 CONSULTAS NOMEADAS
+# =========================================
+
+class Consulta(NamedTuple):
+    sql: str
+    tipo: Optional[type] = None
+
+_PRODUTOS = '''
+    SELECT p.id, p.nome, p.categoria, p.tamanho, p.cor, p.preco, p.estoque, p.descricao,
+           p.escola_id, p.data_cadastro, p.reservado,
+           e.nome as escola_nome, r.ponto_pedido, r.velocidade_diaria,
+           p.estoque - p.reservado as disponivel
+    FROM produtos p
+    LEFT JOIN escolas e ON p.escola_id = e.id
+    LEFT JOIN reposicao r ON r.produto_id = p.id
+'''
+
+_PEDIDOS = '''
+    SELECT p.id, p.cliente_id, p.escola_id, p.status, p.data_pedido, p.data_entrega_prevista,
+           p.data_entrega_real, p.forma_pagamento, p.quantidade_total, p.valor_total, p.observacoes,
+           p.data_pedido_epoch, p.data_pedido_dia,
+           c.nome as cliente_nome, e.nome as escola_nome
+    FROM pedidos p
+    JOIN clientes c ON p.cliente_id = c.id
+    JOIN escolas e ON p.escola_id = e.id
+'''
+
+CONSULTAS = {
+    # Escolas
+    'escolas.listar': Consulta("SELECT id, nome FROM escolas ORDER BY nome", Escola),
+    'escolas.por_id': Consulta("SELECT id, nome FROM escolas WHERE id = ?", Escola),
+
+    # Clientes
+    'clientes.listar': Consulta('''
+        SELECT id, nome, telefone, email, data_cadastro, nome_normalizado, telefone_normalizado
+        FROM clientes ORDER BY nome
+    ''', Cliente),
+    'clientes.contar': Consulta("SELECT COUNT(*) FROM clientes"),
+    'clientes.existe': Consulta("SELECT 1 FROM clientes WHERE id = ?"),
+    'clientes.inserir': Consulta('''
+        INSERT INTO clientes (nome, telefone, email, data_cadastro, nome_normalizado, telefone_normalizado)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''),
+
+    # Produtos
+    'produtos.listar': Consulta(_PRODUTOS + "ORDER BY e.nome, p.categoria, p.nome", Produto),
+    'produtos.da_escola': Consulta(_PRODUTOS + "WHERE p.escola_id = ? ORDER BY p.categoria, p.nome", Produto),
+    'produtos.duplicado': Consulta('''
+        SELECT COUNT(*) FROM produtos
+        WHERE nome = ? AND tamanho = ? AND cor = ? AND escola_id = ?
+    '''),
+    'produtos.inserir': Consulta('''
+        INSERT INTO produtos (nome, categoria, tamanho, cor, preco, estoque, descricao, escola_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''),
+    'produtos.disponivel': Consulta("SELECT estoque - reservado, nome, escola_id FROM produtos WHERE id = ?"),
+    'produtos.atualizar_estoque': Consulta("UPDATE produtos SET estoque = ? WHERE id = ?"),
+    'produtos.reservar': Consulta("UPDATE produtos SET reservado = reservado + ? WHERE id = ?"),
+    'produtos.movimentar': Consulta(
+        "UPDATE produtos SET reservado = reservado + ?, estoque = estoque - ? WHERE id = ?"
+    ),
+
+    # Catálogo em memória (database/catalogo.py)
+    'catalogo.mudancas': Consulta("SELECT produto_id, versao FROM catalogo_mudancas WHERE versao > ?"),
+    'catalogo.ultima_mudanca': Consulta("SELECT MAX(versao) FROM catalogo_mudancas"),
+    'catalogo.produtos_alterados': Consulta(
+        _PRODUTOS + "WHERE p.id IN (SELECT produto_id FROM catalogo_mudancas WHERE versao > ?)", Produto
+    ),
+
+    # Pedidos
+    'pedidos.listar': Consulta(_PEDIDOS + "ORDER BY p.data_pedido_epoch DESC", Pedido),
+    'pedidos.da_escola': Consulta(_PEDIDOS + "WHERE p.escola_id = ? ORDER BY p.data_pedido_epoch DESC", Pedido),
+    'pedidos.pagina_por_status': Consulta(_PEDIDOS + '''
+        WHERE p.status IN (SELECT value FROM json_each(?))
+        ORDER BY p.data_pedido_epoch DESC, p.id DESC
+        LIMIT ? OFFSET ?
+    ''', Pedido),
+    'pedidos.contar_por_status': Consulta("SELECT status, COUNT(*) FROM pedidos GROUP BY status"),
+    'pedidos.inserir': Consulta('''
+        INSERT INTO pedidos (cliente_id, escola_id, data_pedido, data_pedido_epoch, data_pedido_dia,
+                             data_entrega_prevista, forma_pagamento, quantidade_total, valor_total, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''),
+    'pedidos.status': Consulta("SELECT status FROM pedidos WHERE id = ?"),
+    'pedidos.atualizar_status': Consulta('''
+        UPDATE pedidos
+        SET status = ?, data_entrega_real = ?
+        WHERE id = ?
+    '''),
+    'itens.inserir': Consulta('''
+        INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unitario, subtotal)
+        VALUES (?, ?, ?, ?, ?)
+    '''),
+    # Lista de ids em JSON: o texto não muda com a quantidade de pedidos e o IN usa o índice de pedido_id
+    'itens.dos_pedidos': Consulta('''
+        SELECT pi.pedido_id, pi.produto_id, pr.nome, pr.categoria, pr.tamanho, pr.cor,
+               pi.quantidade, pi.preco_unitario, pi.subtotal
+        FROM pedido_itens pi
+        JOIN produtos pr ON pr.id = pi.produto_id
+        WHERE pi.pedido_id IN (SELECT value FROM json_each(?))
+        ORDER BY pi.pedido_id, pi.id
+    ''', ItemPedido),
+    'itens.dos_pedidos_arquivados': Consulta('''
+        SELECT pi.pedido_id, pi.produto_id, pr.nome, pr.categoria, pr.tamanho, pr.cor,
+               pi.quantidade, pi.preco_unitario, pi.subtotal
+        FROM arquivo.pedido_itens pi
+        JOIN produtos pr ON pr.id = pi.produto_id
+        WHERE pi.pedido_id IN (SELECT value FROM json_each(?))
+        ORDER BY pi.pedido_id, pi.id
+    ''', ItemPedido),
+    'itens.movimento_do_pedido': Consulta('''
+        SELECT pi.produto_id, SUM(pi.quantidade) as quantidade, pr.nome, pr.estoque
+        FROM pedido_itens pi
+        JOIN produtos pr ON pi.produto_id = pr.id
+        WHERE pi.pedido_id = ?
+        GROUP BY pi.produto_id
+    ''', ItemMovimento),
+}
+
+# Consultas tipadas cujas colunas já foram conferidas com os campos do registro
+_conferidas = set()
+
+def _conferir_colunas(nome, cur, tipo):
+    colunas = tuple(descricao[0] for descricao in cur.description)
+    if colunas != tipo._fields:
+        raise TypeError(f"Consulta '{nome}' devolve {colunas}, mas {tipo.__name__} espera {tipo._fields}")
+    _conferidas.add(nome)
+
+# =========================================
+# 🗄️ REPOSITÓRIO
+# =========================================
+
+class Repositorio:
+    """Executa as consultas nomeadas sobre uma conexão (do pool ou própria)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    def abrir(cls, caminho_db):
+        """Repositório com conexão própria, para manter aberto pela vida de um processo"""
+        return cls(sqlite3.connect(caminho_db, check_same_thread=False, cached_statements=TAMANHO_CACHE_SQL))
+
+    def fechar(self):
+        self.conn.close()
+
+    def executar(self, nome, parametros=()):
+        return self.conn.execute(CONSULTAS[nome].sql, parametros)
+
+    def executar_varios(self, nome, lista_parametros):
+        return self.conn.executemany(CONSULTAS[nome].sql, lista_parametros)
+
+    def todos(self, nome, parametros=()):
+        consulta = CONSULTAS[nome]
+        cur = self.conn.execute(consulta.sql, parametros)
+        if consulta.tipo is None:
+            return cur.fetchall()
+        if nome not in _conferidas:
+            _conferir_colunas(nome, cur, consulta.tipo)
+        # Tuplas cruas e conversão em lote: mais barato que sqlite3.Row e depois o registro
+        cur.row_factory = None
+        return list(map(consulta.tipo._make, cur.fetchall()))
+
+    def um(self, nome, parametros=()):
+        consulta = CONSULTAS[nome]
+        cur = self.conn.execute(consulta.sql, parametros)
+        if consulta.tipo is None:
+            return cur.fetchone()
+        if nome not in _conferidas:
+            _conferir_colunas(nome, cur, consulta.tipo)
+        cur.row_factory = None
+        linha = cur.fetchone()
+        return consulta.tipo._make(linha) if linha else None
+
+    def valor(self, nome, parametros=()):
+        """Primeira coluna da primeira linha (COUNT, status...) ou None"""
+        linha = self.conn.execute(CONSULTAS[nome].sql, parametros).fetchone()
+        return linha[0] if linha else None
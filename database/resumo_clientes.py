@@ -0,0 +1,144 @@
+"""Resumo de compras por cliente, mantido por gatilhos
+
+resumo_clientes guarda, por cliente e escola, quantos pedidos ele fez,
+quantos foram cancelados e o valor gasto nos demais; resumo_clientes_tamanhos
+guarda quantas peças de cada categoria e tamanho ele levou em cada escola
+(os tamanhos dos filhos de quem compra para mais de uma escola). Gatilhos em
+pedidos e pedido_itens mantêm as duas tabelas na mesma transação de cada
+gravação, então o histórico do cliente é uma leitura pela chave primária,
+sem somar os pedidos dele.
+
+Os gatilhos não enxergam o banco de arquivo: o arquivamento apaga os
+pedidos da base quente e recalcula o resumo dos clientes movidos sobre a
+união da base quente com o arquivo (recalcular_resumo_clientes).
+"""
+import json
+
+CANCELADO = 'Cancelado'
+
+def criar_resumo_clientes(cur):
+    """Tabelas do resumo e os gatilhos que as mantêm; retorna True se as tabelas acabaram de ser criadas"""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resumo_clientes'")
+    criadas = cur.fetchone() is None
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_clientes (
+            cliente_id INTEGER NOT NULL,
+            escola_id INTEGER NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            cancelados INTEGER NOT NULL DEFAULT 0,
+            valor_total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (cliente_id, escola_id)
+        ) WITHOUT ROWID
+    ''')
+    # Categoria e tamanho vazios em vez de NULL: fazem parte da chave
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_clientes_tamanhos (
+            cliente_id INTEGER NOT NULL,
+            escola_id INTEGER NOT NULL,
+            categoria TEXT NOT NULL,
+            tamanho TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            PRIMARY KEY (cliente_id, escola_id, categoria, tamanho)
+        ) WITHOUT ROWID
+    ''')
+
+    # Histórico paginado e última compra saem deste índice, já na ordem da tela
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_data ON pedidos(cliente_id, data_pedido_epoch)")
+
+    def somar_pedido(linha, sinal):
+        return f'''
+            INSERT INTO resumo_clientes (cliente_id, escola_id, pedidos, cancelados, valor_total)
+            SELECT {linha}.cliente_id, {linha}.escola_id, {sinal}, {sinal} * ({linha}.status IS '{CANCELADO}'),
+                   {sinal} * CASE WHEN {linha}.status IS '{CANCELADO}' THEN 0 ELSE COALESCE({linha}.valor_total, 0) END
+            WHERE {linha}.cliente_id IS NOT NULL AND {linha}.escola_id IS NOT NULL
+            ON CONFLICT (cliente_id, escola_id) DO UPDATE SET
+                pedidos = pedidos + excluded.pedidos,
+                cancelados = cancelados + excluded.cancelados,
+                valor_total = valor_total + excluded.valor_total;
+            DELETE FROM resumo_clientes
+            WHERE cliente_id = {linha}.cliente_id AND escola_id = {linha}.escola_id AND pedidos <= 0;
+        '''
+
+    def somar_tamanhos(origem, cliente, escola, filtro, sinal, dono):
+        """dono: (cliente_id, escola_id) das linhas que podem ter zerado"""
+        return f'''
+            INSERT INTO resumo_clientes_tamanhos (cliente_id, escola_id, categoria, tamanho, quantidade)
+            SELECT {cliente}, {escola}, COALESCE(pr.categoria, ''), COALESCE(pr.tamanho, ''),
+                   {sinal} * SUM(COALESCE(pi.quantidade, 0))
+            FROM {origem}
+            JOIN produtos pr ON pr.id = pi.produto_id
+            WHERE {filtro} AND {cliente} IS NOT NULL AND {escola} IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (cliente_id, escola_id, categoria, tamanho) DO UPDATE SET
+                quantidade = quantidade + excluded.quantidade;
+            DELETE FROM resumo_clientes_tamanhos WHERE (cliente_id, escola_id) = ({dono}) AND quantidade <= 0;
+        '''
+
+    def tamanhos_do_pedido(linha, sinal):
+        """Peças do pedido inteiro (mudou de status, cliente ou escola); pedido cancelado não conta"""
+        return somar_tamanhos('pedido_itens pi', f'{linha}.cliente_id', f'{linha}.escola_id',
+                              f"pi.pedido_id = {linha}.id AND {linha}.status IS NOT '{CANCELADO}'", sinal,
+                              f'SELECT {linha}.cliente_id, {linha}.escola_id')
+
+    def tamanhos_do_item(linha, sinal):
+        """Peças de um item, no cliente e na escola do pedido dele"""
+        return somar_tamanhos(f'(SELECT {linha}.produto_id AS produto_id, {linha}.quantidade AS quantidade) pi '
+                              f'JOIN pedidos p ON p.id = {linha}.pedido_id',
+                              'p.cliente_id', 'p.escola_id', f"p.status IS NOT '{CANCELADO}'", sinal,
+                              f'SELECT cliente_id, escola_id FROM pedidos WHERE id = {linha}.pedido_id')
+
+    gatilhos = {
+        'trg_resumo_clientes_pedido_insert': ('AFTER INSERT ON pedidos', somar_pedido('NEW', 1)),
+        'trg_resumo_clientes_pedido_delete': ('AFTER DELETE ON pedidos', somar_pedido('OLD', -1)),
+        'trg_resumo_clientes_pedido_update': (
+            'AFTER UPDATE OF cliente_id, escola_id, status, valor_total ON pedidos',
+            somar_pedido('OLD', -1) + somar_pedido('NEW', 1)
+        ),
+        # Itens entram depois do pedido e saem antes dele (excluir_pedido, arquivamento)
+        'trg_resumo_clientes_tamanhos_update': (
+            f'''AFTER UPDATE OF cliente_id, escola_id, status ON pedidos
+            WHEN OLD.cliente_id IS NOT NEW.cliente_id OR OLD.escola_id IS NOT NEW.escola_id
+              OR (OLD.status IS '{CANCELADO}') != (NEW.status IS '{CANCELADO}')''',
+            tamanhos_do_pedido('OLD', -1) + tamanhos_do_pedido('NEW', 1)
+        ),
+        'trg_resumo_clientes_item_insert': ('AFTER INSERT ON pedido_itens', tamanhos_do_item('NEW', 1)),
+        'trg_resumo_clientes_item_delete': ('AFTER DELETE ON pedido_itens', tamanhos_do_item('OLD', -1)),
+        'trg_resumo_clientes_item_update': (
+            'AFTER UPDATE OF pedido_id, produto_id, quantidade ON pedido_itens',
+            tamanhos_do_item('OLD', -1) + tamanhos_do_item('NEW', 1)
+        ),
+    }
+    for nome, (evento, corpo) in gatilhos.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {corpo} END")
+    return criadas
+
+def recalcular_resumo_clientes(cur, pedidos='pedidos', itens='pedido_itens', cliente_ids=None):
+    """Refaz o resumo dos clientes informados (todos, com None) a partir das origens de pedidos e itens
+    (as tabelas da base quente ou a união com o arquivo de tabelas_pedidos)"""
+    filtro, parametros = "AND {coluna} IS NOT NULL", ()
+    if cliente_ids is not None:
+        filtro = "AND {coluna} IN (SELECT value FROM json_each(?))"
+        parametros = (json.dumps(sorted(cliente_ids)),)
+
+    for tabela in ('resumo_clientes', 'resumo_clientes_tamanhos'):
+        cur.execute(f"DELETE FROM {tabela} WHERE 1 {filtro.format(coluna='cliente_id')}", parametros)
+    cur.execute(f'''
+        INSERT INTO resumo_clientes (cliente_id, escola_id, pedidos, cancelados, valor_total)
+        SELECT cliente_id, escola_id, COUNT(*), SUM(status IS '{CANCELADO}'),
+               SUM(CASE WHEN status IS '{CANCELADO}' THEN 0 ELSE COALESCE(valor_total, 0) END)
+        FROM {pedidos} p
+        WHERE escola_id IS NOT NULL {filtro.format(coluna='cliente_id')}
+        GROUP BY cliente_id, escola_id
+    ''', parametros)
+    cur.execute(f'''
+        INSERT INTO resumo_clientes_tamanhos (cliente_id, escola_id, categoria, tamanho, quantidade)
+        SELECT p.cliente_id, p.escola_id, COALESCE(pr.categoria, ''), COALESCE(pr.tamanho, ''),
+               SUM(COALESCE(pi.quantidade, 0)) AS quantidade
+        FROM {pedidos} p
+        JOIN {itens} pi ON pi.pedido_id = p.id
+        JOIN produtos pr ON pr.id = pi.produto_id
+        WHERE p.escola_id IS NOT NULL AND p.status IS NOT '{CANCELADO}' {filtro.format(coluna='p.cliente_id')}
+        GROUP BY 1, 2, 3, 4
+        HAVING quantidade > 0
+    ''', parametros)
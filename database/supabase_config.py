@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
+import json
 from datetime import datetime
 
+from database.banco import auditoria
+
 # =========================================
 # 🗄️ SISTEMA LOCAL DE FARDAMENTOS
 # =========================================
@@ -15,8 +18,6 @@ def criar_tabelas_iniciais():
     try:
         if 'movimentacoes' not in st.session_state:
             st.session_state.movimentacoes = []
-        if 'historico' not in st.session_state:
-            st.session_state.historico = []
         return True
     except:
         return False
@@ -151,21 +152,10 @@ def buscar_movimentacoes(fardamento_id=None):
     return pd.DataFrame()
 
 def registrar_historico(tipo, fardamento_id=None, detalhes=""):
-    """Registra histórico de ações"""
+    """Registra histórico de ações na trilha de auditoria (gravada em lote no banco)"""
     try:
-        if 'historico' not in st.session_state:
-            st.session_state.historico = []
-            
-        historico = {
-            'id': len(st.session_state.historico) + 1,
-            'tipo': tipo,
-            'fardamento_id': fardamento_id,
-            'detalhes': detalhes,
-            'data': datetime.now().strftime("%d/%m/%Y %H:%M"),
-            'usuario': st.session_state.get('username', 'Sistema')
-        }
-        
-        st.session_state.historico.append(historico)
+        auditoria.registrar(tipo, 'fardamento', fardamento_id, {'detalhes': detalhes},
+                            usuario=st.session_state.get('username', 'Sistema'))
         return True
         
     except Exception:
@@ -173,10 +163,18 @@ def registrar_historico(tipo, fardamento_id=None, detalhes=""):
 
 def buscar_historico(limite=50):
     """Busca histórico do sistema"""
-    if 'historico' in st.session_state and st.session_state.historico:
-        df = pd.DataFrame(st.session_state.historico)
-        return df.sort_values('data', ascending=False).head(limite)
-    return pd.DataFrame()
+    try:
+        linhas = auditoria.buscar(entidade='fardamento', limite=limite)
+    except Exception:
+        return pd.DataFrame()
+    if not linhas:
+        return pd.DataFrame()
+    
+    df = pd.DataFrame([dict(linha) for linha in linhas])
+    df['data'] = df['momento_epoch'].map(lambda epoch: datetime.fromtimestamp(epoch).strftime("%d/%m/%Y %H:%M"))
+    df['detalhes'] = df['detalhes'].map(lambda texto: json.loads(texto).get('detalhes', '') if texto else '')
+    df = df.rename(columns={'acao': 'tipo', 'entidade_id': 'fardamento_id'})
+    return df[['id', 'tipo', 'fardamento_id', 'detalhes', 'data', 'usuario']]
 
 def salvar_pedido(dados_pedido):
     """Salva um pedido com validações"""
@@ -0,0 +1,97 @@
+"""Banco temporário para os testes
+
+O caminho do banco é lido na importação de database.lojas, então é definido
+aqui, antes de qualquer teste importar o pacote (FARDAMENTOS_POR_ESCOLA=1 roda a
+mesma bateria com partições por escola). Cada teste cria os próprios
+produtos e clientes e não depende do que os outros gravaram.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+PASTA_TESTES = tempfile.mkdtemp(prefix='fardamentos-testes-')
+os.environ['FARDAMENTOS_DB'] = os.path.join(PASTA_TESTES, 'testes.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+_sequencia = itertools.count(1)
+
+@pytest.fixture(scope='session', autouse=True)
+def banco():
+    from database.banco import init_db
+    init_db()
+    return os.environ['FARDAMENTOS_DB']
+
+@pytest.fixture(scope='session')
+def porta_api(banco):
+    """API no banco dos testes, em uma thread; devolve a porta"""
+    import threading
+    from api import criar_servidor
+
+    servidor = criar_servidor('127.0.0.1', 0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor.server_address[1]
+    servidor.shutdown()
+
+@pytest.fixture
+def escola_id():
+    from database.banco import listar_escolas
+    return listar_escolas()[0]['id']
+
+@pytest.fixture
+def novo_produto(escola_id):
+    """Cria um produto com nome único; devolve o id"""
+    from database.banco import adicionar_produto, listar_produtos_por_escola
+
+    def criar(estoque=10, preco=30.0, escola=None):
+        escola = escola or escola_id
+        nome = f"Produto teste {next(_sequencia)}"
+        sucesso, mensagem = adicionar_produto(nome, "Camisetas", "M", "Azul", preco, estoque, "", escola)
+        assert sucesso, mensagem
+        return next(p['id'] for p in listar_produtos_por_escola(escola) if p['nome'] == nome)
+    return criar
+
+@pytest.fixture
+def novo_cliente():
+    """Cria um cliente com telefone único; devolve o id"""
+    from database.banco import adicionar_cliente, buscar_clientes
+
+    def criar():
+        numero = next(_sequencia)
+        sucesso, mensagem = adicionar_cliente(f"Cliente teste {numero}", f"1198{numero:07d}", "")
+        assert sucesso, mensagem
+        return buscar_clientes(f"Cliente teste {numero}")[0]['id']
+    return criar
+
+@pytest.fixture
+def novo_pedido(escola_id, novo_produto, novo_cliente):
+    """Grava um pedido pela função da interface; devolve o id.
+    Com registrado_em, grava com essa data, como a venda sincronizada pelo caixa offline"""
+    from database.banco import adicionar_pedido, listar_pedidos_cliente, get_connection, iniciar_escrita, inserir_pedido
+    from database.particoes import na_escola
+
+    def criar(produto_id=None, quantidade=1, cliente_id=None, escola=None, registrado_em=None, preco=30.0):
+        cliente_id = cliente_id or novo_cliente()
+        escola = escola or escola_id
+        produto_id = produto_id or novo_produto(escola=escola)
+        item = {'produto_id': produto_id, 'quantidade': quantidade, 'preco_unitario': preco,
+                'subtotal': preco * quantidade}
+        if registrado_em is None:
+            # Pedidos do mesmo cliente no mesmo segundo em outra escola podem vir antes na listagem
+            anteriores = {pedido.id for pedido in listar_pedidos_cliente(cliente_id, 1000)}
+            sucesso, mensagem = adicionar_pedido(cliente_id, escola, [item], None, 'PIX', '')
+            assert sucesso, mensagem
+            pedido_id, = {pedido.id for pedido in listar_pedidos_cliente(cliente_id, 1000)} - anteriores
+            return pedido_id
+        with na_escola(escola):
+            conn = get_connection()
+            try:
+                iniciar_escrita(conn)
+                pedido_id, _ = inserir_pedido(conn.cursor(), cliente_id, escola, [item], None, 'PIX', '', registrado_em)
+                conn.commit()
+                return pedido_id
+            finally:
+                conn.close()
+    return criar
@@ -0,0 +1,211 @@
+"""Validação das entradas da API: preço do catálogo, cliente, quantidade, estoque e lotes item a item"""
+import base64
+import http.client
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def credenciais(username, password):
+    return 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+
+CREDENCIAIS = credenciais('admin', 'Admin@2024!')
+
+@pytest.fixture
+def requisitar(porta_api):
+    def requisitar(metodo, caminho, corpo=None, autorizacao=CREDENCIAIS):
+        conexao = http.client.HTTPConnection('127.0.0.1', porta_api, timeout=30)
+        try:
+            conexao.request(metodo, caminho, body=json.dumps(corpo) if corpo is not None else None,
+                            headers={'Authorization': autorizacao, 'Content-Type': 'application/json'})
+            resposta = conexao.getresponse()
+            return resposta.status, json.loads(resposta.read())
+        finally:
+            conexao.close()
+    return requisitar
+
+def valor_ultimo_pedido(cliente_id):
+    from database.banco import listar_pedidos_cliente
+    pedidos = listar_pedidos_cliente(cliente_id, 1)
+    return pedidos[0].valor_total if pedidos else None
+
+def test_preco_enviado_e_ignorado(requisitar, escola_id, novo_produto, novo_cliente):
+    produto_id, cliente_id = novo_produto(preco=40.0), novo_cliente()
+    for preco in (-500, 'x'):
+        status, resposta = requisitar('POST', '/pedidos', {
+            'cliente_id': cliente_id, 'escola_id': escola_id,
+            'itens': [{'produto_id': produto_id, 'quantidade': 2, 'preco_unitario': preco}],
+        })
+        assert status == 200, resposta
+        assert valor_ultimo_pedido(cliente_id) == 80.0
+
+def test_cliente_inexistente(requisitar, escola_id, novo_produto):
+    from database.banco import listar_produtos_por_escola
+    produto_id = novo_produto(estoque=5)
+    status, resposta = requisitar('POST', '/pedidos', {
+        'cliente_id': 99999, 'escola_id': escola_id, 'itens': [{'produto_id': produto_id, 'quantidade': 1}],
+    })
+    assert status == 400 and 'Cliente 99999' in resposta['mensagem']
+    produto = next(p for p in listar_produtos_por_escola(escola_id) if p['id'] == produto_id)
+    assert produto['reservado'] == 0
+
+@pytest.mark.parametrize('quantidade', [0, -3, 1.5])
+def test_quantidade_invalida(requisitar, escola_id, novo_produto, novo_cliente, quantidade):
+    status, _ = requisitar('POST', '/pedidos', {
+        'cliente_id': novo_cliente(), 'escola_id': escola_id,
+        'itens': [{'produto_id': novo_produto(), 'quantidade': quantidade}],
+    })
+    assert status == 400
+
+def test_produto_de_outra_escola(requisitar, novo_produto, novo_cliente):
+    from database.banco import listar_escolas
+    outra, escola = [escola['id'] for escola in listar_escolas()[:2]]
+    status, resposta = requisitar('POST', '/pedidos', {
+        'cliente_id': novo_cliente(), 'escola_id': escola,
+        'itens': [{'produto_id': novo_produto(escola=outra), 'quantidade': 1}],
+    })
+    assert status == 400, resposta
+
+def test_inserir_pedido_confere_cliente_e_produto(escola_id, novo_produto, novo_cliente):
+    """Os caminhos que não passam pela API (lote, caixa offline, importação) também são conferidos"""
+    from database.banco import adicionar_pedido
+    produto_id = novo_produto()
+    item = {'produto_id': produto_id, 'quantidade': 1, 'preco_unitario': 30.0, 'subtotal': 30.0}
+    assert not adicionar_pedido(99999, escola_id, [item], None, 'PIX', '')[0]
+    assert not adicionar_pedido(novo_cliente(), escola_id, [dict(item, quantidade=0)], None, 'PIX', '')[0]
+    assert adicionar_pedido(novo_cliente(), escola_id, [item], None, 'PIX', '')[0]
+
+@pytest.mark.parametrize('estoque', [-5, 'x', 2.5, True])
+def test_estoque_invalido(requisitar, escola_id, novo_produto, estoque):
+    from database.banco import listar_produtos_por_escola
+    produto_id = novo_produto(estoque=7)
+    status, _ = requisitar('PUT', f'/produtos/{produto_id}/estoque', {'estoque': estoque})
+    assert status == 400
+    produto = next(p for p in listar_produtos_por_escola(escola_id) if p['id'] == produto_id)
+    assert produto['estoque'] == 7
+
+def test_estoque_lote_item_a_item(requisitar, escola_id, novo_produto):
+    from database.banco import listar_produtos_por_escola
+    bom, ruim = novo_produto(estoque=1), novo_produto(estoque=1)
+    status, resposta = requisitar('POST', '/estoque/lote', {
+        'ajustes': [{'produto_id': bom, 'estoque': 9}, {'produto_id': ruim, 'estoque': -1}],
+    })
+    assert status == 200
+    assert [(r['produto_id'], r['sucesso']) for r in resposta['resultados']] == [(bom, True), (ruim, False)]
+    assert resposta['atualizados'] == 1
+    estoques = {p['id']: p['estoque'] for p in listar_produtos_por_escola(escola_id)}
+    assert (estoques[bom], estoques[ruim]) == (9, 1)
+
+def test_status_lote_item_a_item(requisitar, escola_id, novo_produto, novo_cliente):
+    from database.banco import adicionar_pedido, listar_pedidos_cliente
+    cliente_id = novo_cliente()
+    item = {'produto_id': novo_produto(), 'quantidade': 1, 'preco_unitario': 30.0, 'subtotal': 30.0}
+    assert adicionar_pedido(cliente_id, escola_id, [item], None, 'PIX', '')[0]
+    pedido_id = listar_pedidos_cliente(cliente_id, 1)[0].id
+
+    status, resposta = requisitar('POST', '/pedidos/status/lote', {
+        'atualizacoes': [{'pedido_id': pedido_id, 'status': 'Em produção'},
+                         {'pedido_id': pedido_id, 'status': 'Inventado'}],
+    })
+    assert status == 200
+    assert [r['sucesso'] for r in resposta['resultados']] == [True, False]
+    assert listar_pedidos_cliente(cliente_id, 1)[0].status == 'Em produção'
+
+@pytest.mark.parametrize('forma_pagamento', ['Bitcoin', {}, 0])
+def test_forma_pagamento_invalida(requisitar, escola_id, novo_produto, novo_cliente, forma_pagamento):
+    status, resposta = requisitar('POST', '/pedidos', {
+        'cliente_id': novo_cliente(), 'escola_id': escola_id, 'forma_pagamento': forma_pagamento,
+        'itens': [{'produto_id': novo_produto(), 'quantidade': 1}],
+    })
+    assert status == 400 and 'Forma de pagamento' in resposta['mensagem']
+
+def test_tipo_sem_permissao_so_le(requisitar, escola_id, novo_produto, novo_cliente):
+    from database.banco import criar_usuario
+    assert criar_usuario('consulta_api', 'Consulta@123', 'Só consulta', 'consulta')[0]
+    consulta = credenciais('consulta_api', 'Consulta@123')
+    produto_id = novo_produto(estoque=4)
+
+    assert requisitar('GET', '/escolas', autorizacao=consulta)[0] == 200
+    status, resposta = requisitar('POST', '/pedidos', {
+        'cliente_id': novo_cliente(), 'escola_id': escola_id, 'itens': [{'produto_id': produto_id, 'quantidade': 1}],
+    }, autorizacao=consulta)
+    assert status == 403, resposta
+    assert requisitar('PUT', f'/produtos/{produto_id}/estoque', {'estoque': 0}, autorizacao=consulta)[0] == 403
+    assert requisitar('POST', '/sincronizacao', {'operacoes': [{}]}, autorizacao=consulta)[0] == 403
+    # Nada foi gravado
+    produtos = requisitar('GET', f'/produtos?escola_id={escola_id}')[1]
+    assert next(p['estoque'] for p in produtos if p['id'] == produto_id) == 4
+
+def test_relatorio_de_vendas_por_granularidade(requisitar, escola_id, novo_produto, novo_pedido):
+    from datetime import datetime
+    produto_id = novo_produto(estoque=20)
+    for dia in (14, 20):
+        novo_pedido(produto_id, 1, registrado_em=datetime(2014, 7, dia, 9, 0).astimezone())
+    consulta = f'/relatorios/vendas?escola_id={escola_id}&inicio=2014-07-01&fim=2014-07-31'
+
+    status, linhas = requisitar('GET', consulta + '&granularidade=semana')
+    assert status == 200 and [(linha['Data'], linha['Total Pedidos']) for linha in linhas] == [('2014-07-14', 2)]
+    assert len(requisitar('GET', consulta)[1]) == 2  # Sem granularidade, por dia
+    status, resposta = requisitar('GET', consulta + '&granularidade=ano')
+    assert status == 400 and 'granularidade' in resposta['mensagem']
+
+def test_itens_de_varios_pedidos(requisitar, novo_produto, novo_pedido):
+    from api import MAXIMO_IDS_ITENS
+    pedidos = [novo_pedido(novo_produto(), quantidade) for quantidade in (1, 2)]
+
+    status, itens = requisitar('GET', f'/pedidos/itens?ids={pedidos[0]},{pedidos[1]}')
+    assert status == 200
+    assert {pedido_id: [item['quantidade'] for item in linhas] for pedido_id, linhas in itens.items()} == \
+        {str(pedidos[0]): [1], str(pedidos[1]): [2]}
+    assert requisitar('GET', '/pedidos/itens?ids=1,x')[0] == 400
+    assert requisitar('GET', '/pedidos/itens')[0] == 400
+    muitos = ','.join(str(i) for i in range(1, MAXIMO_IDS_ITENS + 2))
+    assert requisitar('GET', f'/pedidos/itens?ids={muitos}')[0] == 413
+
+def test_historico_do_cliente_paginado(requisitar, novo_cliente, novo_pedido):
+    cliente_id = novo_cliente()
+    pedidos = [novo_pedido(cliente_id=cliente_id) for _ in range(3)]
+
+    status, historico = requisitar('GET', f'/clientes/{cliente_id}/historico?pagina=2&por_pagina=2')
+    assert status == 200, historico
+    assert (historico['pedidos'], historico['valor_total'], historico['pagina']) == (3, 90.0, 2)
+    assert [pedido['id'] for pedido in historico['pedidos_pagina']] == [min(pedidos)]
+    assert requisitar('GET', f'/clientes/{cliente_id}/historico?pagina=0')[0] == 400
+    assert requisitar('GET', f'/clientes/{cliente_id}/historico?por_pagina=1000')[0] == 400
+
+def test_id_desconhecido_da_404(requisitar):
+    status, resposta = requisitar('PUT', '/pedidos/987654321012/status', {'status': 'Entregue'})
+    assert status == 404, resposta
+    status, resposta = requisitar('POST', '/pedidos/status/lote', {
+        'atualizacoes': [{'pedido_id': 987654321012, 'status': 'Entregue'}],
+    })
+    assert status == 200 and 'não encontrado' in resposta['resultados'][0]['mensagem']
+    assert requisitar('PUT', '/produtos/987654321012/estoque', {'estoque': 1})[0] == 404
+
+def test_id_desconhecido_com_particoes(tmp_path):
+    """Com partições, o id de uma escola sem arquivo não pode virar 'Erro de conexão'"""
+    ambiente = dict(os.environ, FARDAMENTOS_DB=str(tmp_path / 'particoes.db'), FARDAMENTOS_POR_ESCOLA='1',
+                    PYTHONPATH=RAIZ)
+    codigo = textwrap.dedent(f'''
+        import http.client, json, threading
+        from api import criar_servidor
+        servidor = criar_servidor('127.0.0.1', 0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        for metodo, caminho, corpo in (('PUT', '/pedidos/5/status', {{'status': 'Entregue'}}),
+                                       ('PUT', '/pedidos/987654321012/status', {{'status': 'Entregue'}}),
+                                       ('PUT', '/produtos/987654321012/estoque', {{'estoque': 1}})):
+            conexao = http.client.HTTPConnection('127.0.0.1', servidor.server_address[1], timeout=30)
+            conexao.request(metodo, caminho, body=json.dumps(corpo),
+                            headers={{'Authorization': {CREDENCIAIS!r}, 'Content-Type': 'application/json'}})
+            resposta = conexao.getresponse()
+            assert resposta.status == 404, (caminho, resposta.status, resposta.read())
+            conexao.close()
+    ''')
+    resultado = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, env=ambiente,
+                               capture_output=True, text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stderr
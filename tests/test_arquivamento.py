@@ -0,0 +1,76 @@
+"""Arquivamento: pedidos fechados antigos saem da base quente sem sumir dos relatórios e do histórico
+
+Os pedidos daqui são de 2009 e o corte é 2010: os dos outros testes não são arquivados.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import database.banco as banco
+from database.arquivamento import arquivar_pedidos, arquivar_lote, corte_maximo
+from database.particoes import na_escola
+
+CORTE = date(2010, 1, 1)
+
+def em_2009(mes, dia):
+    return datetime(2009, mes, dia, 10, 0).astimezone()
+
+def na_base_quente(escola_id, pedido_id):
+    with na_escola(escola_id):
+        conn = banco.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM main.pedidos WHERE id = ?", (pedido_id,)).fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_arquiva_so_os_fechados_e_os_relatorios_nao_mudam(escola_id, novo_produto, novo_cliente, novo_pedido):
+    cliente_id, produto_id = novo_cliente(), novo_produto(estoque=50)
+    entregue = novo_pedido(produto_id, 2, cliente_id, registrado_em=em_2009(3, 10))
+    cancelado = novo_pedido(produto_id, 1, cliente_id, registrado_em=em_2009(3, 11))
+    pendente = novo_pedido(produto_id, 4, cliente_id, registrado_em=em_2009(3, 12))
+    assert banco.atualizar_status_pedido(entregue, 'Entregue')[0]
+    assert banco.atualizar_status_pedido(cancelado, 'Cancelado')[0]
+
+    def relatorios():
+        return (banco.gerar_relatorio_vendas_por_escola(escola_id, date(2009, 1, 1), date(2009, 12, 31)),
+                banco.gerar_relatorio_produtos_por_escola(escola_id),
+                [pedido.id for pedido in banco.listar_pedidos_cliente(cliente_id)])
+    antes = relatorios()
+
+    assert arquivar_pedidos(CORTE, simular=True) >= 2
+    assert arquivar_pedidos(CORTE, tamanho_lote=1) >= 2
+    assert not na_base_quente(escola_id, entregue) and not na_base_quente(escola_id, cancelado)
+    assert na_base_quente(escola_id, pendente)
+    assert arquivar_pedidos(CORTE, simular=True) == 0
+
+    depois = relatorios()
+    pd.testing.assert_frame_equal(antes[0], depois[0])
+    pd.testing.assert_frame_equal(antes[1], depois[1])
+    assert antes[2] == depois[2] == [pendente, cancelado, entregue]
+    # Os itens dos pedidos arquivados continuam no detalhe do histórico
+    itens = banco.listar_itens_pedidos([pendente, cancelado, entregue])
+    assert [[item.quantidade for item in itens[pedido_id]] for pedido_id in (pendente, cancelado, entregue)] == [[4], [1], [2]]
+
+    # Pedido arquivado ainda segura o cliente e o produto
+    assert banco.excluir_cliente(cliente_id) == (False, "Cliente possui pedidos e não pode ser excluído")
+    assert banco.excluir_pedido(pendente)[0]
+    assert banco.excluir_cliente(cliente_id) == (False, "Cliente possui pedidos arquivados e não pode ser excluído")
+    assert not banco.excluir_produto(produto_id)[0]
+
+def test_pedido_reaberto_durante_o_lote_fica_na_base_quente(escola_id, novo_pedido):
+    pedido_id = novo_pedido(registrado_em=em_2009(5, 20))
+    with na_escola(escola_id):
+        conn = banco.get_connection()
+    try:
+        banco.anexar_arquivo(conn, criar=True)
+        # O lote foi escolhido com o pedido fechado, mas ele está aberto na hora de apagar
+        assert arquivar_lote(conn, [pedido_id], banco.data_para_dia(CORTE)) == 0
+        assert conn.execute("SELECT COUNT(*) FROM arquivo.pedidos WHERE id = ?", (pedido_id,)).fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert na_base_quente(escola_id, pedido_id)
+
+def test_corte_nao_alcanca_as_janelas_da_reposicao():
+    with pytest.raises(ValueError, match="não pode passar"):
+        arquivar_pedidos(date.fromordinal(corte_maximo().toordinal() + 1))
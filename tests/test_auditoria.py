@@ -0,0 +1,55 @@
+"""Auditoria: nada de pedido desfeito no lote, e o buffer não cresce sem limite"""
+import json
+import os
+
+def test_pedido_desfeito_no_lote_nao_fica_na_auditoria(monkeypatch, novo_pedido):
+    from database import banco
+    primeiro, segundo = novo_pedido(), novo_pedido()
+    publicar = banco.publicar_evento
+
+    def falhar_no_segundo(conn, entidade, acao, entidade_id, dados=None):
+        # Falha depois de auditoria.registrar, como um erro qualquer no meio da troca de status
+        if entidade_id == segundo and acao == 'status':
+            raise RuntimeError("falha simulada")
+        return publicar(conn, entidade, acao, entidade_id, dados)
+    monkeypatch.setattr(banco, 'publicar_evento', falhar_no_segundo)
+
+    resultados = banco.atualizar_status_pedidos_lote([(primeiro, 'Em produção'), (segundo, 'Em produção')])
+    assert [sucesso for sucesso, _ in resultados] == [True, False]
+
+    def acoes(pedido_id):
+        return [linha['acao'] for linha in banco.auditoria.buscar(entidade='pedido', entidade_id=pedido_id)]
+    assert 'status' in acoes(primeiro)
+    assert 'status' not in acoes(segundo)
+
+def test_ponto_de_retorno_descarta_so_o_que_veio_depois():
+    from database.banco import get_connection, iniciar_escrita, auditoria
+    conn = get_connection()
+    try:
+        iniciar_escrita(conn)
+        auditoria.registrar('teste', 'ponto', 1, conn=conn)
+        marca = conn.abrir_ponto('teste')
+        auditoria.registrar('teste', 'ponto', 2, conn=conn)
+        conn.voltar_ao_ponto('teste', marca)
+        conn.commit()
+    finally:
+        conn.close()
+    assert [linha['entidade_id'] for linha in auditoria.buscar(entidade='ponto')] == [1]
+
+def test_buffer_limitado_com_gravacao_falhando(tmp_path):
+    from database.auditoria import BufferAuditoria
+    # Um diretório no lugar do arquivo: toda gravação falha
+    caminho = tmp_path / 'auditoria.db'
+    caminho.mkdir()
+    buffer = BufferAuditoria(str(caminho), limite=1000, intervalo=3600, maximo=5)
+    for numero in range(8):
+        buffer.registrar('estoque', 'produto', numero, {'estoque': numero})
+        assert buffer.gravar() == 0
+
+    assert [entrada[4] for entrada in buffer._entradas] == [3, 4, 5, 6, 7]
+    with open(buffer.caminho_excedente, encoding='utf-8') as arquivo:
+        excedente = [json.loads(linha) for linha in arquivo]
+    assert [entrada['entidade_id'] for entrada in excedente] == [0, 1, 2]
+    assert excedente[0]['detalhes'] == {'estoque': 0}
+    assert os.path.dirname(buffer.caminho_excedente) == str(tmp_path)
+    buffer._entradas.clear()  # Nada para a gravação na saída do processo
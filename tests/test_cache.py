@@ -0,0 +1,55 @@
+"""Cache coerente entre processos: escrita em um processo invalida o cache dos outros"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_processos_enxergam_as_escritas_uns_dos_outros(tmp_path):
+    from benchmarks.coerencia_cache import preparar_banco, trabalhador
+    caminho = str(tmp_path / 'coerencia.db')
+    preparar_banco(caminho)
+
+    # spawn: cada processo começa sem o cache (nem as threads) deste
+    contexto = multiprocessing.get_context('spawn')
+    processos, escritas = 3, 20
+    barreira = contexto.Barrier(processos)
+    resultados = contexto.Queue()
+    trabalhos = [contexto.Process(target=trabalhador, args=(caminho, i, escritas, barreira, resultados))
+                 for i in range(processos)]
+    for trabalho in trabalhos:
+        trabalho.start()
+    saidas = [resultados.get(timeout=120) for _ in trabalhos]
+    for trabalho in trabalhos:
+        trabalho.join(timeout=30)
+
+    for indice, erros, total_final, acertos, falhas in saidas:
+        assert erros == [], f"processo {indice}: {erros[:3]}"
+        assert total_final == processos * escritas
+        assert acertos > 0  # As leituras repetidas vieram do cache
+
+def test_catalogo_do_processo_ve_estoque_gravado_por_outro(escola_id, novo_produto):
+    from database.banco import listar_produtos_por_escola, roteador
+    from database.particoes import na_escola
+    produto_id = novo_produto(estoque=3)
+
+    def estoque():
+        return next(p.estoque for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+    assert estoque() == 3
+    with na_escola(escola_id):
+        recargas = roteador.banco().catalogo.recargas
+
+    # Outro processo (outro worker da interface ou a API) grava no mesmo banco
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ)
+    gravacao = subprocess.run(
+        [sys.executable, '-c', f"from database.banco import atualizar_estoque; "
+                               f"import sys; sys.exit(0 if atualizar_estoque({produto_id}, 42)[0] else 1)"],
+        env=ambiente, capture_output=True, text=True, timeout=120,
+    )
+    assert gravacao.returncode == 0, gravacao.stderr
+
+    assert estoque() == 42
+    with na_escola(escola_id):
+        # Só o produto alterado foi relido, sem recarregar o catálogo inteiro
+        assert roteador.banco().catalogo.recargas == recargas
@@ -0,0 +1,41 @@
+"""Roteiro do teste de carga da interface: uma sessão do app.py pelo AppTest, sem erros, gravando de verdade"""
+import os
+import random
+import sys
+
+from benchmarks.carga_api import percentil
+from benchmarks.carga_sessoes import Sessao, ACOES, ITENS_POR_CARRINHO, montar_itens, erro_de_bloqueio
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+def test_montar_itens_no_formato_do_carrinho():
+    produtos = [{'id': i, 'nome': f'P{i}', 'tamanho': 'M', 'cor': 'Azul', 'preco': 10.0 * i} for i in range(1, 6)]
+    itens = montar_itens(random.Random(1), produtos, 3)
+    assert len({item['produto_id'] for item in itens}) == 3
+    for item in itens:
+        assert 1 <= item['quantidade'] <= 3
+        assert item['subtotal'] == item['preco_unitario'] * item['quantidade'] == 10.0 * item['produto_id'] * item['quantidade']
+
+def test_metricas():
+    assert erro_de_bloqueio("database is locked") and erro_de_bloqueio(RuntimeError("database is busy"))
+    assert not erro_de_bloqueio("Estoque insuficiente para: Camiseta")
+    assert percentil([], 0.95) == 0.0
+    assert percentil([0.001 * n for n in range(1, 101)], 0.95) == 96.0
+
+def test_roteiro_de_uma_sessao(monkeypatch, escola_id, novo_produto, novo_cliente):
+    from database.banco import listar_pedidos_cliente
+    for _ in range(ITENS_POR_CARRINHO):
+        novo_produto(estoque=100)
+    cliente_id = novo_cliente()
+    # O AppTest troca o __main__ pelo app.py: processos criados depois (importação) tentariam rodar a interface
+    monkeypatch.setitem(sys.modules, '__main__', sys.modules['__main__'])
+
+    sessao = Sessao(CAMINHO_APP, {escola_id: None}, cliente_id, semente=0)
+    # O roteiro sorteia ids de 1 a clientes (o banco da carga é povoado em sequência); aqui vale o cliente do teste
+    sortear = sessao.aleatorio.randint
+    monkeypatch.setattr(sessao.aleatorio, 'randint', lambda a, b: cliente_id if b == cliente_id else sortear(a, b))
+
+    assert [(acao, getattr(sessao, acao)()) for acao in ACOES] == [(acao, None) for acao in ACOES]
+    pedido = listar_pedidos_cliente(cliente_id, 1)[0]
+    assert (pedido.id, pedido.status) == (sessao.pedido_id, 'Em produção')
+    assert sessao.at.session_state['itens_pedido'] == []  # Carrinho esvaziado ao finalizar
@@ -0,0 +1,90 @@
+"""Catálogo em memória: a foto remendada a cada commit é igual à relida do banco"""
+import random
+
+from database.catalogo import IndicesCatalogo
+
+def foto_do_banco():
+    """Catálogo montado do zero, como na primeira leitura do processo"""
+    from database.banco import get_connection
+    from database.repositorio import Repositorio
+    conn = get_connection()
+    try:
+        repositorio = Repositorio(conn)
+        return IndicesCatalogo.montar(repositorio.todos('escolas.listar'), repositorio.todos('produtos.listar'))
+    finally:
+        conn.close()
+
+def conferir(foto, esperada):
+    assert foto.produtos == esperada.produtos
+    assert foto.todos == esperada.todos
+    for nome in IndicesCatalogo.INDICES:
+        assert getattr(foto, nome) == getattr(esperada, nome), nome
+
+def test_remendos_seguem_qualquer_caminho_de_escrita(escola_id, novo_produto, novo_pedido):
+    from database.banco import (catalogo_em_memoria, atualizar_estoque, excluir_produto, get_connection,
+                                atualizar_status_pedido, roteador)
+    from database.particoes import na_escola
+    aleatorio = random.Random(0)
+
+    with na_escola(escola_id):
+        catalogo = roteador.banco().catalogo
+        produtos = [novo_produto(estoque=aleatorio.randint(0, 9)) for _ in range(6)]
+        conferir(catalogo_em_memoria(), foto_do_banco())
+        recargas, remendos = catalogo.recargas, catalogo.remendos
+
+        for passo in range(30):
+            anterior = catalogo_em_memoria()
+            copia = (list(anterior.todos), {nome: {chave: list(lista) for chave, lista in getattr(anterior, nome).items()}
+                                            for nome in IndicesCatalogo.INDICES})
+            operacao = aleatorio.choice(('novo', 'estoque', 'categoria', 'excluir', 'pedido', 'status'))
+            if operacao == 'novo' or not produtos:
+                produtos.append(novo_produto(estoque=aleatorio.randint(0, 9)))
+            elif operacao == 'estoque':
+                assert atualizar_estoque(aleatorio.choice(produtos), aleatorio.randint(0, 50))[0]
+            elif operacao == 'categoria':
+                # Escrita fora das funções do banco: o gatilho anota a mudança do mesmo jeito
+                conn = get_connection()
+                try:
+                    conn.execute("UPDATE produtos SET categoria = ?, tamanho = ? WHERE id = ?",
+                                 (aleatorio.choice(('Calças', 'Camisetas', 'Shorts')),
+                                  aleatorio.choice(('P', 'M', 'G')), aleatorio.choice(produtos)))
+                    conn.commit()
+                finally:
+                    conn.close()
+            elif operacao == 'excluir':
+                produto_id = produtos.pop(aleatorio.randrange(len(produtos)))
+                sucesso, _ = excluir_produto(produto_id)
+                if not sucesso:
+                    produtos.append(produto_id)  # Já está em pedido
+            else:
+                pedido_id = novo_pedido(aleatorio.choice(produtos), aleatorio.randint(1, 3))
+                if operacao == 'status':
+                    assert atualizar_status_pedido(pedido_id, aleatorio.choice(('Entregue', 'Cancelado')))[0]
+
+            conferir(catalogo_em_memoria(), foto_do_banco())
+            # A foto anterior não muda: quem já a recebeu continua com as mesmas listas
+            assert anterior.todos == copia[0]
+            for nome, indice in copia[1].items():
+                assert getattr(anterior, nome) == indice, (passo, operacao, nome)
+
+        assert catalogo.recargas == recargas, "mudanças em poucos produtos não relêem o catálogo inteiro"
+        assert catalogo.remendos > remendos
+
+def test_mudanca_em_escola_rele_o_catalogo(escola_id):
+    from database.banco import catalogo_em_memoria, get_connection, roteador
+    from database.particoes import na_escola
+    with na_escola(None):
+        catalogo = roteador.banco().catalogo
+        catalogo_em_memoria()
+        recargas = catalogo.recargas
+        conn = get_connection()
+        try:
+            nome = conn.execute("SELECT nome FROM escolas WHERE id = ?", (escola_id,)).fetchone()[0]
+            conn.execute("UPDATE escolas SET nome = ? WHERE id = ?", (nome + ' (renomeada)', escola_id))
+            conn.commit()
+            assert catalogo_em_memoria().escolas_por_id[escola_id].nome == nome + ' (renomeada)'
+            assert catalogo.recargas == recargas + 1
+        finally:
+            conn.execute("UPDATE escolas SET nome = ? WHERE id = ?", (nome, escola_id))
+            conn.commit()
+            conn.close()
@@ -0,0 +1,126 @@
+"""Clientes: exclusão só sem pedidos, busca por prefixo e histórico de compras"""
+import threading
+import time
+
+import database.banco as banco
+
+def test_excluir_cliente_sem_conexao_nao_quebra(monkeypatch, novo_cliente):
+    from database.particoes import POR_ESCOLA, escola_atual
+    cliente_id = novo_cliente()
+    get_connection = banco.get_connection
+
+    monkeypatch.setattr(banco, 'get_connection', lambda: None)
+    assert banco.excluir_cliente(cliente_id) == (False, "Erro de conexão")
+    if POR_ESCOLA:
+        # O catálogo responde, mas as partições das escolas não
+        monkeypatch.setattr(banco, 'get_connection', lambda: get_connection() if escola_atual.get() is None else None)
+        assert banco.excluir_cliente(cliente_id) == (False, "Erro de conexão")
+
+    monkeypatch.undo()
+    assert banco.cliente_existe(cliente_id)
+
+def test_excluir_cliente_espera_pedido_em_gravacao(escola_id, novo_produto, novo_cliente):
+    """Pedido gravado ao mesmo tempo que a exclusão: ou a exclusão espera e desiste, ou o pedido não acha o cliente"""
+    from database.particoes import na_escola
+    cliente_id, produto_id = novo_cliente(), novo_produto()
+    item = {'produto_id': produto_id, 'quantidade': 1, 'preco_unitario': 30.0, 'subtotal': 30.0}
+    resultado = []
+
+    with na_escola(escola_id):
+        conn = banco.get_connection()
+    try:
+        banco.iniciar_escrita(conn)
+        banco.inserir_pedido(conn.cursor(), cliente_id, escola_id, [item], None, 'PIX', '')
+        exclusao = threading.Thread(target=lambda: resultado.append(banco.excluir_cliente(cliente_id)))
+        exclusao.start()
+        time.sleep(0.3)
+        assert resultado == []  # Esperando a trava do pedido em gravação
+        conn.commit()
+    finally:
+        conn.close()
+    exclusao.join(10)
+
+    assert resultado == [(False, "Cliente possui pedidos e não pode ser excluído")]
+    assert banco.cliente_existe(cliente_id)
+
+def test_excluir_cliente_sem_pedidos(novo_cliente, novo_pedido):
+    livre, com_pedido = novo_cliente(), novo_cliente()
+    novo_pedido(cliente_id=com_pedido)
+    assert banco.excluir_cliente(livre) == (True, "Cliente excluído com sucesso")
+    assert not banco.cliente_existe(livre)
+    assert not banco.excluir_cliente(com_pedido)[0]
+
+def resumo_gravado_e_recalculado(cliente_id):
+    """Linhas do resumo mantidas pelos gatilhos e as mesmas refeitas do zero, em cada banco"""
+    from database.banco import listar_escolas, tabelas_pedidos
+    from database.particoes import POR_ESCOLA, na_escola
+    from database.resumo_clientes import recalcular_resumo_clientes
+
+    def ler(cur):
+        return [cur.execute(f"SELECT * FROM {tabela} WHERE cliente_id = ? ORDER BY 1, 2, 3", (cliente_id,)).fetchall()
+                for tabela in ('resumo_clientes', 'resumo_clientes_tamanhos')]
+
+    def comparar():
+        conn = banco.get_connection()
+        try:
+            cur = conn.cursor()
+            gravado = ler(cur)
+            banco.iniciar_escrita(conn)
+            recalcular_resumo_clientes(cur, *tabelas_pedidos(conn), cliente_ids={cliente_id})
+            recalculado = ler(cur)
+            conn.rollback()
+            return [list(map(tuple, linhas)) for linhas in gravado], [list(map(tuple, linhas)) for linhas in recalculado]
+        finally:
+            conn.close()
+
+    if not POR_ESCOLA:
+        return comparar()
+    resultados = []
+    for escola in listar_escolas():
+        with na_escola(escola['id']):
+            resultados.append(comparar())
+    return tuple(sum((resultado[i] for resultado in resultados), []) for i in range(2))
+
+def test_historico_do_cliente_em_duas_escolas(novo_cliente, novo_produto, novo_pedido):
+    escolas = [escola['id'] for escola in banco.listar_escolas()[:2]]
+    cliente_id = novo_cliente()
+    assert banco.historico_cliente(cliente_id) == {'pedidos': 0, 'cancelados': 0, 'valor_total': 0,
+                                                   'ultima_compra_dia': None, 'escolas': []}
+
+    camiseta = novo_produto(estoque=50, preco=20.0, escola=escolas[0])
+    novo_pedido(camiseta, 2, cliente_id, escola=escolas[0], preco=20.0)
+    novo_pedido(camiseta, 1, cliente_id, escola=escolas[0], preco=20.0)
+    cancelado = novo_pedido(camiseta, 5, cliente_id, escola=escolas[0], preco=20.0)
+    outra = novo_pedido(novo_produto(preco=45.0, escola=escolas[1]), 3, cliente_id, escola=escolas[1], preco=45.0)
+    assert banco.atualizar_status_pedido(cancelado, 'Cancelado')[0]
+
+    historico = banco.historico_cliente(cliente_id)
+    assert (historico['pedidos'], historico['cancelados'], historico['valor_total']) == (4, 1, 195.0)
+    por_escola = {escola['escola_id']: escola for escola in historico['escolas']}
+    assert [escola['escola_id'] for escola in historico['escolas']] == [escolas[1], escolas[0]]  # Quem gastou mais primeiro
+    assert (por_escola[escolas[0]]['valor_total'], por_escola[escolas[0]]['tamanhos']) == (60.0, {'Camisetas': [('M', 3)]})
+    assert por_escola[escolas[1]]['tamanhos'] == {'Camisetas': [('M', 3)]}
+    assert historico['ultima_compra_dia'] is not None
+
+    # Reativar o cancelado e excluir o da outra escola mantém o resumo igual ao recalculado do zero
+    assert banco.atualizar_status_pedido(cancelado, 'Pendente')[0]
+    assert banco.excluir_pedido(outra)[0]
+    gravado, recalculado = resumo_gravado_e_recalculado(cliente_id)
+    assert gravado == recalculado and gravado[0]
+    historico = banco.historico_cliente(cliente_id)
+    assert (historico['pedidos'], historico['cancelados'], historico['valor_total']) == (3, 0, 160.0)
+    assert [escola['escola_id'] for escola in historico['escolas']] == [escolas[0]]
+
+def test_paginas_do_historico(novo_cliente, novo_pedido):
+    from datetime import datetime
+    escolas = [escola['id'] for escola in banco.listar_escolas()[:2]]
+    cliente_id = novo_cliente()
+    criados = [novo_pedido(cliente_id=cliente_id, escola=escolas[dia % 2],
+                           registrado_em=datetime(2016, 2, dia, 10, 0).astimezone()) for dia in range(1, 8)]
+
+    paginas = [banco.listar_pedidos_cliente(cliente_id, 3, inicio) for inicio in (0, 3, 6)]
+    assert [[pedido.id for pedido in pagina] for pagina in paginas] == [criados[:3:-1], criados[3:0:-1], criados[:1]]
+    # escola_ids vem do histórico: com partições, as escolas fora dele nem são consultadas
+    from database.particoes import POR_ESCOLA
+    so_da_primeira = [pedido.id for pedido in banco.listar_pedidos_cliente(cliente_id, 10, 0, [escolas[0]])]
+    assert so_da_primeira == (criados[1::2][::-1] if POR_ESCOLA else criados[::-1])
@@ -0,0 +1,47 @@
+"""Datas dos pedidos: data_pedido_epoch (UTC) e data_pedido_dia (AAAAMMDD local) preenchidos e usados nos intervalos"""
+import sqlite3
+from datetime import date, datetime, timezone
+
+def test_migracao_preenche_pedidos_antigos_e_gatilho_os_novos():
+    from database.banco import migrar_datas_pedidos
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''CREATE TABLE pedidos (id INTEGER PRIMARY KEY, escola_id INTEGER, status TEXT,
+                                          data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    # Pedidos antigos: texto UTC do padrão CURRENT_TIMESTAMP
+    conn.execute("INSERT INTO pedidos (escola_id, status, data_pedido) VALUES (1, 'Entregue', '2011-03-01 02:30:00')")
+    migrar_datas_pedidos(conn.cursor())
+    conn.execute("INSERT INTO pedidos (escola_id, status, data_pedido) VALUES (1, 'Pendente', '2011-03-02 23:59:00')")
+
+    for data_texto, (epoch, dia) in zip(('2011-03-01 02:30:00', '2011-03-02 23:59:00'), conn.execute(
+            "SELECT data_pedido_epoch, data_pedido_dia FROM pedidos ORDER BY id")):
+        instante = datetime.fromisoformat(data_texto).replace(tzinfo=timezone.utc)
+        local = instante.astimezone().date()
+        assert epoch == int(instante.timestamp())
+        assert dia == local.year * 10000 + local.month * 100 + local.day
+    # Rodar de novo não muda nada nem duplica o gatilho
+    migrar_datas_pedidos(conn.cursor())
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'trg_pedidos_datas'").fetchone()[0] == 1
+
+def test_intervalo_do_relatorio_usa_o_dia_local(escola_id, novo_produto, novo_pedido):
+    from database.banco import gerar_relatorio_vendas_por_escola, get_connection
+    from database.particoes import na_escola
+    produto_id = novo_produto(estoque=50)
+    # Fim da noite no horário local: no UTC pode já ser o dia seguinte
+    noite = datetime(2011, 6, 15, 23, 30).astimezone()
+    pedido_id = novo_pedido(produto_id, 2, registrado_em=noite)
+
+    with na_escola(escola_id):
+        conn = get_connection()
+        try:
+            epoch, dia = conn.execute("SELECT data_pedido_epoch, data_pedido_dia FROM pedidos WHERE id = ?",
+                                      (pedido_id,)).fetchone()
+        finally:
+            conn.close()
+    assert (epoch, dia) == (int(noite.timestamp()), 20110615)
+
+    def vendas(inicio, fim):
+        df = gerar_relatorio_vendas_por_escola(escola_id, inicio, fim)
+        return df[['Total Pedidos', 'Total Itens']].sum().tolist() if not df.empty else [0, 0]
+    assert vendas(date(2011, 6, 15), date(2011, 6, 15)) == [1, 2]
+    assert vendas(date(2011, 6, 16), date(2011, 6, 30)) == [0, 0]
+    assert vendas(date(2011, 6, 1), date(2011, 6, 14)) == [0, 0]
@@ -0,0 +1,83 @@
+"""Eventos (outbox): gravados com a mudança, lidos em ordem por cursor e compactados ao estado final"""
+import sqlite3
+import time
+
+import pytest
+
+from database.eventos import (
+    criar_tabela_eventos, publicar_evento, compactar_banco, decodificar_cursor, codificar_cursor, juntar_eventos
+)
+
+def ler_tudo(depois=None):
+    from database.banco import ler_eventos
+    lidos = []
+    while True:
+        eventos, depois, mais = ler_eventos(depois, 100)
+        lidos += eventos
+        if not mais:
+            return lidos, depois
+
+def test_cursor():
+    assert decodificar_cursor(None) == decodificar_cursor('') == {}
+    assert decodificar_cursor('120') == {0: 120}
+    assert decodificar_cursor('0:15,2:33') == {0: 15, 2: 33}
+    assert codificar_cursor({0: 120}) == '120' and codificar_cursor({}) == '0'
+    assert codificar_cursor({2: 33, 0: 15}) == '0:15,2:33'
+    with pytest.raises(ValueError):
+        decodificar_cursor('0:15,x')
+
+def test_juntar_eventos_pela_hora():
+    def evento(origem, seq, criado_em):
+        return {'origem': origem, 'seq': seq, 'criado_em': criado_em}
+    por_origem = {0: [evento(0, 5, 10), evento(0, 6, 30)], 1: [evento(1, 2, 20)]}
+
+    eventos, posicoes, mais = juntar_eventos(por_origem, {0: 4, 2: 9}, 2)
+    assert [(e['origem'], e['seq']) for e in eventos] == [(0, 5), (1, 2)]
+    assert posicoes == {0: 5, 1: 2, 2: 9} and mais
+    assert juntar_eventos(por_origem, {}, 3)[2] is False
+
+def test_mudancas_aparecem_depois_do_cursor(novo_produto, novo_pedido):
+    from database.banco import atualizar_status_pedido, atualizar_estoque, excluir_pedido
+    _, cursor = ler_tudo()
+    produto_id = novo_produto()
+    pedido_id = novo_pedido(produto_id)
+    assert atualizar_status_pedido(pedido_id, 'Em produção')[0]
+    assert atualizar_estoque(produto_id, 25)[0]
+    assert excluir_pedido(pedido_id)[0]
+
+    eventos, novo_cursor = ler_tudo(cursor)
+    nossos = {('produto', produto_id), ('pedido', pedido_id)}
+    assert [(e['evento'], e['entidade_id']) for e in eventos
+            if (e['evento'].split('.')[0], e['entidade_id']) in nossos] == [
+        ('produto.criado', produto_id), ('pedido.criado', pedido_id), ('pedido.status', pedido_id),
+        ('produto.estoque', produto_id), ('pedido.excluido', pedido_id),
+    ]
+    assert next(e['dados'] for e in eventos if e['evento'] == 'pedido.status') == {'de': 'Pendente', 'para': 'Em produção'}
+    assert ler_tudo(novo_cursor)[0] == []
+
+def test_transacao_desfeita_leva_o_evento():
+    conn = sqlite3.connect(':memory:')
+    criar_tabela_eventos(conn.cursor())
+    conn.commit()
+    publicar_evento(conn, 'produto', 'estoque', 1, {'estoque': 3})
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM eventos").fetchone()[0] == 0
+
+def test_compactar_deixa_o_estado_final():
+    conn = sqlite3.connect(':memory:')
+    criar_tabela_eventos(conn.cursor())
+    antigo, recente = int(time.time()) - 40 * 86400, int(time.time())
+    for entidade, acao, entidade_id, criado_em in [
+        ('produto', 'criado', 1, antigo), ('produto', 'estoque', 1, antigo), ('produto', 'estoque', 1, antigo),
+        ('pedido', 'criado', 7, antigo), ('pedido', 'status', 7, antigo), ('pedido', 'status', 7, antigo),
+        ('pedido', 'excluido', 7, antigo),
+        ('pedido', 'status', 8, antigo), ('pedido', 'status', 8, recente), ('pedido', 'status', 8, recente),
+    ]:
+        conn.execute("INSERT INTO eventos (entidade, acao, entidade_id, criado_em) VALUES (?, ?, ?, ?)",
+                     (entidade, acao, entidade_id, criado_em))
+
+    assert compactar_banco(conn, dias=30) == 5
+    assert conn.execute("SELECT seq, entidade, acao, entidade_id FROM eventos ORDER BY seq").fetchall() == [
+        (1, 'produto', 'criado', 1), (3, 'produto', 'estoque', 1), (7, 'pedido', 'excluido', 7),
+        (9, 'pedido', 'status', 8), (10, 'pedido', 'status', 8),
+    ]
@@ -0,0 +1,37 @@
+"""Importação de pré-pedidos"""
+import csv
+import json
+
+def test_clientes_importados_entram_na_auditoria(monkeypatch, tmp_path, escola_id, novo_produto):
+    from database import importacao
+    from database.banco import auditoria, buscar_clientes, listar_escolas, listar_produtos_por_escola
+    escola = next(e['nome'] for e in listar_escolas() if e['id'] == escola_id)
+    produto_id = novo_produto()
+    produto = next(p for p in listar_produtos_por_escola(escola_id) if p['id'] == produto_id)
+
+    caminho = tmp_path / 'pre_pedidos.csv'
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['nome', 'telefone', 'escola', 'produto', 'tamanho', 'cor', 'quantidade'])
+        escritor.writerow(['Cliente Importado', '11955550000', escola, produto['nome'], 'M', 'Azul', 2])
+        escritor.writerow(['Cliente Desfeito', '11955550001', escola, produto['nome'], 'M', 'Azul', 1])
+
+    # O pedido do segundo cliente falha depois do INSERT do cliente: os dois são desfeitos juntos
+    inserir_pedido, gravados = importacao.inserir_pedido, []
+    def falhar_no_segundo(cur, *args, **kwargs):
+        gravados.append(1)
+        if len(gravados) == 2:
+            raise RuntimeError("falha simulada")
+        return inserir_pedido(cur, *args, **kwargs)
+    monkeypatch.setattr(importacao, 'inserir_pedido', falhar_no_segundo)
+
+    resumo = importacao.importar_pre_pedidos(str(caminho), trabalhadores=1)
+    assert (resumo['pedidos'], resumo['clientes_novos'], resumo['rejeitados']) == (1, 1, 1)
+
+    cliente, = buscar_clientes('Cliente Importado')
+    entrada, = auditoria.buscar(entidade='cliente', entidade_id=cliente['id'])
+    assert entrada['acao'] == 'criar'
+    assert json.loads(entrada['detalhes'])['origem'] == 'importacao'
+    assert buscar_clientes('Cliente Desfeito') == []
+    assert not any('Cliente Desfeito' in (linha['detalhes'] or '')
+                   for linha in auditoria.buscar(entidade='cliente', limite=1000))
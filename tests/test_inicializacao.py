@@ -0,0 +1,53 @@
+"""Partida a frio: banco e API sem pandas/numpy/plotly, e o aquecimento que enche os pools antes do primeiro uso"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from database.pool import PoolConexoes
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_preencher_abre_so_o_que_falta(tmp_path):
+    pool = PoolConexoes(str(tmp_path / 'pool.db'), tamanho=3)
+    pool.devolver(pool.obter())
+    pool.preencher()
+    emprestadas = [pool.obter() for _ in range(3)]
+    assert len({id(conn) for conn in emprestadas}) == 3
+
+    # Cheio: as três vieram da fila, nenhuma foi aberta na hora
+    def abrir():
+        raise AssertionError("conexão aberta fora do aquecimento")
+    for conn in emprestadas:
+        pool.devolver(conn)
+    pool._abrir = abrir
+    pool.devolver(pool.obter())
+    pool.fechar()
+
+def test_aquecer_sem_carregar_modulos_pesados(tmp_path):
+    # Mesmo modo de partições da bateria (herda FARDAMENTOS_POR_ESCOLA)
+    ambiente = dict(os.environ, FARDAMENTOS_DB=str(tmp_path / 'frio.db'), PYTHONPATH=RAIZ)
+    codigo = textwrap.dedent('''
+        import json, sys
+        PESADOS = ('pandas', 'numpy', 'plotly.express', 'database.relatorios')
+        import api
+        from database.banco import aquecer, listar_escolas, gerar_relatorio_produtos_por_escola
+        from database.lojas import roteador
+        from database.particoes import POR_ESCOLA, na_escola
+        aquecer()
+        carregados = [nome for nome in PESADOS if nome in sys.modules]
+
+        pools = [roteador.banco().pool]
+        if POR_ESCOLA:
+            for escola in listar_escolas():
+                with na_escola(escola['id']):
+                    pools.append(roteador.banco().pool)
+        cheios = all(pool._livres.full() for pool in pools)
+        gerar_relatorio_produtos_por_escola()  # O relatório carrega o pandas quando é pedido
+        print(json.dumps({'carregados': carregados, 'cheios': cheios, 'pandas_depois': 'pandas' in sys.modules}))
+    ''')
+    resultado = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, env=ambiente,
+                               capture_output=True, text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stderr
+    assert json.loads(resultado.stdout.splitlines()[-1]) == {'carregados': [], 'cheios': True, 'pandas_depois': True}
@@ -0,0 +1,59 @@
+"""Usuários e lojas: um username pertence a uma loja só
+
+O cadastro de lojas é lido na importação, então cada cenário roda em um
+processo próprio com FARDAMENTOS_LOJAS definido.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def rodar_com_lojas(pasta, codigo):
+    ambiente = dict(os.environ, FARDAMENTOS_LOJAS=str(pasta / 'lojas.db'), PYTHONPATH=RAIZ)
+    ambiente.pop('FARDAMENTOS_POR_ESCOLA', None)
+    preparo = textwrap.dedent('''
+        from database.lojas import adicionar_loja, na_loja, loja_vinculada
+        from database.banco import init_db, criar_usuario, verificar_login, get_connection
+        for loja in ('norte', 'sul'):
+            adicionar_loja(loja, loja.title())
+            with na_loja(loja):
+                init_db()
+        def usuarios(loja):
+            with na_loja(loja):
+                conn = get_connection()
+                try:
+                    return {linha[0] for linha in conn.execute("SELECT username FROM usuarios")}
+                finally:
+                    conn.close()
+    ''')
+    resultado = subprocess.run([sys.executable, '-c', preparo + textwrap.dedent(codigo)],
+                               cwd=pasta, env=ambiente, capture_output=True, text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stderr
+
+def test_username_de_outra_loja_nao_e_movido(tmp_path):
+    rodar_com_lojas(tmp_path, '''
+        with na_loja('norte'):
+            assert criar_usuario('maria', 'Senha@123', 'Maria', 'vendedor')[0]
+        with na_loja('sul'):
+            sucesso, mensagem = criar_usuario('maria', 'Outra@123', 'Maria Sul', 'vendedor')
+        assert not sucesso and 'norte' in mensagem, mensagem
+        assert loja_vinculada('maria') == 'norte'
+        # Nada ficou pela metade no banco da outra loja
+        assert 'maria' not in usuarios('sul')
+        assert verificar_login('maria', 'Senha@123')[0]
+    ''')
+
+def test_falha_na_loja_desfaz_vinculo_novo(tmp_path):
+    # admin existe no banco de toda loja, mas não está vinculado a nenhuma
+    rodar_com_lojas(tmp_path, '''
+        with na_loja('sul'):
+            sucesso, mensagem = criar_usuario('admin', 'Admin@9999', 'Outro', 'admin')
+        assert not sucesso and mensagem == "Username já existe", mensagem
+        assert loja_vinculada('admin') is None
+        with na_loja('sul'):
+            assert criar_usuario('joao', 'Senha@123', 'João', 'vendedor')[0]
+            assert criar_usuario('joao', 'Senha@123', 'João', 'vendedor') == (False, "Username já existe")
+        assert loja_vinculada('joao') == 'sul'
+    ''')
@@ -0,0 +1,124 @@
+"""Caixa offline: reenviar o mesmo lote (ou sincronizar de novo depois de perder a resposta) não duplica nada"""
+import pytest
+
+@pytest.fixture
+def fila(tmp_path):
+    from database.offline import FilaOffline
+    fila = FilaOffline(str(tmp_path / 'fila.db'))
+    yield fila
+    fila.fechar()
+
+def pedidos_do_cliente(cliente_id):
+    from database.banco import historico_cliente
+    return historico_cliente(cliente_id)['pedidos']
+
+def produto(escola_id, produto_id):
+    from database.banco import listar_produtos_por_escola
+    return next(p for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+
+def test_reenvio_do_lote_devolve_o_resultado_guardado(fila, escola_id, novo_produto, novo_cliente):
+    from database.banco import buscar_clientes
+    from database.offline import receber_operacoes
+    produto_id, cliente_id = novo_produto(estoque=10), novo_cliente()
+    fila.registrar_pedido(escola_id, [{'produto_id': produto_id, 'quantidade': 2}], cliente_id=cliente_id)
+    fila.registrar_pedido(escola_id, [{'produto_id': produto_id, 'quantidade': 1}],
+                          cliente={'nome': 'Cliente Caixa Reenvio', 'telefone': '11977770000'})
+    fila.registrar_ajuste_estoque(produto_id, -4, 'avaria')
+    operacoes = fila.pendentes()
+
+    primeiro = receber_operacoes(operacoes)
+    assert all(resultado['sucesso'] for resultado in primeiro), primeiro
+    segundo = receber_operacoes(operacoes)
+    assert all(resultado.get('repetida') for resultado in segundo)
+    assert [r.get('pedido_id') for r in segundo] == [r.get('pedido_id') for r in primeiro]
+
+    # Aplicado uma vez só
+    assert pedidos_do_cliente(cliente_id) == 1
+    novos = buscar_clientes('Cliente Caixa Reenvio')
+    assert len(novos) == 1 and pedidos_do_cliente(novos[0]['id']) == 1
+    atual = produto(escola_id, produto_id)
+    assert (atual.estoque, atual.reservado) == (6, 3)
+
+def test_resposta_perdida_na_sincronizacao(fila, porta_api, escola_id, novo_produto, novo_cliente):
+    from database.offline import ClienteAPI, ServidorIndisponivel, sincronizar
+
+    class RedeQueCai(ClienteAPI):
+        """O servidor aplica o lote, mas a resposta da primeira requisição não chega ao caixa"""
+        perdidas = 0
+
+        def requisitar(self, metodo, caminho, corpo=None):
+            resposta = super().requisitar(metodo, caminho, corpo)
+            if not self.perdidas:
+                self.perdidas += 1
+                raise ServidorIndisponivel("conexão perdida")
+            return resposta
+
+    produto_id, cliente_id = novo_produto(estoque=5), novo_cliente()
+    for _ in range(3):
+        fila.registrar_pedido(escola_id, [{'produto_id': produto_id, 'quantidade': 1}], cliente_id=cliente_id)
+    cliente = RedeQueCai(f'http://127.0.0.1:{porta_api}', 'admin', 'Admin@2024!')
+    try:
+        resumo = sincronizar(fila, cliente, tamanho_lote=2)
+        assert resumo['erro'] == "conexão perdida" and resumo['enviadas'] == 0
+        assert len(fila.pendentes()) == 3
+
+        resumo = sincronizar(fila, cliente, tamanho_lote=2)
+    finally:
+        cliente.fechar()
+    assert resumo['erro'] is None
+    assert (resumo['enviadas'], resumo['aplicadas'], resumo['repetidas']) == (3, 3, 2)
+    assert fila.pendentes() == []
+    assert pedidos_do_cliente(cliente_id) == 3
+    assert produto(escola_id, produto_id).reservado == 3
+
+def test_preco_negativo_do_caixa_e_recusado(escola_id, novo_produto, novo_cliente):
+    from database.offline import receber_operacoes
+    operacao = {'uuid': 'preco-negativo', 'tipo': 'pedido', 'dados': {
+        'cliente_id': novo_cliente(), 'escola_id': escola_id,
+        'itens': [{'produto_id': novo_produto(), 'quantidade': 1, 'preco_unitario': -500}],
+    }}
+    resultado, = receber_operacoes([operacao])
+    assert not resultado['sucesso'] and not resultado['reenviar']
+
+def test_cliente_novo_sai_se_o_pedido_for_recusado(escola_id, novo_produto):
+    from database.banco import buscar_clientes, listar_escolas
+    from database.offline import receber_operacoes
+    outra_escola = next(escola['id'] for escola in listar_escolas() if escola['id'] != escola_id)
+    de_outra_escola, daqui = novo_produto(escola=outra_escola), novo_produto()
+
+    def pedido(uuid, nome, produto_id):
+        return {'uuid': uuid, 'tipo': 'pedido', 'dados': {
+            'cliente': {'nome': nome, 'telefone': '11966660000'}, 'escola_id': escola_id,
+            'itens': [{'produto_id': produto_id, 'quantidade': 1}],
+        }}
+
+    resultados = receber_operacoes([
+        pedido('cliente-recusado', 'Cliente Caixa Recusado', de_outra_escola),
+        # O mesmo cliente novo em dois pedidos: basta um entrar para ele ficar
+        pedido('cliente-metade-1', 'Cliente Caixa Metade', de_outra_escola),
+        pedido('cliente-metade-2', 'Cliente Caixa Metade', daqui),
+    ])
+    assert [r['sucesso'] for r in resultados] == [False, False, True]
+    assert buscar_clientes('Cliente Caixa Recusado') == []
+    metade, = buscar_clientes('Cliente Caixa Metade')
+    assert pedidos_do_cliente(metade['id']) == 1
+
+def test_saida_do_caixa_nao_passa_do_reservado(escola_id, novo_produto, novo_pedido):
+    from database.offline import receber_operacoes
+    produto_id = novo_produto(estoque=10)
+    novo_pedido(produto_id, 4)
+
+    def ajuste(uuid, quantidade):
+        resultado, = receber_operacoes([{'uuid': uuid, 'tipo': 'estoque',
+                                         'dados': {'produto_id': produto_id, 'ajuste': quantidade}}])
+        assert resultado['sucesso'], resultado
+        return resultado
+
+    resultado = ajuste('saida-alem-do-reservado', -8)
+    assert resultado['estoque'] == 4 and '4 reservado' in resultado['conflitos'][0]
+    atual = produto(escola_id, produto_id)
+    assert (atual.estoque, atual.reservado, atual.disponivel) == (4, 4, 0)
+
+    # Entradas valem inteiras; a saída seguinte só leva o que não está reservado
+    assert ajuste('entrada', 3)['conflitos'] == []
+    assert ajuste('saida-parcial', -5)['estoque'] == 4
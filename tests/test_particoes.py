@@ -0,0 +1,93 @@
+"""Partições por escola: faixas de ids, consultas em paralelo e a divisão de um banco já em uso"""
+import contextvars
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+from database.particoes import em_paralelo, escola_do_id, inicio_faixa, caminho_particao, FAIXA_IDS
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_faixa_de_ids_diz_a_escola():
+    assert inicio_faixa(3) == 3 * FAIXA_IDS
+    assert [escola_do_id(i) for i in (inicio_faixa(3) + 1, inicio_faixa(4) - 1, str(inicio_faixa(7)))] == [3, 3, 7]
+    assert caminho_particao(os.path.join('dados', 'loja.db'), 2) == os.path.join('dados', 'loja_escolas', 'escola_2.db')
+
+def test_em_paralelo_mantem_ordem_e_contexto():
+    escola = contextvars.ContextVar('escola')
+    usuario = contextvars.ContextVar('usuario')
+    usuario.set('admin')
+    resultados = em_paralelo(escola, [5, 1, 3, 2], lambda sufixo: f"{usuario.get()}:{escola.get()}{sufixo}", ('!',))
+    assert resultados == ['admin:5!', 'admin:1!', 'admin:3!', 'admin:2!']
+    assert escola.get(None) is None  # Quem chamou não vê o valor das tarefas
+
+# Pedidos, produtos e relatórios vistos pelas funções do banco, sem ids (que mudam na divisão)
+RETRATO = '''
+    import json
+    from datetime import date
+    from database.banco import (listar_escolas, buscar_clientes, listar_pedidos_cliente, listar_produtos_por_escola,
+                                listar_itens_pedidos, gerar_relatorio_vendas_por_escola)
+    from database.particoes import POR_ESCOLA, escola_do_id
+    escolas = [escola['id'] for escola in listar_escolas()[:2]]
+    cliente = buscar_clientes('Cliente Divisão')[0]['id']
+    pedidos = listar_pedidos_cliente(cliente)
+    itens = listar_itens_pedidos([pedido.id for pedido in pedidos])
+    vendas = gerar_relatorio_vendas_por_escola(None, date(2009, 1, 1), date(2099, 1, 1))
+    print(json.dumps({
+        'pedidos': sorted([p.escola_id, p.status, p.valor_total, [[i.nome, i.quantidade] for i in itens[p.id]]] for p in pedidos),
+        'produtos': sorted([p['nome'], p['estoque'], p['reservado']] for e in escolas for p in listar_produtos_por_escola(e)),
+        'vendas': [vendas['Total Itens'].sum().item(), vendas['Total Vendas (R$)'].sum().item()],
+        'na_faixa': all(escola_do_id(p.id) == p.escola_id for p in pedidos) if POR_ESCOLA else None,
+    }))
+'''
+
+def test_dividir_banco_em_uso(tmp_path):
+    ambiente = dict(os.environ, FARDAMENTOS_DB=str(tmp_path / 'loja.db'), PYTHONPATH=RAIZ)
+    ambiente.pop('FARDAMENTOS_POR_ESCOLA', None)
+
+    def rodar(argumentos, por_escola):
+        resultado = subprocess.run([sys.executable] + argumentos, cwd=tmp_path, capture_output=True, text=True,
+                                   timeout=120, env=dict(ambiente, **({'FARDAMENTOS_POR_ESCOLA': '1'} if por_escola else {})))
+        assert resultado.returncode == 0, resultado.stderr
+        return resultado.stdout.strip().splitlines()
+
+    # Banco da loja sem partições, com um pedido entregue já arquivado e um em aberto em cada escola
+    antes = rodar(['-c', textwrap.dedent('''
+        from datetime import date, datetime
+        from database.banco import (init_db, listar_escolas, adicionar_cliente, buscar_clientes, adicionar_produto,
+                                    listar_produtos_por_escola, adicionar_pedido, get_connection, iniciar_escrita,
+                                    inserir_pedido, atualizar_status_pedido)
+        from database.arquivamento import arquivar_pedidos
+        init_db()
+        assert adicionar_cliente('Cliente Divisão', '11911112222', '')[0]
+        cliente = buscar_clientes('Cliente Divisão')[0]['id']
+        for numero, escola in enumerate(escola['id'] for escola in listar_escolas()[:2]):
+            assert adicionar_produto(f'Camiseta {escola}', 'Camisetas', 'M', 'Azul', 25.0, 10, '', escola)[0]
+            produto = next(p['id'] for p in listar_produtos_por_escola(escola) if p['nome'] == f'Camiseta {escola}')
+            item = lambda quantidade: {'produto_id': produto, 'quantidade': quantidade, 'preco_unitario': 25.0,
+                                       'subtotal': 25.0 * quantidade}
+            conn = get_connection()
+            iniciar_escrita(conn)
+            antigo, _ = inserir_pedido(conn.cursor(), cliente, escola, [item(2)], None, 'PIX', '',
+                                       datetime(2009, 3, 10 + numero, 10, 0).astimezone())
+            conn.commit()
+            conn.close()
+            assert atualizar_status_pedido(antigo, 'Entregue')[0]
+            assert adicionar_pedido(cliente, escola, [item(1 + numero)], None, 'PIX', '')[0]
+        assert arquivar_pedidos(date(2010, 1, 1)) == 2
+    ''') + textwrap.dedent(RETRATO)], por_escola=False)[-1]
+
+    saida = rodar(['-m', 'database.particoes', 'dividir'], por_escola=True)
+    assert [linha.split(':')[1].split(' em ')[0] for linha in saida[:2]] == [' 1 produtos e 2 pedidos'] * 2
+    depois = json.loads(rodar(['-c', textwrap.dedent(RETRATO)], por_escola=True)[-1])
+    assert dict(json.loads(antes), na_faixa=True) == depois
+
+    # O banco da loja ficou só com o catálogo, e dividir de novo não copia nada
+    with sqlite3.connect(tmp_path / 'loja.db') as conn:
+        assert conn.execute("SELECT (SELECT COUNT(*) FROM pedidos) + (SELECT COUNT(*) FROM produtos)").fetchone() == (0,)
+    saida = rodar(['-m', 'database.particoes', 'dividir'], por_escola=True)
+    assert [linha.split(':')[1].split(' em ')[0] for linha in saida[:2]] == [' 0 produtos e 0 pedidos'] * 2
+    assert json.loads(rodar(['-c', textwrap.dedent(RETRATO)], por_escola=True)[-1]) == depois
@@ -0,0 +1,104 @@
+"""Pedidos: páginas por status, itens de uma página em uma consulta, lista de separação e conferência de integridade"""
+
+def test_paginas_por_status_cobrem_os_pedidos_sem_repetir(novo_pedido):
+    from database.banco import (listar_pedidos_por_status, contar_pedidos_por_status, atualizar_status_pedido,
+                                listar_pedidos_por_escola, STATUS_ABERTOS)
+    criados = [novo_pedido() for _ in range(7)]
+    for pedido_id in criados[:3]:
+        assert atualizar_status_pedido(pedido_id, 'Entregue')[0]
+
+    contagens = contar_pedidos_por_status()
+    for status in (STATUS_ABERTOS, ('Entregue',)):
+        esperado = [pedido.id for pedido in listar_pedidos_por_escola() if pedido.status in status]
+        paginas = [listar_pedidos_por_status(status, 2, inicio) for inicio in range(0, len(esperado) + 2, 2)]
+        assert all(len(pagina) <= 2 for pagina in paginas)
+        lidos = [pedido.id for pagina in paginas for pedido in pagina]
+        assert sorted(lidos) == sorted(esperado)
+        assert len(lidos) == len(set(lidos)) == sum(contagens.get(s, 0) for s in status)
+        # Mais recentes primeiro
+        datas = [pedido.data_pedido_epoch for pagina in paginas for pedido in pagina]
+        assert datas == sorted(datas, reverse=True)
+    assert set(criados[:3]) <= {pedido.id for pedido in listar_pedidos_por_status(('Entregue',), 1000)}
+
+def test_itens_de_varios_pedidos_em_uma_consulta(monkeypatch, novo_produto, novo_cliente, novo_pedido):
+    from database.banco import listar_escolas, listar_itens_pedidos
+    from database.particoes import POR_ESCOLA
+    from database.repositorio import Repositorio
+    escolas = [escola['id'] for escola in listar_escolas()[:2]]
+    cliente_id = novo_cliente()
+    pedidos = [novo_pedido(novo_produto(escola=escola), quantidade, cliente_id, escola=escola)
+               for escola, quantidade in ((escolas[0], 2), (escolas[1], 3), (escolas[0], 1))]
+
+    consultas, todos = [], Repositorio.todos
+    def contar(self, nome, *args):
+        consultas.append(nome)
+        return todos(self, nome, *args)
+    monkeypatch.setattr(Repositorio, 'todos', contar)
+    itens = listar_itens_pedidos(pedidos)
+
+    # Uma consulta por banco: com partições, uma por escola
+    assert consultas == ['itens.dos_pedidos'] * (len(escolas) if POR_ESCOLA else 1)
+    assert [[item.quantidade for item in itens[pedido_id]] for pedido_id in pedidos] == [[2], [3], [1]]
+    assert listar_itens_pedidos([pedidos[0] + 10**6]) == {pedidos[0] + 10**6: []}
+    item = itens[pedidos[1]][0]
+    assert (item.pedido_id, item.subtotal, item.categoria) == (pedidos[1], 90.0, 'Camisetas')
+
+def a_separar(escola_id, nome_produto):
+    from database.banco import gerar_lista_separacao
+    lista = gerar_lista_separacao(escola_id)
+    linhas = lista[lista['Produto'] == nome_produto] if not lista.empty else lista
+    return int(linhas['A Separar'].sum()) if not linhas.empty else 0
+
+def test_lista_de_separacao_soma_so_os_pedidos_em_aberto(escola_id, novo_produto, novo_pedido):
+    from database.banco import atualizar_status_pedido, excluir_pedido, listar_produtos_por_escola
+    produto_id = novo_produto(estoque=10)
+    nome = next(p.nome for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+
+    primeiro = novo_pedido(produto_id, 3)
+    segundo = novo_pedido(produto_id, 2)
+    passos = [
+        (None, None, 5),
+        (primeiro, 'Em produção', 5),
+        (primeiro, 'Entregue', 2),
+        (segundo, 'Cancelado', 0),
+        (segundo, 'Pendente', 2),
+        (primeiro, 'Pronto para entrega', 5),
+    ]
+    for pedido_id, status, esperado in passos:
+        if pedido_id:
+            assert atualizar_status_pedido(pedido_id, status)[0]
+        # Separar = reservado: a lista soma os itens dos pedidos em aberto
+        assert a_separar(escola_id, nome) == esperado, (pedido_id, status)
+        produto = next(p for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+        assert produto.reservado == esperado
+
+    assert excluir_pedido(segundo)[0]
+    assert a_separar(escola_id, nome) == 3
+
+def test_integridade_acha_e_corrige_reserva_desviada(escola_id, novo_produto, novo_pedido):
+    from database.banco import get_connection, listar_produtos_por_escola
+    from database.integridade import verificar_integridade
+    from database.particoes import na_escola
+    produto_id = novo_produto(estoque=10)
+    novo_pedido(produto_id, 3)
+
+    def desviados():
+        reservas = verificar_integridade()[0]['reservas']
+        return reservas.loc[reservas['id'] == produto_id, ['reservado', 'reservado_itens']].values.tolist()
+    assert desviados() == []
+
+    # Simula uma falha no meio da entrega que deixou a reserva para trás
+    with na_escola(escola_id):
+        conn = get_connection()
+        try:
+            conn.execute("UPDATE produtos SET reservado = 99 WHERE id = ?", (produto_id,))
+            conn.commit()
+        finally:
+            conn.close()
+    assert desviados() == [[99, 3]]
+
+    _, corrigidos = verificar_integridade(corrigir_problemas=True)
+    assert corrigidos.get('reservas', 0) >= 1
+    assert desviados() == []
+    produto = next(p for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+    assert (produto.estoque, produto.reservado) == (10, 3)
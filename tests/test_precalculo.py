@@ -0,0 +1,49 @@
+"""Pré-cálculo: relatórios em Parquet servidos enquanto a versão dos dados do manifesto for a atual"""
+import os
+
+import pandas as pd
+
+from database.precalculo import precalcular_relatorios, ler_relatorio, ler_manifesto, parametros_vendas, ARQUIVO_MANIFESTO
+
+def test_relatorio_precalculado_igual_ao_ao_vivo(tmp_path, escola_id, novo_pedido):
+    from database.banco import gerar_relatorio_produtos_por_escola, gerar_resumo_escolas
+    novo_pedido()
+    manifesto = precalcular_relatorios(str(tmp_path))
+
+    assert ler_manifesto(str(tmp_path)) == manifesto
+    for tipo, escola, ao_vivo in (('produtos', escola_id, gerar_relatorio_produtos_por_escola(escola_id)),
+                                  ('produtos', None, gerar_relatorio_produtos_por_escola()),
+                                  ('resumo_escolas', None, gerar_resumo_escolas())):
+        df, calculado_em = ler_relatorio(tipo, escola, pasta=str(tmp_path))
+        assert calculado_em is not None
+        pd.testing.assert_frame_equal(df, ao_vivo.reset_index(drop=True))
+
+def test_vendas_so_com_os_mesmos_parametros(tmp_path, escola_id, novo_pedido):
+    novo_pedido()
+    precalcular_relatorios(str(tmp_path))
+    parametros = parametros_vendas()
+
+    assert ler_relatorio('vendas', escola_id, parametros, pasta=str(tmp_path))[0] is not None
+    outro = dict(parametros, granularidade='mes' if parametros['granularidade'] != 'mes' else 'dia')
+    assert ler_relatorio('vendas', escola_id, outro, pasta=str(tmp_path)) == (None, None)
+
+def test_escrita_depois_do_calculo_vence_o_relatorio(tmp_path, escola_id, novo_pedido):
+    precalcular_relatorios(str(tmp_path))
+    assert ler_relatorio('produtos', escola_id, pasta=str(tmp_path))[0] is not None
+
+    novo_pedido()
+    assert ler_relatorio('produtos', escola_id, pasta=str(tmp_path)) == (None, None)
+
+def test_manifesto_ou_arquivo_com_problema(tmp_path, escola_id):
+    assert ler_relatorio('produtos', escola_id, pasta=str(tmp_path)) == (None, None)  # Nunca calculado
+
+    precalcular_relatorios(str(tmp_path))
+    with open(os.path.join(tmp_path, f'produtos_escola_{escola_id}.parquet'), 'wb') as arquivo:
+        arquivo.write(b'corrompido')
+    assert ler_relatorio('produtos', escola_id, pasta=str(tmp_path)) == (None, None)
+
+    with open(os.path.join(tmp_path, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as arquivo:
+        arquivo.write('{')
+    assert ler_manifesto(str(tmp_path)) == {}
+    # Nenhum temporário de gravação ficou para trás
+    assert not [nome for nome in os.listdir(tmp_path) if nome.endswith('.tmp')]
@@ -0,0 +1,20 @@
+"""Cadastro de produtos"""
+import database.banco as banco
+from database.pool import ConexaoReutilizavel
+
+def test_produto_duplicado_desfaz_a_transacao(monkeypatch, escola_id, novo_produto):
+    produto_id = novo_produto()
+    produto = next(p for p in banco.listar_produtos_por_escola(escola_id) if p['id'] == produto_id)
+    devolvidas_em_transacao = []
+    close = ConexaoReutilizavel.close
+
+    def registrar_close(conn):
+        devolvidas_em_transacao.append(conn.in_transaction)
+        close(conn)
+    monkeypatch.setattr(ConexaoReutilizavel, 'close', registrar_close)
+    # Dois cadastros ao mesmo tempo: os dois passam pela conferência e o segundo esbarra no UNIQUE
+    monkeypatch.setattr(banco, 'verificar_produto_duplicado', lambda *args: False)
+
+    sucesso, mensagem = banco.adicionar_produto(produto['nome'], "Camisetas", "M", "Azul", 30.0, 1, "", escola_id)
+    assert not sucesso and 'duplicado' in mensagem
+    assert devolvidas_em_transacao == [False]
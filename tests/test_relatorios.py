@@ -0,0 +1,105 @@
+"""Relatórios: colunas tipadas na carga e formatação brasileira vetorizada para exibição"""
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database.relatorios import (
+    carregar_dataframe, dias_para_datas, textos_para_datas, formatar_datas_brasil, formatar_moeda_brasil,
+    formatar_exibicao
+)
+
+def moeda_linha_a_linha(valor):
+    """Referência: a formatação antiga, um valor por vez"""
+    texto = f"{abs(valor):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return f"{'-' if round(valor * 100) < 0 else ''}R$ {texto}"
+
+def test_carregar_dataframe_tipa_as_colunas():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    cur = conn.execute("""SELECT 20240131 AS dia, '2024-02-29 13:45:00' AS data, 'Camisetas' AS categoria,
+                                 3 AS itens, 89.9 AS valor
+                          UNION ALL SELECT NULL, NULL, 'Calças', 0, 0""")
+    df = carregar_dataframe(cur, ['Dia', 'Data', 'Categoria', 'Itens', 'Valor'],
+                            {'Dia': 'dia', 'Data': 'data', 'Categoria': 'category', 'Itens': 'int64', 'Valor': 'float64'})
+
+    assert df.dtypes.astype(str).tolist() == ['datetime64[ns]', 'datetime64[ns]', 'category', 'int64', 'float64']
+    assert df['Dia'].iloc[0] == pd.Timestamp(2024, 1, 31)
+    assert df['Data'].iloc[0] == pd.Timestamp(2024, 2, 29)
+    assert df[['Dia', 'Data']].iloc[1].isna().all()
+
+def test_conversao_de_datas_invalidas_vira_ausente():
+    assert dias_para_datas(pd.Series([20230229, 20231301, 'x'])).isna().all()
+    assert textos_para_datas(pd.Series(['2023-02-30', '', None])).isna().all()
+
+def test_datas_no_padrao_brasileiro():
+    datas = pd.Series(pd.to_datetime(['2024-01-05', None, '1999-12-31', '2005-10-09']))
+    assert formatar_datas_brasil(datas).tolist() == ['05/01/2024', '', '31/12/1999', '09/10/2005']
+
+@pytest.mark.parametrize('valores', [
+    [0, 0.5, 1, 9.99, 999.999, 1000, 1234.5, 1000000, 12345678.9],
+    [-0.004, -0.006, -1234.56, -1000000.01],  # Meio centavo exato fica de fora: o arredondamento do float decide
+    list(np.random.default_rng(7).uniform(-2e6, 2e6, 500).round(2)),
+])
+def test_moeda_igual_a_formatacao_linha_a_linha(valores):
+    assert formatar_moeda_brasil(pd.Series(valores)).tolist() == [moeda_linha_a_linha(v) for v in valores]
+
+def test_moeda_com_valor_ausente_vira_zero():
+    assert formatar_moeda_brasil(pd.Series([None, 'abc'])).tolist() == ['R$ 0,00', 'R$ 0,00']
+
+def test_formatar_exibicao_nao_altera_o_relatorio():
+    df = pd.DataFrame({'Data': pd.to_datetime(['2024-03-01']), 'Total Vendas (R$)': [1500.0], 'Total Itens': [4]},
+                      index=[7])
+    exibicao = formatar_exibicao(df, datas=['Data'], moedas=['Total Vendas (R$)'])
+
+    assert exibicao.loc[7].tolist() == ['01/03/2024', 'R$ 1.500,00', 4]
+    assert df['Total Vendas (R$)'].dtype == 'float64'  # O original segue numérico para gráficos e somas
+
+def test_relatorios_saem_tipados(escola_id, novo_produto, novo_pedido):
+    from database.banco import gerar_relatorio_vendas_por_escola, gerar_relatorio_produtos_por_escola
+    novo_pedido(novo_produto(estoque=20), 3, registrado_em=datetime(2012, 4, 10, 10, 0).astimezone(), preco=12.5)
+
+    vendas = gerar_relatorio_vendas_por_escola(escola_id, date(2012, 4, 1), date(2012, 4, 30))
+    assert vendas.dtypes.astype(str).tolist() == ['datetime64[ns]', 'int64', 'int64', 'float64']
+    assert vendas.iloc[0].tolist() == [pd.Timestamp(2012, 4, 10), 1, 3, 37.5]
+
+    produtos = gerar_relatorio_produtos_por_escola(escola_id)
+    assert str(produtos['Categoria'].dtype) == 'category'
+    assert str(produtos['Total Vendido'].dtype) == 'int64'
+    assert str(produtos['Total Faturado (R$)'].dtype) == 'float64'
+
+def test_semana_e_mes_calculados_no_sqlite():
+    from database.banco import EXPRESSOES_GRANULARIDADE, data_para_dia
+    conn = sqlite3.connect(':memory:')
+    dias = [date.fromordinal(date(2015, 12, 20).toordinal() + n) for n in range(400)]
+    for granularidade, inicio in (('semana', lambda d: date.fromordinal(d.toordinal() - d.weekday())),
+                                  ('mes', lambda d: d.replace(day=1))):
+        expressao = EXPRESSOES_GRANULARIDADE[granularidade].format(dia='?')
+        for dia in dias:
+            chave = data_para_dia(dia)
+            assert conn.execute(f"SELECT {expressao}", (chave,) * expressao.count('?')).fetchone()[0] \
+                == data_para_dia(inicio(dia)), (granularidade, dia)
+
+@pytest.mark.parametrize('dias, granularidade', [(0, 'dia'), (92, 'dia'), (93, 'semana'), (731, 'semana'), (732, 'mes')])
+def test_granularidade_automatica(dias, granularidade):
+    from database.banco import escolher_granularidade
+    inicio = date(2014, 1, 1)
+    assert escolher_granularidade(inicio, date.fromordinal(inicio.toordinal() + dias)) == granularidade
+
+def test_vendas_agrupadas_por_semana_e_mes(escola_id, novo_produto, novo_pedido):
+    from database.banco import gerar_relatorio_vendas_por_escola
+    produto_id = novo_produto(estoque=50)
+    # Domingo, segunda, sábado e a segunda seguinte, atravessando a virada do mês
+    for dia, quantidade in ((27, 1), (28, 2), (33, 3), (35, 4)):
+        novo_pedido(produto_id, quantidade, registrado_em=datetime(2014, 4, 1, 9, 0).astimezone()
+                    + timedelta(days=dia - 1), preco=10.0)
+
+    def vendas(granularidade):
+        df = gerar_relatorio_vendas_por_escola(escola_id, date(2014, 4, 1), date(2014, 5, 31), granularidade)
+        return [(data.date(), pedidos, itens, total) for data, pedidos, itens, total in df.itertuples(index=False)]
+    assert vendas('semana') == [(date(2014, 5, 5), 1, 4, 40.0), (date(2014, 4, 28), 2, 5, 50.0),
+                                (date(2014, 4, 21), 1, 1, 10.0)]
+    assert vendas('mes') == [(date(2014, 5, 1), 2, 7, 70.0), (date(2014, 4, 1), 2, 3, 30.0)]
+    assert len(vendas('dia')) == 4
@@ -0,0 +1,58 @@
+"""Reposição: ponto de pedido pela velocidade de venda, recalculado só para os produtos que mudaram"""
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from database.reposicao import calcular_reposicao, dias_cobertura, ESTOQUE_MINIMO
+
+def test_ponto_de_pedido_pela_velocidade():
+    hoje = date(2013, 5, 31)
+    vendas = pd.DataFrame({
+        'produto_id': [1, 1, 1, 1, 2],
+        'quantidade': [7, 23, 60, 99, 40],
+        # Há 2, 20 e 60 dias; a última é de amanhã e não conta
+        'dia': [20130529, 20130511, 20130401, 20130601, 20130101],
+    })
+    resultado = calcular_reposicao(vendas, [1, 2, 3], hoje)
+
+    assert resultado.loc[1, ['vendas_7d', 'vendas_30d', 'vendas_90d']].tolist() == [7, 30, 90]
+    assert resultado.loc[1, 'velocidade_diaria'] == pytest.approx(0.5 * 7 / 7 + 0.3 * 30 / 30 + 0.2 * 90 / 90)
+    assert resultado.loc[1, 'ponto_pedido'] == 22  # 1 peça/dia por 15 dias de prazo + 7 de segurança
+    # Venda só fora das janelas ou nenhuma: regra fixa
+    assert resultado.loc[[2, 3], 'ponto_pedido'].tolist() == [ESTOQUE_MINIMO, ESTOQUE_MINIMO]
+
+def test_venda_lenta_pede_pelo_menos_uma_peca():
+    vendas = pd.DataFrame({'produto_id': [1], 'quantidade': [1], 'dia': [20130310]})
+    assert calcular_reposicao(vendas, [1], date(2013, 5, 31)).loc[1, 'ponto_pedido'] == 1
+
+def test_dias_cobertura():
+    assert dias_cobertura(10, 2.5) == 4
+    assert dias_cobertura(-3, 2.5) == 0
+    assert dias_cobertura(10, 0) == float('inf')
+    assert dias_cobertura(10, None) == float('inf')
+
+def test_atualizacao_incremental(escola_id, novo_produto, novo_pedido):
+    from database.banco import get_connection, atualizar_status_pedido
+    from database.particoes import na_escola
+    from database.reposicao import atualizar_reposicao
+    hoje = date(2013, 5, 31)
+    produto_id = novo_produto(estoque=50)
+    pedido_id = novo_pedido(produto_id, 14, registrado_em=datetime(2013, 5, 30, 12, 0).astimezone())
+
+    def reposicao():
+        return conn.execute("SELECT vendas_7d, ponto_pedido FROM reposicao WHERE produto_id = ?",
+                            (produto_id,)).fetchone()
+
+    with na_escola(escola_id):
+        conn = get_connection()
+    try:
+        assert atualizar_reposicao(conn, hoje) > 0
+        assert tuple(reposicao()) == (14, 26)  # 0.5 * 14/7 + 0.3 * 14/30 + 0.2 * 14/90 peças/dia por 22 dias
+        assert atualizar_reposicao(conn, hoje) == 0  # Nada mudou desde a última vez
+
+        assert atualizar_status_pedido(pedido_id, 'Cancelado')[0]
+        assert atualizar_reposicao(conn, hoje) == 1  # Só o produto do pedido cancelado
+        assert tuple(reposicao()) == (0, ESTOQUE_MINIMO)
+    finally:
+        conn.close()
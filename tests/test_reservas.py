@@ -0,0 +1,49 @@
+"""Reservas: reservado acompanha os pedidos em aberto e disponível = estoque - reservado"""
+
+def estoque_reservado_disponivel(escola_id, produto_id):
+    from database.banco import listar_produtos_por_escola
+    produto = next(p for p in listar_produtos_por_escola(escola_id) if p.id == produto_id)
+    return produto.estoque, produto.reservado, produto.disponivel
+
+def test_reserva_segue_o_ciclo_do_pedido(escola_id, novo_produto, novo_pedido):
+    from database.banco import atualizar_status_pedido, excluir_pedido
+    produto_id = novo_produto(estoque=10)
+
+    primeiro = novo_pedido(produto_id, 3)
+    segundo = novo_pedido(produto_id, 2)
+    passos = [
+        (None, None, (10, 5)),
+        (primeiro, 'Em produção', (10, 5)),
+        (primeiro, 'Entregue', (7, 2)),       # Baixa o estoque e libera a reserva
+        (segundo, 'Cancelado', (7, 0)),
+        (segundo, 'Pendente', (7, 2)),        # Reativado reserva de novo
+        (primeiro, 'Pronto para entrega', (10, 5)),  # Entrega desfeita devolve o estoque
+    ]
+    for pedido_id, status, (estoque, reservado) in passos:
+        if pedido_id:
+            assert atualizar_status_pedido(pedido_id, status)[0]
+        assert estoque_reservado_disponivel(escola_id, produto_id) == (estoque, reservado, estoque - reservado), \
+            (pedido_id, status)
+
+    # Excluir um pedido em aberto libera a reserva dele
+    assert excluir_pedido(segundo)[0]
+    assert estoque_reservado_disponivel(escola_id, produto_id) == (10, 3, 7)
+
+def test_entrega_sem_estoque_nao_mexe_em_nada(escola_id, novo_produto, novo_pedido):
+    from database.banco import atualizar_status_pedido
+    produto_id = novo_produto(estoque=1)
+    pedido_id = novo_pedido(produto_id, 2)
+    sucesso, mensagem = atualizar_status_pedido(pedido_id, 'Entregue')
+    assert not sucesso and 'Estoque insuficiente' in mensagem
+    assert estoque_reservado_disponivel(escola_id, produto_id) == (1, 2, -1)
+
+def test_lote_desfeito_nao_deixa_reserva(escola_id, novo_produto, novo_cliente):
+    """Pedido recusado dentro de um lote não reserva nada; os outros do lote reservam"""
+    from database.banco import adicionar_pedidos_lote
+    produto_id = novo_produto(estoque=10)
+    item = {'produto_id': produto_id, 'quantidade': 4, 'preco_unitario': 30.0, 'subtotal': 120.0}
+    pedido = {'cliente_id': novo_cliente(), 'escola_id': escola_id, 'itens': [item], 'data_entrega': None,
+              'forma_pagamento': 'PIX', 'observacoes': ''}
+    resultados = adicionar_pedidos_lote([pedido, dict(pedido, cliente_id=99999)])
+    assert [r['sucesso'] for r in resultados] == [True, False]
+    assert estoque_reservado_disponivel(escola_id, produto_id) == (10, 4, 6)